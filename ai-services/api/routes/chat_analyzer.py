@@ -4,15 +4,26 @@ Processes natural language conversations to extract symptoms, assess urgency, an
 """
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import asyncio
+import json
+import os
 import structlog
 
+from core.config import settings
+from core.executors import ExecutorSaturatedError, executor_stats
 # from core.database import get_database
 # from core.cache import get_cache
 # from services.conversational_ai_service import ConversationalAIService
-from services.enhanced_chatbot_service import EnhancedChatbotService
+from services.enhanced_chatbot_service import (
+    EnhancedChatbotService,
+    get_chatbot_service,
+    reload_chatbot_service
+)
+from services.session_store import SessionStore, get_session_store
 
 logger = structlog.get_logger()
 router = APIRouter()
@@ -51,78 +62,72 @@ class ChatMessageOutput(BaseModel):
     symptom_categories: List[str] = Field(default=[], description="Categories of detected symptoms")
     needs_medical_attention: bool = Field(default=False, description="Whether medical attention is recommended")
     analysis: Optional[Dict[str, Any]] = Field(default=None, description="Detailed analysis data")
+    error: Optional[str] = Field(default=None, description="Error detail when the analysis failed")
     timestamp: datetime = Field(default_factory=datetime.utcnow, description="Analysis timestamp")
 
 
+class ChatBatchInput(BaseModel):
+    """Input model for batch chat message analysis"""
+    messages: List[ChatMessageInput] = Field(
+        ...,
+        description="Messages to analyze",
+        min_length=1,
+        max_length=settings.ANALYZE_BATCH_MAX_ITEMS
+    )
+
+
+class ChatBatchOutput(BaseModel):
+    """Output model for batch chat message analysis"""
+    results: List[ChatMessageOutput] = Field(..., description="One result per input message, in order")
+    total: int = Field(..., description="Number of messages received")
+    succeeded: int = Field(..., description="Messages analyzed successfully")
+    failed: int = Field(..., description="Messages that returned an error")
+    processing_time_ms: float = Field(..., description="Total processing time")
+
+
 @router.post("/v1/analyze", response_model=ChatMessageOutput)
 async def analyze_message(
-    input_data: ChatMessageInput
+    input_data: ChatMessageInput,
+    enhanced_service: EnhancedChatbotService = Depends(get_chatbot_service),
+    session_store: SessionStore = Depends(get_session_store)
 ) -> ChatMessageOutput:
     """
     Analyze user message for symptom detection, urgency assessment, and generate natural response
+    
+    With a session_id, symptoms from earlier turns are kept server-side and
+    merged with the new message, so conversation_history does not need to be sent.
     """
     start_time = datetime.utcnow()
     
     try:
         logger.info("Processing chat message",
                    message_length=len(input_data.message),
-                   has_history=input_data.conversation_history is not None)
-        
-        # Use enhanced chatbot service with complete workflow
-        try:
-            enhanced_service = EnhancedChatbotService()
-            logger.info("Enhanced chatbot service initialized")
-        except Exception as service_init_error:
-            logger.error("Failed to initialize EnhancedChatbotService", error=str(service_init_error))
-            # No fallback - fail gracefully
-            raise HTTPException(
-                status_code=500,
-                detail=f"Service initialization error: {str(service_init_error)}"
-            )
+                   has_history=input_data.conversation_history is not None,
+                   has_session=input_data.session_id is not None)
         
         # Analyze the message (Tokenize → Classify → OpenAI → Respond)
-        analysis_result = await enhanced_service.process_user_message(
-            user_message=input_data.message,
-            conversation_history=input_data.conversation_history,
-            context=input_data.context
-        )
+        if input_data.session_id:
+            # One turn of a session at a time, or the last save would drop the other turn
+            async with session_store.lock(input_data.session_id):
+                session_state = await session_store.get(input_data.session_id)
+                analysis_result, session_state = await enhanced_service.process_session_message(
+                    user_message=input_data.message,
+                    session_state=session_state
+                )
+                await session_store.save(input_data.session_id, session_state)
+        else:
+            analysis_result = await enhanced_service.process_user_message(
+                user_message=input_data.message,
+                conversation_history=input_data.conversation_history,
+                context=input_data.context
+            )
         
         logger.info("Analysis result structure", 
                    has_message='message' in analysis_result,
                    has_analysis='analysis' in analysis_result,
                    has_disease_class='disease_classification' in analysis_result)
         
-        # Extract data from analysis
-        analysis = analysis_result.get('analysis', {})
-        disease_classification = analysis_result.get('disease_classification', {})
-        
-        # Get the response message
-        ai_message = analysis_result.get('message', 
-            'He recibido tu mensaje. ¿En qué puedo ayudarte específicamente?')
-        
-        # Extract urgency from disease classification or analysis
-        urgency_level = disease_classification.get('urgency', analysis.get('urgency_level', 'low'))
-        
-        # Extract symptom count
-        symptom_extraction = analysis_result.get('symptom_extraction', {})
-        symptom_count = symptom_extraction.get('count', len(symptom_extraction.get('symptoms', [])))
-        
-        # Get symptom categories
-        symptom_categories = disease_classification.get('top_3_diseases', [])[:2]  # Get category from diseases
-        
-        # Check if medical attention needed
-        needs_medical_attention = urgency_level in ['critica', 'alta', 'media']
-        
-        # Generate response
-        result = ChatMessageOutput(
-            success=True,
-            message=ai_message,
-            urgency_level=urgency_level,
-            symptom_count=symptom_count,
-            symptom_categories=[d.get('name', '') for d in symptom_categories] if isinstance(symptom_categories, list) else [],
-            needs_medical_attention=needs_medical_attention,
-            analysis=analysis_result
-        )
+        result = _build_chat_output(analysis_result)
         
         # Optional: Store in database for analytics (commented out to avoid dependency issues)
         # if input_data.session_id:
@@ -144,6 +149,8 @@ async def analyze_message(
         
     except HTTPException:
         raise
+    except ExecutorSaturatedError as e:
+        raise _saturated_error(e)
     except Exception as e:
         logger.error("Error analyzing chat message", error=str(e))
         raise HTTPException(
@@ -152,6 +159,223 @@ async def analyze_message(
         )
 
 
+@router.post("/v1/analyze/stream")
+async def analyze_message_stream(
+    input_data: ChatMessageInput,
+    enhanced_service: EnhancedChatbotService = Depends(get_chatbot_service)
+) -> StreamingResponse:
+    """
+    Streaming variant of /v1/analyze (Server-Sent Events)
+    
+    Events, in order and as each stage finishes: symptoms, classification
+    (disease + urgency), explanation (ML only), narrative, result. The final
+    'result' event carries the same ChatMessageOutput as /v1/analyze.
+    """
+    logger.info("Streaming chat message", message_length=len(input_data.message))
+    
+    async def event_stream():
+        try:
+            async for event, data in enhanced_service.stream_user_message(input_data.message):
+                if event == 'result':
+                    data = _item_output(data).model_dump()
+                yield _format_sse(event, data)
+        except Exception as e:
+            logger.error("Error streaming chat message", error=str(e))
+            yield _format_sse('error', {'detail': f"Error processing message: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _format_sse(event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _saturated_error(error: ExecutorSaturatedError) -> HTTPException:
+    """503 for a request rejected because the analysis executors are full"""
+    logger.warning("Chat analysis rejected, executors saturated", error=str(error))
+    return HTTPException(
+        status_code=503,
+        detail=f"Service busy, retry later: {str(error)}",
+        headers={"Retry-After": "1"}
+    )
+
+
+def _item_output(analysis_result: Dict[str, Any]) -> ChatMessageOutput:
+    """Output for one message of a batch or stream, with its error instead of an HTTP error"""
+    if analysis_result.get('success', False):
+        return _build_chat_output(analysis_result)
+    return ChatMessageOutput(
+        success=False,
+        message=analysis_result.get('message', 'Error processing message'),
+        urgency_level='unknown',
+        error=analysis_result.get('error')
+    )
+
+
+@router.post("/v1/analyze/batch", response_model=ChatBatchOutput)
+async def analyze_messages_batch(
+    input_data: ChatBatchInput,
+    enhanced_service: EnhancedChatbotService = Depends(get_chatbot_service)
+) -> ChatBatchOutput:
+    """
+    Analyze several messages in one call
+    
+    Messages are processed in chunks of BATCH_SIZE (classification and ML
+    prediction are batched per chunk). A message that fails gets success=False
+    and an error in its own result; the rest of the batch is unaffected.
+    """
+    start_time = datetime.utcnow()
+    messages = [item.message for item in input_data.messages]
+    
+    try:
+        logger.info("Processing chat message batch", batch_size=len(messages))
+        
+        analysis_results = []
+        for start in range(0, len(messages), settings.BATCH_SIZE):
+            analysis_results.extend(
+                await enhanced_service.process_user_messages(messages[start:start + settings.BATCH_SIZE])
+            )
+        
+        results = [_item_output(analysis_result) for analysis_result in analysis_results]
+        
+        succeeded = sum(1 for result in results if result.success)
+        processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        logger.info("Chat message batch analyzed",
+                   batch_size=len(results),
+                   failed=len(results) - succeeded,
+                   processing_time_ms=processing_time)
+        
+        return ChatBatchOutput(
+            results=results,
+            total=len(results),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            processing_time_ms=processing_time
+        )
+        
+    except ExecutorSaturatedError as e:
+        raise _saturated_error(e)
+    except Exception as e:
+        logger.error("Error analyzing chat message batch", error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing batch: {str(e)}"
+        )
+
+
+def _build_chat_output(analysis_result: Dict[str, Any]) -> ChatMessageOutput:
+    """Map a chatbot analysis result to the API output model"""
+    # Extract data from analysis
+    analysis = analysis_result.get('analysis', {})
+    disease_classification = analysis_result.get('disease_classification', {})
+    
+    # Get the response message
+    ai_message = analysis_result.get('message', 
+        'He recibido tu mensaje. ¿En qué puedo ayudarte específicamente?')
+    
+    # Extract urgency from disease classification or analysis
+    urgency_level = disease_classification.get('urgency') or analysis.get('urgency_level') or 'low'
+    
+    # Extract symptom count
+    symptom_extraction = analysis_result.get('symptom_extraction', {})
+    symptom_count = symptom_extraction.get('count', len(symptom_extraction.get('symptoms', [])))
+    
+    # Get symptom categories
+    symptom_categories = disease_classification.get('top_3_diseases', [])[:2]  # Get category from diseases
+    
+    # Check if medical attention needed
+    needs_medical_attention = urgency_level in ['critica', 'alta', 'media']
+    
+    return ChatMessageOutput(
+        success=True,
+        message=ai_message,
+        urgency_level=urgency_level,
+        symptom_count=symptom_count,
+        symptom_categories=[d.get('name', '') for d in symptom_categories] if isinstance(symptom_categories, list) else [],
+        needs_medical_attention=needs_medical_attention,
+        analysis=analysis_result
+    )
+
+
+@router.post("/v1/chatbot/reload")
+async def reload_chatbot() -> Dict[str, Any]:
+    """
+    Rebuild the shared chatbot service (ML models + disease database)
+    Use after deploying new model files or an updated disease list
+    
+    Only the uvicorn worker that serves this call is reloaded; with several
+    workers, the others keep their current service until they restart.
+    The rebuild runs in a thread so the worker's event loop keeps serving.
+    """
+    try:
+        service = await asyncio.to_thread(reload_chatbot_service)
+        return {
+            "status": "success",
+            "message": "Chatbot service reloaded in this worker only; other workers keep their current service",
+            "worker_pid": os.getpid(),
+            "ml_enabled": service._use_ml,
+            "disease_database_loaded": service._disease_db is not None
+        }
+    except Exception as e:
+        logger.error("Error reloading chatbot service", error=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error reloading service: {str(e)}"
+        )
+
+
+@router.get("/v1/chatbot/executors")
+async def chatbot_executors() -> Dict[str, Any]:
+    """
+    Queue depth, task counters and queue wait times of the analysis executors
+    """
+    return {
+        "status": "success",
+        "executors": executor_stats()
+    }
+
+
+@router.get("/v1/chatbot/cache")
+async def chatbot_cache(
+    enhanced_service: EnhancedChatbotService = Depends(get_chatbot_service)
+) -> Dict[str, Any]:
+    """
+    Hit/miss counters of the memoized analysis results
+    """
+    return {
+        "status": "success",
+        "cache": enhanced_service.analysis_cache_stats()
+    }
+
+
+@router.delete("/v1/session/{session_id}")
+async def end_session(
+    session_id: str,
+    session_store: SessionStore = Depends(get_session_store)
+) -> Dict[str, Any]:
+    """
+    Forget the accumulated symptoms of a chat session
+    """
+    try:
+        await session_store.delete(session_id)
+        return {
+            "status": "success",
+            "message": "Session cleared",
+            "session_id": session_id
+        }
+    except Exception as e:
+        logger.error("Error clearing chat session", error=str(e), session_id=session_id)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error clearing session: {str(e)}"
+        )
+
+
 # async def _store_message_analysis(
 #     db,
 #     session_id: str,
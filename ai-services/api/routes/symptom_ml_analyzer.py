@@ -5,13 +5,20 @@ Integrates ML models (Random Forest, XGBoost) with SHAP explanations
 for disease classification with full explainability.
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+import os
 import structlog
 import numpy as np
 
+from core.config import settings
+from core.executors import ExecutorSaturatedError
+from services.explanation_store import ExplanationStore, get_explanation_store
+from services.inference_batcher import InferenceBatcher, get_inference_batcher
+from services.model_registry import DEFAULT_MODELS, get_default_model, get_model_registry
+
 logger = structlog.get_logger()
 router = APIRouter()
 
@@ -25,20 +32,32 @@ class SymptomMLInput(BaseModel):
 
 class SymptomMLOutput(BaseModel):
     """Output for ML symptom analysis"""
+    model_config = ConfigDict(protected_namespaces=())
+    
     disease: str = Field(..., description="Predicted disease")
     confidence: float = Field(..., description="Confidence score (0-1)")
     urgency_level: str = Field(..., description="Urgency level")
     explanation: Optional[Dict[str, Any]] = Field(None, description="SHAP explanation")
+    explanation_id: Optional[str] = Field(None, description="ID to fetch the SHAP explanation later (when not included)")
+    model_version: Optional[str] = Field(None, description="Version of the model that made the prediction")
     top_3_predictions: List[Dict[str, str]] = Field([], description="Top 3 predictions")
     needs_medical_attention: bool = Field(False, description="Whether medical attention is needed")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 
 @router.post("/v1/ml-analyze", response_model=SymptomMLOutput)
-async def analyze_symptoms_ml(input_data: SymptomMLInput) -> SymptomMLOutput:
+async def analyze_symptoms_ml(
+    input_data: SymptomMLInput,
+    explanation_store: ExplanationStore = Depends(get_explanation_store),
+    batcher: InferenceBatcher = Depends(get_inference_batcher)
+) -> SymptomMLOutput:
     """
     Analyze symptoms using ML models with SHAP explanations
     
+    Without include_explanation the prediction skips SHAP and returns an
+    explanation_id for GET /v1/ml-explanation/{explanation_id}. Concurrent
+    requests share batched model calls (services/inference_batcher.py).
+    
     Args:
         input_data: Symptoms and patient info
     
@@ -53,38 +72,39 @@ async def analyze_symptoms_ml(input_data: SymptomMLInput) -> SymptomMLOutput:
         # Convert symptoms to string format
         symptoms_str = ", ".join(input_data.symptoms)
         
-        # Load ML model and SHAP explainer
-        from shap_explainer import SHAPDiseaseExplainer
-        
-        # Try to load XGBoost model first (better performance)
-        explainer = None
-        try:
-            explainer = SHAPDiseaseExplainer('models/xgboost_model.pkl')
-            logger.info("Loaded XGBoost model")
-        except:
-            try:
-                explainer = SHAPDiseaseExplainer('models/base_random_forest.pkl')
-                logger.info("Loaded Random Forest model")
-            except Exception as e:
-                logger.error("Could not load ML models", error=str(e))
-                # Fallback to pattern matching
-                from services.enhanced_chatbot_service import EnhancedChatbotService
-                service = EnhancedChatbotService()
-                result = service._classify_by_patterns(symptoms_str, [], input_data.symptoms)
-                
-                return SymptomMLOutput(
-                    disease=result.get('disease_name', 'Infección respiratoria'),
-                    confidence=result.get('confidence', 0.6),
-                    urgency_level=result.get('urgency', 'medium'),
-                    needs_medical_attention=result.get('urgency') in ['high', 'critical']
-                )
+        # Shared XGBoost (or Random Forest) explainer, loaded once per process
+        loaded = get_default_model()
+        if loaded is None:
+            logger.error("Could not load ML models")
+            # Fallback to pattern matching
+            from services.enhanced_chatbot_service import get_chatbot_service
+            service = get_chatbot_service()
+            result = service._classify_by_patterns(symptoms_str, [], input_data.symptoms)
+            
+            return SymptomMLOutput(
+                disease=result.get('disease_name', 'Infección respiratoria'),
+                confidence=result.get('confidence', 0.6),
+                urgency_level=result.get('urgency', 'medium'),
+                needs_medical_attention=result.get('urgency') in ['high', 'critical']
+            )
         
-        # Get prediction with SHAP explanation
-        prediction = explainer.explain_prediction(
-            symptoms_str,
-            patient_age=input_data.patient_age,
-            top_k=10 if input_data.include_explanation else 0
-        )
+        explanation_id = None
+        if input_data.include_explanation:
+            # Get prediction with SHAP explanation
+            prediction = await batcher.predict(
+                loaded,
+                symptoms_str,
+                patient_age=input_data.patient_age,
+                explain=True,
+                top_k=10,
+                backend=settings.ML_ANALYZE_EXPLANATION_BACKEND
+            )
+        else:
+            # Label only; SHAP runs if the client fetches the explanation
+            prediction = await batcher.predict(loaded, symptoms_str, patient_age=input_data.patient_age)
+            explanation_id = await explanation_store.register(
+                loaded.path, loaded.version, symptoms_str, input_data.patient_age
+            )
         
         # Extract urgency from disease characteristics
         urgent_diseases = ['neumonia grave', 'estado asmatico', 'tuberculosis']
@@ -96,6 +116,8 @@ async def analyze_symptoms_ml(input_data: SymptomMLInput) -> SymptomMLOutput:
             confidence=prediction['confidence'],
             urgency_level='high' if is_urgent else 'medium',
             explanation=prediction.get('explanation') if input_data.include_explanation else None,
+            explanation_id=explanation_id,
+            model_version=loaded.version,
             top_3_predictions=[
                 {'disease': p['disease'], 'confidence': f"{p['confidence']:.4f}"}
                 for p in prediction.get('top_3_predictions', [])
@@ -109,6 +131,13 @@ async def analyze_symptoms_ml(input_data: SymptomMLInput) -> SymptomMLOutput:
         
         return response
         
+    except ExecutorSaturatedError as e:
+        logger.warning("ML analysis rejected, executor saturated", error=str(e))
+        raise HTTPException(
+            status_code=503,
+            detail=f"Service busy, retry later: {str(e)}",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error("Error in ML symptom analysis", error=str(e))
         raise HTTPException(
@@ -121,41 +150,43 @@ async def analyze_symptoms_ml(input_data: SymptomMLInput) -> SymptomMLOutput:
 async def get_model_info() -> Dict[str, Any]:
     """Get information about loaded ML models"""
     try:
-        from shap_explainer import SHAPDiseaseExplainer
-        import joblib
-        
         model_info = {
             'models_available': [],
             'models_loaded': []
         }
         
         # Check available models
-        import os
-        if os.path.exists('models/xgboost_model.pkl'):
-            model_info['models_available'].append('xgboost')
-        if os.path.exists('models/base_random_forest.pkl'):
-            model_info['models_available'].append('random_forest')
+        for kind, path in DEFAULT_MODELS:
+            if os.path.exists(path) and kind not in model_info['models_available']:
+                model_info['models_available'].append(kind)
         
-        # Try to load one
+        # Model currently served (XGBoost if it loads, otherwise Random Forest)
         if model_info['models_available']:
-            try:
-                if 'xgboost' in model_info['models_available']:
-                    explainer = SHAPDiseaseExplainer('models/xgboost_model.pkl')
-                    model_info['models_loaded'] = ['xgboost']
-                else:
-                    explainer = SHAPDiseaseExplainer('models/base_random_forest.pkl')
-                    model_info['models_loaded'] = ['random_forest']
-                
-                # Get model info
-                model_info['feature_count'] = len(explainer.vectorizer.get_feature_names_out())
-                model_info['class_count'] = len(explainer.label_encoder.classes_)
-                
-                # Get feature importance summary
-                importance_summary = explainer.get_feature_importance_summary(top_n=10)
-                model_info['most_important_features'] = importance_summary['most_important_features']
-                
-            except Exception as e:
-                model_info['error'] = str(e)
+            loaded = get_default_model()
+            if loaded is None:
+                model_info['error'] = 'Could not load any model'
+            else:
+                try:
+                    explainer = loaded.explainer
+                    model_info['models_loaded'] = [loaded.kind]
+                    model_info['model_version'] = loaded.version
+                    model_info['model_loaded_at'] = datetime.utcfromtimestamp(loaded.loaded_at).isoformat()
+                    
+                    # Get model info
+                    model_info['feature_count'] = len(explainer.vectorizer.get_feature_names_out())
+                    model_info['class_count'] = len(explainer.label_encoder.classes_)
+                    
+                    # Get feature importance summary
+                    importance_summary = explainer.get_feature_importance_summary(top_n=10)
+                    model_info['most_important_features'] = importance_summary['most_important_features']
+                    
+                except Exception as e:
+                    model_info['error'] = str(e)
+        
+        model_info['registry'] = get_model_registry().stats()
+        batcher = get_inference_batcher()
+        model_info['batching'] = batcher.stats()
+        model_info['prediction_cache'] = batcher.cache.stats() if batcher.cache is not None else None
         
         return model_info
         
@@ -165,20 +196,19 @@ async def get_model_info() -> Dict[str, Any]:
 
 
 @router.post("/v1/ml-explanation")
-async def get_detailed_explanation(symptoms: str, patient_age: int = 35) -> Dict[str, Any]:
+async def get_detailed_explanation(
+    symptoms: str,
+    patient_age: int = 35,
+    batcher: InferenceBatcher = Depends(get_inference_batcher)
+) -> Dict[str, Any]:
     """Get detailed SHAP explanation for symptoms"""
     try:
-        from shap_explainer import SHAPDiseaseExplainer
-        
-        # Try to load model
-        explainer = None
-        try:
-            explainer = SHAPDiseaseExplainer('models/xgboost_model.pkl')
-        except:
-            explainer = SHAPDiseaseExplainer('models/base_random_forest.pkl')
+        loaded = get_default_model()
+        if loaded is None:
+            raise RuntimeError("No ML model could be loaded")
         
         # Get explanation
-        explanation = explainer.explain_prediction(symptoms, patient_age, top_k=20)
+        explanation = await batcher.predict(loaded, symptoms, patient_age, explain=True, top_k=20, backend='shap')
         
         return {
             'prediction': explanation['disease'],
@@ -194,3 +224,48 @@ async def get_detailed_explanation(symptoms: str, patient_age: int = 35) -> Dict
             detail=f"Error generating explanation: {str(e)}"
         )
 
+
+@router.get("/v1/ml-explanation/{explanation_id}")
+async def get_deferred_explanation(
+    explanation_id: str,
+    top_k: int = 10,
+    explanation_store: ExplanationStore = Depends(get_explanation_store),
+    batcher: InferenceBatcher = Depends(get_inference_batcher)
+) -> Dict[str, Any]:
+    """SHAP explanation of an earlier /v1/ml-analyze prediction, computed on first fetch"""
+    entry = await explanation_store.get(explanation_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired explanation ID")
+    
+    try:
+        explanation = entry['explanation']
+        if explanation is None or entry['top_k'] != top_k:
+            loaded = get_model_registry().get(entry['model_path'])
+            if loaded is None or loaded.version != entry['model_version']:
+                raise HTTPException(
+                    status_code=410,
+                    detail="The model changed since this prediction; analyze the symptoms again"
+                )
+            
+            explanation = await batcher.predict(
+                loaded, entry['symptoms'], entry['patient_age'], explain=True, top_k=top_k, backend='shap'
+            )
+            await explanation_store.save_explanation(explanation_id, entry, top_k, explanation)
+        
+        return {
+            'explanation_id': explanation_id,
+            'model_version': entry['model_version'],
+            'prediction': explanation['disease'],
+            'confidence': explanation['confidence'],
+            'top_3_predictions': explanation['top_3_predictions'],
+            'explanation': explanation['explanation'],
+            'shap_values': explanation['shap_values']
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating explanation: {str(e)}"
+        )
@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for RespiCare AI Services
+
+Run from the ai-services directory, e.g.:
+    python -m benchmarks.bench_shared_chatbot
+"""
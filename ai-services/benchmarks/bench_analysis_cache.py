@@ -0,0 +1,55 @@
+"""
+Benchmark: process_user_message with and without the result cache
+
+Times each sample message uncached (full pipeline) and as a near-duplicate
+(different case, surrounding spaces) that hits the in-process cache tier.
+
+Usage:
+    python -m benchmarks.bench_analysis_cache [--iterations 200] [--no-model]
+"""
+
+import argparse
+import asyncio
+import logging
+
+import structlog
+
+from benchmarks.common import SAMPLE_MESSAGES, benchmark_workspace, print_stats, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analysis cache benchmark')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per variant')
+    parser.add_argument('--no-model', action='store_true', help='Run without the XGBoost artifact')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=not args.no_model, disease_count=124):
+        from services.enhanced_chatbot_service import get_chatbot_service
+
+        service = get_chatbot_service()
+        loop = asyncio.new_event_loop()
+        print(f"ML enabled: {service._use_ml}")
+
+        def run_uncached():
+            for message in SAMPLE_MESSAGES:
+                loop.run_until_complete(service._analyze_user_message(message))
+
+        near_duplicates = ['  ' + message.upper() + ' ' for message in SAMPLE_MESSAGES]
+        for message in SAMPLE_MESSAGES:
+            loop.run_until_complete(service.process_user_message(message))
+
+        def run_cached():
+            for message in near_duplicates:
+                loop.run_until_complete(service.process_user_message(message))
+
+        per_batch = len(SAMPLE_MESSAGES)
+        print_stats(f"uncached ({per_batch} messages)", time_calls(run_uncached, args.iterations))
+        print_stats(f"cache hit ({per_batch} near-duplicates)", time_calls(run_cached, args.iterations))
+        print(service.analysis_cache_stats())
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
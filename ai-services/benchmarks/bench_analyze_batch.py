@@ -0,0 +1,66 @@
+"""
+Benchmark: /api/v1/analyze one message at a time vs /api/v1/analyze/batch
+
+Measures messages per second of the chatbot pipeline (tokenize, extract,
+classify, ML prediction with SHAP, narrative) for process_user_message in a
+loop and for process_user_messages at growing batch sizes, to find the size
+at which batching stops paying off.
+
+Usage:
+    python -m benchmarks.bench_analyze_batch [--messages 512] [--no-model]
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+import structlog
+
+from benchmarks.common import SAMPLE_MESSAGES, benchmark_workspace
+
+BATCH_SIZES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch analysis benchmark')
+    parser.add_argument('--messages', type=int, default=512, help='Messages processed per measurement')
+    parser.add_argument('--no-model', action='store_true', help='Run without the XGBoost artifact')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=not args.no_model, disease_count=124):
+        from services.enhanced_chatbot_service import get_chatbot_service
+
+        service = get_chatbot_service()
+        loop = asyncio.new_event_loop()
+        messages = list(itertools.islice(itertools.cycle(SAMPLE_MESSAGES), args.messages))
+
+        def run_single():
+            for message in messages:
+                loop.run_until_complete(service.process_user_message(message))
+
+        def run_batches(batch_size):
+            for start in range(0, len(messages), batch_size):
+                loop.run_until_complete(service.process_user_messages(messages[start:start + batch_size]))
+
+        print(f"ML enabled: {service._use_ml}  messages per run: {len(messages)}")
+        run_single()  # warm-up
+
+        start = time.perf_counter()
+        run_single()
+        baseline = len(messages) / (time.perf_counter() - start)
+        print(f"{'process_user_message loop':<32} {baseline:9.1f} msg/s")
+
+        for batch_size in BATCH_SIZES:
+            start = time.perf_counter()
+            run_batches(batch_size)
+            throughput = len(messages) / (time.perf_counter() - start)
+            print(f"{f'batch size {batch_size}':<32} {throughput:9.1f} msg/s  ({throughput / baseline:4.2f}x)")
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: re-sending the conversation every turn vs a server-side session
+
+Measures the latency of turn N of a conversation when the client sends the
+whole history as one message (process_user_message on the concatenated text)
+and when the service keeps the session state and only processes the new turn
+(process_session_message). The measured turn always adds a new symptom.
+
+Usage:
+    python -m benchmarks.bench_chat_session [--iterations 50] [--no-model]
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, print_stats, time_calls
+
+TURN_COUNTS = (1, 5, 10, 25, 50)
+
+TURNS = [
+    "Tengo fiebre alta desde ayer",
+    "también tos seca por las noches",
+    "y me duelen los dolores musculares",
+    "hoy amanecí con dolor de garganta",
+    "sigo igual, con bastante cansancio",
+    "a veces escalofrios en la tarde",
+]
+
+# Last turn of every measured conversation: always brings a new symptom, so
+# the session path has to classify again instead of reusing the last result
+NEW_SYMPTOM_TURN = "ahora también estornudos y congestion nasal"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Chat session benchmark')
+    parser.add_argument('--iterations', type=int, default=50, help='Timed calls per turn count')
+    parser.add_argument('--no-model', action='store_true', help='Run without the XGBoost artifact')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=not args.no_model, disease_count=124):
+        from services.enhanced_chatbot_service import get_chatbot_service
+
+        service = get_chatbot_service()
+        loop = asyncio.new_event_loop()
+        print(f"ML enabled: {service._use_ml}")
+
+        for turn_count in TURN_COUNTS:
+            history = list(itertools.islice(itertools.cycle(TURNS), turn_count - 1)) + [NEW_SYMPTOM_TURN]
+
+            # State after the first N-1 turns
+            state = None
+            for message in history[:-1]:
+                _, state = loop.run_until_complete(service.process_session_message(message, state))
+
+            # Each real turn is a new text, so neither path may reuse a cached scan
+            full_text = '. '.join(history)
+
+            def run_stateless():
+                service._scan_message.cache_clear()
+                loop.run_until_complete(service.process_user_message(full_text))
+
+            def run_session():
+                service._scan_message.cache_clear()
+                loop.run_until_complete(service.process_session_message(history[-1], state))
+
+            stateless = time_calls(run_stateless, args.iterations)
+            session = time_calls(run_session, args.iterations)
+            print_stats(f"turn {turn_count}: full history", stateless)
+            print_stats(f"turn {turn_count}: session delta", session)
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
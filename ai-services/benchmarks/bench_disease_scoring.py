@@ -0,0 +1,80 @@
+"""
+Benchmark: per-disease scoring loops vs sparse scoring matrix in classify_disease
+
+Scores the sample messages against disease catalogs of growing size with the
+old nested loops (re-lowercasing on every comparison) and with
+EnhancedChatbotService.classify_disease on top of DiseaseScorer.
+
+Usage:
+    python -m benchmarks.bench_disease_scoring [--iterations 100]
+"""
+
+import argparse
+import itertools
+import logging
+
+import structlog
+
+from benchmarks.common import SAMPLE_MESSAGES, benchmark_workspace, print_stats, time_calls
+
+
+def loop_classify(diseases, detected_symptom_names, possible_diseases, tokens):
+    """Old scoring: every disease x detected symptom x disease symptom, every keyword x token"""
+    disease_scores = {}
+    for disease in diseases:
+        if disease.get('id') in possible_diseases:
+            symptom_matches = 0
+            for detected_symptom in detected_symptom_names:
+                for disease_symptom in disease.get('sintomas', []):
+                    if detected_symptom.lower() in disease_symptom.lower() or disease_symptom.lower() in detected_symptom.lower():
+                        symptom_matches += 1
+                        break
+            keyword_matches = sum(
+                1 for keyword in disease.get('keywords', [])
+                if any(keyword.lower() in token for token in tokens)
+            )
+            disease_scores[disease.get('id')] = symptom_matches * 3 + keyword_matches * 1.5
+    return sorted(disease_scores.items(), key=lambda x: x[1], reverse=True)[:3]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Disease scoring benchmark')
+    parser.add_argument('--iterations', type=int, default=100)
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    for disease_count in (124, 1000, 5000):
+        with benchmark_workspace(with_model=False, disease_count=disease_count):
+            from services.enhanced_chatbot_service import EnhancedChatbotService
+
+            service = EnhancedChatbotService()
+            diseases = service._disease_db['diseases']
+
+            prepared = []
+            for message in SAMPLE_MESSAGES:
+                tokens = service.tokenize_spanish_text(message)
+                symptoms = service.extract_symptom_keywords(message, tokens)
+                if symptoms:
+                    prepared.append((message, symptoms, tokens))
+            cases = itertools.cycle(prepared)
+
+            def loops():
+                message, symptoms, tokens = next(cases)
+                possible = set()
+                for symptom in symptoms:
+                    possible.update(symptom['possible_diseases'])
+                loop_classify(diseases, [s['symptom'] for s in symptoms], possible, tokens)
+
+            def matrix():
+                message, symptoms, tokens = next(cases)
+                service.classify_disease(message, symptoms, tokens)
+
+            print(f"\n{disease_count} diseases, matrix {service._disease_scorer._matrix.shape} "
+                  f"nnz={service._disease_scorer._matrix.nnz}")
+            print_stats('before: scoring loops', time_calls(loops, args.iterations))
+            print_stats('after: sparse matrix + top-3', time_calls(matrix, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
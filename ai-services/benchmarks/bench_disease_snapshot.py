@@ -0,0 +1,61 @@
+"""
+Benchmark: disease knowledge base cold start, markdown parse vs compiled snapshot
+
+Usage:
+    python -m benchmarks.bench_disease_snapshot [--diseases 124] [--iterations 200]
+"""
+
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from benchmarks.common import print_stats, time_calls, write_disease_markdown
+from data.disease_parser import (
+    build_disease_database,
+    compile_disease_snapshot,
+    load_disease_database,
+    parse_diseases_markdown
+)
+
+
+def retained_bytes(loader) -> int:
+    """Bytes still allocated after loading the database"""
+    gc.collect()
+    tracemalloc.start()
+    database = loader()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del database
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Disease snapshot benchmark')
+    parser.add_argument('--diseases', type=int, default=124)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='respicare-bench-') as workspace:
+        source = write_disease_markdown(workspace, args.diseases)
+        compile_disease_snapshot(source)
+
+        def parse_markdown():
+            return build_disease_database(parse_diseases_markdown(source))
+
+        def load_snapshot():
+            return load_disease_database(source)
+
+        print(f"Diseases: {len(load_snapshot()['diseases'])}  "
+              f"markdown: {os.path.getsize(source)} B  "
+              f"snapshot: {os.path.getsize(source.replace('.md', '.snapshot.pkl'))} B")
+        print_stats('markdown parse + build', time_calls(parse_markdown, args.iterations))
+        print_stats('snapshot load (fresh)', time_calls(load_snapshot, args.iterations))
+        print(f"retained memory, parse:    {retained_bytes(parse_markdown) / 1024:8.1f} KiB")
+        print(f"retained memory, snapshot: {retained_bytes(load_snapshot) / 1024:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
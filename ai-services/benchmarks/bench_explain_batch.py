@@ -0,0 +1,115 @@
+"""
+Benchmark: SHAP explanations one case at a time vs explain_batch
+
+For N cases compares a loop of explain_prediction with one explain_batch
+call, and times the post-processing on its own: the former per-row code
+(one dict per feature, full sort) against argpartition top-k over the SHAP
+matrix with array label decoding.
+
+Usage:
+    python -m benchmarks.bench_explain_batch [--sizes 1 32 256 4096] [--top-k 10]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import logging
+import time
+
+import numpy as np
+import structlog
+
+from benchmarks.common import benchmark_workspace, generate_cases
+
+
+def legacy_explanations(explainer, prediction_proba, shap_rows, top_k):
+    """Post-processing as explain_prediction did it before, row by row"""
+    explanations = []
+    for proba, shap_row in zip(prediction_proba, shap_rows):
+        prediction_idx = int(np.argmax(proba))
+        disease = explainer.label_encoder.inverse_transform([prediction_idx])[0]
+        top_indices = np.argsort(proba)[-3:][::-1]
+        top_predictions = [
+            {'disease': explainer.label_encoder.inverse_transform([idx])[0], 'confidence': float(proba[idx])}
+            for idx in top_indices
+        ]
+        contributions = [
+            {'feature_index': i, 'shap_value': float(value), 'feature_importance': abs(float(value))}
+            for i, value in enumerate(shap_row)
+        ]
+        contributions.sort(key=lambda x: x['feature_importance'], reverse=True)
+        positive = [c for c in contributions if c['shap_value'] > 0][:top_k]
+        negative = [c for c in contributions if c['shap_value'] < 0][:top_k]
+        explanations.append({
+            'disease': disease,
+            'confidence': float(proba[prediction_idx]),
+            'top_3_predictions': top_predictions,
+            'explanation': {
+                'positive_factors': positive,
+                'negative_factors': negative,
+                'decision_factors': positive[:5],
+                'explainability_score': 1.0
+            },
+            'shap_values': shap_row.tolist()
+        })
+    return explanations
+
+
+def timed(func, repeat):
+    """Best wall time of func() in ms over repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='explain_batch benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 32, 256, 4096], help='Batch sizes')
+    parser.add_argument('--top-k', type=int, default=10, help='Factors per case')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=True):
+        from shap_explainer import SHAPDiseaseExplainer
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            explainer = SHAPDiseaseExplainer('models/xgboost_model.pkl')
+        cases = generate_cases(cases_per_disease=200, seed=7)
+        print(f"features: {explainer.model.n_features_in_}  classes: {len(explainer.label_encoder.classes_)}")
+
+        print(f"{'N':>6} {'loop explain_prediction':>24} {'explain_batch':>14} {'speedup':>8}   "
+              f"{'post-process before':>20} {'after':>10}")
+        for size in args.sizes:
+            batch = list(itertools.islice(itertools.cycle(cases), size))
+            texts = [case['symptoms'] for case in batch]
+            ages = [int(case['patient_age']) for case in batch]
+            repeat = 3 if size <= 256 else 1
+
+            loop_ms = timed(lambda: [explainer.explain_prediction(t, a, top_k=args.top_k)
+                                     for t, a in zip(texts, ages)], repeat)
+            batch_ms = timed(lambda: explainer.explain_batch(texts, ages, top_k=args.top_k), repeat)
+
+            # Post-processing alone, on SHAP rows computed once
+            X = explainer.build_features(texts, ages)
+            proba = explainer.model.predict_proba(X)
+            shap_rows = np.concatenate([
+                explainer._predicted_class_shap_values(
+                    explainer.explainer.shap_values(X[start:start + 256]),
+                    np.argmax(proba[start:start + 256], axis=1)
+                )
+                for start in range(0, size, 256)
+            ])
+            before_ms = timed(lambda: legacy_explanations(explainer, proba, shap_rows, args.top_k), repeat)
+            after_ms = timed(lambda: explainer._build_explanations(proba, shap_rows, args.top_k), repeat)
+
+            print(f"{size:>6} {loop_ms:>21.1f} ms {batch_ms:>11.1f} ms {loop_ms / batch_ms:>7.1f}x   "
+                  f"{before_ms:>17.2f} ms {after_ms:>7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
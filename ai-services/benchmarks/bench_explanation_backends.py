@@ -0,0 +1,94 @@
+"""
+Benchmark: explanation backends, speed and agreement with full SHAP
+
+Trains a model on the synthetic dataset, explains held-out synthetic cases
+with every backend of SHAPDiseaseExplainer.EXPLANATION_BACKENDS and reports:
+
+- p50 of one explain_prediction, and explain_batch throughput
+- agreement with 'shap' on each case's predicted-class contributions: max
+  absolute difference, same strongest positive factor (top-1), mean overlap
+  of the top-5 decision factors and of the top-10 factors by |value|, and
+  same sign on the features either backend gives a non-zero value
+
+The predicted disease does not depend on the backend (one predict_proba),
+so accuracy is reported once.
+
+Usage:
+    python -m benchmarks.bench_explanation_backends [--cases-per-disease 20] [--n-estimators 100]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import time
+
+import numpy as np
+import structlog
+
+from benchmarks.common import benchmark_workspace, generate_cases, time_calls
+
+
+def agreement(reference, rows, top_k=10):
+    """Agreement of contribution rows with the reference rows"""
+    positive_ref = np.argsort(-reference, axis=1, kind='stable')
+    positive = np.argsort(-rows, axis=1, kind='stable')
+    magnitude_ref = np.argsort(-np.abs(reference), axis=1, kind='stable')[:, :top_k]
+    magnitude = np.argsort(-np.abs(rows), axis=1, kind='stable')[:, :top_k]
+
+    def overlap(a, b):
+        return np.mean([len(set(x) & set(y)) / len(x) for x, y in zip(a, b)])
+
+    nonzero = (reference != 0) | (rows != 0)
+    return {
+        'max_abs_diff': float(np.abs(reference - rows).max()),
+        'top1': float(np.mean(positive_ref[:, 0] == positive[:, 0])),
+        'decision_top5': overlap(positive_ref[:, :5], positive[:, :5]),
+        'top10_abs': overlap(magnitude_ref, magnitude),
+        'sign': float(np.mean(np.sign(reference[nonzero]) == np.sign(rows[nonzero]))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Explanation backend benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=20, help='Held-out cases per disease')
+    parser.add_argument('--n-estimators', type=int, default=100, help='Boosting rounds of the benchmark model')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=False):
+        from benchmarks.common import train_xgboost_artifact
+        from shap_explainer import SHAPDiseaseExplainer
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = train_xgboost_artifact('models/xgboost_model.pkl', n_estimators=args.n_estimators)
+            explainer = SHAPDiseaseExplainer(path)
+            # Held out: another seed than the training cases
+            cases = generate_cases(cases_per_disease=args.cases_per_disease, seed=7)
+        texts = [case['symptoms'] for case in cases]
+        ages = [int(case['patient_age']) for case in cases]
+
+        X = explainer.build_features(texts, ages)
+        proba = explainer.model.predict_proba(X)
+        predicted = np.argmax(proba, axis=1)
+        labels = explainer.label_encoder.transform([case['disease'] for case in cases])
+        print(f"cases: {len(cases)}  classes: {proba.shape[1]}  rounds: {args.n_estimators}  "
+              f"accuracy (every backend): {np.mean(predicted == labels):.1%}")
+
+        reference = explainer._contribution_rows(X, predicted, 'shap')
+        print(f"{'backend':<12} {'single p50':>11} {'batch/s':>9} {'max |diff|':>11} {'top-1':>7} "
+              f"{'top-5 dec.':>11} {'top-10 |v|':>11} {'sign':>7}")
+        for backend in SHAPDiseaseExplainer.EXPLANATION_BACKENDS:
+            single = time_calls(lambda: explainer.explain_prediction(texts[0], ages[0], backend=backend), 200)
+            start = time.perf_counter()
+            explainer.explain_batch(texts, ages, backend=backend)
+            per_second = len(texts) / (time.perf_counter() - start)
+            stats = agreement(reference, explainer._contribution_rows(X, predicted, backend))
+            print(f"{backend:<12} {single['p50_ms']:>8.2f} ms {per_second:>9.0f} "
+                  f"{stats['max_abs_diff']:>11.2e} {stats['top1']:>7.1%} {stats['decision_top5']:>11.1%} "
+                  f"{stats['top10_abs']:>11.1%} {stats['sign']:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
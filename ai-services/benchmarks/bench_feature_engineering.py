@@ -0,0 +1,59 @@
+"""
+Benchmark: engineered features per case vs create_features_batch
+
+Times AdvancedFeatureEngineering.create_features called once per case (as
+training over the synthetic CSV did) against create_features_batch over the
+whole column, and checks both give the same matrix.
+
+Usage:
+    python -m benchmarks.bench_feature_engineering [--sizes 1 32 1000 10000 100000]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import generate_cases
+
+
+def best_of(func, repeat):
+    """Best wall time of func() in ms"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Feature engineering benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 32, 1000, 10000, 100000],
+                        help='Cases per measurement')
+    args = parser.parse_args()
+
+    from train_xgboost_model import AdvancedFeatureEngineering
+
+    pool = generate_cases(cases_per_disease=400, seed=7)
+    print(f"{'N':>7} {'per case':>12} {'batch':>12} {'speedup':>8}")
+    for size in args.sizes:
+        cases = [pool[i % len(pool)] for i in range(size)]
+        texts = [case['symptoms'] for case in cases]
+        ages = [int(case['patient_age']) for case in cases]
+        repeat = 5 if size <= 10000 else 1
+
+        def per_case():
+            return np.array([AdvancedFeatureEngineering.create_features(t, a) for t, a in zip(texts, ages)])
+
+        def batch():
+            return AdvancedFeatureEngineering.create_features_batch(texts, ages)
+
+        assert np.array_equal(per_case(), batch())
+        per_case_ms = best_of(per_case, repeat)
+        batch_ms = best_of(batch, repeat)
+        print(f"{size:>7} {per_case_ms:>9.2f} ms {batch_ms:>9.2f} ms {per_case_ms / batch_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
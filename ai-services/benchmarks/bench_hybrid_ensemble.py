@@ -0,0 +1,105 @@
+"""
+Benchmark: HybridRuleMLSystem ensemble, sequential hard vote vs parallel soft vote
+
+Trains the Random Forest, XGBoost and multi-task neural network of
+ml_models on synthetic cases (generate_dataset.py generator) and predicts a
+held-out set generated with another seed:
+
+- latency of each model's class_probabilities alone
+- the previous ensemble: the three models one after another, majority vote
+  over their predicted labels
+- HybridRuleMLSystem._ensemble_predict: the three models on the thread pool,
+  weighted average of their probability vectors
+- holdout accuracy of each model and of both votes
+
+Usage:
+    python -m benchmarks.bench_hybrid_ensemble [--cases-per-disease 40] [--iterations 200]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import generate_cases, time_calls
+
+
+def cases_frame(cases_per_disease, seed):
+    """Cases as ml_models expects them: a symptom list per row (no patient_age column)"""
+    cases = generate_cases(cases_per_disease=cases_per_disease, seed=seed)
+    return pd.DataFrame({
+        'disease': [case['disease'] for case in cases],
+        'symptoms': [[symptom.strip() for symptom in case['symptoms'].split(',')] for case in cases],
+        'urgency': [case['urgency'] for case in cases],
+        'severity': [case['severity'] for case in cases],
+        'category': [case['category'] for case in cases],
+    })
+
+
+def train_system(df):
+    """HybridRuleMLSystem with its three models trained on df"""
+    from ml_models import HybridRuleMLSystem
+
+    system = HybridRuleMLSystem()
+    X, y = system.random_forest.prepare_features(df)
+    system.random_forest.train(X, y)
+    X_xgb = system.xgboost.create_advanced_features(df)
+    y_xgb = system.xgboost.label_encoder.fit_transform(df['disease'])
+    system.xgboost.train(X_xgb, y_xgb, optimize=False)
+    system.neural_net.train(system.neural_net.prepare_multi_task_data(df))
+    system.is_trained = True
+    return system
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hybrid ensemble benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=40, help='Training cases per disease')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed predictions per variant')
+    args = parser.parse_args()
+
+    train = cases_frame(args.cases_per_disease, seed=42)
+    holdout = cases_frame(max(args.cases_per_disease // 4, 5), seed=7)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        system = train_system(train)
+        train_seconds = time.perf_counter() - start
+    # Column order of the Random Forest features (prepare_features)
+    all_symptoms = sorted({symptom.lower() for symptoms in train['symptoms'] for symptom in symptoms})
+
+    models = {
+        'rf': lambda symptoms: system.random_forest.class_probabilities(symptoms, all_symptoms),
+        'xgb': system.xgboost.class_probabilities,
+        'nn': system.neural_net.class_probabilities,
+    }
+
+    def label(predict):
+        def predict_label(symptoms):
+            classes, probabilities = predict(symptoms)
+            return classes[int(np.argmax(probabilities))]
+        return predict_label
+
+    def hard_vote(symptoms):
+        return Counter(label(predict)(symptoms) for predict in models.values()).most_common(1)[0][0]
+
+    def soft_vote(symptoms):
+        return system._ensemble_predict(symptoms, all_symptoms)['disease']
+
+    print(f"train cases: {len(train)}  holdout cases: {len(holdout)}  diseases: {train['disease'].nunique()}  "
+          f"training: {train_seconds:.1f} s")
+    sample = holdout['symptoms'].iloc[0]
+    variants = [(f"{name} alone", label(predict)) for name, predict in models.items()]
+    variants += [('sequential hard vote (before)', hard_vote), ('parallel soft vote (after)', soft_vote)]
+    print(f"{'variant':<32} {'p50':>9} {'p99':>9} {'accuracy':>9}")
+    for name, predict in variants:
+        stats = time_calls(lambda: predict(sample), args.iterations)
+        accuracy = np.mean([predict(symptoms) == disease
+                            for symptoms, disease in zip(holdout['symptoms'], holdout['disease'])])
+        print(f"{name:<32} {stats['p50_ms']:>6.2f} ms {stats['p99_ms']:>6.2f} ms {accuracy:>9.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: concurrent ML predictions, one model call each vs micro-batched
+
+C clients each send requests back to back through InferenceBatcher; with
+max_batch_size=1 every request makes its own predict_proba (and shap_values)
+call, as before, otherwise requests arriving within the window share one.
+Reports requests/s, per-request latency and the batcher's batch-size and
+queue-latency histograms, for predictions only and with explanations.
+
+Usage:
+    python -m benchmarks.bench_inference_batcher [--concurrency 1 8 32 64] [--window-ms 2] [--max-batch 32]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import logging
+import time
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, percentile
+
+SYMPTOMS = [
+    'fiebre, tos seca, dificultad para respirar',
+    'tos con flema, dolor de pecho',
+    'estornudos, congestion nasal, dolor de garganta',
+    'sibilancias, falta de aire, opresion en el pecho',
+]
+
+
+async def run_clients(batcher, loaded, concurrency, requests_per_client, explain):
+    """Latencies (ms) of every request and the total wall time (s)"""
+    latencies = []
+
+    async def client(offset):
+        inputs = itertools.islice(itertools.cycle(SYMPTOMS), offset, None)
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            await batcher.predict(loaded, next(inputs), 35, explain=explain)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(i) for i in range(concurrency)])
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inference micro-batching benchmark')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64], help='Concurrent clients')
+    parser.add_argument('--window-ms', type=float, default=2.0, help='Batching window')
+    parser.add_argument('--max-batch', type=int, default=32, help='Maximum batch size')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per run (predictions only)')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=True):
+        from services.inference_batcher import InferenceBatcher
+        from services.model_registry import get_default_model
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded = get_default_model()
+
+        print(f"{'':<12} {'C':>4} {'variant':<10} {'req/s':>8} {'p50':>9} {'p99':>9} {'mean batch':>11}")
+        for explain, total in ((False, args.requests), (True, args.requests // 4)):
+            label = 'explain' if explain else 'predict'
+            for concurrency in args.concurrency:
+                per_client = max(1, total // concurrency)
+                for variant, max_batch in (('unbatched', 1), ('batched', args.max_batch)):
+                    batcher = InferenceBatcher(window_ms=args.window_ms, max_batch_size=max_batch)
+                    # Warm-up (executor threads, first model call)
+                    asyncio.run(run_clients(batcher, loaded, concurrency, 1, explain))
+                    batcher = InferenceBatcher(window_ms=args.window_ms, max_batch_size=max_batch)
+                    latencies, seconds = asyncio.run(
+                        run_clients(batcher, loaded, concurrency, per_client, explain))
+                    stats = batcher.stats()
+                    print(f"{label:<12} {concurrency:>4} {variant:<10} {len(latencies) / seconds:>8.1f} "
+                          f"{percentile(latencies, 50):>6.2f} ms {percentile(latencies, 99):>6.2f} ms "
+                          f"{stats['batch_size']['mean']:>11.1f}")
+                    if variant == 'batched' and concurrency == max(args.concurrency):
+                        print(f"    batch sizes: {stats['batch_size']['buckets']}")
+                        print(f"    queue latency (ms): {stats['queue_latency_ms']['buckets']}")
+
+
+if __name__ == '__main__':
+    main()
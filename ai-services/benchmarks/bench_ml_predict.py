@@ -0,0 +1,62 @@
+"""
+Benchmark: ML prediction with and without SHAP
+
+/v1/ml-analyze used to run explain_prediction (predict_proba + SHAP for every
+class + one dict per feature, sorted) even with include_explanation=false.
+Compares that path with the predict-only path it now takes, and with the
+explanation fetched later through an explanation ID.
+
+Usage:
+    python -m benchmarks.bench_ml_predict [--iterations 200]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import logging
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, print_stats, time_calls
+
+SYMPTOMS = [
+    'fiebre, tos seca, dificultad para respirar',
+    'tos con flema, dolor de pecho',
+    'estornudos, congestion nasal, dolor de garganta',
+    'sibilancias, falta de aire, opresion en el pecho',
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ML predict-only benchmark')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed calls per variant')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=True):
+        from shap_explainer import SHAPDiseaseExplainer
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            explainer = SHAPDiseaseExplainer('models/xgboost_model.pkl')
+        print(f"features: {explainer.model.n_features_in_}  classes: {len(explainer.label_encoder.classes_)}")
+
+        def cycling(call):
+            inputs = itertools.cycle(SYMPTOMS)
+            return lambda: call(next(inputs))
+
+        rows = [
+            ('explain_prediction(top_k=0) (before)',
+             cycling(lambda symptoms: explainer.explain_prediction(symptoms, 35, top_k=0))),
+            ('predict (no SHAP)',
+             cycling(lambda symptoms: explainer.predict(symptoms, 35))),
+            ('explain_prediction(top_k=10) (on fetch)',
+             cycling(lambda symptoms: explainer.explain_prediction(symptoms, 35, top_k=10))),
+        ]
+        for label, call in rows:
+            print_stats(label, time_calls(call, args.iterations))
+
+
+if __name__ == '__main__':
+    main()
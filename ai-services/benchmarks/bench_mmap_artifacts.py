@@ -0,0 +1,108 @@
+"""
+Benchmark: worker start-up and memory, joblib vs memory-mapped artifact
+
+Starts N worker processes at once (spawned, like uvicorn --workers), each
+loading the model artifact and serving one explained prediction, then
+reads every worker's /proc/self/smaps_rollup while all of them are alive:
+
+- ready: process start to first explained prediction (imports included)
+- load: SHAPDiseaseExplainer construction alone
+- RSS: resident pages, counting shared ones in full
+- PSS: shared pages split between the processes mapping them
+- private: pages only this worker has (what each extra worker costs)
+
+Usage:
+    python -m benchmarks.bench_mmap_artifacts [--workers 4] [--n-estimators 300]
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+from benchmarks.common import benchmark_workspace, train_xgboost_artifact
+
+SYMPTOMS = 'fiebre, tos seca, dificultad para respirar'
+
+
+def memory_kib():
+    """RSS, PSS and private memory (KiB) of the current process"""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0])
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def worker(model_path, started_at, barrier, results):
+    """One worker: load, serve one explained prediction, report once every worker is up"""
+    import contextlib
+    import io
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from shap_explainer import SHAPDiseaseExplainer
+
+        load_start = time.perf_counter()
+        explainer = SHAPDiseaseExplainer(model_path)
+        load_seconds = time.perf_counter() - load_start
+        explainer.explain_prediction(SYMPTOMS, 35)
+    ready_seconds = time.time() - started_at
+
+    barrier.wait()
+    results.put({'load': load_seconds, 'ready': ready_seconds, **memory_kib()})
+    barrier.wait()
+
+
+def run_workers(model_path, workers):
+    """Per-worker results of workers processes started together"""
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(workers)
+    results = context.Queue()
+    started_at = time.time()
+    processes = [
+        context.Process(target=worker, args=(model_path, started_at, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return collected
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory-mapped artifact benchmark')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes')
+    parser.add_argument('--n-estimators', type=int, default=300, help='Boosting rounds of the benchmark model')
+    args = parser.parse_args()
+
+    with benchmark_workspace(with_model=False):
+        from model_artifacts import export_mmap_artifact
+
+        pkl_path = train_xgboost_artifact(os.path.join('models', 'xgboost_model.pkl'),
+                                          n_estimators=args.n_estimators)
+        mmap_path = export_mmap_artifact(pkl_path)
+        print(f"artifact: joblib {os.path.getsize(pkl_path) / 2**20:.1f} MB, "
+              f"mmap {os.path.getsize(mmap_path) / 2**20:.1f} MB  workers: {args.workers}")
+
+        print(f"{'format':<8} {'ready':>9} {'load':>9} {'RSS':>10} {'PSS':>10} {'private':>10} {'host (sum PSS)':>15}")
+        for label, path in (('joblib', pkl_path), ('mmap', mmap_path)):
+            results = run_workers(os.path.abspath(path), args.workers)
+
+            def mean(key):
+                return sum(result[key] for result in results) / len(results)
+
+            print(f"{label:<8} {mean('ready'):>7.2f} s {mean('load'):>7.2f} s "
+                  f"{mean('rss') / 1024:>7.1f} MB {mean('pss') / 1024:>7.1f} MB {mean('private') / 1024:>7.1f} MB "
+                  f"{sum(result['pss'] for result in results) / 1024:>12.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: ML explainer loaded per request vs through the model registry
+
+Times the /v1/ml-analyze work (explainer + explain_prediction) when the
+explainer is built from the artifact on every call, as the ML routes used to
+do, and when it comes from the shared ModelRegistry. Then rewrites the
+artifact and measures get() latency while the new version loads in the
+background.
+
+Usage:
+    python -m benchmarks.bench_model_registry [--iterations 30]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import shutil
+import time
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, percentile, print_stats, time_calls
+
+SYMPTOMS = 'fiebre, tos seca, dificultad para respirar'
+MODEL_PATH = 'models/xgboost_model.pkl'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Model registry benchmark')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed calls per variant')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=True):
+        from shap_explainer import SHAPDiseaseExplainer
+        from services.model_registry import ModelRegistry
+
+        def per_request():
+            SHAPDiseaseExplainer(MODEL_PATH).explain_prediction(SYMPTOMS, 35, top_k=10)
+
+        registry = ModelRegistry(check_interval=0)
+
+        def shared():
+            registry.get(MODEL_PATH).explainer.explain_prediction(SYMPTOMS, 35, top_k=10)
+
+        # SHAPDiseaseExplainer prints on every load
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = [
+                ('Explainer loaded per request', time_calls(per_request, args.iterations)),
+                ('ModelRegistry (loaded once)', time_calls(shared, args.iterations)),
+            ]
+        for label, stats in rows:
+            print_stats(label, stats)
+
+        # Hot swap: copy the artifact over itself with a new mtime and keep reading
+        with contextlib.redirect_stdout(io.StringIO()):
+            old_version = registry.get(MODEL_PATH).version
+            shutil.copy(MODEL_PATH, MODEL_PATH + '.new')
+            with open(MODEL_PATH + '.new', 'ab') as f:
+                f.write(b'\0')  # Different content, so a different version
+            os.replace(MODEL_PATH + '.new', MODEL_PATH)
+
+            samples = []
+            deadline = time.perf_counter() + 30
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                loaded = registry.get(MODEL_PATH)
+                samples.append((time.perf_counter() - start) * 1000)
+                if loaded.version != old_version:
+                    break
+                time.sleep(0.001)
+
+        print(f"Hot swap: {len(samples)} gets during reload  "
+              f"p50={percentile(samples, 50):.3f} ms  max={max(samples):.3f} ms  "
+              f"reload took {loaded.load_seconds * 1000:.1f} ms  "
+              f"version {old_version} -> {loaded.version}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: multi-task network, four independent MLPs vs one shared trunk
+
+Trains MultiTaskNeuralNetwork (one MLPClassifier per task) and
+SharedTrunkMultiTaskNetwork (one hidden trunk, a softmax head per task) on
+the same synthetic cases and compares, on a held-out set generated with
+another seed:
+
+- training time
+- latency of predict_all_tasks (four forward passes vs one)
+- parameters and pickled model size
+- accuracy per task
+
+Usage:
+    python -m benchmarks.bench_multitask_network [--cases-per-disease 40] [--iterations 500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_hybrid_ensemble import cases_frame
+from benchmarks.common import time_calls
+
+TASKS = ('disease', 'urgency', 'severity', 'category')
+
+
+def parameter_count(network):
+    """Weights and biases of every layer of the network"""
+    if network.models:
+        return sum(
+            sum(W.size for W in model.coefs_) + sum(b.size for b in model.intercepts_)
+            for model in network.models.values()
+        )
+    return sum(W.size + b.size for W, b in network.layers)
+
+
+def saved_size(network):
+    """Bytes of the file written by save_model"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'network.pkl')
+        with contextlib.redirect_stdout(io.StringIO()):
+            network.save_model(path)
+        return os.path.getsize(path)
+
+
+def task_label(prediction, task):
+    return prediction['disease']['name'] if task == 'disease' else prediction[task]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-task network benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=40, help='Training cases per disease')
+    parser.add_argument('--iterations', type=int, default=500, help='Timed predictions per variant')
+    args = parser.parse_args()
+
+    from ml_models import MultiTaskNeuralNetwork, SharedTrunkMultiTaskNetwork
+
+    train = cases_frame(args.cases_per_disease, seed=42)
+    holdout = cases_frame(max(args.cases_per_disease // 4, 5), seed=7)
+    sample = holdout['symptoms'].iloc[0]
+    print(f"train cases: {len(train)}  holdout cases: {len(holdout)}  diseases: {train['disease'].nunique()}")
+
+    header = f"{'variant':<26} {'training':>9} {'p50':>9} {'p99':>9} {'params':>8} {'size':>9}"
+    print(header + ''.join(f" {task:>9}" for task in TASKS))
+    for name, network in (('four MLPs (before)', MultiTaskNeuralNetwork()),
+                          ('shared trunk (after)', SharedTrunkMultiTaskNetwork())):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            network.train(network.prepare_multi_task_data(train))
+            train_seconds = time.perf_counter() - start
+
+        stats = time_calls(lambda: network.predict_all_tasks(sample), args.iterations)
+        predictions = [network.predict_all_tasks(symptoms) for symptoms in holdout['symptoms']]
+        accuracies = [
+            np.mean([task_label(prediction, task) == expected for prediction, expected in zip(predictions, holdout[task])])
+            for task in TASKS
+        ]
+        print(f"{name:<26} {train_seconds:>7.1f} s {stats['p50_ms']:>6.3f} ms {stats['p99_ms']:>6.3f} ms "
+              f"{parameter_count(network):>8} {saved_size(network) / 1024:>6.0f} KB"
+              + ''.join(f" {accuracy:>9.1%}" for accuracy in accuracies))
+
+
+if __name__ == '__main__':
+    main()
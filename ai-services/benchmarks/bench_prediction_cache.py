@@ -0,0 +1,106 @@
+"""
+Benchmark: explained ML predictions without and with the prediction cache
+
+Simulates chat traffic: a pool of distinct symptom sets, drawn with a Zipf
+distribution (a few common presentations, a long tail) and each written
+with a random surface variant (case, spacing), so many requests are new
+strings but repeat a feature vector. C clients send them through
+InferenceBatcher with explanations: without a cache, with a cold
+PredictionCache, then again on the filled one. Reports distinct messages and vectors, requests/s,
+per-request latency and the cache hit rate.
+
+Usage:
+    python -m benchmarks.bench_prediction_cache [--requests 2000] [--pool 300] [--concurrency 8] [--zipf 1.1]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import logging
+import random
+import time
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, generate_cases, percentile
+
+# Ways of writing the same symptoms that the vectorizer and feature engineering do not tell apart
+VARIANTS = [
+    lambda text: text,
+    str.capitalize,
+    str.upper,
+    str.title,
+    lambda text: text.replace(', ', ' , '),
+    lambda text: f" {text}. ",
+]
+
+
+def build_traffic(pool_size, requests, zipf, seed=7):
+    """Messages of a Zipf-distributed draw from pool_size symptom sets"""
+    rng = random.Random(seed)
+    cases = generate_cases(cases_per_disease=20, seed=seed)
+    pool = [case['symptoms'] for case in rng.sample(cases, pool_size)]
+    weights = [1 / (rank + 1) ** zipf for rank in range(pool_size)]
+    return [rng.choice(VARIANTS)(symptoms) for symptoms in rng.choices(pool, weights, k=requests)]
+
+
+async def run_clients(batcher, loaded, messages, concurrency):
+    """Latencies (ms) of every request and the total wall time (s)"""
+    queue = iter(messages)
+    latencies = []
+
+    async def client():
+        for message in queue:
+            start = time.perf_counter()
+            await batcher.predict(loaded, message, 35, explain=True)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prediction cache benchmark')
+    parser.add_argument('--requests', type=int, default=2000, help='Explained predictions per run')
+    parser.add_argument('--pool', type=int, default=300, help='Distinct symptom sets')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of the symptom-set draw')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=True):
+        from services.inference_batcher import InferenceBatcher
+        from services.model_registry import get_default_model
+        from services.prediction_cache import PredictionCache
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            loaded = get_default_model()
+            messages = build_traffic(args.pool, args.requests, args.zipf)
+        explainer = loaded.explainer
+        vectors = set(explainer.feature_digests(explainer.build_features(messages, [35] * len(messages))))
+        print(f"requests: {len(messages)}  distinct messages: {len(set(messages))}  "
+              f"distinct feature vectors: {len(vectors)}  C: {args.concurrency}")
+
+        print(f"{'variant':<12} {'req/s':>8} {'p50':>9} {'p99':>9} {'hit rate':>9}")
+        cache = PredictionCache(max_entries=4096, ttl=3600, use_redis=False)
+        # The warm run replays the traffic on the cache the cold run filled
+        for variant, variant_cache in (('no cache', None), ('cold cache', cache), ('warm cache', cache)):
+            # Warm-up (executor threads, first model call) on a batcher of its own
+            asyncio.run(run_clients(InferenceBatcher(), loaded, messages[:args.concurrency], args.concurrency))
+            hits_before = variant_cache.stats() if variant_cache else None
+            batcher = InferenceBatcher(cache=variant_cache)
+            latencies, seconds = asyncio.run(run_clients(batcher, loaded, messages, args.concurrency))
+            hit_rate = '-'
+            if variant_cache:
+                stats = variant_cache.stats()
+                hits = stats['local_hits'] - hits_before['local_hits']
+                lookups = hits + stats['misses'] - hits_before['misses']
+                hit_rate = f"{hits / lookups:.1%}"
+            print(f"{variant:<12} {len(latencies) / seconds:>8.1f} {percentile(latencies, 50):>6.2f} ms "
+                  f"{percentile(latencies, 99):>6.2f} ms {hit_rate:>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark: RandomForestDiseaseClassifier features and prediction, before vs after
+
+- prepare_features: dense matrix filled cell by cell (before) vs sparse rows
+  from the symptom -> column index
+- one prediction: loop over all_symptoms, separate predict / predict_proba
+  calls on a dense vector and the forest's feature_importances_ (averaged
+  over every tree on each access) read per matched symptom (before) vs
+  predict (sparse row, one predict_proba, importances computed once)
+- a holdout set: predict per case vs predict_batch
+
+The "before" functions reproduce the previous implementation.
+
+Usage:
+    python -m benchmarks.bench_random_forest_predict [--cases-per-disease 60] [--n-estimators 300]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+
+from benchmarks.bench_hybrid_ensemble import cases_frame
+from benchmarks.common import time_calls
+
+
+def dense_features(df):
+    """Previous prepare_features: sorted symptoms, double loop over a zeros matrix"""
+    all_symptoms = set()
+    for symptoms in df['symptoms']:
+        all_symptoms.update([s.lower() for s in symptoms])
+    symptom_list = sorted(all_symptoms)
+    X = np.zeros((len(df), len(symptom_list)))
+    for i, symptoms in enumerate(df['symptoms']):
+        symptom_set = {s.lower() for s in symptoms}
+        for j, symptom in enumerate(symptom_list):
+            if symptom in symptom_set:
+                X[i, j] = 1
+    return X
+
+
+def predict_before(classifier, symptoms, all_symptoms):
+    """Previous predict: feature loop, predict + predict_proba, importances read per matched symptom"""
+    emergency_check = classifier._check_emergency_rules(symptoms)
+    if emergency_check['is_emergency']:
+        return emergency_check
+
+    feature_vector = np.zeros(len(all_symptoms))
+    symptoms_lower = [s.lower() for s in symptoms]
+    for i, symptom in enumerate(all_symptoms):
+        if symptom.lower() in symptoms_lower:
+            feature_vector[i] = 1
+
+    model = classifier.model
+    prediction_idx = model.predict(feature_vector.reshape(1, -1))[0]
+    prediction_probs = model.predict_proba(feature_vector.reshape(1, -1))[0]
+    disease_name = classifier.label_encoder.inverse_transform([prediction_idx])[0]
+
+    top_indices = np.argsort(prediction_probs)[-3:][::-1]
+    top_predictions = [
+        {'disease': classifier.label_encoder.inverse_transform([idx])[0], 'confidence': float(prediction_probs[idx])}
+        for idx in top_indices
+    ]
+
+    importance_scores = []
+    if hasattr(model, 'feature_importances_'):
+        for i, symptom in enumerate(all_symptoms):
+            if symptom.lower() in symptoms_lower:
+                importance_scores.append((symptom, float(model.feature_importances_[i])))
+    importance_scores.sort(key=lambda x: x[1], reverse=True)
+
+    return {
+        'disease': disease_name,
+        'confidence': float(prediction_probs[prediction_idx]),
+        'top_3_predictions': top_predictions,
+        'urgency_level': classifier._classify_urgency(symptoms),
+        'is_emergency': False,
+        'feature_importance': importance_scores
+    }
+
+
+def seconds(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Random Forest predict benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=60, help='Training cases per disease')
+    parser.add_argument('--n-estimators', type=int, default=300, help='Trees of the forest')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed single predictions')
+    args = parser.parse_args()
+
+    from ml_models import RandomForestDiseaseClassifier
+
+    train = cases_frame(args.cases_per_disease, seed=42)
+    holdout = cases_frame(max(args.cases_per_disease // 4, 5), seed=7)
+    classifier = RandomForestDiseaseClassifier(n_estimators=args.n_estimators)
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y = classifier.prepare_features(train)
+        classifier.train(X, y)
+    all_symptoms = classifier.feature_names
+    cases = holdout['symptoms'].tolist()
+    # Non-emergency case: both versions reach the model
+    sample = next(symptoms for symptoms in cases if not classifier._check_emergency_rules(symptoms)['is_emergency'])
+
+    dense_seconds = seconds(lambda: dense_features(train))
+    sparse_seconds = seconds(lambda: classifier.prepare_features(train))
+    print(f"training cases: {len(train)}  feature columns: {len(all_symptoms)}  trees: {args.n_estimators}")
+    print(f"prepare_features      before {dense_seconds * 1000:8.1f} ms  after {sparse_seconds * 1000:8.1f} ms  "
+          f"({dense_seconds / sparse_seconds:.1f}x)")
+
+    before = time_calls(lambda: predict_before(classifier, sample, all_symptoms), args.iterations)
+    after = time_calls(lambda: classifier.predict(sample), args.iterations)
+    print(f"one prediction (p50)  before {before['p50_ms']:8.2f} ms  after {after['p50_ms']:8.2f} ms  "
+          f"({before['p50_ms'] / after['p50_ms']:.1f}x)")
+
+    loop_seconds = seconds(lambda: [classifier.predict(symptoms) for symptoms in cases])
+    batch_seconds = seconds(lambda: classifier.predict_batch(cases))
+    print(f"{len(cases)} cases           predict loop {len(cases) / loop_seconds:8.0f}/s  "
+          f"predict_batch {len(cases) / batch_seconds:8.0f}/s  ({loop_seconds / batch_seconds:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
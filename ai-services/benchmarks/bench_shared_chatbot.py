@@ -0,0 +1,57 @@
+"""
+Benchmark: per-request EnhancedChatbotService vs shared startup instance
+
+Compares p50/p99 latency of /api/v1/analyze's core work when the service is
+constructed on every request (old behaviour) against the process-wide
+instance returned by get_chatbot_service().
+
+Usage:
+    python -m benchmarks.bench_shared_chatbot [--iterations 50] [--no-model]
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+
+import structlog
+
+from benchmarks.common import (
+    SAMPLE_MESSAGES,
+    benchmark_workspace,
+    print_stats,
+    time_calls
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared chatbot service benchmark')
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--no-model', action='store_true', help='Run without the XGBoost artifact')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=not args.no_model):
+        from services.enhanced_chatbot_service import EnhancedChatbotService, get_chatbot_service
+
+        loop = asyncio.new_event_loop()
+        messages = itertools.cycle(SAMPLE_MESSAGES)
+
+        def per_request():
+            service = EnhancedChatbotService()
+            loop.run_until_complete(service.process_user_message(next(messages)))
+
+        shared = get_chatbot_service()
+
+        def shared_instance():
+            loop.run_until_complete(shared.process_user_message(next(messages)))
+
+        print(f"ML enabled: {shared._use_ml}  disease database: {shared._disease_db is not None}")
+        print_stats('before: new service per request', time_calls(per_request, args.iterations))
+        print_stats('after: shared startup instance', time_calls(shared_instance, args.iterations))
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark: dense vs sparse (CSR) feature pipeline
+
+Builds the feature matrix of the full synthetic dataset (same per-disease
+case counts as generate_dataset.py, generated in memory) both ways: the
+vectorizer output densified with .toarray() + np.hstack, as training used to
+do, and kept in CSR with the engineered columns appended by sparse.hstack.
+Reports matrix memory and build time, XGBoost training time and accuracy for
+each, and explain_batch / single-case predict latency through
+SHAPDiseaseExplainer for the two artifacts.
+
+Usage:
+    python -m benchmarks.bench_sparse_features [--n-estimators 20] [--seed 42]
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import logging
+import os
+import random
+import time
+
+import joblib
+import numpy as np
+import structlog
+import xgboost as xgb
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from benchmarks.common import benchmark_workspace, print_stats, time_calls
+
+
+def full_dataset(seed):
+    """Cases of generate_dataset.generate_dataset without writing the CSV"""
+    from generate_dataset import COMMON_DISEASES, generate_case, parse_disease_list
+
+    random.seed(seed)
+    cases = []
+    for disease_info in parse_disease_list():
+        name, code = disease_info[0], disease_info[1]
+        is_common = any(common in name.lower() or common in code for common in COMMON_DISEASES)
+        num_samples = random.randint(1000, 5000) if is_common else random.randint(100, 500)
+        cases.extend(generate_case(disease_info) for _ in range(num_samples))
+    return cases
+
+
+def matrix_bytes(X):
+    """Bytes held by a dense array or a CSR matrix"""
+    if sparse.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+
+def timed(func):
+    """(result, seconds) of one call"""
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dense vs sparse feature pipeline benchmark')
+    parser.add_argument('--n-estimators', type=int, default=20, help='Boosting rounds per model')
+    parser.add_argument('--seed', type=int, default=42, help='Dataset seed')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed single-case predictions')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=False):
+        from shap_explainer import SHAPDiseaseExplainer
+        from train_xgboost_model import AdvancedFeatureEngineering
+
+        cases = full_dataset(args.seed)
+        texts = [case['symptoms'] for case in cases]
+        ages = [int(case['patient_age']) for case in cases]
+        feature_engineer = AdvancedFeatureEngineering()
+        vectorizer = CountVectorizer(max_features=500, ngram_range=(1, 2))
+        X_symptom = vectorizer.fit_transform(texts)
+        X_engineered = feature_engineer.create_features_batch(texts, ages)
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform([case['disease'] for case in cases])
+
+        X_dense, dense_build = timed(lambda: np.hstack([X_symptom.toarray(), X_engineered]))
+        X_sparse, sparse_build = timed(
+            lambda: sparse.hstack([X_symptom, sparse.csr_matrix(X_engineered)], format='csr'))
+        print(f"cases: {len(cases)}  features: {X_dense.shape[1]}  classes: {len(label_encoder.classes_)}  "
+              f"non-zeros: {X_sparse.nnz} ({X_sparse.nnz / np.prod(X_dense.shape):.1%})")
+        print(f"{'':<8} {'matrix':>10} {'build':>10} {'fit':>10} {'accuracy':>9}")
+
+        artifacts = {}
+        os.makedirs('models', exist_ok=True)
+        for label, X, build in (('dense', X_dense, dense_build), ('sparse', X_sparse, sparse_build)):
+            X_train, X_test, y_train, y_test = train_test_split(
+                X, y, test_size=0.2, random_state=42, stratify=y)
+            model = xgb.XGBClassifier(
+                n_estimators=args.n_estimators,
+                max_depth=6,
+                learning_rate=0.1,
+                random_state=42,
+                n_jobs=-1,
+                objective='multi:softprob',
+                eval_metric='mlogloss'
+            )
+            _, fit_seconds = timed(lambda: model.fit(X_train, y_train, verbose=False))
+            accuracy = model.score(X_test, y_test)
+            print(f"{label:<8} {matrix_bytes(X) / 2**20:>7.1f} MB {build * 1000:>7.1f} ms "
+                  f"{fit_seconds:>8.2f} s {accuracy:>9.4f}")
+
+            artifacts[label] = os.path.join('models', f'xgboost_{label}.pkl')
+            joblib.dump({
+                'model': model,
+                'label_encoder': label_encoder,
+                'vectorizer': vectorizer,
+                'feature_engineer': feature_engineer,
+                'sparse_features': label == 'sparse'
+            }, artifacts[label])
+
+        batch = list(itertools.islice(itertools.cycle(cases), 256))
+        batch_texts = [case['symptoms'] for case in batch]
+        batch_ages = [int(case['patient_age']) for case in batch]
+        for label, path in artifacts.items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                explainer = SHAPDiseaseExplainer(path)
+            print_stats(f"{label}: explain_batch(256)",
+                        time_calls(lambda: explainer.explain_batch(batch_texts, batch_ages, top_k=10), 5, warmup=1))
+            inputs = itertools.cycle(texts[:64])
+            print_stats(f"{label}: predict (1 case)",
+                        time_calls(lambda: explainer.predict(next(inputs), 35), args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: chat analysis on the event loop vs on stage executors
+
+Sends concurrent process_user_message calls while a probe coroutine measures
+event loop lag (how late a 10 ms sleep wakes up), which is what a health check
+or any other request on the same worker would wait. Runs the classification
+and ML stages inline, on thread pools and on process pools.
+
+Usage:
+    python -m benchmarks.bench_stage_executors [--requests 256] [--concurrency 32] [--no-model]
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+import structlog
+
+from benchmarks.common import SAMPLE_MESSAGES, benchmark_workspace, percentile
+
+PROBE_INTERVAL = 0.01
+KINDS = ('inline', 'thread', 'process')
+
+
+async def measure(service, messages, concurrency):
+    """Run messages with bounded concurrency; returns (elapsed seconds, loop lag samples in ms)"""
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append((time.perf_counter() - start - PROBE_INTERVAL) * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(message):
+        async with semaphore:
+            await service.process_user_message(message)
+
+    probe_task = asyncio.ensure_future(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*(analyze(message) for message in messages))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage executor benchmark')
+    parser.add_argument('--requests', type=int, default=256, help='Messages per measurement')
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once')
+    parser.add_argument('--no-model', action='store_true', help='Run without the XGBoost artifact')
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=not args.no_model, disease_count=124):
+        import core.executors as executors
+        from core.config import settings
+        from services.enhanced_chatbot_service import get_chatbot_service
+
+        service = get_chatbot_service()
+        messages = list(itertools.islice(itertools.cycle(SAMPLE_MESSAGES), args.requests))
+        print(f"ML enabled: {service._use_ml}  requests: {len(messages)}  "
+              f"concurrency: {args.concurrency}  workers: {settings.EXECUTOR_MAX_WORKERS}")
+
+        for kind in KINDS:
+            settings.CLASSIFICATION_EXECUTOR = kind
+            settings.ML_EXECUTOR = kind
+            executors.shutdown_executors()
+            executors._executors.clear()
+
+            asyncio.run(measure(service, messages[:args.concurrency], args.concurrency))  # warm-up (starts pools)
+            elapsed, lags = asyncio.run(measure(service, messages, args.concurrency))
+
+            waits = [stats['queue_wait_ms'] for stats in executors.executor_stats()]
+            wait_text = '  '.join(
+                f"{stats['name']} wait p50={wait['p50']:.2f} p99={wait['p99']:.2f} ms"
+                for stats, wait in zip(executors.executor_stats(), waits)
+            ) if kind != 'inline' else ''
+            print(f"{kind:<8} {len(messages) / elapsed:8.1f} msg/s  "
+                  f"loop lag p50={percentile(lags, 50):7.2f} p99={percentile(lags, 99):7.2f} "
+                  f"max={max(lags):7.2f} ms  {wait_text}")
+
+        executors.shutdown_executors()
+
+
+if __name__ == '__main__':
+    main()
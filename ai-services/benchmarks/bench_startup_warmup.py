@@ -0,0 +1,93 @@
+"""
+Benchmark: first requests after start-up, without and with the warm-up
+
+Each variant runs in a fresh (spawned) process, like a new worker:
+
+- no warm-up: start-up builds the chatbot service only (the previous
+  behaviour), then serves the chat messages
+- warm-up: start-up runs services.warmup.Warmup, then serves the same messages
+
+Reports the time until the worker is ready, the latency of the first message,
+the worst of the first messages, and the p50 once every message has been seen
+(steady state). Messages differ from the warm-up ones, so no result is reused.
+
+Usage:
+    python -m benchmarks.bench_startup_warmup [--rounds 5]
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from benchmarks.common import SAMPLE_MESSAGES, benchmark_workspace, percentile
+
+
+def worker(warm, rounds, results):
+    """One fresh worker: start up, then time rounds passes over the messages"""
+    import asyncio
+    import contextlib
+    import io
+    import logging
+
+    import structlog
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    async def serve():
+        from services.enhanced_chatbot_service import get_chatbot_service, init_chatbot_service
+        from services.warmup import Warmup
+
+        start = time.perf_counter()
+        stages = {}
+        if warm:
+            stages = (await Warmup().run())['stages']
+        else:
+            init_chatbot_service()
+        ready_seconds = time.perf_counter() - start
+
+        service = get_chatbot_service()
+        latencies = []
+        for round_index in range(rounds):
+            for message in SAMPLE_MESSAGES:
+                # A new string each round, so the analysis cache does not answer
+                message = f"{message} {'.' * round_index}"
+                message_start = time.perf_counter()
+                await service.process_user_message(message)
+                latencies.append((time.perf_counter() - message_start) * 1000)
+        return ready_seconds, stages, latencies
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results.put(asyncio.run(serve()))
+
+
+def run_worker(warm, rounds):
+    """(ready seconds, warm-up stages, latencies) of one spawned worker"""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=worker, args=(warm, rounds, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup warm-up benchmark')
+    parser.add_argument('--rounds', type=int, default=5, help='Passes over the sample messages per worker')
+    args = parser.parse_args()
+
+    with benchmark_workspace(with_model=True):
+        first_count = len(SAMPLE_MESSAGES)
+        print(f"messages: {first_count} x {args.rounds} rounds")
+        print(f"{'variant':<12} {'ready':>9} {'first':>10} {'worst of first':>15} {'steady p50':>11}")
+        for label, warm in (('no warm-up', False), ('warm-up', True)):
+            ready_seconds, stages, latencies = run_worker(warm, args.rounds)
+            steady = latencies[first_count:]
+            print(f"{label:<12} {ready_seconds:>7.2f} s {latencies[0]:>7.1f} ms "
+                  f"{max(latencies[:first_count]):>12.1f} ms {percentile(steady, 50):>8.2f} ms")
+            if stages:
+                print('  stages: ' + ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in stages.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: SHAPDiseaseExplainer.build_features, joined text vs canonical symptom names
+
+For an XGBoost model in the train_xgboost_model.py format, on cases of the
+chatbot's canonical symptom names:
+
+- text: ', '.join(names), then CountVectorizer.transform and
+  AdvancedFeatureEngineering (create_features for one row, create_features_batch
+  for more), as the chat service called the explainer before
+- names: the names themselves, assembled from the model's SymptomFeatureMap
+
+Reports one case (p50) and batches, checking that both matrices are identical.
+
+Usage:
+    python -m benchmarks.bench_symptom_features [--iterations 500]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import time_calls, train_xgboost_artifact
+
+BATCH_SIZES = (1, 32, 256)
+
+
+def chat_cases(names, n_cases, seed):
+    """Cases of 1-5 distinct canonical names, as extract_symptom_keywords returns them"""
+    rng = random.Random(seed)
+    return [tuple(rng.sample(names, rng.randint(1, 5))) for _ in range(n_cases)], [rng.randint(1, 90) for _ in range(n_cases)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Canonical symptom features benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=20, help='Training cases per disease')
+    parser.add_argument('--iterations', type=int, default=500, help='Timed calls per variant')
+    parser.add_argument('--sparse', type=int, default=1, help='CSR (1) or dense (0) model input')
+    args = parser.parse_args()
+
+    from services.enhanced_chatbot_service import EnhancedChatbotService
+    from shap_explainer import SHAPDiseaseExplainer
+
+    names = EnhancedChatbotService.canonical_symptom_names()
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()):
+        path = train_xgboost_artifact(os.path.join(directory, 'xgboost_model.pkl'),
+                                      cases_per_disease=args.cases_per_disease, n_estimators=5,
+                                      sparse_features=bool(args.sparse))
+        explainer = SHAPDiseaseExplainer(path)
+
+    start = time.perf_counter()
+    explainer.symptom_feature_map().precompute(names)
+    precompute_ms = (time.perf_counter() - start) * 1000
+    print(f"canonical names: {len(names)}  vocabulary: {len(explainer.vectorizer.vocabulary_)}  "
+          f"sparse input: {bool(args.sparse)}  precompute: {precompute_ms:.2f} ms")
+
+    for batch_size in BATCH_SIZES:
+        cases, ages = chat_cases(names, batch_size, seed=batch_size)
+        texts = [', '.join(case) for case in cases]
+        X_text = explainer.build_features(texts, ages)
+        X_names = explainer.build_features(cases, ages)
+        identical = (X_text != X_names).nnz == 0 if args.sparse else np.array_equal(X_text, X_names)
+
+        iterations = max(args.iterations // batch_size, 20)
+        before = time_calls(lambda: explainer.build_features([', '.join(case) for case in cases], ages), iterations)
+        after = time_calls(lambda: explainer.build_features(cases, ages), iterations)
+        print(f"  batch {batch_size:<4} (p50)  text {before['p50_ms']:8.3f} ms  names {after['p50_ms']:8.3f} ms  "
+              f"({before['p50_ms'] / after['p50_ms']:.1f}x)  identical: {identical}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: substring scan vs inverted index in _get_disease_ids_for_symptom
+
+Runs every symptom the chatbot can extract (plus a few misses) against the
+124-disease list, with the old two-way substring scan over all
+symptom_to_diseases keys and with SymptomIndex.lookup.
+
+Usage:
+    python -m benchmarks.bench_symptom_index [--iterations 300]
+"""
+
+import argparse
+import logging
+
+import structlog
+
+from benchmarks.common import benchmark_workspace, print_stats, time_calls
+
+
+def substring_scan(symptom_map, symptom):
+    """Old lookup: two substring checks per symptom key"""
+    disease_ids = set()
+    for symptom_key, ids in symptom_map.items():
+        if symptom.lower() in symptom_key.lower() or symptom_key.lower() in symptom.lower():
+            disease_ids.update(ids)
+    return list(disease_ids) if disease_ids else list(range(1, 125))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Symptom index benchmark')
+    parser.add_argument('--iterations', type=int, default=300)
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=False, disease_count=124):
+        from services.enhanced_chatbot_service import EnhancedChatbotService
+        from services.symptom_index import SymptomIndex
+
+        service = EnhancedChatbotService()
+        symptom_map = service._disease_db['symptom_to_diseases']
+        queries = sorted(set(service.SYMPTOM_PHRASES) | set(service.SYMPTOM_WORD_PATTERNS.values()))
+        queries += ['sibilancias nocturnas', 'dolor abdominal', 'xyz']
+
+        index = SymptomIndex(symptom_map)
+        print(f"{len(service._disease_db['diseases'])} diseases, {len(index)} symptom keys, "
+              f"{len(queries)} queries per iteration")
+        print_stats('index build (startup)', time_calls(lambda: SymptomIndex(symptom_map), 20))
+
+        def scan_all():
+            for symptom in queries:
+                substring_scan(symptom_map, symptom)
+
+        def index_all():
+            for symptom in queries:
+                index.lookup(symptom)
+
+        print_stats('before: substring scan', time_calls(scan_all, args.iterations))
+        print_stats('after: inverted index', time_calls(index_all, args.iterations))
+        print_stats('after: _get_disease_ids_for_symptom',
+                    time_calls(lambda: [service._get_disease_ids_for_symptom(s) for s in queries],
+                               args.iterations))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: per-lexicon substring loops vs one multi-pattern scan
+
+The old message analysis ran a separate `pattern in message` loop for symptom
+phrases, disease terms, greetings and question words (and repeated the greeting
+and question checks when building the reply). The matcher scans the message
+once for all of them. Measured for the chatbot's own lexicon and for a lexicon
+grown with every symptom phrase of the 124-disease list, at several message
+lengths.
+
+Usage:
+    python -m benchmarks.bench_symptom_matcher [--iterations 300]
+"""
+
+import argparse
+import itertools
+import logging
+
+import structlog
+
+from benchmarks.common import (
+    SAMPLE_MESSAGES,
+    benchmark_workspace,
+    print_stats,
+    time_calls
+)
+
+
+def naive_scan(service, patterns, message):
+    """Old approach: one substring loop per lexicon, repeated checks per step"""
+    message_lower = message.lower()
+    for _ in range(2):  # greeting/question checks ran in process_user_message and again in the reply
+        any(greeting in message_lower for greeting in service.GREETINGS)
+        any(question_word in message_lower for question_word in service.QUESTION_WORDS)
+    found = [pattern for pattern in patterns if pattern in message_lower]
+    for disease_info in service.DISEASE_PATTERNS.values():
+        [term for term in disease_info['symptoms'] if term in message_lower]
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Multi-pattern matcher benchmark')
+    parser.add_argument('--iterations', type=int, default=300)
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+
+    with benchmark_workspace(with_model=False, disease_count=124):
+        from services.enhanced_chatbot_service import EnhancedChatbotService
+        from services.symptom_matcher import MultiPatternMatcher
+
+        service = EnhancedChatbotService()
+        chatbot_patterns = service.SYMPTOM_PHRASES + list(service.SYMPTOM_WORD_PATTERNS)
+        disease_phrases = sorted({
+            symptom.lower()
+            for disease in service._disease_db['diseases']
+            for symptom in disease['sintomas']
+        })
+        lexicons = {
+            'chatbot lexicon': chatbot_patterns,
+            'chatbot + 124-disease phrases': chatbot_patterns + disease_phrases,
+        }
+
+        for lexicon_name, patterns in lexicons.items():
+            entries = [(pattern, 'symptom', None) for pattern in patterns]
+            entries += [(term, 'disease_term', None)
+                        for info in service.DISEASE_PATTERNS.values() for term in info['symptoms']]
+            entries += [(greeting, 'greeting', None) for greeting in service.GREETINGS]
+            entries += [(word, 'question', None) for word in service.QUESTION_WORDS]
+            matcher = MultiPatternMatcher(entries)
+
+            print(f"\n{lexicon_name}: {matcher.pattern_count} distinct patterns")
+            for repeat in (1, 10, 50):
+                messages = itertools.cycle([' '.join([message] * repeat) for message in SAMPLE_MESSAGES])
+                length = sum(len(message) for message in SAMPLE_MESSAGES) * repeat // len(SAMPLE_MESSAGES)
+
+                print_stats(f"before: loops, ~{length} chars",
+                            time_calls(lambda: naive_scan(service, patterns, next(messages)), args.iterations))
+                print_stats(f"after: one scan, ~{length} chars",
+                            time_calls(lambda: matcher.scan(next(messages).lower()), args.iterations))
+
+
+if __name__ == '__main__':
+    main()
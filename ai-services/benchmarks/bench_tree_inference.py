@@ -0,0 +1,122 @@
+"""
+Benchmark: tree ensemble inference, library objects vs ml_models.tree_inference
+
+For an XGBoost model in the train_xgboost_model.py format and the Random
+Forest of RandomForestDiseaseClassifier, both trained on synthetic cases:
+
+- import + load in a fresh interpreter: joblib artifact (xgboost / scikit-learn)
+  vs the exported .npz (NumPy only)
+- predict_proba latency for one row and rows/s for batches, on the features of
+  a held-out set, checking that the probabilities are bit-identical
+
+Usage:
+    python -m benchmarks.bench_tree_inference [--n-estimators 100] [--rf-estimators 300]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from benchmarks.bench_hybrid_ensemble import cases_frame
+from benchmarks.common import generate_cases, time_calls, train_xgboost_artifact
+
+BATCH_SIZES = (32, 256)
+
+LOAD_ARTIFACT = (
+    "import joblib; data = joblib.load({path!r}); "
+    "model = data['model'] if isinstance(data, dict) else data"
+)
+LOAD_ARRAYS = (
+    "from ml_models.tree_inference import ArrayTreeEnsemble; ArrayTreeEnsemble.load({path!r})"
+)
+
+
+def cold_load_seconds(statement, path, runs=3):
+    """Best of runs: seconds to import and load in a new interpreter"""
+    script = f"import time; start = time.perf_counter(); {statement.format(path=path)}; print(time.perf_counter() - start)"
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    return min(
+        float(subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True, env=env).stdout)
+        for _ in range(runs)
+    )
+
+
+def rows_per_second(predict_proba, X, batch_size):
+    """Rows/s predicting X in consecutive batches"""
+    start = time.perf_counter()
+    for batch_start in range(0, X.shape[0], batch_size):
+        predict_proba(X[batch_start:batch_start + batch_size])
+    return X.shape[0] / (time.perf_counter() - start)
+
+
+def compare(name, model, model_path, X, iterations):
+    from ml_models.tree_inference import export_tree_ensemble
+
+    ensemble = export_tree_ensemble(model)
+    npz_path = os.path.splitext(model_path)[0] + '.npz'
+    ensemble.save(npz_path)
+    identical = np.array_equal(model.predict_proba(X), ensemble.predict_proba(X))
+
+    print(f"\n{name}: {ensemble.n_trees} trees, {len(ensemble.feature)} nodes, max depth {ensemble.max_depth}, "
+          f"holdout rows {X.shape[0]}, bit-identical: {identical}")
+    artifact_load = cold_load_seconds(LOAD_ARTIFACT, model_path)
+    arrays_load = cold_load_seconds(LOAD_ARRAYS, npz_path)
+    print(f"  {'import + load':<16} artifact {artifact_load * 1000:8.1f} ms ({os.path.getsize(model_path) / 1024:.0f} KB)  "
+          f"npz {arrays_load * 1000:8.1f} ms ({os.path.getsize(npz_path) / 1024:.0f} KB)  "
+          f"({artifact_load / arrays_load:.1f}x)")
+
+    row = X[:1]
+    before = time_calls(lambda: model.predict_proba(row), iterations)
+    after = time_calls(lambda: ensemble.predict_proba(row), iterations)
+    print(f"  {'one row (p50)':<16} library  {before['p50_ms']:8.3f} ms  arrays {after['p50_ms']:8.3f} ms  "
+          f"({before['p50_ms'] / after['p50_ms']:.1f}x)")
+    for batch_size in BATCH_SIZES + (X.shape[0],):
+        library = rows_per_second(model.predict_proba, X, batch_size)
+        arrays = rows_per_second(ensemble.predict_proba, X, batch_size)
+        print(f"  {f'batch {batch_size}':<16} library  {library:8.0f}/s   arrays {arrays:8.0f}/s   "
+              f"({arrays / library:.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Array tree ensemble benchmark')
+    parser.add_argument('--cases-per-disease', type=int, default=60, help='Training cases per disease')
+    parser.add_argument('--n-estimators', type=int, default=100, help='XGBoost boosting rounds')
+    parser.add_argument('--rf-estimators', type=int, default=300, help='Random Forest trees')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed single-row predictions')
+    args = parser.parse_args()
+
+    from ml_models import RandomForestDiseaseClassifier
+    from shap_explainer import SHAPDiseaseExplainer
+
+    holdout_cases = generate_cases(cases_per_disease=max(args.cases_per_disease // 4, 5), seed=7)
+
+    with tempfile.TemporaryDirectory() as directory:
+        with contextlib.redirect_stdout(io.StringIO()):
+            xgb_path = train_xgboost_artifact(os.path.join(directory, 'xgboost_model.pkl'),
+                                              cases_per_disease=args.cases_per_disease,
+                                              n_estimators=args.n_estimators)
+            explainer = SHAPDiseaseExplainer(xgb_path)
+            X_xgb = explainer.build_features([case['symptoms'] for case in holdout_cases],
+                                             [int(case['patient_age']) for case in holdout_cases])
+
+            classifier = RandomForestDiseaseClassifier(n_estimators=args.rf_estimators)
+            X, y = classifier.prepare_features(cases_frame(args.cases_per_disease, seed=42))
+            classifier.train(X, y)
+            rf_path = os.path.join(directory, 'random_forest.pkl')
+            joblib.dump({'model': classifier.model}, rf_path)
+            X_rf = classifier._features(cases_frame(max(args.cases_per_disease // 4, 5), seed=7)['symptoms'].tolist())
+
+        compare('XGBoost (CSR features)', explainer.model, xgb_path, X_xgb, args.iterations)
+        compare('Random Forest', classifier.model, rf_path, X_rf, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""
+Shared helpers for benchmarks
+
+Builds a throwaway workspace with the disease markdown and a small trained
+XGBoost artifact so benchmarks can run without the production files.
+"""
+
+import os
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Any, Optional
+
+from data.respiratory_diseases_comprehensive import RESPIRATORY_DISEASES_DATABASE
+
+DISEASE_FILE_NAME = 'lista_enfermedades_respiratorias.md'
+
+SAMPLE_MESSAGES = [
+    "Tengo fiebre alta, tos seca y dolores musculares desde ayer",
+    "Hola, buenos días",
+    "Estornudos frecuentes, picazon nasal, congestion nasal y lagrimeo",
+    "Siento dificultad para respirar, dolor de pecho y escalofrios",
+    "¿Qué es el asma?",
+    "Tengo tos con flema, fatiga y fiebre leve hace una semana",
+    "Me duele la garganta y tengo secrecion nasal",
+    "Fiebre, dolores musculares, tos, dolor de garganta, fatiga, síntomas gastrointestinales",
+]
+
+
+def build_disease_markdown(count: Optional[int] = None) -> str:
+    """
+    Render the comprehensive disease database in the parser's markdown format
+
+    Args:
+        count: Number of entries to emit. The 30 known diseases are cycled
+            (with a variant suffix) to reach sizes like the full 124-entry list.
+    """
+    known = list(RESPIRATORY_DISEASES_DATABASE.values())
+    count = count or len(known)
+
+    sections: Dict[str, List[Dict[str, Any]]] = {}
+    for i in range(count):
+        disease = dict(known[i % len(known)])
+        if i >= len(known):
+            disease['nombre'] = f"{disease['nombre']} (variante {i // len(known)})"
+        sections.setdefault(disease['categoria'].upper(), []).append(disease)
+
+    lines = ['# Lista de enfermedades respiratorias', '']
+    number = 1
+    for section, diseases in sections.items():
+        lines.append(f'## {section}')
+        lines.append('')
+        for disease in diseases:
+            symptoms = ', '.join(disease['sintomas'])
+            lines.append(f"{number}. **{disease['nombre']}**: {symptoms}")
+            number += 1
+        lines.append('')
+
+    return '\n'.join(lines)
+
+
+def write_disease_markdown(directory: str, count: Optional[int] = None) -> str:
+    """Write the disease markdown into directory and return its path"""
+    path = os.path.join(directory, DISEASE_FILE_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(build_disease_markdown(count))
+    return path
+
+
+def generate_cases(cases_per_disease: int = 60, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate synthetic cases with the same generator used for training"""
+    from generate_dataset import parse_disease_list, generate_case
+
+    random.seed(seed)
+    cases = []
+    for disease_info in parse_disease_list():
+        for _ in range(cases_per_disease):
+            cases.append(generate_case(disease_info))
+    return cases
+
+
+def train_xgboost_artifact(path: str,
+                           cases_per_disease: int = 60,
+                           n_estimators: int = 40,
+                           sparse_features: bool = True) -> str:
+    """Train a small XGBoost model in the train_xgboost_model.py format"""
+    import joblib
+    import numpy as np
+    import xgboost as xgb
+    from scipy import sparse
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import LabelEncoder
+    from train_xgboost_model import AdvancedFeatureEngineering
+
+    cases = generate_cases(cases_per_disease)
+    texts = [case['symptoms'] for case in cases]
+    ages = [int(case['patient_age']) for case in cases]
+
+    feature_engineer = AdvancedFeatureEngineering()
+    vectorizer = CountVectorizer(max_features=500, ngram_range=(1, 2))
+    X_symptom = vectorizer.fit_transform(texts)
+    X_engineered = feature_engineer.create_features_batch(texts, ages)
+    if sparse_features:
+        X = sparse.hstack([X_symptom, sparse.csr_matrix(X_engineered)], format='csr')
+    else:
+        X = np.hstack([X_symptom.toarray(), X_engineered])
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform([case['disease'] for case in cases])
+
+    model = xgb.XGBClassifier(
+        n_estimators=n_estimators,
+        max_depth=4,
+        learning_rate=0.2,
+        random_state=42,
+        n_jobs=1,
+        objective='multi:softprob',
+        eval_metric='mlogloss'
+    )
+    model.fit(X, y, verbose=False)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    joblib.dump({
+        'model': model,
+        'label_encoder': label_encoder,
+        'vectorizer': vectorizer,
+        'feature_engineer': feature_engineer,
+        'sparse_features': sparse_features
+    }, path)
+    return path
+
+
+@contextmanager
+def benchmark_workspace(with_model: bool = True, disease_count: Optional[int] = None):
+    """Temporary working directory with disease markdown and models/xgboost_model.pkl"""
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='respicare-bench-') as workspace:
+        write_disease_markdown(workspace, disease_count)
+        if with_model:
+            train_xgboost_artifact(os.path.join(workspace, 'models', 'xgboost_model.pkl'))
+        os.chdir(workspace)
+        try:
+            yield workspace
+        finally:
+            os.chdir(previous_cwd)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def time_calls(func: Callable[[], Any], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """Time func() and return latency stats in milliseconds"""
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'iterations': iterations,
+        'mean_ms': statistics.fmean(samples),
+        'p50_ms': percentile(samples, 50),
+        'p99_ms': percentile(samples, 99),
+    }
+
+
+def print_stats(label: str, stats: Dict[str, float]):
+    """Print one row of latency stats"""
+    print(f"{label:<40} p50={stats['p50_ms']:9.3f} ms  "
+          f"p99={stats['p99_ms']:9.3f} ms  mean={stats['mean_ms']:9.3f} ms  "
+          f"(n={stats['iterations']})")
@@ -4,8 +4,11 @@ Redis cache utilities
 
 import redis.asyncio as redis
 import json
+import threading
+import time
 import structlog
-from typing import Any, Optional, Union
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
 from datetime import timedelta
 
 from .config import settings
@@ -117,3 +120,107 @@ async def clear_cache_pattern(pattern: str) -> int:
     except Exception as e:
         logger.error("Failed to clear cache pattern", pattern=pattern, error=str(e))
         return 0
+
+
+class TieredCache:
+    """
+    In-process LRU with TTL, optionally backed by the Redis cache
+
+    Reads check the local tier first and fill it from Redis; writes go to
+    both. Values stored in Redis must be JSON-serializable.
+    """
+
+    def __init__(self, prefix: str, max_entries: int, ttl: int, use_redis: bool = False):
+        """
+        Args:
+            prefix: Redis key prefix
+            max_entries: Entries kept in memory before the least recent is evicted
+            ttl: Seconds an entry lives (refreshed when it is set again)
+            use_redis: Also read/write entries through Redis
+        """
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        # key -> (expiry, value), least recently used first
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set_local(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached value, None if missing or expired"""
+        value = self._get_local(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+
+        if self.use_redis:
+            value = await get_cache(self.prefix + key)
+            if value is not None:
+                self.redis_hits += 1
+                self._set_local(key, value)
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: Any):
+        """Store a value in every tier"""
+        self._set_local(key, value)
+        if self.use_redis:
+            await set_cache(self.prefix + key, value, ttl=self.ttl)
+
+    async def delete(self, key: str):
+        """Remove a value from every tier"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.use_redis:
+            await delete_cache(self.prefix + key)
+
+    def clear_local(self, key_prefix: str = ''):
+        """Drop the in-process tier, or only its keys starting with key_prefix"""
+        with self._lock:
+            if not key_prefix:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key.startswith(key_prefix)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters"""
+        lookups = self.local_hits + self.redis_hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'redis': self.use_redis,
+            'local_hits': self.local_hits,
+            'redis_hits': self.redis_hits,
+            'misses': self.misses,
+            'hit_rate': (self.local_hits + self.redis_hits) / lookups if lookups else 0.0
+        }
@@ -36,11 +36,47 @@ class Settings(BaseSettings):
     MEDICAL_MODEL_NAME: str = "en_core_sci_sm"  # SciSpacy medical model
     SYMPTOM_MODEL_NAME: str = "symptom-classifier-v1"
     HISTORY_MODEL_NAME: str = "medical-history-processor-v1"
+    MODEL_RELOAD_CHECK_INTERVAL: float = 5.0  # Seconds between checks for a changed model file
     
     # Processing Configuration
     MAX_TEXT_LENGTH: int = 10000
     BATCH_SIZE: int = 32
+    ANALYZE_BATCH_MAX_ITEMS: int = 500  # Messages accepted by /api/v1/analyze/batch
     CACHE_TTL: int = 3600  # 1 hour
+    ANALYSIS_CACHE_SIZE: int = 2048  # Chat analysis results memoized per worker (0 disables)
+    ANALYSIS_CACHE_REDIS: bool = False  # Share memoized results between workers through Redis
+    
+    # Chat sessions
+    SESSION_CACHE_SIZE: int = 10000  # Sessions kept in memory per worker
+    SESSION_TTL: int = 1800  # 30 minutes without activity
+    SESSION_STORE_REDIS: bool = False  # Share sessions between workers through Redis
+    
+    # Deferred ML explanations (/api/v1/ml-explanation/{explanation_id})
+    EXPLANATION_STORE_SIZE: int = 10000  # Pending explanations kept in memory per worker
+    EXPLANATION_TTL: int = 900  # 15 minutes to fetch an explanation
+    EXPLANATION_STORE_REDIS: bool = False  # Share explanation IDs between workers through Redis
+    
+    # CPU-bound chat stages, off the event loop (inline | thread | process)
+    CLASSIFICATION_EXECUTOR: str = "thread"  # Tokenize, extract and score against the disease database
+    ML_EXECUTOR: str = "thread"  # XGBoost + SHAP
+    EXECUTOR_MAX_WORKERS: int = 4
+    EXECUTOR_MAX_QUEUE: int = 64  # Tasks waiting per stage before requests are rejected
+    
+    # Micro-batching of concurrent ML predictions on the ML executor
+    ML_BATCH_WINDOW_MS: float = 2.0  # How long a prediction waits for others to share its model call
+    ML_BATCH_MAX_SIZE: int = 32  # Predictions that start a batch at once (1 disables batching)
+    
+    # Predictions and SHAP explanations memoized by feature vector and model version
+    PREDICTION_CACHE_SIZE: int = 4096  # Results kept in memory per worker (0 disables)
+    PREDICTION_CACHE_TTL: int = 3600  # 1 hour
+    PREDICTION_CACHE_REDIS: bool = False  # Share results between workers through Redis
+    
+    # How explanations are computed: shap | native (XGBoost pred_contribs, same values) | approximate (Saabas)
+    CHAT_EXPLANATION_BACKEND: str = "native"  # Chat pipeline
+    ML_ANALYZE_EXPLANATION_BACKEND: str = "native"  # /api/v1/ml-analyze (/api/v1/ml-explanation always uses shap)
+    
+    # Startup
+    STARTUP_WARMUP: bool = True  # Run synthetic messages through every stage before /api/v1/health reports ready
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,262 @@
+"""
+Executors for CPU-bound request stages
+
+Chat analysis is CPU work (tokenizing, scanning, scoring, XGBoost + SHAP)
+behind async endpoints. Running it inline blocks the event loop, so every
+other request on the worker (health checks included) waits for it. Each stage
+goes through a bounded executor instead:
+
+- thread: for NumPy / XGBoost work that releases the GIL
+- process: for pure-Python work, in parallel with the event loop
+- inline: run on the event loop (debugging, tests)
+
+Submissions beyond max_workers running + max_queue waiting are rejected with
+ExecutorSaturatedError, and the time tasks spend waiting for a worker is kept
+as a metric.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when a stage already has its maximum number of tasks queued"""
+
+
+def _timed_call(func: Callable, args: tuple) -> tuple:
+    """Run func in the worker, returning (start time, result, error)"""
+    # Wall clock: the start time is compared with the submit time of another process
+    started_at = time.time()
+    try:
+        return started_at, func(*args), None
+    except Exception as e:
+        return started_at, None, e
+
+
+class StageExecutor:
+    """Bounded thread / process pool for one kind of CPU-bound work, with queue metrics"""
+
+    KINDS = ('inline', 'thread', 'process')
+
+    # Recent queue waits kept for percentiles
+    WAIT_SAMPLES = 1024
+
+    def __init__(self, name: str, kind: str = 'thread', max_workers: int = 4, max_queue: int = 64):
+        """
+        Args:
+            name: Stage name (metrics, thread names)
+            kind: 'inline', 'thread' or 'process'
+            max_workers: Tasks running at once
+            max_queue: Tasks allowed to wait for a worker before submissions are rejected
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {self.KINDS}")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._waits = deque(maxlen=self.WAIT_SAMPLES)
+        self._wait_total = 0.0
+        self._wait_count = 0
+        self._wait_max = 0.0
+
+    def _get_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == 'process':
+                    self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=f"{self.name}-stage"
+                    )
+            return self._pool
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run func(*args) on the stage's pool and await the result
+
+        In process mode func and args must be picklable (module-level functions).
+
+        Raises:
+            ExecutorSaturatedError: max_queue tasks are already waiting
+        """
+        if self.kind == 'inline':
+            return self._finish(time.time(), _timed_call(func, args))
+
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturatedError(
+                    f"Executor '{self.name}' is saturated ({self._in_flight} tasks in flight)"
+                )
+            self._in_flight += 1
+            self._submitted += 1
+
+        submitted_at = time.time()
+        try:
+            future = self._submit(func, args)
+        except BaseException:
+            self._task_done(None)
+            raise
+        # Counted until the pool is done with the task, not until the caller stops
+        # awaiting it: a cancelled caller leaves a started task running on the pool
+        future.add_done_callback(self._task_done)
+        outcome = await asyncio.wrap_future(future)
+        return self._finish(submitted_at, outcome)
+
+    def _submit(self, func: Callable, args: tuple) -> Future:
+        """Submit to the current pool, again to the next one if shutdown() retired it meanwhile"""
+        pool = self._get_pool()
+        try:
+            return pool.submit(_timed_call, func, args)
+        except RuntimeError:
+            # A reload on another thread (restart_process_executors) shut the pool down
+            # between _get_pool() and submit: the task belongs on the replacement
+            with self._lock:
+                retired = self._pool is not pool
+            if not retired:
+                raise
+            return self._get_pool().submit(_timed_call, func, args)
+
+    def _task_done(self, future):
+        """Pool future done callback (or failed submit): the task no longer takes a slot"""
+        with self._lock:
+            self._in_flight -= 1
+
+    def _finish(self, submitted_at: float, outcome: tuple) -> Any:
+        """Record the queue wait and completion of one task, then return or raise its outcome"""
+        started_at, result, error = outcome
+        wait = max(0.0, started_at - submitted_at)
+
+        with self._lock:
+            self._waits.append(wait)
+            self._wait_total += wait
+            self._wait_count += 1
+            self._wait_max = max(self._wait_max, wait)
+            if error is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+        if error is not None:
+            raise error
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Current queue depth, task counters and queue wait times (ms)"""
+        with self._lock:
+            waits = sorted(self._waits)
+            in_flight = self._in_flight
+            stats = {
+                'name': self.name,
+                'kind': self.kind,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'in_flight': in_flight,
+                'queue_depth': max(0, in_flight - self.max_workers),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+            }
+            wait_count = self._wait_count
+            wait_total = self._wait_total
+            wait_max = self._wait_max
+
+        def percentile(pct: float) -> float:
+            if not waits:
+                return 0.0
+            index = max(0, min(len(waits) - 1, int(round(pct / 100.0 * len(waits) + 0.5)) - 1))
+            return waits[index] * 1000
+
+        stats['queue_wait_ms'] = {
+            'count': wait_count,
+            'mean': wait_total / wait_count * 1000 if wait_count else 0.0,
+            'p50': percentile(50),
+            'p99': percentile(99),
+            'max': wait_max * 1000,
+        }
+        return stats
+
+    def shutdown(self, wait: bool = False):
+        """Stop the pool; the next submission starts a new one"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+# One executor per stage, configured from settings
+STAGE_KINDS = {
+    'classification': lambda: settings.CLASSIFICATION_EXECUTOR,
+    'ml': lambda: settings.ML_EXECUTOR,
+}
+
+_executors: Dict[str, StageExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(stage: str) -> StageExecutor:
+    """Get the shared executor of a stage ('classification' or 'ml')"""
+    executor = _executors.get(stage)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(stage)
+            if executor is None:
+                executor = StageExecutor(
+                    stage,
+                    kind=STAGE_KINDS[stage](),
+                    max_workers=settings.EXECUTOR_MAX_WORKERS,
+                    max_queue=settings.EXECUTOR_MAX_QUEUE
+                )
+                _executors[stage] = executor
+                logger.info("stage_executor_initialized",
+                           stage=stage,
+                           kind=executor.kind,
+                           max_workers=executor.max_workers,
+                           max_queue=executor.max_queue)
+    return executor
+
+
+def executor_stats() -> List[Dict[str, Any]]:
+    """Metrics of every stage executor created so far"""
+    with _executors_lock:
+        executors = list(_executors.values())
+    return [executor.stats() for executor in executors]
+
+
+def restart_process_executors():
+    """Restart process pools so workers pick up reloaded models and data"""
+    with _executors_lock:
+        executors = list(_executors.values())
+    for executor in executors:
+        if executor.kind == 'process':
+            executor.shutdown()
+
+
+def shutdown_executors():
+    """Stop every stage pool (application shutdown)"""
+    with _executors_lock:
+        executors = list(_executors.values())
+    for executor in executors:
+        executor.shutdown(wait=True)
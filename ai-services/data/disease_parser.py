@@ -2,8 +2,19 @@
 Disease Parser - Parse and structure all 124 respiratory diseases from markdown
 """
 
+import os
 import re
-from typing import Dict, List, Any
+import sys
+import pickle
+import hashlib
+import tempfile
+from typing import Dict, List, Any, Optional
+
+# Bump whenever the structure produced by build_disease_database changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+DISEASE_LINE_PATTERN = re.compile(r'(\d+)\.\s*\*\*(.*?)\*\*:\s*(.+)')
+
 
 def parse_diseases_markdown(file_path: str) -> List[Dict[str, Any]]:
     """Parse diseases from markdown file and return structured data"""
@@ -11,6 +22,16 @@ def parse_diseases_markdown(file_path: str) -> List[Dict[str, Any]]:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
+        return parse_diseases_text(content)
+    
+    except Exception as e:
+        print(f"Error parsing diseases: {e}")
+        return []
+
+
+def parse_diseases_text(content: str) -> List[Dict[str, Any]]:
+    """Parse diseases from markdown content"""
+    try:
         diseases = []
         current_section = None
         
@@ -27,12 +48,12 @@ def parse_diseases_markdown(file_path: str) -> List[Dict[str, Any]]:
                 continue
             
             # Parse disease entry: "Number. **Name**: Symptoms..."
-            match = re.match(r'(\d+)\.\s*\*\*(.*?)\*\*:\s*(.+)', line)
+            match = DISEASE_LINE_PATTERN.match(line)
             if match:
                 number, name, symptoms_text = match.groups()
                 
-                # Extract symptoms
-                symptoms = [s.strip() for s in symptoms_text.split(',')]
+                # Extract symptoms (interned: the same strings key symptom_to_diseases)
+                symptoms = [sys.intern(s.strip()) for s in symptoms_text.split(',')]
                 symptoms = [s for s in symptoms if s]
                 
                 # Determine urgency based on keywords
@@ -170,13 +191,131 @@ def build_disease_database(diseases: List[Dict[str, Any]]) -> Dict[str, Any]:
     return database
 
 
+def default_snapshot_path(source_path: str) -> str:
+    """Snapshot file that lives next to the source markdown"""
+    return os.path.splitext(source_path)[0] + '.snapshot.pkl'
+
+
+def _read_source(file_path: str):
+    """Read the source markdown once, returning (content, fingerprint)"""
+    stat = os.stat(file_path)
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    
+    fingerprint = {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': hashlib.sha256(raw).hexdigest()
+    }
+    return raw.decode('utf-8'), fingerprint
+
+
+def _write_snapshot(snapshot_path: str, database: Dict[str, Any], source: Dict[str, Any]):
+    """Write snapshot atomically (temp file + rename)"""
+    snapshot = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'source': source,
+        'database': database
+    }
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.snapshot-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+    except BaseException:
+        # Full disk or similar: do not leave the partial file next to the source
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compile_disease_snapshot(source_path: str, snapshot_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Parse the disease markdown and write the compiled database snapshot
+    
+    Args:
+        source_path: Path to lista_enfermedades_respiratorias.md
+        snapshot_path: Output file (defaults to <source>.snapshot.pkl)
+    
+    Returns:
+        The compiled disease database
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(source_path)
+    
+    content, source = _read_source(source_path)
+    diseases = parse_diseases_text(content)
+    database = build_disease_database(diseases)
+    
+    if diseases:
+        _write_snapshot(snapshot_path, database, source)
+    
+    return database
+
+
+def _read_snapshot(snapshot_path: str) -> Optional[Dict[str, Any]]:
+    """Read a snapshot in one go, None if missing, corrupt or from another format"""
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.loads(f.read())
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    
+    if not isinstance(snapshot, dict) or snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return snapshot
+
+
+def load_disease_database(source_path: str, snapshot_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the disease database from its snapshot, rebuilding it when stale
+    
+    The snapshot is reused while the source markdown keeps the same mtime and
+    size. When those change, the content hash decides: same hash refreshes the
+    stored fingerprint, a different hash recompiles the snapshot.
+    
+    Args:
+        source_path: Path to lista_enfermedades_respiratorias.md
+        snapshot_path: Snapshot file (defaults to <source>.snapshot.pkl)
+    
+    Returns:
+        The disease database, as built by build_disease_database
+    """
+    snapshot_path = snapshot_path or default_snapshot_path(source_path)
+    snapshot = _read_snapshot(snapshot_path)
+    
+    try:
+        if snapshot is not None:
+            stored = snapshot['source']
+            stat = os.stat(source_path)
+            
+            if stored['mtime_ns'] == stat.st_mtime_ns and stored['size'] == stat.st_size:
+                return snapshot['database']
+            
+            _, source = _read_source(source_path)
+            if source['sha256'] == stored['sha256']:
+                # Touched but unchanged: keep the data, refresh the fingerprint
+                _write_snapshot(snapshot_path, snapshot['database'], source)
+                return snapshot['database']
+        
+        return compile_disease_snapshot(source_path, snapshot_path)
+    
+    except OSError as e:
+        # Read-only filesystem or similar: fall back to parsing in memory
+        print(f"Could not write disease snapshot: {e}")
+        return build_disease_database(parse_diseases_markdown(source_path))
+
+
 if __name__ == "__main__":
-    # Test the parser
-    diseases = parse_diseases_markdown('../lista_enfermedades_respiratorias.md')
+    # Compile the snapshot: python data/disease_parser.py [source.md] [snapshot.pkl]
+    source_file = sys.argv[1] if len(sys.argv) > 1 else '../lista_enfermedades_respiratorias.md'
+    snapshot_file = sys.argv[2] if len(sys.argv) > 2 else None
+    
+    db = compile_disease_snapshot(source_file, snapshot_file)
+    diseases = db['diseases']
     print(f"Parsed {len(diseases)} diseases")
+    print(f"Snapshot written to {snapshot_file or default_snapshot_path(source_file)}")
     
-    # Build database
-    db = build_disease_database(diseases)
     print(f"\nSymptom-to-disease mappings: {len(db['symptom_to_diseases'])}")
     print(f"Urgency mappings: {len(db['urgency_mapping'])}")
     print(f"Category mappings: {len(db['category_mapping'])}")
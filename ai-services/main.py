@@ -4,6 +4,7 @@ Medical analysis and prediction service
 """
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
@@ -415,13 +416,25 @@ async def root():
 
 @app.get("/api/v1/health")
 async def health_check():
-    """Health check endpoint"""
-    return {
+    """Health check endpoint (503 until the startup warm-up finishes)"""
+    from core.config import settings
+    from services.warmup import get_warmup
+    
+    response = {
         "status": "healthy",
         "service": "ai-services",
         "version": "1.0.0",
+        "ready": True,
         "timestamp": datetime.now().isoformat()
     }
+    if settings.STARTUP_WARMUP:
+        warmup = get_warmup().status()
+        response["ready"] = warmup["ready"]
+        response["warmup"] = warmup
+        if not warmup["ready"]:
+            response["status"] = "warming_up"
+            return JSONResponse(status_code=503, content=response)
+    return response
 
 # DEPRECATED: This endpoint is replaced by the new enhanced_chatbot_service
 # Kept for backwards compatibility but should use the new /api/v1/analyze from chat_analyzer router
@@ -470,6 +483,31 @@ async def get_symptom_categories():
 # Startup event
 @app.on_event("startup")
 async def startup_event():
+    from core.config import settings
+    
+    # Build the shared chatbot service once so requests don't pay model/database loading
+    # (the warm-up builds it in the background and runs every stage once)
+    if not settings.STARTUP_WARMUP:
+        try:
+            from services.enhanced_chatbot_service import init_chatbot_service
+            init_chatbot_service()
+        except Exception as e:
+            logger.warning("chatbot_service_init_failed", error=str(e))
+    
+    # Redis tier of the chat session store, result caches and explanation store (opt-in, in-process otherwise)
+    try:
+        if (settings.SESSION_STORE_REDIS or settings.ANALYSIS_CACHE_REDIS or settings.EXPLANATION_STORE_REDIS
+                or settings.PREDICTION_CACHE_REDIS):
+            from core.cache import init_cache
+            await init_cache()
+    except Exception as e:
+        logger.warning("redis_cache_init_failed", error=str(e))
+    
+    # Warm-up after Redis, so warm-up results reach the shared caches
+    if settings.STARTUP_WARMUP:
+        from services.warmup import get_warmup
+        get_warmup().start()
+    
     logger.info("ai_services_started", 
                message="RespiCare AI Services started successfully",
                diseases_count=len(RESPIRATORY_KNOWLEDGE_BASE))
@@ -477,6 +515,12 @@ async def startup_event():
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
+    try:
+        from core.executors import shutdown_executors
+        shutdown_executors()
+    except Exception as e:
+        logger.warning("executors_shutdown_failed", error=str(e))
+    
     logger.info("ai_services_stopped", 
                message="RespiCare AI Services stopped")
 
@@ -1,18 +1,29 @@
 """
 ML Models Package for Disease Classification
+
+Classes are imported on first access, so importing a light submodule
+(ml_models.tree_inference) does not load scikit-learn, XGBoost and pandas.
 """
 
-from .synthetic_dataset_generator import SyntheticDatasetGenerator
-from .random_forest_model import RandomForestClassifier
-from .xgboost_model import XGBoostClassifier
-from .neural_network_model import MultiTaskNeuralNetwork
-from .hybrid_system import HybridRuleMLSystem
+import importlib
+
+_EXPORTS = {
+    'SyntheticDatasetGenerator': '.synthetic_dataset_generator',
+    'RandomForestDiseaseClassifier': '.random_forest_model',
+    'XGBoostDiseaseClassifier': '.xgboost_model',
+    'MultiTaskNeuralNetwork': '.neural_network_model',
+    'SharedTrunkMultiTaskNetwork': '.neural_network_model',
+    'HybridRuleMLSystem': '.hybrid_system',
+    'ArrayTreeEnsemble': '.tree_inference',
+    'export_tree_ensemble': '.tree_inference',
+}
+
+__all__ = list(_EXPORTS)
 
-__all__ = [
-    'SyntheticDatasetGenerator',
-    'RandomForestClassifier',
-    'XGBoostClassifier',
-    'MultiTaskNeuralNetwork',
-    'HybridRuleMLSystem'
-]
 
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -3,14 +3,15 @@ Hybrid System: Medical Rules + Machine Learning
 
 Combines:
 - Emergency rule system (priority)
-- ML classifiers (Random Forest, XGBoost, Neural Networks)
+- ML classifiers (Random Forest, XGBoost, Neural Networks), soft-voting ensemble
 - Medical validation rules
 - Confidence scoring
 - Explanation generation
 """
 
 import numpy as np
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
 from .random_forest_model import RandomForestDiseaseClassifier
 from .xgboost_model import XGBoostDiseaseClassifier
 from .neural_network_model import MultiTaskNeuralNetwork
@@ -19,8 +20,13 @@ from .neural_network_model import MultiTaskNeuralNetwork
 class HybridRuleMLSystem:
     """Hybrid system combining rules and ML"""
     
-    def __init__(self):
-        """Initialize hybrid system"""
+    def __init__(self, ensemble_weights: Optional[Dict[str, float]] = None):
+        """
+        Initialize hybrid system
+        
+        Args:
+            ensemble_weights: Soft-voting weight per model ('rf', 'xgb', 'nn'), 1.0 if missing
+        """
         self.emergency_rules = self._define_emergency_rules()
         self.medical_validation_rules = self._define_validation_rules()
         
@@ -29,6 +35,9 @@ class HybridRuleMLSystem:
         self.xgboost = XGBoostDiseaseClassifier()
         self.neural_net = MultiTaskNeuralNetwork()
         
+        self.ensemble_weights = ensemble_weights or {'rf': 1.0, 'xgb': 1.0, 'nn': 1.0}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        
         self.is_trained = False
     
     def _define_emergency_rules(self) -> Dict[str, List[str]]:
@@ -146,56 +155,66 @@ class HybridRuleMLSystem:
         return {'is_emergency': False}
     
     def _ensemble_predict(self, symptoms: List[str], all_symptoms: List[str]) -> Dict[str, Any]:
-        """Combine predictions from all ML models"""
-        predictions = {}
-        
-        # Random Forest
+        """Combine probabilities of all trained ML models, predicted concurrently"""
+        calls = {}
         if self.random_forest.is_trained:
-            rf_pred = self.random_forest.predict(symptoms, all_symptoms)
-            predictions['rf'] = rf_pred
-        
-        # XGBoost
+            calls['rf'] = (self.random_forest.class_probabilities, symptoms, all_symptoms)
         if self.xgboost.is_trained:
-            xgb_pred = self.xgboost.predict_with_explanation(symptoms)
-            predictions['xgb'] = xgb_pred
-        
-        # Neural Network
+            calls['xgb'] = (self.xgboost.class_probabilities, symptoms)
         if self.neural_net.is_trained:
-            nn_pred = self.neural_net.predict_all_tasks(symptoms)
-            predictions['nn'] = nn_pred
+            calls['nn'] = (self.neural_net.class_probabilities, symptoms)
         
-        # Ensemble vote
-        if len(predictions) > 1:
-            return self._ensemble_vote(predictions)
-        else:
-            return list(predictions.values())[0]
+        # The tree libraries and NumPy release the GIL while predicting
+        executor = self._get_executor()
+        futures = {name: executor.submit(*call) for name, call in calls.items()}
+        predictions = {name: future.result() for name, future in futures.items()}
+        
+        return self._ensemble_vote(predictions)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Thread pool running the model predictions of an ensemble, one thread per model"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix='hybrid-ensemble')
+        return self._executor
     
-    def _ensemble_vote(self, predictions: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
-        """Vote-based ensemble of multiple models"""
-        # Collect all disease predictions
-        disease_counts = {}
-        total_confidence = {}
-        
-        for model_name, pred in predictions.items():
-            disease = pred.get('disease', pred.get('disease', {}).get('name', ''))
-            confidence = pred.get('confidence', 0.5)
-            
-            if disease not in disease_counts:
-                disease_counts[disease] = 0
-                total_confidence[disease] = 0
-            
-            disease_counts[disease] += 1
-            total_confidence[disease] += confidence
-        
-        # Most common disease
-        most_common = max(disease_counts, key=disease_counts.get)
-        avg_confidence = total_confidence[most_common] / disease_counts[most_common]
+    def _ensemble_vote(self, predictions: Dict[str, Tuple[np.ndarray, np.ndarray]]) -> Dict[str, Any]:
+        """
+        Soft vote: weighted average of the models' probability vectors
+        
+        Args:
+            predictions: (disease names, probabilities) per model name
+        
+        Returns:
+            Dict with the ensemble disease, its averaged probability, top 3
+            and each model's own prediction
+        """
+        names = list(predictions)
+        # Shared class index: a model without a class gives it probability 0
+        classes = np.unique(np.concatenate([predictions[name][0] for name in names]))
+        probabilities = np.zeros((len(names), len(classes)))
+        for row, name in enumerate(names):
+            model_classes, model_probabilities = predictions[name]
+            probabilities[row, np.searchsorted(classes, model_classes)] = model_probabilities
+        
+        weights = np.array([self.ensemble_weights.get(name, 1.0) for name in names])
+        averaged = weights @ probabilities / weights.sum()
+        
+        model_best = probabilities.argmax(axis=1)
+        best = int(averaged.argmax())
+        top_indices = np.argsort(averaged)[-3:][::-1]
         
         return {
-            'disease': most_common,
-            'confidence': avg_confidence,
-            'ensemble_votes': disease_counts,
-            'models_agreed': disease_counts[most_common]
+            'disease': str(classes[best]),
+            'confidence': float(averaged[best]),
+            'top_3_predictions': [
+                {'disease': str(classes[index]), 'confidence': float(averaged[index])}
+                for index in top_indices
+            ],
+            'model_predictions': {
+                name: {'disease': str(classes[index]), 'confidence': float(probabilities[row, index])}
+                for row, (name, index) in enumerate(zip(names, model_best))
+            },
+            'models_agreed': int(np.sum(model_best == best))
         }
     
     def _pattern_match(self, symptoms: List[str]) -> Dict[str, Any]:
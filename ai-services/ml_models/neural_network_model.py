@@ -37,14 +37,20 @@ class MultiTaskNeuralNetwork:
             'category': LabelEncoder()
         }
         
-        self.models = {}
         self.feature_names = []
         self.is_trained = False
         
+        self.models = self._build_models()
+    
+    def _build_models(self) -> Dict[str, Any]:
+        """One independent MLP per task"""
         # Simple MLP implementation (can be extended with TensorFlow/PyTorch)
         from sklearn.neural_network import MLPClassifier
         
-        self.models['disease'] = MLPClassifier(
+        random_state = self.random_state
+        models = {}
+        
+        models['disease'] = MLPClassifier(
             hidden_layer_sizes=(128, 64),
             max_iter=500,
             random_state=random_state,
@@ -52,26 +58,28 @@ class MultiTaskNeuralNetwork:
             validation_fraction=0.2
         )
         
-        self.models['urgency'] = MLPClassifier(
+        models['urgency'] = MLPClassifier(
             hidden_layer_sizes=(64, 32),
             max_iter=300,
             random_state=random_state,
             early_stopping=True
         )
         
-        self.models['severity'] = MLPClassifier(
+        models['severity'] = MLPClassifier(
             hidden_layer_sizes=(64, 32),
             max_iter=300,
             random_state=random_state,
             early_stopping=True
         )
         
-        self.models['category'] = MLPClassifier(
+        models['category'] = MLPClassifier(
             hidden_layer_sizes=(64, 32),
             max_iter=300,
             random_state=random_state,
             early_stopping=True
         )
+        
+        return models
     
     def prepare_multi_task_data(self, df: pd.DataFrame) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
         """
@@ -212,6 +220,21 @@ class MultiTaskNeuralNetwork:
         
         return predictions
     
+    def class_probabilities(self, symptoms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Disease task probabilities for soft voting
+        
+        Returns:
+            Tuple of (disease names, probabilities), aligned
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        
+        X = self.scaler.transform(self._symptoms_to_features(symptoms).reshape(1, -1))
+        model = self.models['disease']
+        probabilities = model.predict_proba(X)[0]
+        return self.label_encoders['disease'].classes_[model.classes_], probabilities
+    
     def _symptoms_to_features(self, symptoms: List[str]) -> np.ndarray:
         """Convert symptom list to feature vector"""
         symptom_set = {s.lower() for s in symptoms}
@@ -244,6 +267,274 @@ class MultiTaskNeuralNetwork:
         print(f"Model loaded from {filepath}")
 
 
+class SharedTrunkMultiTaskNetwork(MultiTaskNeuralNetwork):
+    """
+    Multi-task network with one shared hidden trunk and a softmax head per task
+    
+    Same data preparation and prediction API as MultiTaskNeuralNetwork, but
+    the tasks share their hidden layers: one forward pass (the heads are one
+    matrix product) predicts every task, and training updates a single set
+    of weights on the summed cross-entropy of all tasks. Implemented in
+    NumPy (Adam, early stopping on a validation split, like MLPClassifier).
+    """
+    
+    def __init__(self,
+                 input_dim: int = None,
+                 random_state: int = 42,
+                 hidden_layer_sizes: Tuple[int, ...] = (128, 64),
+                 learning_rate: float = 0.001,
+                 alpha: float = 0.0001,
+                 batch_size: int = 200,
+                 max_iter: int = 300,
+                 validation_fraction: float = 0.1,
+                 n_iter_no_change: int = 10,
+                 tol: float = 1e-4):
+        """
+        Initialize neural network
+        
+        Args:
+            input_dim: Input feature dimensions
+            random_state: Random seed
+            hidden_layer_sizes: Units of each shared hidden layer
+            learning_rate: Adam step size
+            alpha: L2 penalty
+            batch_size: Minibatch size
+            max_iter: Maximum epochs
+            validation_fraction: Training data held out for early stopping
+            n_iter_no_change: Epochs without validation improvement before stopping
+            tol: Minimum validation loss improvement
+        """
+        super().__init__(input_dim, random_state)
+        self.hidden_layer_sizes = tuple(hidden_layer_sizes)
+        self.learning_rate = learning_rate
+        self.alpha = alpha
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.validation_fraction = validation_fraction
+        self.n_iter_no_change = n_iter_no_change
+        self.tol = tol
+        
+        # Trunk layers (W, b), then all heads as one (W, b) split by head_slices
+        self.layers: List[Tuple[np.ndarray, np.ndarray]] = []
+        self.tasks: List[str] = []
+        self.head_slices: Dict[str, slice] = {}
+    
+    def _build_models(self) -> Dict[str, Any]:
+        """No per-task models: the tasks share self.layers"""
+        return {}
+    
+    def _init_layers(self, n_features: int, n_outputs: int, rng: np.random.RandomState):
+        """Glorot uniform initialization (as MLPClassifier)"""
+        sizes = [n_features, *self.hidden_layer_sizes, n_outputs]
+        self.layers = []
+        for fan_in, fan_out in zip(sizes[:-1], sizes[1:]):
+            bound = np.sqrt(6.0 / (fan_in + fan_out))
+            self.layers.append((
+                rng.uniform(-bound, bound, (fan_in, fan_out)),
+                rng.uniform(-bound, bound, fan_out)
+            ))
+    
+    def _forward(self, X: np.ndarray) -> Tuple[List[np.ndarray], Dict[str, np.ndarray]]:
+        """Hidden activations and per-task class probabilities"""
+        activations = [X]
+        for W, b in self.layers[:-1]:
+            activations.append(np.maximum(activations[-1] @ W + b, 0))
+        W, b = self.layers[-1]
+        logits = activations[-1] @ W + b
+        
+        probabilities = {}
+        for task, columns in self.head_slices.items():
+            task_logits = logits[:, columns]
+            exp = np.exp(task_logits - task_logits.max(axis=1, keepdims=True))
+            probabilities[task] = exp / exp.sum(axis=1, keepdims=True)
+        return activations, probabilities
+    
+    def _loss(self, probabilities: Dict[str, np.ndarray], targets: Dict[str, np.ndarray]) -> float:
+        """Summed mean cross-entropy of all tasks"""
+        return float(sum(
+            -np.mean(np.log(np.clip(probabilities[task][np.arange(len(y)), y], 1e-10, None)))
+            for task, y in targets.items()
+        ))
+    
+    def train(self, tasks_data: Dict[str, Tuple[np.ndarray, np.ndarray]], test_size: float = 0.2):
+        """
+        Train the shared network on every task at once
+        
+        Args:
+            tasks_data: Dict with (X, y) for each task (the same X for all)
+            test_size: Proportion of test set
+        """
+        print("Training shared-trunk multi-task network...")
+        
+        self.tasks = list(tasks_data)
+        X = np.asarray(tasks_data[self.tasks[0]][0], dtype=np.float64)
+        y = {task: np.asarray(tasks_data[task][1]) for task in self.tasks}
+        
+        rng = np.random.RandomState(self.random_state)
+        stratify = y.get('disease', y[self.tasks[0]])
+        train_rows, test_rows = train_test_split(
+            np.arange(len(X)), test_size=test_size, random_state=self.random_state, stratify=stratify
+        )
+        fit_rows, validation_rows = train_test_split(
+            train_rows, test_size=self.validation_fraction, random_state=self.random_state
+        )
+        
+        # Head columns of each task in the output layer
+        start = 0
+        for task in self.tasks:
+            n_classes = len(self.label_encoders[task].classes_)
+            self.head_slices[task] = slice(start, start + n_classes)
+            start += n_classes
+        self._init_layers(X.shape[1], start, rng)
+        
+        self._fit(X, y, fit_rows, validation_rows, rng)
+        self.is_trained = True
+        
+        _, probabilities = self._forward(X[test_rows])
+        for task in self.tasks:
+            accuracy = np.mean(probabilities[task].argmax(axis=1) == y[task][test_rows])
+            print(f"  {task} test accuracy: {accuracy:.4f}")
+    
+    def _fit(self,
+             X: np.ndarray,
+             y: Dict[str, np.ndarray],
+             fit_rows: np.ndarray,
+             validation_rows: np.ndarray,
+             rng: np.random.RandomState):
+        """Adam on minibatches; keeps the weights of the best validation loss"""
+        beta1, beta2, epsilon = 0.9, 0.999, 1e-8
+        moments = [[np.zeros_like(param) for param in layer] for layer in self.layers]
+        velocities = [[np.zeros_like(param) for param in layer] for layer in self.layers]
+        step = 0
+        
+        validation_targets = {task: labels[validation_rows] for task, labels in y.items()}
+        best_loss = np.inf
+        best_layers = self.layers
+        epochs_without_improvement = 0
+        
+        for epoch in range(self.max_iter):
+            order = rng.permutation(fit_rows)
+            for batch_start in range(0, len(order), self.batch_size):
+                rows = order[batch_start:batch_start + self.batch_size]
+                gradients = self._gradients(X[rows], {task: labels[rows] for task, labels in y.items()})
+                
+                step += 1
+                for layer_index, layer in enumerate(self.layers):
+                    updated = []
+                    for param_index, (param, gradient) in enumerate(zip(layer, gradients[layer_index])):
+                        moment = moments[layer_index][param_index]
+                        velocity = velocities[layer_index][param_index]
+                        moment *= beta1
+                        moment += (1 - beta1) * gradient
+                        velocity *= beta2
+                        velocity += (1 - beta2) * gradient ** 2
+                        rate = self.learning_rate * np.sqrt(1 - beta2 ** step) / (1 - beta1 ** step)
+                        updated.append(param - rate * moment / (np.sqrt(velocity) + epsilon))
+                    self.layers[layer_index] = tuple(updated)
+            
+            _, probabilities = self._forward(X[validation_rows])
+            loss = self._loss(probabilities, validation_targets)
+            if loss < best_loss - self.tol:
+                best_loss = loss
+                best_layers = list(self.layers)
+                epochs_without_improvement = 0
+            else:
+                epochs_without_improvement += 1
+                if epochs_without_improvement >= self.n_iter_no_change:
+                    break
+        
+        self.layers = best_layers
+        print(f"  Epochs: {epoch + 1}  best validation loss: {best_loss:.4f}")
+    
+    def _gradients(self, X: np.ndarray, targets: Dict[str, np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Backpropagation of the summed task losses (+ L2) through heads and trunk"""
+        activations, probabilities = self._forward(X)
+        n_samples = len(X)
+        
+        # Softmax + cross-entropy: d(loss)/d(logits) = p - one_hot(y), per head
+        delta = np.empty((n_samples, self.layers[-1][0].shape[1]))
+        for task, columns in self.head_slices.items():
+            task_delta = probabilities[task].copy()
+            task_delta[np.arange(n_samples), targets[task]] -= 1
+            delta[:, columns] = task_delta / n_samples
+        
+        gradients = []
+        for layer_index in range(len(self.layers) - 1, -1, -1):
+            W, _ = self.layers[layer_index]
+            gradients.append((
+                activations[layer_index].T @ delta + self.alpha * W / n_samples,
+                delta.sum(axis=0)
+            ))
+            if layer_index > 0:
+                delta = (delta @ W.T) * (activations[layer_index] > 0)
+        return gradients[::-1]
+    
+    def predict_all_tasks(self, symptoms: List[str]) -> Dict[str, Any]:
+        """
+        Predict all tasks with one forward pass
+        
+        Args:
+            symptoms: List of symptom strings
+        
+        Returns:
+            Dict with predictions for all tasks (as MultiTaskNeuralNetwork)
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        
+        X = self.scaler.transform(self._symptoms_to_features(symptoms).reshape(1, -1))
+        _, probabilities = self._forward(X)
+        
+        predictions = {}
+        for task in self.tasks:
+            task_probabilities = probabilities[task][0]
+            best = int(task_probabilities.argmax())
+            label = self.label_encoders[task].classes_[best]
+            if task == 'disease':
+                predictions['disease'] = {'name': label, 'confidence': float(task_probabilities[best])}
+            else:
+                predictions[task] = label
+        return predictions
+    
+    def class_probabilities(self, symptoms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Disease task probabilities for soft voting
+        
+        Returns:
+            Tuple of (disease names, probabilities), aligned
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        
+        X = self.scaler.transform(self._symptoms_to_features(symptoms).reshape(1, -1))
+        _, probabilities = self._forward(X)
+        return self.label_encoders['disease'].classes_, probabilities['disease'][0]
+    
+    def save_model(self, filepath: str):
+        """Save trained model to file"""
+        joblib.dump({
+            'layers': self.layers,
+            'tasks': self.tasks,
+            'head_slices': self.head_slices,
+            'label_encoders': self.label_encoders,
+            'feature_names': self.feature_names,
+            'scaler': self.scaler
+        }, filepath)
+        print(f"Model saved to {filepath}")
+    
+    def load_model(self, filepath: str):
+        """Load trained model from file"""
+        data = joblib.load(filepath)
+        self.layers = data['layers']
+        self.tasks = data['tasks']
+        self.head_slices = data['head_slices']
+        self.label_encoders = data['label_encoders']
+        self.feature_names = data['feature_names']
+        self.scaler = data['scaler']
+        self.is_trained = True
+        print(f"Model loaded from {filepath}")
+
+
 if __name__ == "__main__":
     # Example usage
     from synthetic_dataset_generator import SyntheticDatasetGenerator
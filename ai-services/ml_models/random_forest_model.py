@@ -10,7 +10,8 @@ Implements:
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
+from scipy import sparse
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
@@ -43,6 +44,10 @@ class RandomForestDiseaseClassifier:
         )
         
         self.label_encoder = LabelEncoder()
+        # Symptom -> feature column, saved with the model
+        self.symptom_index: Dict[str, int] = {}
+        self.feature_names: List[str] = []
+        self._feature_importances: Optional[np.ndarray] = None
         self.is_trained = False
         
         # Emergency rules for critical conditions
@@ -69,7 +74,7 @@ class RandomForestDiseaseClassifier:
             ]
         }
     
-    def prepare_features(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    def prepare_features(self, df: pd.DataFrame) -> Tuple[Any, np.ndarray]:
         """
         Prepare features and labels from dataset
         
@@ -77,7 +82,8 @@ class RandomForestDiseaseClassifier:
             df: DataFrame with cases
         
         Returns:
-            Tuple of (features, labels)
+            Tuple of (features, labels); with a 'symptoms' column the
+            features are a sparse binary matrix over symptom_index
         """
         # Extract symptom features
         symptom_cols = [col for col in df.columns if col not in 
@@ -85,27 +91,14 @@ class RandomForestDiseaseClassifier:
         
         # If symptoms are in a single column, need to encode them
         if 'symptoms' in df.columns:
-            # Convert symptoms list to binary features
-            all_symptoms = set()
-            for symptoms in df['symptoms']:
-                if isinstance(symptoms, list):
-                    all_symptoms.update([s.lower() for s in symptoms])
-                elif isinstance(symptoms, str):
-                    all_symptoms.update([s.lower() for s in symptoms.split(',')])
+            symptom_sets = [self._symptom_set(symptoms) for symptoms in df['symptoms']]
             
-            # Create binary feature matrix
-            X = np.zeros((len(df), len(all_symptoms)))
-            symptom_list = sorted(all_symptoms)
+            # Columns in sorted symptom order
+            all_symptoms = sorted(set().union(*symptom_sets))
+            self.symptom_index = {symptom: column for column, symptom in enumerate(all_symptoms)}
+            self.feature_names = all_symptoms
             
-            for i, symptoms in enumerate(df['symptoms']):
-                if isinstance(symptoms, list):
-                    symptom_set = {s.lower() for s in symptoms}
-                else:
-                    symptom_set = {s.lower() for s in symptoms.split(',')}
-                
-                for j, symptom in enumerate(symptom_list):
-                    if symptom in symptom_set:
-                        X[i, j] = 1
+            X = self._rows_to_matrix(symptom_sets, self.symptom_index)
             
             # Encode labels
             y = self.label_encoder.fit_transform(df['disease'])
@@ -117,6 +110,36 @@ class RandomForestDiseaseClassifier:
             y = self.label_encoder.fit_transform(df['disease'])
             return X, y
     
+    @staticmethod
+    def _symptom_set(symptoms: Any) -> set:
+        """Lowercased symptoms of a case (list or comma-separated string)"""
+        if isinstance(symptoms, str):
+            symptoms = symptoms.split(',')
+        return {s.lower() for s in symptoms}
+    
+    @staticmethod
+    def _rows_to_matrix(symptom_sets: List[set], symptom_index: Dict[str, int]) -> sparse.csr_matrix:
+        """Sparse binary rows, one dict lookup per symptom (unknown symptoms are ignored)"""
+        columns = [
+            sorted(symptom_index[symptom] for symptom in symptom_set if symptom in symptom_index)
+            for symptom_set in symptom_sets
+        ]
+        indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in columns], out=indptr[1:])
+        indices = np.fromiter((column for row in columns for column in row), dtype=np.int32, count=indptr[-1])
+        data = np.ones(len(indices), dtype=np.float64)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(columns), len(symptom_index)))
+    
+    def _features(self, symptoms_list: List[List[str]], all_symptoms: Optional[List[str]] = None) -> sparse.csr_matrix:
+        """Model input rows for symptom lists"""
+        symptom_index = self.symptom_index
+        if not symptom_index:
+            # Model saved without its index: columns are all_symptoms in order
+            if all_symptoms is None:
+                raise ValueError("all_symptoms is required for a model saved without its symptom index")
+            symptom_index = {symptom.lower(): column for column, symptom in enumerate(all_symptoms)}
+        return self._rows_to_matrix([self._symptom_set(symptoms) for symptoms in symptoms_list], symptom_index)
+    
     def train(self, X: np.ndarray, y: np.ndarray, test_size: float = 0.2):
         """
         Train Random Forest model
@@ -146,62 +169,99 @@ class RandomForestDiseaseClassifier:
         feature_importances = self.model.feature_importances_
         print(f"\nTop 10 most important symptoms:")
         for i in np.argsort(feature_importances)[-10:][::-1]:
-            print(f"  Feature {i}: {feature_importances[i]:.4f}")
+            feature_name = self.feature_names[i] if i < len(self.feature_names) else f"Feature {i}"
+            print(f"  {feature_name}: {feature_importances[i]:.4f}")
         
+        self._feature_importances = feature_importances
         self.is_trained = True
     
-    def predict(self, symptoms: List[str], all_symptoms: List[str]) -> Dict[str, Any]:
+    def predict(self, symptoms: List[str], all_symptoms: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Predict disease from symptoms
         
         Args:
             symptoms: List of symptom strings
-            all_symptoms: Complete list of all possible symptoms
+            all_symptoms: Feature columns, only needed for models saved without symptom_index
         
         Returns:
             Dict with prediction, confidence, and details
         """
+        return self.predict_batch([symptoms], all_symptoms)[0]
+    
+    def predict_batch(self,
+                      symptoms_list: List[List[str]],
+                      all_symptoms: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Predict several cases with one predict_proba call
+        
+        Args:
+            symptoms_list: Symptom strings of each case
+            all_symptoms: Feature columns, only needed for models saved without symptom_index
+        
+        Returns:
+            One dict per case, as returned by predict
+        """
         if not self.is_trained:
             raise ValueError("Model not trained yet")
         
         # Check emergency rules first
-        emergency_check = self._check_emergency_rules(symptoms)
-        if emergency_check['is_emergency']:
-            return emergency_check
+        results: List[Optional[Dict[str, Any]]] = [None] * len(symptoms_list)
+        to_predict = []
+        for position, symptoms in enumerate(symptoms_list):
+            emergency_check = self._check_emergency_rules(symptoms)
+            if emergency_check['is_emergency']:
+                results[position] = emergency_check
+            else:
+                to_predict.append(position)
+        if not to_predict:
+            return results
         
-        # Convert symptoms to feature vector
-        feature_vector = np.zeros(len(all_symptoms))
-        symptoms_lower = [s.lower() for s in symptoms]
+        X = self._features([symptoms_list[position] for position in to_predict], all_symptoms)
+        probabilities = self.model.predict_proba(X)
+        # Column j of predict_proba is the encoded label model.classes_[j]
+        class_names = self.label_encoder.classes_[self.model.classes_]
+        feature_names = self.feature_names if self.symptom_index else all_symptoms
         
-        for i, symptom in enumerate(all_symptoms):
-            if symptom.lower() in symptoms_lower:
-                feature_vector[i] = 1
-        
-        # Predict
-        prediction_idx = self.model.predict(feature_vector.reshape(1, -1))[0]
-        prediction_probs = self.model.predict_proba(feature_vector.reshape(1, -1))[0]
+        for row, position in enumerate(to_predict):
+            symptoms = symptoms_list[position]
+            prediction_probs = probabilities[row]
+            best = int(np.argmax(prediction_probs))
+            
+            # Get top 3 predictions
+            top_indices = np.argsort(prediction_probs)[-3:][::-1]
+            top_predictions = [
+                {
+                    'disease': class_names[idx],
+                    'confidence': float(prediction_probs[idx])
+                }
+                for idx in top_indices
+            ]
+            
+            results[position] = {
+                'disease': class_names[best],
+                'confidence': float(prediction_probs[best]),
+                'top_3_predictions': top_predictions,
+                'urgency_level': self._classify_urgency(symptoms),
+                'is_emergency': False,
+                'feature_importance': self._get_feature_importance(X.indices[X.indptr[row]:X.indptr[row + 1]], feature_names)
+            }
         
-        disease_name = self.label_encoder.inverse_transform([prediction_idx])[0]
-        confidence = prediction_probs[prediction_idx]
+        return results
+    
+    def class_probabilities(self,
+                            symptoms: List[str],
+                            all_symptoms: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Disease probabilities for soft voting (no emergency rules)
         
-        # Get top 3 predictions
-        top_indices = np.argsort(prediction_probs)[-3:][::-1]
-        top_predictions = [
-            {
-                'disease': self.label_encoder.inverse_transform([idx])[0],
-                'confidence': float(prediction_probs[idx])
-            }
-            for idx in top_indices
-        ]
+        Returns:
+            Tuple of (disease names, probabilities), aligned
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
         
-        return {
-            'disease': disease_name,
-            'confidence': float(confidence),
-            'top_3_predictions': top_predictions,
-            'urgency_level': self._classify_urgency(symptoms),
-            'is_emergency': False,
-            'feature_importance': self._get_feature_importance(symptoms, all_symptoms)
-        }
+        probabilities = self.model.predict_proba(self._features([symptoms], all_symptoms))[0]
+        return self.label_encoder.classes_[self.model.classes_], probabilities
     
     def _check_emergency_rules(self, symptoms: List[str]) -> Dict[str, Any]:
         """Check if symptoms match emergency rules"""
@@ -233,18 +293,15 @@ class RandomForestDiseaseClassifier:
         
         return 'medium'
     
-    def _get_feature_importance(self, symptoms: List[str], all_symptoms: List[str]) -> List[Tuple[str, float]]:
-        """Get importance scores for matched symptoms"""
-        if not hasattr(self.model, 'feature_importances_'):
-            return []
-        
-        importance_scores = []
-        symptoms_lower = [s.lower() for s in symptoms]
-        
-        for i, symptom in enumerate(all_symptoms):
-            if symptom.lower() in symptoms_lower:
-                importance = self.model.feature_importances_[i]
-                importance_scores.append((symptom, float(importance)))
+    def _get_feature_importance(self, columns: np.ndarray, feature_names: List[str]) -> List[Tuple[str, float]]:
+        """Get importance scores for the feature columns of matched symptoms"""
+        importances = self._feature_importances
+        if importances is None:
+            if not hasattr(self.model, 'feature_importances_'):
+                return []
+            # A forest averages every tree's importances on each access: computed once
+            importances = self._feature_importances = self.model.feature_importances_
+        importance_scores = [(feature_names[column], float(importances[column])) for column in columns]
         
         # Sort by importance
         importance_scores.sort(key=lambda x: x[1], reverse=True)
@@ -255,7 +312,8 @@ class RandomForestDiseaseClassifier:
         """Save trained model to file"""
         joblib.dump({
             'model': self.model,
-            'label_encoder': self.label_encoder
+            'label_encoder': self.label_encoder,
+            'symptom_index': self.symptom_index
         }, filepath)
         print(f"Model saved to {filepath}")
     
@@ -264,6 +322,10 @@ class RandomForestDiseaseClassifier:
         data = joblib.load(filepath)
         self.model = data['model']
         self.label_encoder = data['label_encoder']
+        self._feature_importances = None
+        # Files saved before the index was stored need all_symptoms at predict time
+        self.symptom_index = data.get('symptom_index', {})
+        self.feature_names = sorted(self.symptom_index, key=self.symptom_index.get)
         self.is_trained = True
         print(f"Model loaded from {filepath}")
 
@@ -289,8 +351,7 @@ if __name__ == "__main__":
     
     # Test prediction
     test_symptoms = ['tos', 'sibilancias', 'dificultad para respirar']
-    all_symptoms = generator.symptom_keywords
-    prediction = classifier.predict(test_symptoms, all_symptoms)
+    prediction = classifier.predict(test_symptoms)
     
     print(f"\nPrediction: {prediction['disease']}")
     print(f"Confidence: {prediction['confidence']:.4f}")
@@ -0,0 +1,408 @@
+"""
+Array-backed Tree Ensemble Inference
+
+Flattens a trained xgboost.XGBClassifier (multi:softprob) or
+sklearn.ensemble.RandomForestClassifier into contiguous NumPy arrays, one
+entry per node of every tree:
+
+- feature: input column the node reads (see below)
+- threshold: split value (+inf on leaves)
+- left: global index of the left child; the right child is left + 1
+  (nodes are stored breadth first) and leaves point to themselves
+- value: leaf value (XGBoost margin, or Random Forest class probabilities)
+
+plus the root of each tree. XGBoost trees are stored class by class, each
+class in boosting order. The arrays are saved as .npz and evaluated with
+NumPy only: a batch goes through all trees at once, one tree level per step.
+
+Missing values need no branch: the evaluator reads an input of 2 * n_features
++ 1 columns, the features with NaN as -inf, then with NaN as +inf, then a
+zero column. A node whose missing values go left reads the first copy, one
+whose missing values go right reads the second, and leaves read the zero
+column, which never passes their +inf threshold.
+
+Predictions are bit-identical to predict_proba of the source model: inputs
+are compared in float32 like the libraries do, and the per-tree outputs are
+summed in tree order (the Random Forest one as scikit-learn does with one
+job; with several joblib threads its own sum order varies).
+
+This module imports NumPy only; xgboost and scikit-learn are needed to export,
+not to predict.
+
+Usage:
+    python -m ml_models.tree_inference models/xgboost_model.pkl [models/xgboost_model.npz]
+"""
+
+import json
+import os
+import sys
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+XGBOOST = 'xgboost'
+RANDOM_FOREST = 'random_forest'
+
+
+class ArrayTreeEnsemble:
+    """Tree ensemble as flat node arrays, with a vectorized predict_proba"""
+
+    # Rows up to which Random Forest leaf values are summed in one cumsum
+    SMALL_BATCH = 16
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Args:
+            arrays: Node and tree arrays built by export_tree_ensemble (or read from .npz)
+        """
+        if int(arrays['format_version']) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported tree ensemble version {int(arrays['format_version'])}")
+
+        self.kind = str(arrays['kind'])
+        # Node arrays as the index type, so each level's gathers do not convert them
+        self.feature = arrays['feature'].astype(np.intp)
+        self.threshold = arrays['threshold']
+        self.left = arrays['left'].astype(np.intp)
+        self.value = arrays['value']
+        self.roots = arrays['roots'].astype(np.intp)
+        self.max_depth = int(arrays['max_depth'])
+        self.n_features = int(arrays['n_features'])
+        self.classes_ = arrays['classes']
+        # XGBoost: the initial margin of every class
+        self.base_score = arrays['base_score']
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            'format_version': np.asarray(FORMAT_VERSION),
+            'kind': np.asarray(self.kind),
+            'feature': self.feature.astype(np.int32),
+            'threshold': self.threshold,
+            'left': self.left.astype(np.int32),
+            'value': self.value,
+            'roots': self.roots.astype(np.int32),
+            'max_depth': np.asarray(self.max_depth),
+            'n_features': np.asarray(self.n_features),
+            'classes': self.classes_,
+            'base_score': self.base_score,
+        }
+
+    def save(self, path: str):
+        """Save the arrays to an uncompressed .npz file"""
+        np.savez(path, **self._arrays())
+
+    @classmethod
+    def load(cls, path: str) -> 'ArrayTreeEnsemble':
+        """Ensemble saved by save"""
+        with np.load(path, allow_pickle=False) as data:
+            return cls({name: data[name] for name in data.files})
+
+    def _input(self, X) -> np.ndarray:
+        """
+        Rows of [features (NaN as -inf), features (NaN as +inf), 0]
+
+        Entries absent from a sparse matrix are missing values to XGBoost and
+        zeros to scikit-learn. Values are rounded to float32 as both libraries
+        do, then stored in the thresholds' dtype.
+        """
+        n_features = self.n_features
+        if hasattr(X, 'tocsr'):
+            X = X.tocsr()
+            if X.shape[1] != n_features:
+                raise ValueError(f"X has {X.shape[1]} features, the ensemble expects {n_features}")
+            extended = np.zeros((X.shape[0], 2 * n_features + 1), dtype=self.threshold.dtype)
+            if self.kind == XGBOOST:
+                extended[:, :n_features] = -np.inf
+                extended[:, n_features:-1] = np.inf
+            rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+            data = X.data.astype(np.float32)
+            extended[rows, X.indices] = data
+            extended[rows, X.indices + n_features] = data
+        else:
+            X = np.asarray(X, dtype=np.float32)
+            if X.ndim == 1:
+                X = X.reshape(1, -1)
+            if X.shape[1] != n_features:
+                raise ValueError(f"X has {X.shape[1]} features, the ensemble expects {n_features}")
+            extended = np.zeros((X.shape[0], 2 * n_features + 1), dtype=self.threshold.dtype)
+            extended[:, :n_features] = X
+            extended[:, n_features:-1] = X
+            missing = np.isnan(X)
+            if missing.any():
+                extended[:, :n_features][missing] = -np.inf
+                extended[:, n_features:-1][missing] = np.inf
+        return extended
+
+    def apply(self, X) -> np.ndarray:
+        """Global leaf index reached in every tree, shape (n_samples, n_trees)"""
+        extended = self._input(X)
+        flat = extended.reshape(-1)
+        row_offsets = (np.arange(len(extended)) * extended.shape[1])[:, None]
+        leaf_column = extended.shape[1] - 1
+        nodes = np.tile(self.roots, (len(extended), 1))
+
+        # One level of every tree per step. XGBoost goes right on value >= threshold,
+        # scikit-learn on value > threshold
+        inclusive = self.kind == XGBOOST
+        for level in range(self.max_depth):
+            columns = self.feature[nodes]
+            # Deep trees: stop once every row is on a leaf (the leaf column is the last one)
+            if level >= 8 and columns.min() == leaf_column:
+                break
+            if len(extended) > 1:
+                columns += row_offsets
+            values = flat[columns]
+            thresholds = self.threshold[nodes]
+            go_right = values >= thresholds if inclusive else values > thresholds
+            nodes = self.left[nodes]
+            nodes += go_right
+        return nodes
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities, columns in classes_ order"""
+        leaves = self.apply(X)
+
+        if self.kind == XGBOOST:
+            # Margin starts at base_score, then each class adds its trees in order (float32)
+            leaf_values = self.value[leaves].reshape(len(leaves), len(self.classes_), -1)
+            margin = np.concatenate([
+                np.broadcast_to(self.base_score, leaf_values.shape[:2] + (1,)),
+                leaf_values
+            ], axis=2)
+            margin = np.cumsum(margin, axis=2, dtype=np.float32)[:, :, -1]
+            return self._softmax(margin)
+
+        # Sum of the trees' normalized leaf values in tree order, then the mean
+        if len(leaves) <= self.SMALL_BATCH:
+            return np.cumsum(self.value[leaves], axis=1)[:, -1] / self.n_trees
+        # Larger batches: one tree at a time, without the (rows, trees, classes) array
+        leaves = np.ascontiguousarray(leaves.T)
+        total = self.value[leaves[0]]
+        for tree_leaves in leaves[1:]:
+            total += self.value[tree_leaves]
+        return total / self.n_trees
+
+    @staticmethod
+    def _softmax(margin: np.ndarray) -> np.ndarray:
+        """XGBoost's softmax: float32 exponentials, their sum accumulated in float64"""
+        exp = _expf(margin - margin.max(axis=1, keepdims=True))
+        total = np.cumsum(exp, axis=1, dtype=np.float64)[:, -1]
+        return exp / total.astype(np.float32)[:, None]
+
+    def predict(self, X) -> np.ndarray:
+        """Most probable class of each row"""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+@lru_cache(maxsize=None)
+def _libm_expf():
+    """expf of the C library, which XGBoost calls; None if it cannot be loaded"""
+    import ctypes
+    import ctypes.util
+
+    # Symbols already loaded into the interpreter first (libm on Linux), then a lookup
+    expf = None
+    for library in (None, 'm'):
+        try:
+            expf = ctypes.CDLL(library if library is None else ctypes.util.find_library(library)).expf
+            break
+        except (OSError, AttributeError, TypeError):
+            continue
+    if expf is None:
+        return None
+    expf.restype = ctypes.c_float
+    expf.argtypes = [ctypes.c_float]
+    return expf
+
+
+def _expf(x: np.ndarray) -> np.ndarray:
+    """
+    float32 exp rounded like the C library's expf
+
+    The float64 exponential rounded to float32 is the correctly rounded
+    result. glibc's expf is within 0.502 ulp, so it can only round the other
+    way when the exact value is next to the midpoint of two float32: those
+    few values are recomputed with expf itself.
+    """
+    exact = np.exp(x.astype(np.float64))
+    result = exact.astype(np.float32)
+    rounded = result.astype(np.float64)
+    # Distance to the neighbouring float32 on the side of the exact value
+    side = np.where(exact > rounded, np.float32(np.inf), np.float32(-np.inf))
+    spacing = np.abs(np.nextafter(result, side).astype(np.float64) - rounded)
+    near_midpoint = np.flatnonzero(np.abs(exact - rounded) > 0.49 * spacing)
+    expf = _libm_expf()
+    if len(near_midpoint) and expf is not None:
+        flat = result.reshape(-1)
+        flat[near_midpoint] = [expf(value) for value in x.reshape(-1)[near_midpoint].tolist()]
+    return result
+
+
+def _breadth_first(tree: Dict[str, np.ndarray], n_features: int) -> Dict[str, np.ndarray]:
+    """
+    Node arrays of one tree in breadth-first order, the children of a node adjacent
+
+    Args:
+        tree: Arrays indexed by the library's node ids (root 0): left, right,
+            is_leaf, feature, threshold, default_left and value
+        n_features: Input features of the model
+
+    Returns:
+        feature (extended input column), threshold, left (local index), value and depth
+    """
+    levels, level = [], np.array([0])
+    while len(level):
+        levels.append(level)
+        internal = level[~tree['is_leaf'][level]]
+        level = np.column_stack([tree['left'][internal], tree['right'][internal]]).reshape(-1)
+    order = np.concatenate(levels)
+    position = np.empty(len(tree['left']), dtype=np.int64)
+    position[order] = np.arange(len(order))
+
+    is_leaf = tree['is_leaf'][order]
+    column = tree['feature'][order] + np.where(tree['default_left'][order], 0, n_features)
+    return {
+        'feature': np.where(is_leaf, 2 * n_features, column),
+        'threshold': np.where(is_leaf, np.inf, tree['threshold'][order]).astype(tree['threshold'].dtype),
+        'left': np.where(is_leaf, np.arange(len(order)), position[np.where(is_leaf, 0, tree['left'][order])]),
+        'value': tree['value'][order],
+        'depth': len(levels) - 1,
+    }
+
+
+def _flatten(trees: List[Dict[str, np.ndarray]], n_features: int) -> Dict[str, np.ndarray]:
+    """Concatenate the trees' breadth-first arrays, children and roots shifted to global indices"""
+    trees = [_breadth_first(tree, n_features) for tree in trees]
+    offsets = np.cumsum([0] + [len(tree['left']) for tree in trees[:-1]])
+    return {
+        'feature': np.concatenate([tree['feature'] for tree in trees]).astype(np.int32),
+        'threshold': np.concatenate([tree['threshold'] for tree in trees]),
+        'left': np.concatenate([tree['left'] + offset for tree, offset in zip(trees, offsets)]).astype(np.int32),
+        'value': np.concatenate([tree['value'] for tree in trees]),
+        'roots': offsets.astype(np.int32),
+        'max_depth': np.asarray(max(tree['depth'] for tree in trees)),
+        'n_features': np.asarray(n_features),
+    }
+
+
+def _export_xgboost(model) -> Dict[str, np.ndarray]:
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw('json'))['learner']
+    if learner['objective']['name'] != 'multi:softprob':
+        raise ValueError(f"Only multi:softprob XGBoost models can be exported, got {learner['objective']['name']}")
+
+    gbtree = learner['gradient_booster']
+    if 'model' not in gbtree:
+        raise ValueError(f"Only tree boosters can be exported, got {gbtree.get('name')}")
+    n_trees = len(gbtree['model']['trees'])
+    # predict_proba stops at the best iteration of early stopping
+    best_iteration = booster.attr('best_iteration')
+    if best_iteration is not None:
+        n_trees = gbtree['model']['iteration_indptr'][int(best_iteration) + 1]
+
+    trees = []
+    for tree in gbtree['model']['trees'][:n_trees]:
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported")
+        left = np.asarray(tree['left_children'])
+        # Leaves keep their value in split_conditions
+        split_conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        trees.append({
+            'left': left,
+            'right': np.asarray(tree['right_children']),
+            'is_leaf': left == -1,
+            'feature': np.asarray(tree['split_indices']),
+            'threshold': split_conditions,
+            'default_left': np.asarray(tree['default_left'], dtype=bool),
+            'value': split_conditions,
+        })
+
+    # Class by class, each in boosting order
+    n_classes = int(learner['learner_model_param']['num_class'])
+    tree_group = np.asarray(gbtree['model']['tree_info'][:n_trees])
+    order = np.concatenate([np.flatnonzero(tree_group == group) for group in range(n_classes)])
+
+    arrays = _flatten([trees[index] for index in order], int(learner['learner_model_param']['num_feature']))
+    arrays['base_score'] = np.asarray(float(learner['learner_model_param']['base_score']), dtype=np.float32)
+    arrays['classes'] = np.arange(n_classes)
+    arrays['kind'] = np.asarray(XGBOOST)
+    return arrays
+
+
+def _export_random_forest(model) -> Dict[str, np.ndarray]:
+    if model.n_outputs_ != 1:
+        raise ValueError("Only single-output Random Forests can be exported")
+
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        # DecisionTreeClassifier.predict_proba: leaf class weights over their sum
+        value = tree.value[:, 0, :model.n_classes_].copy()
+        normalizer = value.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        value /= normalizer
+        trees.append({
+            'left': tree.children_left,
+            'right': tree.children_right,
+            'is_leaf': tree.children_left == -1,
+            'feature': tree.feature,
+            'threshold': tree.threshold,
+            'default_left': np.asarray(tree.missing_go_to_left, dtype=bool),
+            'value': value,
+        })
+
+    arrays = _flatten(trees, model.n_features_in_)
+    arrays['base_score'] = np.asarray(0, dtype=np.float32)
+    arrays['classes'] = np.asarray(model.classes_)
+    arrays['kind'] = np.asarray(RANDOM_FOREST)
+    return arrays
+
+
+def export_tree_ensemble(model: Any) -> ArrayTreeEnsemble:
+    """
+    Flatten a trained model into an ArrayTreeEnsemble
+
+    Args:
+        model: xgboost.XGBClassifier (multi:softprob) or sklearn RandomForestClassifier
+
+    Returns:
+        Ensemble predicting the same probabilities as model.predict_proba
+    """
+    if hasattr(model, 'get_booster'):
+        arrays = _export_xgboost(model)
+    elif hasattr(model, 'estimators_') and hasattr(model, 'n_classes_'):
+        arrays = _export_random_forest(model)
+    else:
+        raise ValueError(f"Cannot export {type(model).__name__}: expected a fitted XGBClassifier or RandomForestClassifier")
+    arrays['format_version'] = np.asarray(FORMAT_VERSION)
+    return ArrayTreeEnsemble(arrays)
+
+
+def export_model_file(model_path: str, output_path: str = None) -> str:
+    """Export the model of a joblib artifact ({'model': ...} or the model itself) to .npz; returns the output path"""
+    import joblib
+
+    data = joblib.load(model_path)
+    model = data['model'] if isinstance(data, dict) else data
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + '.npz'
+    export_tree_ensemble(model).save(output_path)
+    return output_path
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.split('Usage:')[1].strip())
+        sys.exit(1)
+    output_path = export_model_file(*sys.argv[1:])
+    print(f"Tree ensemble written to {output_path} ({os.path.getsize(output_path) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
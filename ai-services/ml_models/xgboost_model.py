@@ -283,6 +283,20 @@ class XGBoostDiseaseClassifier:
             'feature_importance': contribution_scores
         }
     
+    def class_probabilities(self, symptoms: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Disease probabilities for soft voting (no SHAP explanation)
+        
+        Returns:
+            Tuple of (disease names, probabilities), aligned
+        """
+        if not self.is_trained:
+            raise ValueError("Model not trained yet")
+        
+        feature_vector = self._symptoms_to_features(symptoms)
+        probabilities = self.model.predict_proba(feature_vector.reshape(1, -1))[0]
+        return self.label_encoder.classes_, probabilities
+    
     def _symptoms_to_features(self, symptoms: List[str]) -> np.ndarray:
         """Convert symptom list to feature vector"""
         symptom_set = {s.lower() for s in symptoms}
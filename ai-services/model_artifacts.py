@@ -0,0 +1,240 @@
+"""
+Memory-mapped Model Artifacts
+
+A joblib artifact is unpickled into private memory by every process that
+loads it, so the N uvicorn workers of a host hold N copies of the same
+read-only arrays. Each of them also rebuilds shap's tree arrays from the
+booster, which is most of the load time.
+
+The mmap format stores the loaded explainer once:
+- a pickled header for the small objects
+- out of band, every large read-only array at an aligned offset: the SHAP
+  explainer's tree arrays, the vocabulary terms, the class labels, the
+  feature-name table and the serialized booster
+
+Loading maps the file read-only and rebuilds those arrays as views on the
+mapping. Workers share the page-cache copy, and pages that are never read
+(the tree arrays, for XGBoost's own SHAP path) are never loaded. The booster
+is still parsed into XGBoost's memory, one copy per process.
+
+Layout: MAGIC, buffer count and header length (uint64), one (offset, length)
+pair per buffer, the header (pickle protocol 5), then the buffers.
+
+Usage:
+    python model_artifacts.py models/xgboost_model.pkl [models/xgboost_model.mmap]
+"""
+
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+from typing import Any, Dict
+
+import numpy as np
+import shap
+import xgboost as xgb
+
+MAGIC = b'RCMMAP01'
+FORMAT_VERSION = 1
+
+# Buffer offsets are aligned for any NumPy dtype
+ALIGNMENT = 64
+
+_COUNTS = struct.Struct('<QQ')
+_BUFFER_ENTRY = struct.Struct('<QQ')
+
+
+def _aligned(position: int) -> int:
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def is_mmap_artifact(path: str) -> bool:
+    """Whether path is a file in this format (checked by its magic bytes)"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_mmap_artifact(state: Dict[str, Any], path: str):
+    """
+    Write state to path, its contiguous NumPy arrays out of band
+
+    Writes a temporary file and renames it over path, so a model registry
+    watching path never sees a partial file.
+    """
+    buffers = []
+    header = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+    raw_buffers = [buffer.raw() for buffer in buffers]
+
+    position = _aligned(len(MAGIC) + _COUNTS.size + _BUFFER_ENTRY.size * len(raw_buffers) + len(header))
+    entries = []
+    for raw in raw_buffers:
+        entries.append((position, raw.nbytes))
+        position = _aligned(position + raw.nbytes)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.mmap-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_COUNTS.pack(len(raw_buffers), len(header)))
+            for offset, length in entries:
+                f.write(_BUFFER_ENTRY.pack(offset, length))
+            f.write(header)
+            for (offset, _), raw in zip(entries, raw_buffers):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(raw)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_mmap_artifact(path: str) -> Dict[str, Any]:
+    """State written by write_mmap_artifact, its arrays read-only views on a shared mapping"""
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = None
+    buffers = []
+    try:
+        if mapping[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a memory-mapped model artifact")
+
+        n_buffers, header_length = _COUNTS.unpack_from(mapping, len(MAGIC))
+        entries_start = len(MAGIC) + _COUNTS.size
+        view = memoryview(mapping)
+        buffers = [
+            view[offset:offset + length]
+            for offset, length in (
+                _BUFFER_ENTRY.unpack_from(mapping, entries_start + i * _BUFFER_ENTRY.size)
+                for i in range(n_buffers)
+            )
+        ]
+        header_start = entries_start + n_buffers * _BUFFER_ENTRY.size
+        # The arrays keep the mapping alive; it is unmapped when the last one is freed
+        return pickle.loads(view[header_start:header_start + header_length], buffers=buffers)
+    except BaseException:
+        _close_mapping(mapping, [view] + buffers)
+        raise
+
+
+def _close_mapping(mapping: mmap.mmap, views: list):
+    """Unmap a mapping whose artifact could not be read (left to the GC if something still uses it)"""
+    try:
+        for view in views:
+            if view is not None:
+                view.release()
+        mapping.close()
+    except BufferError:
+        pass
+
+
+def explainer_state(explainer) -> Dict[str, Any]:
+    """Header state of a loaded SHAPDiseaseExplainer (XGBoost models only)"""
+    if not isinstance(explainer.model, xgb.XGBClassifier):
+        raise ValueError(f"Only XGBoost models can be exported, got {type(explainer.model).__name__}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        booster_path = os.path.join(directory, 'model.ubj')
+        explainer.model.save_model(booster_path)
+        with open(booster_path, 'rb') as f:
+            booster = np.frombuffer(f.read(), dtype=np.uint8)
+
+    # The vocabulary dict is rebuilt from the term table on load
+    vectorizer = pickle.loads(pickle.dumps(explainer.vectorizer))
+    vocabulary = vectorizer.vocabulary_
+    del vectorizer.vocabulary_
+    # Terms pruned by max_features, kept by scikit-learn for introspection only
+    vectorizer.stop_words_ = None
+    terms = np.empty(len(vocabulary), dtype=object)
+    for term, column in vocabulary.items():
+        terms[column] = term
+
+    tree_explainer = explainer.explainer
+    return {
+        'format_version': FORMAT_VERSION,
+        'booster': booster,
+        'label_encoder': explainer.label_encoder,
+        'vectorizer': vectorizer,
+        'vocabulary': terms.astype(str),
+        'feature_names': np.asarray(explainer.feature_names, dtype=str),
+        'sparse_features': explainer.sparse_features,
+        'engineered_features': explainer.feature_engineer is not None,
+        # shap's explainer without the booster and the per-tree objects
+        # (the stacked tree arrays hold the same data)
+        'shap_version': shap.__version__,
+        'tree_ensemble': {
+            name: value for name, value in vars(tree_explainer.model).items()
+            if name not in ('original_model', 'trees')
+        },
+        'tree_explainer': {
+            name: value for name, value in vars(tree_explainer).items()
+            if name not in ('model', 'link')
+        },
+        'link': tree_explainer.link.__name__,
+    }
+
+
+def load_explainer_state(explainer, state: Dict[str, Any]):
+    """Fill a SHAPDiseaseExplainer from a header read by read_mmap_artifact"""
+    if state.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported mmap artifact version {state.get('format_version')}")
+
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(state['booster']))
+
+    vectorizer = state['vectorizer']
+    vectorizer.vocabulary_ = {term: column for column, term in enumerate(state['vocabulary'].tolist())}
+
+    explainer.model = model
+    explainer.label_encoder = state['label_encoder']
+    explainer.vectorizer = vectorizer
+    explainer.feature_names = state['feature_names']
+    explainer.sparse_features = state['sparse_features']
+    explainer.feature_engineer = None
+    if state['engineered_features']:
+        from train_xgboost_model import AdvancedFeatureEngineering
+        explainer.feature_engineer = AdvancedFeatureEngineering()
+
+    if state['shap_version'] != shap.__version__:
+        # Internals saved by another shap version: rebuild from the booster
+        explainer.explainer = shap.TreeExplainer(model)
+        return
+
+    from shap.explainers._tree import TreeEnsemble
+    ensemble = TreeEnsemble.__new__(TreeEnsemble)
+    ensemble.__dict__.update(state['tree_ensemble'])
+    ensemble.original_model = model.get_booster()
+    ensemble.trees = None
+    tree_explainer = shap.TreeExplainer.__new__(shap.TreeExplainer)
+    tree_explainer.__dict__.update(state['tree_explainer'])
+    tree_explainer.model = ensemble
+    tree_explainer.link = getattr(shap.links, state['link'])
+    explainer.explainer = tree_explainer
+
+
+def export_mmap_artifact(model_path: str, output_path: str = None) -> str:
+    """Convert a joblib artifact to the mmap format; returns the output path"""
+    from shap_explainer import SHAPDiseaseExplainer
+
+    if output_path is None:
+        output_path = os.path.splitext(model_path)[0] + '.mmap'
+    write_mmap_artifact(explainer_state(SHAPDiseaseExplainer(model_path)), output_path)
+    return output_path
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.split('Usage:')[1].strip())
+        sys.exit(1)
+    output_path = export_mmap_artifact(*sys.argv[1:])
+    print(f"Memory-mapped artifact written to {output_path} ({os.path.getsize(output_path) / 2**20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Memoization of chat analysis results
+
+Many messages are near-duplicates (quick-question buttons, FAQ-style symptom
+descriptions), so process_user_message results are cached under a normalized
+form of the message: lowercased, accent-folded, whitespace-collapsed and
+without stop words. Results live in an in-process LRU and, when enabled, in
+Redis (core/cache.py) shared by every worker.
+"""
+
+import copy
+import hashlib
+import unicodedata
+from typing import Any, Container, Dict, Optional
+
+from core.cache import TieredCache
+from core.config import settings
+
+
+def fold_accents(text: str) -> str:
+    """Strip accents and diaeresis ('síntomas' -> 'sintomas'), keeping ñ"""
+    folded = []
+    for char in unicodedata.normalize('NFD', text):
+        if unicodedata.combining(char):
+            # n + combining tilde is ñ, the only accent that changes a Spanish letter
+            if char == '\u0303' and folded and folded[-1] in 'nN':
+                folded[-1] = 'ñ' if folded[-1] == 'n' else 'Ñ'
+            continue
+        folded.append(char)
+    return ''.join(folded)
+
+
+def normalize_message(message: str, stop_words: Container[str]) -> str:
+    """
+    Normalized form of a message for cache keys
+
+    Args:
+        message: Raw user message
+        stop_words: Words to drop, already lowercased and accent-folded
+    """
+    words = fold_accents(message.lower()).split()
+    return ' '.join(word for word in words if word not in stop_words)
+
+
+class AnalysisCache:
+    """Two-tier cache of analysis results (LRU + optional Redis) with hit/miss counters"""
+
+    KEY_PREFIX = 'chat_analysis:'
+
+    def __init__(self,
+                 max_entries: int = settings.ANALYSIS_CACHE_SIZE,
+                 ttl: int = settings.CACHE_TTL,
+                 use_redis: bool = settings.ANALYSIS_CACHE_REDIS):
+        """
+        Args:
+            max_entries: Results kept in memory before the least recent is evicted
+            ttl: Seconds a result is reused
+            use_redis: Also read/write results through core.cache
+        """
+        self._cache = TieredCache(self.KEY_PREFIX, max_entries, ttl, use_redis=use_redis)
+
+    @staticmethod
+    def make_key(namespace: str, normalized_message: str, signature: str = '') -> str:
+        """Fixed-length key for a normalized message within a data/model namespace"""
+        digest = hashlib.sha1(f"{normalized_message}\x00{signature}".encode('utf-8')).hexdigest()
+        return f"{namespace}:{digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result (a private copy), None on a miss"""
+        result = await self._cache.get(key)
+        return copy.deepcopy(result) if isinstance(result, dict) else None
+
+    async def set(self, key: str, result: Dict[str, Any]):
+        """Cache a result (callers keep their own copy)"""
+        await self._cache.set(key, copy.deepcopy(result))
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters"""
+        return self._cache.stats()
@@ -0,0 +1,153 @@
+"""
+Sparse disease scoring for classify_disease
+
+Precomputes a disease x (symptom key | keyword) incidence matrix from the
+disease database. Scoring a message is one sparse product with a query
+matrix built from the detected symptoms and tokens, followed by a partial
+sort for the top results.
+"""
+
+from typing import Any, Dict, Iterable, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from services.symptom_index import SymptomIndex, bitset_members
+from services.symptom_matcher import MultiPatternMatcher
+
+# Never part of a keyword, so keyword hits on the joined tokens stay inside one token
+TOKEN_SEPARATOR = '\x00'
+
+
+class DiseaseScorer:
+    """
+    Vectorized form of `symptom_matches * 3 + keyword_matches * 1.5`
+
+    symptom_matches counts detected symptoms that contain, or are contained
+    in, any symptom of the disease; keyword_matches counts disease keywords
+    found inside any token.
+    """
+
+    SYMPTOM_WEIGHT = 3
+    KEYWORD_WEIGHT = 1.5
+
+    def __init__(self, diseases: List[Dict[str, Any]], symptom_index: SymptomIndex):
+        """
+        Build the incidence matrix
+
+        Args:
+            diseases: Disease list from build_disease_database
+            symptom_index: Index over the same database's symptom_to_diseases
+        """
+        # One row per disease id (a repeated id keeps its first position, last entry)
+        by_id: Dict[int, Dict[str, Any]] = {}
+        for disease in diseases:
+            by_id[disease.get('id')] = disease
+        self.diseases = list(by_id.values())
+        self.disease_ids = np.array(list(by_id), dtype=np.int64)
+        self._row_of_id = {disease_id: row for row, disease_id in enumerate(by_id)}
+
+        self._symptom_index = symptom_index
+        key_count = len(symptom_index)
+
+        keyword_columns: Dict[str, int] = {}
+        entries = set()
+        for row, disease in enumerate(self.diseases):
+            for symptom in disease.get('sintomas', []):
+                position = symptom_index.key_position(symptom)
+                if position is not None:
+                    entries.add((row, position))
+            for keyword in disease.get('keywords', []):
+                column = keyword_columns.setdefault(keyword.lower(), key_count + len(keyword_columns))
+                entries.add((row, column))
+
+        rows, columns = zip(*entries) if entries else ((), ())
+        self._matrix = sparse.csr_matrix(
+            (np.ones(len(entries), dtype=np.float64), (rows, columns)),
+            shape=(len(self.diseases), key_count + len(keyword_columns))
+        )
+        self._keyword_matcher = MultiPatternMatcher(
+            (keyword, 'keyword', column) for keyword, column in keyword_columns.items()
+        )
+
+    def _query_matrix(self, detected_symptoms: List[str], tokens: Iterable[str]) -> sparse.csc_matrix:
+        """
+        One column per detected symptom (its matching keys) plus a keyword column
+
+        Multiplying by the incidence matrix gives, per disease, the number of
+        matching keys for each detected symptom and the keyword match count.
+        """
+        rows, columns = [], []
+        for column, symptom in enumerate(detected_symptoms):
+            positions = bitset_members(self._symptom_index.match_keys(symptom))
+            rows.extend(positions)
+            columns.extend([column] * len(positions))
+
+        keyword_column = len(detected_symptoms)
+        keyword_rows = {match.value for match in self._keyword_matcher.scan(TOKEN_SEPARATOR.join(tokens))}
+        rows.extend(keyword_rows)
+        columns.extend([keyword_column] * len(keyword_rows))
+
+        return sparse.csc_matrix(
+            (np.ones(len(rows), dtype=np.float64), (rows, columns)),
+            shape=(self._matrix.shape[1], keyword_column + 1)
+        )
+
+    def score(self, detected_symptoms: List[str], tokens: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Score every disease row
+
+        Returns:
+            (scores, symptom_matches, keyword_matches), one entry per row
+        """
+        return self.score_batch([(detected_symptoms, tokens)])[0]
+
+    def score_batch(self, queries: List[Tuple[List[str], Iterable[str]]]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """
+        Score every disease row for several messages with one sparse product
+
+        Args:
+            queries: (detected_symptoms, tokens) per message
+
+        Returns:
+            (scores, symptom_matches, keyword_matches) per message
+        """
+        if not queries:
+            return []
+
+        query_matrices = [self._query_matrix(detected_symptoms, tokens) for detected_symptoms, tokens in queries]
+        hits = (self._matrix @ sparse.hstack(query_matrices, format='csc')).toarray()
+
+        results = []
+        start = 0
+        for query_matrix in query_matrices:
+            end = start + query_matrix.shape[1]
+            symptom_matches = np.count_nonzero(hits[:, start:end - 1], axis=1)
+            keyword_matches = hits[:, end - 1].astype(np.int64)
+            scores = symptom_matches * self.SYMPTOM_WEIGHT + keyword_matches * self.KEYWORD_WEIGHT
+            results.append((scores, symptom_matches, keyword_matches))
+            start = end
+        return results
+
+    def candidate_rows(self, disease_ids: Iterable[int]) -> np.ndarray:
+        """Rows of the given disease ids, in database order (unknown ids are skipped)"""
+        rows = [self._row_of_id[disease_id] for disease_id in disease_ids if disease_id in self._row_of_id]
+        return np.array(sorted(rows), dtype=np.int64)
+
+    @staticmethod
+    def top_rows(scores: np.ndarray, rows: np.ndarray, k: int = 3) -> np.ndarray:
+        """
+        The k best rows by score, ties broken by database order
+
+        Same order as a stable descending sort of all rows, without sorting them.
+        """
+        k = min(k, len(rows))
+        if k == 0:
+            return rows[:0]
+
+        candidate_scores = scores[rows]
+        kth_score = candidate_scores[np.argpartition(candidate_scores, -k)[-k]]
+        above = rows[candidate_scores > kth_score]
+        tied = rows[candidate_scores == kth_score][:k - len(above)]
+        top = np.concatenate([above, tied])
+        return top[np.lexsort((top, -scores[top]))]
@@ -4,11 +4,26 @@ Complete flow: Tokenize → Classify → OpenAI → Respond
 """
 
 import re
+import os
 import asyncio
-from typing import Dict, Any, Optional, List
+import hashlib
+import random
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
 import structlog
 from collections import Counter
 
+from core.config import settings
+from core.executors import ExecutorSaturatedError, get_executor, restart_process_executors
+from services.analysis_cache import AnalysisCache, fold_accents, normalize_message
+from services.inference_batcher import get_inference_batcher
+from services.model_registry import get_default_model, get_model_registry
+from services.symptom_matcher import MultiPatternMatcher, MessageMatches
+from services.symptom_index import SymptomIndex, bitset_members
+from services.disease_scoring import DiseaseScorer
+
 logger = structlog.get_logger()
 
 
@@ -21,14 +36,121 @@ class EnhancedChatbotService:
     4. Provide actionable recommendations
     """
     
+    # Common symptom phrases (checked FIRST for priority, in this order)
+    SYMPTOM_PHRASES = [
+        'dolor de garganta', 'dolor de cabeza', 'dolor de pecho', 'dolor de oido',
+        'dificultad para respirar', 'falta de aire', 'ahogo', 'opresion en el pecho',
+        'dolores musculares', 'dolores corporales', 'dolores de cuerpo',
+        'síntomas gastrointestinales', 'malestar estomacal',
+        'fiebre alta', 'fiebre moderada', 'fiebre leve',
+        'tos seca', 'tos productiva', 'tos con flema',
+        'congestion nasal', 'secrecion nasal', 'rinorrea', 'secrecion acuosa',
+        'fatiga extrema', 'cansancio extremo', 'agotamiento',
+        'picazon nasal', 'picazon en ojos', 'lagrimeo'
+    ]
+    
+    # Single-word symptom tokens -> canonical symptom name
+    SYMPTOM_WORD_PATTERNS = {
+        'estornudos': 'estornudos',
+        'congestion': 'congestion nasal',
+        'nasal': 'congestion nasal',
+        'secrecion': 'secrecion nasal',
+        'picazon': 'picazon nasal',
+        'lagrimeo': 'lagrimeo',
+        'fiebre': 'fiebre',
+        'tos': 'tos',
+        'dolor': 'dolor de garganta',
+        'garganta': 'dolor de garganta',
+        'fatiga': 'fatiga',
+        'cansancio': 'fatiga',
+        'dolores': 'dolores musculares',
+        'musculares': 'dolores musculares',
+        'gastrointestinales': 'sintomas gastrointestinales',
+        'nauseas': 'nauseas',
+        'vomito': 'vomito',
+        'escalofrios': 'escalofrios'
+    }
+    
+    # Pattern-based disease identification (used when the database is not available)
+    DISEASE_PATTERNS = {
+        'rinitis_alergica': {
+            'name': 'Rinitis alérgica',
+            'symptoms': ['estornudos', 'frecuentes', 'picazon', 'nasal', 'congestion', 'nasal', 'secrecion', 'acuosa', 'lagrimeo', 'picazon', 'ojos'],
+            'urgency': 'baja',
+            'severity': 'leve',
+            'weight': 1
+        },
+        'resfriado_comun': {
+            'name': 'Resfriado común',
+            'symptoms': ['congestion', 'nasal', 'estornudos', 'secrecion', 'nasal', 'malestar', 'general', 'dolor', 'garganta', 'leve', 'fiebre', 'leve'],
+            'urgency': 'baja',
+            'severity': 'leve',
+            'weight': 1
+        },
+        'influenza_b': {
+            'name': 'Influenza B',
+            'symptoms': ['fiebre', 'dolores', 'musculares', 'tos', 'garganta', 'fatiga', 'gastrointestinales', 'cansancio', 'dolores', 'corporales'],
+            'urgency': 'media',
+            'severity': 'moderada',
+            'weight': 3
+        },
+        'influenza_h1n1': {
+            'name': 'Influenza A (H1N1)',
+            'symptoms': ['fiebre', 'alto', 'dolores', 'musculares', 'intensos', 'tos', 'seca', 'escalofrios', 'fatiga', 'extrema'],
+            'urgency': 'media',
+            'severity': 'alta',
+            'weight': 3
+        },
+        'neumonia': {
+            'name': 'Neumonía',
+            'symptoms': ['fiebre', 'alto', 'dificultad', 'respirar', 'respiratoria', 'tos', 'torácico', 'pecho', 'escalofrios', 'confusion'],
+            'urgency': 'alta',
+            'severity': 'alta',
+            'weight': 4
+        },
+        'bronquitis': {
+            'name': 'Bronquitis aguda',
+            'symptoms': ['tos', 'persistente', 'productiva', 'torácico', 'pecho', 'fiebre', 'leve', 'sibilancias'],
+            'urgency': 'baja',
+            'severity': 'moderada',
+            'weight': 2
+        }
+    }
+    
+    GREETINGS = ['hola', 'hi', 'buenos días', 'buenas tardes', 'buenas noches', 
+                 'saludos', 'buen día', 'hey', 'buenas', 'hello', '¿qué tal?', 'como estas']
+    
+    QUESTION_WORDS = ['qué', 'que', 'cuál', 'cual', 'cómo', 'como', 'por qué', 
+                      'porque', 'cuándo', 'cuando', 'dónde', 'donde', 'quién', 'quien', '?']
+    
+    # ML urgency_level -> urgency scale used by pattern classification and responses
+    ML_URGENCY_LEVELS = {'high': 'alta', 'medium': 'media', 'low': 'baja'}
+    
+    # Raw-text signs that make an ML prediction urgent whatever its confidence
+    URGENCY_KEYWORDS = ['dificultad respiratoria', 'cianosis', 'confusion', 'shock', 'coma', 'severa', 'grave']
+    
+    # Raw-text words picking the answer to a general question (definition, purpose, capabilities)
+    QUESTION_TOPICS = [
+        ['qué es', 'que es', 'define', 'definir'],
+        ['para qué', 'para que', 'qué hace', 'que hace'],
+        ['puedes', 'podés', 'sabes', 'puede hacer']
+    ]
+    
+    # Recent message scans kept per service (one message is scanned by several steps)
+    SCAN_CACHE_SIZE = 256
+    
     def __init__(self):
         self._disease_db = None
+        self._disease_file = None
+        self._model_path = None
+        self._symptom_index = None
+        self._disease_scorer = None
         self._openai_api_key = None
         self._openai_model = "gpt-3.5-turbo"
         
         # Try to load ML models
         self._ml_model = None
-        self._shap_explainer = None
+        self._model_kind = None
         self._use_ml = False
         self._load_ml_models()
         
@@ -50,49 +172,84 @@ class EnhancedChatbotService:
             'venir', 'pensar', 'sacar', 'luego', 'trabajar', 'mirar',
             'todavía', 'tener'
         }
+        self._folded_stop_words = {fold_accents(word) for word in self.stop_words}
         
         # Load diseases database
         self._load_disease_database()
+        
+        # One automaton over every lexicon, so each message is scanned once
+        self._message_matcher = self._build_message_matcher()
+        self._scan_message = lru_cache(maxsize=self.SCAN_CACHE_SIZE)(self._scan_message_uncached)
+        
+        # Memoized results of process_user_message, namespaced by the loaded data and model
+        self._analysis_cache = AnalysisCache() if settings.ANALYSIS_CACHE_SIZE > 0 else None
+        self._disease_version = self._file_version(self._disease_file)
+    
+    def _build_message_matcher(self) -> MultiPatternMatcher:
+        """Build the multi-pattern matcher over phrases, words, disease terms, greetings and questions"""
+        entries = []
+        for priority, phrase in enumerate(self.SYMPTOM_PHRASES):
+            entries.append((phrase, 'symptom_phrase', priority))
+        for word, symptom_name in self.SYMPTOM_WORD_PATTERNS.items():
+            entries.append((word, 'symptom_word', symptom_name))
+        
+        # Disease term -> indexes of the diseases listing it (in DISEASE_PATTERNS order)
+        term_diseases: Dict[str, List[int]] = {}
+        for index, disease_info in enumerate(self.DISEASE_PATTERNS.values()):
+            for term in disease_info['symptoms']:
+                indexes = term_diseases.setdefault(term, [])
+                if index not in indexes:
+                    indexes.append(index)
+        for term, indexes in term_diseases.items():
+            entries.append((term, 'disease_term', tuple(indexes)))
+        
+        for greeting in self.GREETINGS:
+            entries.append((greeting, 'greeting', None))
+        for question_word in self.QUESTION_WORDS:
+            entries.append((question_word, 'question', None))
+        
+        return MultiPatternMatcher(entries)
+    
+    def _scan_message_uncached(self, message: str) -> MessageMatches:
+        """Scan the lowercased message once for every lexicon"""
+        message_lower = message.lower()
+        return MessageMatches(message_lower, self._message_matcher.scan(message_lower))
     
     def _load_ml_models(self):
-        """Try to load ML models for predictions"""
+        """Try to load ML models for predictions (through the shared model registry)"""
         try:
-            from shap_explainer import SHAPDiseaseExplainer
-            import os
+            loaded = get_default_model()
+            if loaded is None:
+                logger.warning("ML models not found, using pattern matching")
+                self._use_ml = False
+                return
             
-            # Try to load XGBoost first (better performance)
-            model_paths = [
-                'models/xgboost_model.pkl',
-                'ai-services/models/xgboost_model.pkl'
-            ]
-            
-            for path in model_paths:
-                if os.path.exists(path):
-                    self._shap_explainer = SHAPDiseaseExplainer(path)
-                    self._use_ml = True
-                    logger.info("ML models loaded", model="XGBoost", path=path)
-                    return
-            
-            # Try Random Forest as fallback
-            rf_paths = [
-                'models/base_random_forest.pkl',
-                'ai-services/models/base_random_forest.pkl'
-            ]
-            
-            for path in rf_paths:
-                if os.path.exists(path):
-                    self._shap_explainer = SHAPDiseaseExplainer(path)
-                    self._use_ml = True
-                    logger.info("ML models loaded", model="Random Forest", path=path)
-                    return
-            
-            logger.warning("ML models not found, using pattern matching")
-            self._use_ml = False
+            self._model_path = loaded.path
+            self._model_kind = loaded.kind
+            self._use_ml = True
+            # Feature parts of every name extract_symptom_keywords can return, before the first request
+            symptom_feature_map = getattr(loaded.explainer, 'symptom_feature_map', None)
+            if symptom_feature_map is not None:
+                symptom_feature_map().precompute(self.canonical_symptom_names())
+            logger.info("ML models loaded", model=loaded.kind, path=loaded.path, version=loaded.version)
             
         except Exception as e:
             logger.warning("Could not load ML models", error=str(e))
             self._use_ml = False
     
+    @classmethod
+    def canonical_symptom_names(cls) -> List[str]:
+        """Symptom names extract_symptom_keywords can return (the ML input)"""
+        return list(dict.fromkeys(cls.SYMPTOM_PHRASES + list(cls.SYMPTOM_WORD_PATTERNS.values())))
+    
+    @property
+    def _shap_explainer(self):
+        """Explainer of the current version of the service's model (hot-swapped by the registry)"""
+        if self._model_path is None:
+            return None
+        loaded = get_model_registry().get(self._model_path, self._model_kind)
+        return loaded.explainer if loaded is not None else None
+    
     def _load_disease_database(self):
         """Load the 124 diseases database"""
         try:
@@ -114,12 +271,17 @@ class EnhancedChatbotService:
                     break
             
             if disease_file:
-                from data.disease_parser import parse_diseases_markdown, build_disease_database
+                from data.disease_parser import load_disease_database
                 
-                diseases = parse_diseases_markdown(disease_file)
+                # Compiled snapshot, rebuilt only when the markdown changes
+                disease_db = load_disease_database(disease_file)
+                diseases = disease_db.get('diseases', [])
                 
                 if diseases:
-                    self._disease_db = build_disease_database(diseases)
+                    self._disease_db = disease_db
+                    self._disease_file = disease_file
+                    self._symptom_index = SymptomIndex(disease_db.get('symptom_to_diseases', {}))
+                    self._disease_scorer = DiseaseScorer(diseases, self._symptom_index)
                     logger.info("disease_database_loaded", 
                               count=len(diseases), 
                               file=disease_file)
@@ -161,28 +323,19 @@ class EnhancedChatbotService:
     def extract_symptom_keywords(self, user_message: str, tokens: List[str]) -> List[Dict[str, Any]]:
         """
         Extract medical keywords that are symptoms from tokens - WITHOUT DUPLICATES
+        
+        Phrases and single words come from one scan of the message; single words
+        only count as whole tokens, so the result matches a lookup over tokens.
         """
         symptoms_found = []
         seen_symptoms = set()  # Track unique symptoms
         
-        message_lower = user_message.lower()
+        scan = self._scan_message(user_message)
         
-        # Common symptom phrases (check these FIRST for priority)
-        symptom_phrases = [
-            'dolor de garganta', 'dolor de cabeza', 'dolor de pecho', 'dolor de oido',
-            'dificultad para respirar', 'falta de aire', 'ahogo', 'opresion en el pecho',
-            'dolores musculares', 'dolores corporales', 'dolores de cuerpo',
-            'síntomas gastrointestinales', 'malestar estomacal',
-            'fiebre alta', 'fiebre moderada', 'fiebre leve',
-            'tos seca', 'tos productiva', 'tos con flema',
-            'congestion nasal', 'secrecion nasal', 'rinorrea', 'secrecion acuosa',
-            'fatiga extrema', 'cansancio extremo', 'agotamiento',
-            'picazon nasal', 'picazon en ojos', 'lagrimeo'
-        ]
-        
-        # Check for multi-word symptom phrases first
-        for phrase in symptom_phrases:
-            if phrase in message_lower and phrase not in seen_symptoms:
+        # Multi-word symptom phrases first, in SYMPTOM_PHRASES priority order
+        phrase_priorities = sorted({match.value: match.pattern for match in scan.of_class('symptom_phrase')}.items())
+        for _, phrase in phrase_priorities:
+            if phrase not in seen_symptoms:
                 symptoms_found.append({
                     'symptom': phrase,
                     'matched_token': phrase.split()[0],
@@ -191,43 +344,17 @@ class EnhancedChatbotService:
                 })
                 seen_symptoms.add(phrase)
         
-        # Enhanced symptom detection - single words (avoid duplicates)
-        symptom_patterns = {
-            'estornudos': 'estornudos',
-            'congestion': 'congestion nasal',
-            'nasal': 'congestion nasal',
-            'secrecion': 'secrecion nasal',
-            'picazon': 'picazon nasal',
-            'lagrimeo': 'lagrimeo',
-            'fiebre': 'fiebre',
-            'tos': 'tos',
-            'dolor': 'dolor de garganta',
-            'garganta': 'dolor de garganta',
-            'fatiga': 'fatiga',
-            'cansancio': 'fatiga',
-            'dolores': 'dolores musculares',
-            'musculares': 'dolores musculares',
-            'gastrointestinales': 'sintomas gastrointestinales',
-            'nauseas': 'nauseas',
-            'vomito': 'vomito',
-            'escalofrios': 'escalofrios'
-        }
-        
-        # Check for single word symptoms (avoid already seen phrases)
-        for token in tokens:
-            if len(token) >= 3:  # Ignore very short tokens
-                # Check if token matches a symptom pattern
-                if token in symptom_patterns:
-                    symptom_name = symptom_patterns[token]
-                    # Only add if we haven't seen it yet
-                    if symptom_name not in seen_symptoms:
-                        symptoms_found.append({
-                            'symptom': symptom_name,
-                            'matched_token': token,
-                            'confidence': 0.8,
-                            'possible_diseases': self._get_disease_ids_for_symptom(symptom_name)
-                        })
-                        seen_symptoms.add(symptom_name)
+        # Single word symptoms in message order (avoid already seen phrases)
+        for match in scan.words_of_class('symptom_word'):
+            symptom_name = match.value
+            if symptom_name not in seen_symptoms:
+                symptoms_found.append({
+                    'symptom': symptom_name,
+                    'matched_token': match.pattern,
+                    'confidence': 0.8,
+                    'possible_diseases': self._get_disease_ids_for_symptom(symptom_name)
+                })
+                seen_symptoms.add(symptom_name)
         
         return symptoms_found
     
@@ -249,78 +376,48 @@ class EnhancedChatbotService:
         if not self._disease_db:
             return []
         
-        symptom_map = self._disease_db.get('symptom_to_diseases', {})
-        disease_ids = set()
-        
-        for symptom_key, ids in symptom_map.items():
-            if symptom.lower() in symptom_key.lower() or symptom_key.lower() in symptom.lower():
-                disease_ids.update(ids)
+        disease_bits = self._symptom_index.lookup(symptom)
         
-        return list(disease_ids) if disease_ids else list(range(1, 125))  # Fallback to all diseases
+        # Fallback to all diseases
+        return bitset_members(disease_bits or self._symptom_index.all_diseases)
     
-    def _classify_by_patterns(self, user_message: str, symptoms: List[Dict[str, Any]], tokens: List[str]) -> Dict[str, Any]:
-        """Classify disease using pattern matching when database is not available"""
+    def _classify_by_patterns(self,
+                              user_message: str,
+                              symptoms: List[Dict[str, Any]],
+                              tokens: List[str],
+                              disease_terms: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Classify disease using pattern matching when database is not available
+        
+        disease_terms replaces the disease terms found in the message (a
+        session passes those of all its turns).
+        """
         
-        message_lower = user_message.lower()
         detected_symptoms = [s.get('symptom', '') for s in symptoms]
+        disease_items = list(self.DISEASE_PATTERNS.items())
         
-        # Pattern-based disease identification
-        disease_patterns = {
-            'rinitis_alergica': {
-                'name': 'Rinitis alérgica',
-                'symptoms': ['estornudos', 'frecuentes', 'picazon', 'nasal', 'congestion', 'nasal', 'secrecion', 'acuosa', 'lagrimeo', 'picazon', 'ojos'],
-                'urgency': 'baja',
-                'severity': 'leve',
-                'weight': 1
-            },
-            'resfriado_comun': {
-                'name': 'Resfriado común',
-                'symptoms': ['congestion', 'nasal', 'estornudos', 'secrecion', 'nasal', 'malestar', 'general', 'dolor', 'garganta', 'leve', 'fiebre', 'leve'],
-                'urgency': 'baja',
-                'severity': 'leve',
-                'weight': 1
-            },
-            'influenza_b': {
-                'name': 'Influenza B',
-                'symptoms': ['fiebre', 'dolores', 'musculares', 'tos', 'garganta', 'fatiga', 'gastrointestinales', 'cansancio', 'dolores', 'corporales'],
-                'urgency': 'media',
-                'severity': 'moderada',
-                'weight': 3
-            },
-            'influenza_h1n1': {
-                'name': 'Influenza A (H1N1)',
-                'symptoms': ['fiebre', 'alto', 'dolores', 'musculares', 'intensos', 'tos', 'seca', 'escalofrios', 'fatiga', 'extrema'],
-                'urgency': 'media',
-                'severity': 'alta',
-                'weight': 3
-            },
-            'neumonia': {
-                'name': 'Neumonía',
-                'symptoms': ['fiebre', 'alto', 'dificultad', 'respirar', 'respiratoria', 'tos', 'torácico', 'pecho', 'escalofrios', 'confusion'],
-                'urgency': 'alta',
-                'severity': 'alta',
-                'weight': 4
-            },
-            'bronquitis': {
-                'name': 'Bronquitis aguda',
-                'symptoms': ['tos', 'persistente', 'productiva', 'torácico', 'pecho', 'fiebre', 'leve', 'sibilancias'],
-                'urgency': 'baja',
-                'severity': 'moderada',
-                'weight': 2
-            }
-        }
+        # Disease terms present in the message and the diseases they point at
+        found_terms = set()
+        candidate_indexes = set()
+        if disease_terms is None:
+            for match in self._scan_message(user_message).of_class('disease_term'):
+                found_terms.add(match.pattern)
+                candidate_indexes.update(match.value)
+        else:
+            found_terms.update(disease_terms)
+            candidate_indexes.update(
+                index for index, (_, disease_info) in enumerate(disease_items)
+                if found_terms.intersection(disease_info['symptoms'])
+            )
         
         scores = {}
-        for disease_key, disease_info in disease_patterns.items():
-            score = 0
-            matched = []
+        for index in sorted(candidate_indexes):
+            disease_key, disease_info = disease_items[index]
             weight = disease_info.get('weight', 2)
             
             # Count how many symptoms from this disease are in the user's message
-            for disease_symptom in disease_info['symptoms']:
-                if disease_symptom in message_lower:
-                    score += weight
-                    matched.append(disease_symptom)
+            matched = [term for term in disease_info['symptoms'] if term in found_terms]
+            score = weight * len(matched)
             
             if score > 0:
                 scores[disease_key] = {
@@ -380,109 +477,115 @@ class EnhancedChatbotService:
             'reasoning': 'Symptoms detected but cannot classify precisely'
         }
     
-    def classify_disease(self, user_message: str, symptoms: List[Dict[str, Any]], tokens: List[str]) -> Dict[str, Any]:
+    def classify_disease(self,
+                         user_message: str,
+                         symptoms: List[Dict[str, Any]],
+                         tokens: List[str],
+                         disease_terms: Optional[List[str]] = None) -> Dict[str, Any]:
         """
         Classify which disease(s) the patient likely has based on ALL symptoms
         """
-        if not symptoms:
-            return {
-                'disease_id': None,
-                'disease_name': None,
-                'confidence': 0.0,
-                'reasoning': 'No enough symptoms detected',
-                'matched_symptoms': [],
-                'urgency': 'baja',
-                'severity': 'leve'
-            }
-        
-        # If no disease database loaded, use pattern matching
-        if not self._disease_db:
-            return self._classify_by_patterns(user_message, symptoms, tokens)
-        
-        # Extract all symptom names detected
-        detected_symptom_names = [s.get('symptom', '') for s in symptoms]
-        
-        # Get all possible disease IDs from symptoms
-        possible_diseases = set()
-        for symptom in symptoms:
-            possible_diseases.update(symptom.get('possible_diseases', []))
+        return self.classify_diseases([(user_message, symptoms, tokens, disease_terms)])[0]
+    
+    def classify_diseases(self, items: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Classify several messages at once
         
-        if not possible_diseases:
-            return {
-                'disease_id': None,
-                'disease_name': None,
-                'confidence': 0.0,
-                'reasoning': 'No diseases found matching symptoms',
-                'matched_symptoms': []
-            }
+        Args:
+            items: (user_message, symptoms, tokens) per message, optionally
+                followed by the disease terms of classify_disease
         
-        # Score diseases by ALL symptom matches
-        disease_scores = {}
+        Returns:
+            One classification per item, as returned by classify_disease.
+            Messages scored against the database share one sparse product.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        to_score = []
         
-        diseases_list = self._disease_db.get('diseases', [])
-        for disease in diseases_list:
-            disease_id = disease.get('id')
-            disease_name = disease.get('nombre', '')
-            disease_symptoms = disease.get('sintomas', [])
+        for position, (user_message, symptoms, tokens, *disease_terms) in enumerate(items):
+            if not symptoms:
+                results[position] = {
+                    'disease_id': None,
+                    'disease_name': None,
+                    'confidence': 0.0,
+                    'reasoning': 'No enough symptoms detected',
+                    'matched_symptoms': [],
+                    'urgency': 'baja',
+                    'severity': 'leve'
+                }
+                continue
             
-            if disease_id in possible_diseases:
-                # Count ALL symptom matches (not just keywords)
-                symptom_matches = 0
-                matched_symptoms = []
-                
-                # Check each detected symptom against disease's symptoms list
-                for detected_symptom in detected_symptom_names:
-                    for disease_symptom in disease_symptoms:
-                        if detected_symptom.lower() in disease_symptom.lower() or disease_symptom.lower() in detected_symptom.lower():
-                            symptom_matches += 1
-                            matched_symptoms.append(disease_symptom)
-                            break
-                
-                # Count matching keywords for additional context
-                keywords = disease.get('keywords', [])
-                keyword_matches = sum(
-                    1 for keyword in keywords 
-                    if any(keyword.lower() in token for token in tokens)
-                )
-                
-                # Enhanced scoring: More weight to symptom matches
-                total_score = symptom_matches * 3 + keyword_matches * 1.5
-                
-                disease_scores[disease_id] = {
-                    'score': total_score,
-                    'symptom_matches': symptom_matches,
-                    'matched_symptoms': list(set(matched_symptoms)),  # Remove duplicates
-                    'keyword_matches': keyword_matches,
-                    'disease': disease,
-                    'detected_symptoms_list': detected_symptom_names
+            # If no disease database loaded, use pattern matching
+            if not self._disease_db:
+                results[position] = self._classify_by_patterns(user_message, symptoms, tokens, *disease_terms)
+                continue
+            
+            # Extract all symptom names detected
+            detected_symptom_names = [s.get('symptom', '') for s in symptoms]
+            
+            # Get all possible disease IDs from symptoms
+            possible_diseases = set()
+            for symptom in symptoms:
+                possible_diseases.update(symptom.get('possible_diseases', []))
+            
+            if not possible_diseases:
+                results[position] = {
+                    'disease_id': None,
+                    'disease_name': None,
+                    'confidence': 0.0,
+                    'reasoning': 'No diseases found matching symptoms',
+                    'matched_symptoms': []
                 }
+                continue
+            
+            to_score.append((position, detected_symptom_names, possible_diseases, tokens))
+        
+        if to_score:
+            # Score diseases by ALL symptom matches (one sparse product for every message)
+            batch_scores = self._disease_scorer.score_batch(
+                [(detected_symptom_names, tokens) for _, detected_symptom_names, _, tokens in to_score]
+            )
+            for (position, detected_symptom_names, possible_diseases, _), (scores, symptom_matches, _) in zip(to_score, batch_scores):
+                results[position] = self._rank_diseases(detected_symptom_names, possible_diseases, scores, symptom_matches)
+        
+        return results
+    
+    def _rank_diseases(self,
+                       detected_symptom_names: List[str],
+                       possible_diseases: set,
+                       scores,
+                       symptom_matches) -> Dict[str, Any]:
+        """Classification result from the scores of every disease row"""
+        scorer = self._disease_scorer
+        rows = scorer.candidate_rows(possible_diseases)
         
         # Get top scoring diseases (top 3)
-        if disease_scores:
-            sorted_diseases = sorted(disease_scores.items(), key=lambda x: x[1]['score'], reverse=True)
-            top_three = sorted_diseases[:3]
-            
-            top_result = sorted_diseases[0][1]
+        if len(rows):
+            top_three = scorer.top_rows(scores, rows, 3)
+            top_row = top_three[0]
+            top_disease = scorer.diseases[top_row]
+            top_score = float(scores[top_row])
+            matched_symptoms = self._matched_disease_symptoms(top_disease, detected_symptom_names)
             
             return {
-                'disease_id': sorted_diseases[0][0],
-                'disease_name': top_result['disease']['nombre'],
-                'category': top_result['disease'].get('categoria', 'unknown'),
-                'symptoms': top_result['disease'].get('sintomas', []),
-                'matched_symptoms': top_result.get('matched_symptoms', []),
-                'detected_symptoms': top_result.get('detected_symptoms_list', []),
-                'urgency': top_result['disease'].get('urgencia', 'baja'),
-                'severity': top_result['disease'].get('severidad', 'leve'),
-                'confidence': min(top_result['score'] / 10, 1.0),
-                'reasoning': f"Matched {top_result['symptom_matches']} symptoms: {', '.join(top_result['matched_symptoms'][:3])}",
+                'disease_id': top_disease.get('id'),
+                'disease_name': top_disease['nombre'],
+                'category': top_disease.get('categoria', 'unknown'),
+                'symptoms': top_disease.get('sintomas', []),
+                'matched_symptoms': matched_symptoms,
+                'detected_symptoms': detected_symptom_names,
+                'urgency': top_disease.get('urgencia', 'baja'),
+                'severity': top_disease.get('severidad', 'leve'),
+                'confidence': min(top_score / 10, 1.0),
+                'reasoning': f"Matched {int(symptom_matches[top_row])} symptoms: {', '.join(matched_symptoms[:3])}",
                 'top_3_diseases': [
                     {
-                        'id': did,
-                        'name': data['disease']['nombre'],
-                        'score': data['score'],
-                        'matches': data['symptom_matches']
+                        'id': scorer.diseases[row].get('id'),
+                        'name': scorer.diseases[row]['nombre'],
+                        'score': float(scores[row]),
+                        'matches': int(symptom_matches[row])
                     }
-                    for did, data in top_three
+                    for row in top_three
                 ]
             }
         
@@ -494,17 +597,24 @@ class EnhancedChatbotService:
             'matched_symptoms': []
         }
     
+    def _matched_disease_symptoms(self, disease: Dict[str, Any], detected_symptom_names: List[str]) -> List[str]:
+        """First symptom of the disease matching each detected symptom, without duplicates"""
+        matched_symptoms = []
+        for detected_symptom in detected_symptom_names:
+            matching_keys = self._symptom_index.match_keys(detected_symptom)
+            for disease_symptom in disease.get('sintomas', []):
+                position = self._symptom_index.key_position(disease_symptom)
+                if position is not None and matching_keys >> position & 1:
+                    if disease_symptom not in matched_symptoms:
+                        matched_symptoms.append(disease_symptom)
+                    break
+        return matched_symptoms
+    
     def _is_greeting(self, message: str) -> bool:
         """Detect if message is a greeting"""
-        greetings = ['hola', 'hi', 'buenos días', 'buenas tardes', 'buenas noches', 
-                    'saludos', 'buen día', 'hey', 'buenas', 'hello', '¿qué tal?', 'como estas']
-        
-        message_lower = message.lower().strip()
-        
         # Check for greetings
-        for greeting in greetings:
-            if greeting in message_lower:
-                return True
+        if self._scan_message(message).has('greeting'):
+            return True
         
         # Check for very short messages (likely greeting)
         if len(message.strip()) < 10 and any(char.isalpha() for char in message):
@@ -514,12 +624,7 @@ class EnhancedChatbotService:
     
     def _is_question(self, message: str) -> bool:
         """Detect if message is a general question"""
-        question_words = ['qué', 'que', 'cuál', 'cual', 'cómo', 'como', 'por qué', 
-                         'porque', 'cuándo', 'cuando', 'dónde', 'donde', 'quién', 'quien']
-        
-        message_lower = message.lower()
-        
-        return any(qw in message_lower for qw in question_words) or '?' in message
+        return self._scan_message(message).has('question')
     
     async def get_openai_response(
         self, 
@@ -704,121 +809,532 @@ class EnhancedChatbotService:
     ) -> Dict[str, Any]:
         """
         Complete workflow: Tokenize → Classify → OpenAI → Respond
+        
+        CPU-bound steps run on the stage executors (core/executors.py), so
+        the event loop keeps serving other requests meanwhile. Successful
+        results are memoized by normalized message (services/analysis_cache.py).
+        """
+        if self._analysis_cache is None:
+            return await self._analyze_user_message(user_message)
+        
+        cache_key = self._analysis_cache_key(user_message)
+        cached = await self._analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # The cache key seeds the greeting variant, so every worker and tier agree on it
+        result = await self._analyze_user_message(user_message, greeting_seed=cache_key)
+        if result.get('success'):
+            await self._analysis_cache.set(cache_key, result)
+        return result
+    
+    def _analysis_cache_key(self, user_message: str) -> str:
+        """
+        Cache key of a message: its normalized form plus the lexicon patterns it contains
+        
+        Normalization merges near-duplicates; the signature (taken from the raw
+        message, like the analysis itself) keeps messages whose greeting or
+        question detection, symptoms, urgency keywords or question topic
+        differ from sharing a result.
         """
+        scan = self._scan_message(user_message)
+        hits = {
+            (match.pattern_class, match.pattern)
+            for match in scan.matches if match.pattern_class != 'symptom_word'
+        }
+        hits.update(('symptom_word', match.pattern) for match in scan.words_of_class('symptom_word'))
+        # Greeting detection also depends on the raw length
+        hits.add(('is_greeting', str(self._is_greeting(user_message))))
+        # Plain substring checks of the analysis ('grave' and 'gráve' fold to one key)
+        message_lower = user_message.lower()
+        hits.update(('urgency', kw) for kw in self.URGENCY_KEYWORDS if kw in message_lower)
+        hits.add(('question_topic', str(self._question_topic(user_message))))
+        signature = '|'.join(f"{pattern_class}:{pattern}" for pattern_class, pattern in sorted(hits))
+
+        return AnalysisCache.make_key(
+            self._analysis_namespace,
+            normalize_message(user_message, self._folded_stop_words),
+            signature
+        )
+    
+    @staticmethod
+    def _file_version(path: Optional[str]) -> str:
+        """Path, mtime and size of a data file ('' if there is none)"""
+        if not path or not os.path.exists(path):
+            return ''
+        stat = os.stat(path)
+        return f"{os.path.abspath(path)}:{stat.st_mtime_ns}:{stat.st_size}"
+    
+    @property
+    def _analysis_namespace(self) -> str:
+        """Short fingerprint of the disease file and the model version currently served"""
+        model_version = ''
+        if self._model_path is not None:
+            loaded = get_model_registry().get(self._model_path, self._model_kind)
+            model_version = loaded.version if loaded is not None else ''
+        return hashlib.sha1(f"{self._disease_version}|{model_version}".encode('utf-8')).hexdigest()[:12]
+
+    def analysis_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the result cache"""
+        if self._analysis_cache is None:
+            return {'enabled': False}
+        return {'enabled': True, 'namespace': self._analysis_namespace, **self._analysis_cache.stats()}
+    
+    async def _analyze_user_message(self, user_message: str, greeting_seed: Optional[str] = None) -> Dict[str, Any]:
+        """process_user_message without the result cache"""
         try:
             logger.info("Processing message", message_length=len(user_message))
-            
-            # Handle special cases first (greetings, general questions)
-            if self._is_greeting(user_message):
-                return {
-                    'success': True,
-                    'message': self._get_greeting_response(),
-                    'analysis': {
-                        'message_type': 'greeting',
-                        'needs_followup': True
-                    }
-                }
-            
-            # Step 1: Tokenize the message
-            tokens = self.tokenize_spanish_text(user_message)
-            logger.info("Message tokenized", token_count=len(tokens))
-            
-            # Step 2: Extract symptom keywords
-            symptoms = self.extract_symptom_keywords(user_message, tokens)
-            logger.info("Symptoms extracted", symptom_count=len(symptoms))
-            
-            # Handle general questions
-            if self._is_question(user_message) and not symptoms:
-                return {
-                    'success': True,
-                    'message': self._get_general_question_response(user_message),
-                    'analysis': {
-                        'message_type': 'general_question',
-                        'needs_followup': True
-                    }
-                }
-            
+        
+            # Step 1-2: Tokenize and extract, handling greetings and general questions
+            prepared = await self._run_stage('classification', '_prepare_message', user_message)
+            if prepared['message_type'] == 'greeting':
+                return self._greeting_result(greeting_seed)
+            if prepared['message_type'] == 'general_question':
+                return self._general_question_result(user_message)
+        
+            tokens = prepared['tokens']
+            symptoms = prepared['symptoms']
+        
             # Step 3: Classify disease (use ML if available)
-            classified_disease = None
-            ml_prediction = None
-            
-            if self._use_ml and symptoms:
+            classified_disease = prepared['classification']
+        
+            if classified_disease is None and self._use_ml and symptoms:
                 # Try ML prediction with SHAP
                 try:
-                    ml_prediction = self._predict_with_ml(user_message, symptoms)
+                    ml_prediction = await self._predict_with_ml_batched(user_message, symptoms)
                     if ml_prediction:
-                        classified_disease = {
-                            'disease_name': ml_prediction.get('disease', 'Infección respiratoria'),
-                            'disease_id': hash(ml_prediction.get('disease', 'unknown')),
-                            'confidence': ml_prediction.get('confidence', 0.7),
-                            'urgency_level': ml_prediction.get('urgency_level', 'medium'),
-                            'symptoms': symptoms,
-                            'matched_symptoms': ml_prediction.get('top_contributing_features', [])[:5],
-                            'detected_symptoms': [s.get('symptom', '') for s in symptoms],
-                            'ml_explanation': ml_prediction.get('explanation'),
-                            'top_3_predictions': ml_prediction.get('top_3_predictions', [])
-                        }
-                        logger.info("ML prediction successful", 
+                        classified_disease = self._ml_classification(ml_prediction, symptoms)
+                        logger.info("ML prediction successful",
                                    disease=classified_disease.get('disease_name'),
                                    confidence=classified_disease.get('confidence'))
+                except ExecutorSaturatedError:
+                    raise
                 except Exception as e:
                     logger.warning("ML prediction failed, using pattern matching", error=str(e))
-            
+        
             # Fallback to pattern matching if ML not used or failed
             if not classified_disease:
-                classified_disease = self.classify_disease(user_message, symptoms, tokens)
+                classified_disease = await self._run_stage(
+                    'classification', 'classify_disease', user_message, symptoms, tokens
+                )
                 logger.info("Disease classified (pattern matching)",
                            disease=classified_disease.get('disease_name'),
                            confidence=classified_disease.get('confidence'))
-            
-            # Handle case with no symptoms detected
-            if classified_disease.get('disease_id') is None and not symptoms:
-                return {
-                    'success': True,
-                    'message': self._get_no_symptoms_response(user_message),
-                    'analysis': {
-                        'message_type': 'no_symptoms',
-                        'needs_followup': True
-                    }
-                }
-            
-            # Step 4: Get OpenAI response (humanized)
-            ai_response = await self.get_openai_response(
-                user_message,
-                classified_disease,
-                symptoms
-            )
-            
-            # Step 5: Prepare final response
-            return {
-                'success': True,
-                'message': ai_response,
-                'tokenization': {
+        
+            return await self._complete_analysis(user_message, tokens, symptoms, classified_disease)
+        
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            logger.error("Error processing message", error=str(e))
+            return self._error_result(e)
+    
+    def _prepare_message(self, user_message: str, classify: bool = True) -> Dict[str, Any]:
+        """
+        Steps 1-3 up to the ML model, as one CPU-bound stage
+        
+        Returns:
+            message_type ('greeting', 'general_question' or 'symptoms'); for
+            'symptoms' also tokens, symptoms and the pattern classification
+            (None when classify is False or the ML model will handle it)
+        """
+        if self._is_greeting(user_message):
+            return {'message_type': 'greeting'}
+        
+        # Step 1: Tokenize the message
+        tokens = self.tokenize_spanish_text(user_message)
+        logger.info("Message tokenized", token_count=len(tokens))
+        
+        # Step 2: Extract symptom keywords
+        symptoms = self.extract_symptom_keywords(user_message, tokens)
+        logger.info("Symptoms extracted", symptom_count=len(symptoms))
+        
+        if self._is_question(user_message) and not symptoms:
+            return {'message_type': 'general_question'}
+        
+        classified_disease = None
+        if classify and not (self._use_ml and symptoms):
+            classified_disease = self.classify_disease(user_message, symptoms, tokens)
+        
+        return {
+            'message_type': 'symptoms',
+            'tokens': tokens,
+            'symptoms': symptoms,
+            'classification': classified_disease
+        }
+    
+    def _prepare_messages(self, user_messages: List[str]) -> List[Dict[str, Any]]:
+        """_prepare_message without classification for a batch ('error' type for a failing message)"""
+        prepared = []
+        for position, user_message in enumerate(user_messages):
+            try:
+                prepared.append(self._prepare_message(user_message, classify=False))
+            except Exception as e:
+                logger.error("Error processing message", error=str(e), batch_position=position)
+                prepared.append({'message_type': 'error', 'error': e})
+        return prepared
+    
+    async def _run_stage(self, stage: str, method_name: str, *args) -> Any:
+        """Run a CPU-bound method of this service on the stage's executor"""
+        executor = get_executor(stage)
+        if executor.kind == 'process':
+            # Process workers run their own copy of the shared service
+            return await executor.run(_call_shared_service, method_name, args)
+        return await executor.run(getattr(self, method_name), *args)
+    
+    async def stream_user_message(self, user_message: str) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Staged workflow for streaming clients
+        
+        Yields (event, data) as each stage finishes: 'symptoms', 'classification'
+        (disease and urgency), 'explanation' (ML only), 'narrative', and finally
+        'result' with the same dict process_user_message returns. Greetings,
+        general questions and messages without symptoms go straight to 'result'.
+        """
+        try:
+            # Step 1-2: Tokenize and extract
+            prepared = await self._run_stage('classification', '_prepare_message', user_message, False)
+            if prepared['message_type'] == 'greeting':
+                yield 'result', self._greeting_result()
+                return
+            if prepared['message_type'] == 'general_question':
+                yield 'result', self._general_question_result(user_message)
+                return
+        
+            tokens = prepared['tokens']
+            symptoms = prepared['symptoms']
+        
+            if symptoms:
+                yield 'symptoms', {
                     'tokens': tokens,
-                    'token_count': len(tokens)
-                },
-                'symptom_extraction': {
                     'symptoms': symptoms,
                     'count': len(symptoms)
-                },
-                'disease_classification': classified_disease,
-                'analysis': {
-                    'detected_symptoms': [s.get('symptom') for s in symptoms],
-                    'possible_disease': classified_disease.get('disease_name'),
-                    'urgency_level': classified_disease.get('urgency'),
-                    'severity': classified_disease.get('severity'),
-                    'confidence': classified_disease.get('confidence'),
-                    'recommendation': self._get_actionable_recommendation(classified_disease)
                 }
+        
+            # Step 3: Classification first (ML without SHAP), explanation after
+            classified_disease = None
+            if self._use_ml and symptoms:
+                prediction = await self._predict_with_ml_batched(user_message, symptoms, False)
+                if prediction:
+                    yield 'classification', self._ml_classification(prediction, symptoms)
+        
+                    explained = await self._predict_with_ml_batched(user_message, symptoms)
+                    if explained:
+                        classified_disease = self._ml_classification(explained, symptoms)
+                        yield 'explanation', {
+                            'ml_explanation': classified_disease['ml_explanation'],
+                            'top_3_predictions': classified_disease['top_3_predictions']
+                        }
+        
+            # Same fallback as process_user_message (a corrected classification follows)
+            if not classified_disease:
+                classified_disease = await self._run_stage(
+                    'classification', 'classify_disease', user_message, symptoms, tokens
+                )
+                if symptoms:
+                    yield 'classification', classified_disease
+        
+            # Step 4-5: Narrative and final result
+            result = await self._complete_analysis(user_message, tokens, symptoms, classified_disease)
+            if 'disease_classification' in result:
+                yield 'narrative', {'message': result['message']}
+            yield 'result', result
+        
+        except Exception as e:
+            logger.error("Error streaming message", error=str(e))
+            yield 'result', self._error_result(e)
+    
+    async def process_user_messages(self, user_messages: List[str]) -> List[Dict[str, Any]]:
+        """
+        Batch workflow: same result per message as process_user_message
+        
+        Classification against the disease database is one sparse product for
+        the whole batch and ML prediction is one batched model call. A failing
+        message gets its own error result; the rest of the batch still completes.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(user_messages)
+        pending = []
+        
+        logger.info("Processing message batch", batch_size=len(user_messages))
+        
+        # Step 1-2: Tokenize and extract, settling greetings and general questions
+        prepared_messages = await self._run_stage('classification', '_prepare_messages', user_messages)
+        for position, (user_message, prepared) in enumerate(zip(user_messages, prepared_messages)):
+            if prepared['message_type'] == 'greeting':
+                results[position] = self._greeting_result()
+            elif prepared['message_type'] == 'general_question':
+                results[position] = self._general_question_result(user_message)
+            elif prepared['message_type'] == 'error':
+                results[position] = self._error_result(prepared['error'])
+            else:
+                pending.append((position, user_message, prepared['tokens'], prepared['symptoms']))
+        
+        # Step 3: Classify disease (one ML batch, pattern matching for the rest)
+        classified = {}
+        ml_items = [item for item in pending if item[3]] if self._use_ml else []
+        if ml_items:
+            predictions = await self._run_stage(
+                'ml',
+                '_predict_with_ml_batch',
+                [user_message for _, user_message, _, _ in ml_items],
+                [symptoms for _, _, _, symptoms in ml_items]
+            )
+            for (position, _, _, symptoms), prediction in zip(ml_items, predictions):
+                if prediction:
+                    classified[position] = self._ml_classification(prediction, symptoms)
+        
+        to_classify = [item for item in pending if item[0] not in classified]
+        try:
+            pattern_results = await self._run_stage(
+                'classification',
+                'classify_diseases',
+                [(user_message, symptoms, tokens) for _, user_message, tokens, symptoms in to_classify]
+            )
+            for (position, _, _, _), classified_disease in zip(to_classify, pattern_results):
+                classified[position] = classified_disease
+        except ExecutorSaturatedError:
+            raise
+        except Exception as e:
+            # Batch scoring failed: classify one by one so only broken items fail
+            logger.warning("Batch classification failed, classifying per message", error=str(e))
+            for position, user_message, tokens, symptoms in to_classify:
+                try:
+                    classified[position] = await self._run_stage(
+                        'classification', 'classify_disease', user_message, symptoms, tokens
+                    )
+                except ExecutorSaturatedError:
+                    raise
+                except Exception as item_error:
+                    results[position] = self._error_result(item_error)
+        
+        # Step 4-5: Response per message
+        for position, user_message, tokens, symptoms in pending:
+            if position not in classified:
+                continue
+            try:
+                results[position] = await self._complete_analysis(
+                    user_message, tokens, symptoms, classified[position]
+                )
+            except Exception as e:
+                logger.error("Error processing message", error=str(e), batch_position=position)
+                results[position] = self._error_result(e)
+        
+        return results
+    
+    async def process_session_message(
+        self,
+        user_message: str,
+        session_state: Optional[Dict[str, Any]] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Incremental workflow for one turn of a chat session
+        
+        Only the new message is tokenized and scanned; its symptoms, tokens and
+        disease terms are merged into the session's (deduplicated, so the state
+        is bounded by the lexicon rather than by the number of turns).
+        Classification runs on the merged symptoms and is reused when the turn
+        adds no new symptom. Urgency keywords are checked on the raw text of
+        each turn and remembered, so every turn's urgency is at least that of
+        its own message. The first turn of a session gives the same analysis as
+        process_user_message.
+        
+        Args:
+            user_message: The new turn
+            session_state: State returned by the previous turn (None starts a session)
+        
+        Returns:
+            (result, new_state); the input state is never modified
+        """
+        state = session_state or self.new_session_state()
+        try:
+            logger.info("Processing session message",
+                       message_length=len(user_message),
+                       turn=state['turns'] + 1)
+        
+            # Step 1-2: Tokenize and extract the new turn only
+            prepared = await self._run_stage('classification', '_prepare_message', user_message, False)
+            if prepared['message_type'] == 'greeting':
+                return self._greeting_result(), state
+            if prepared['message_type'] == 'general_question':
+                return self._general_question_result(user_message), state
+        
+            tokens = prepared['tokens']
+            symptoms = prepared['symptoms']
+        
+            # Merge the delta into the session
+            known_symptoms = {s['symptom'] for s in state['symptoms']}
+            new_symptoms = []
+            for symptom in symptoms:
+                if symptom['symptom'] not in known_symptoms:
+                    known_symptoms.add(symptom['symptom'])
+                    new_symptoms.append(symptom)
+        
+            known_tokens = set(state['tokens'])
+            session_tokens = state['tokens'] + [
+                token for token in dict.fromkeys(tokens) if token not in known_tokens
+            ]
+            session_symptoms = state['symptoms'] + new_symptoms
+        
+            # Raw-text checks run on the turn itself (phrases may span the session's tokens)
+            urgent = state.get('urgent', False) or self._has_urgency_keywords(user_message)
+            disease_terms = sorted(set(state.get('disease_terms', [])).union(
+                match.pattern for match in self._scan_message(user_message).of_class('disease_term')
+            ))
+        
+            # Step 3: Classify only when the symptom set changed
+            classified_disease = state['classification']
+            if new_symptoms or classified_disease is None:
+                classified_disease = None
+                if self._use_ml and session_symptoms:
+                    try:
+                        ml_prediction = await self._predict_with_ml_batched(user_message, session_symptoms)
+                        if ml_prediction:
+                            classified_disease = self._ml_classification(ml_prediction, session_symptoms)
+                    except ExecutorSaturatedError:
+                        raise
+                    except Exception as e:
+                        logger.warning("ML prediction failed, using pattern matching", error=str(e))
+        
+                if not classified_disease:
+                    classified_disease = await self._run_stage(
+                        'classification', 'classify_disease', user_message, session_symptoms, session_tokens,
+                        disease_terms
+                    )
+        
+            # Urgency step on every turn, a reused classification included
+            classified_disease = self._session_urgency(classified_disease, urgent)
+        
+            result = await self._complete_analysis(
+                user_message, session_tokens, session_symptoms, classified_disease
+            )
+        
+            new_state = {
+                'symptoms': session_symptoms,
+                'tokens': session_tokens,
+                'disease_terms': disease_terms,
+                'urgent': urgent,
+                'classification': classified_disease if session_symptoms else None,
+                'turns': state['turns'] + 1
             }
-            
+            return result, new_state
+        
+        except ExecutorSaturatedError:
+            raise
         except Exception as e:
-            logger.error("Error processing message", error=str(e))
+            logger.error("Error processing session message", error=str(e))
+            return self._error_result(e), state
+    
+    @staticmethod
+    def new_session_state() -> Dict[str, Any]:
+        """State of a session with no turns yet (plain JSON-serializable dict)"""
+        return {
+            'symptoms': [],
+            'tokens': [],
+            'disease_terms': [],
+            'urgent': False,
+            'classification': None,
+            'turns': 0
+        }
+    
+    def _session_urgency(self, classified_disease: Dict[str, Any], urgent: bool) -> Dict[str, Any]:
+        """ML classification raised to high urgency once a turn of the session had an urgency keyword"""
+        if not urgent or classified_disease.get('urgency_level') in (None, 'high'):
+            return classified_disease
+        return {**classified_disease, 'urgency_level': 'high', 'urgency': self.ML_URGENCY_LEVELS['high']}
+    
+    def _greeting_result(self, seed: Optional[str] = None) -> Dict[str, Any]:
+        """Result for a greeting message"""
+        return {
+            'success': True,
+            'message': self._get_greeting_response(seed),
+            'analysis': {
+                'message_type': 'greeting',
+                'needs_followup': True
+            }
+        }
+    
+    def _general_question_result(self, user_message: str) -> Dict[str, Any]:
+        """Result for a general question without symptoms"""
+        return {
+            'success': True,
+            'message': self._get_general_question_response(user_message),
+            'analysis': {
+                'message_type': 'general_question',
+                'needs_followup': True
+            }
+        }
+    
+    def _error_result(self, error: Exception) -> Dict[str, Any]:
+        """Result for a message that could not be processed"""
+        return {
+            'success': False,
+            'message': 'Lo siento, hubo un error procesando tu mensaje. Por favor intenta de nuevo.',
+            'error': str(error)
+        }
+    
+    def _ml_classification(self, ml_prediction: Dict[str, Any], symptoms: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Classification dict from an ML prediction"""
+        return {
+            'disease_name': ml_prediction.get('disease', 'Infección respiratoria'),
+            'disease_id': hash(ml_prediction.get('disease', 'unknown')),
+            'confidence': ml_prediction.get('confidence', 0.7),
+            'urgency_level': ml_prediction.get('urgency_level', 'medium'),
+            'urgency': self.ML_URGENCY_LEVELS.get(ml_prediction.get('urgency_level', 'medium'), 'media'),
+            'symptoms': symptoms,
+            'matched_symptoms': ml_prediction.get('top_contributing_features', [])[:5],
+            'detected_symptoms': [s.get('symptom', '') for s in symptoms],
+            'ml_explanation': ml_prediction.get('explanation'),
+            'top_3_predictions': ml_prediction.get('top_3_predictions', [])
+        }
+    
+    async def _complete_analysis(
+        self,
+        user_message: str,
+        tokens: List[str],
+        symptoms: List[Dict[str, Any]],
+        classified_disease: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Steps 4-5: humanized response and final result for a classified message"""
+        # Handle case with no symptoms detected
+        if classified_disease.get('disease_id') is None and not symptoms:
             return {
-                'success': False,
-                'message': 'Lo siento, hubo un error procesando tu mensaje. Por favor intenta de nuevo.',
-                'error': str(e)
+                'success': True,
+                'message': self._get_no_symptoms_response(user_message),
+                'analysis': {
+                    'message_type': 'no_symptoms',
+                    'needs_followup': True
+                }
+            }
+        
+        # Step 4: Get OpenAI response (humanized)
+        ai_response = await self.get_openai_response(
+            user_message,
+            classified_disease,
+            symptoms
+        )
+        
+        # Step 5: Prepare final response
+        return {
+            'success': True,
+            'message': ai_response,
+            'tokenization': {
+                'tokens': tokens,
+                'token_count': len(tokens)
+            },
+            'symptom_extraction': {
+                'symptoms': symptoms,
+                'count': len(symptoms)
+            },
+            'disease_classification': classified_disease,
+            'analysis': {
+                'detected_symptoms': [s.get('symptom') for s in symptoms],
+                'possible_disease': classified_disease.get('disease_name'),
+                'urgency_level': classified_disease.get('urgency'),
+                'severity': classified_disease.get('severity'),
+                'confidence': classified_disease.get('confidence'),
+                'recommendation': self._get_actionable_recommendation(classified_disease)
             }
+        }
     
     def _get_actionable_recommendation(self, classified_disease: Dict[str, Any]) -> str:
         """Get actionable recommendation based on disease classification"""
@@ -841,8 +1357,8 @@ class EnhancedChatbotService:
         
         return recommendations.get(urgency, recommendations['baja'])
     
-    def _get_greeting_response(self) -> str:
-        """Get a friendly greeting response"""
+    def _get_greeting_response(self, seed: Optional[str] = None) -> str:
+        """Get a friendly greeting response (a random variant, or a fixed one per seed)"""
         greetings = [
             "¡Hola! 👋\n\nSoy tu asistente médico de Respicare. Estoy aquí para ayudarte con información sobre salud respiratoria, síntomas y orientación médica.\n\n**¿Cuál es tu consulta o problema?** Puedes:\n\n• Describirme tus síntomas\n• Preguntar sobre enfermedades respiratorias\n• Pedir orientación médica general",
             
@@ -850,17 +1366,17 @@ class EnhancedChatbotService:
             
             "¡Hola! 👋\n\nBienvenido a Respicare. Soy tu asistente médico virtual aquí para ayudarte.\n\n**¿Qué te preocupa?** Comparte conmigo:\n\n• Síntomas que estás experimentando\n• Preguntas sobre salud respiratoria\n• Cualquier duda médica"
         ]
-        
-        import random
-        return random.choice(greetings)
+
+        if seed is None:
+            return random.choice(greetings)
+        return greetings[zlib.crc32(seed.encode('utf-8')) % len(greetings)]
     
     def _get_general_question_response(self, user_message: str) -> str:
         """Get response for general questions without symptoms"""
         
-        message_lower = user_message.lower()
-        
         # Detect question type
-        if any(word in message_lower for word in ['qué es', 'que es', 'define', 'definir']):
+        topic = self._question_topic(user_message)
+        if topic == 0:
             return (
                 "¡Claro! Te puedo ayudar con información sobre enfermedades respiratorias.\n\n"
                 "**Para darte información más precisa, dime:**\n"
@@ -871,7 +1387,7 @@ class EnhancedChatbotService:
                 "asma, neumonía, bronquitis, COVID-19, gripe, EPOC, y más."
             )
         
-        elif any(word in message_lower for word in ['para qué', 'para que', 'qué hace', 'que hace']):
+        elif topic == 1:
             return (
                 "Estoy diseñado para ayudarte con:\n\n"
                 "🤒 **Análisis de síntomas**: Describe tus síntomas y te ayudo a entender qué podría ser\n"
@@ -881,7 +1397,7 @@ class EnhancedChatbotService:
                 "**¿Cómo quieres comenzar?** Describe tus síntomas o hazme una pregunta."
             )
         
-        elif any(word in message_lower for word in ['puedes', 'podés', 'sabes', 'puede hacer']):
+        elif topic == 2:
             return (
                 "¡Por supuesto! Puedo ayudarte con:\n\n"
                 "✅ Analizar tus síntomas respiratorios\n"
@@ -902,6 +1418,14 @@ class EnhancedChatbotService:
                 "Puedes también consultar las preguntas rápidas disponibles o escribirme tu situación."
             )
     
+    def _question_topic(self, user_message: str) -> Optional[int]:
+        """Index of the first QUESTION_TOPICS entry the message mentions (None if none)"""
+        message_lower = user_message.lower()
+        for topic, words in enumerate(self.QUESTION_TOPICS):
+            if any(word in message_lower for word in words):
+                return topic
+        return None
+    
     def _get_no_symptoms_response(self, user_message: str) -> str:
         """Get response when no symptoms are detected"""
         
@@ -918,39 +1442,149 @@ class EnhancedChatbotService:
             "O si prefieres, puedes hacer una pregunta general sobre salud respiratoria."
         )
     
-    def _predict_with_ml(self, user_message: str, symptoms: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-        """Use ML model with SHAP for prediction"""
+    def _predict_with_ml(self,
+                         user_message: str,
+                         symptoms: List[Dict[str, Any]],
+                         explain: bool = True) -> Optional[Dict[str, Any]]:
+        """Use ML model with SHAP for prediction (explain=False skips SHAP)"""
         try:
-            # Build symptoms string
-            symptom_names = [s.get('symptom', '') for s in symptoms]
-            symptoms_text = ', '.join(symptom_names)
-            
-            # Get patient age from context if available (default 35)
-            patient_age = 35
-            if symptoms and isinstance(symptoms[0], dict):
-                patient_age = symptoms[0].get('patient_age', 35)
+            symptom_names, patient_age = self._ml_input(symptoms)
             
             # Predict with SHAP
-            prediction = self._shap_explainer.explain_prediction(
-                symptoms_text, 
-                patient_age=patient_age
-            )
+            if explain:
+                prediction = self._shap_explainer.explain_prediction(
+                    symptom_names, 
+                    patient_age=patient_age,
+                    backend=settings.CHAT_EXPLANATION_BACKEND
+                )
+            else:
+                prediction = self._shap_explainer.predict(symptom_names, patient_age=patient_age)
             
-            # Enhance with urgency level
-            urgency_keywords = ['dificultad respiratoria', 'cianosis', 'confusion', 'shock', 'coma', 'severa', 'grave']
-            detected_text = user_message.lower()
-            has_urgency = any(kw in detected_text for kw in urgency_keywords)
+            return self._add_ml_urgency(prediction, user_message)
             
-            if has_urgency:
-                prediction['urgency_level'] = 'high'
-            elif prediction.get('confidence', 0) > 0.8:
-                prediction['urgency_level'] = 'medium'
-            else:
-                prediction['urgency_level'] = 'low'
+        except Exception as e:
+            logger.error("ML prediction error", error=str(e))
+            return None
+    
+    async def _predict_with_ml_batched(self,
+                                       user_message: str,
+                                       symptoms: List[Dict[str, Any]],
+                                       explain: bool = True) -> Optional[Dict[str, Any]]:
+        """_predict_with_ml through the shared inference batcher (one model call for concurrent requests)"""
+        try:
+            loaded = get_model_registry().get(self._model_path, self._model_kind) if self._model_path else None
+            if loaded is None:
+                return None
             
-            return prediction
+            symptom_names, patient_age = self._ml_input(symptoms)
+            prediction = await get_inference_batcher().predict(
+                loaded, symptom_names, patient_age=patient_age, explain=explain,
+                backend=settings.CHAT_EXPLANATION_BACKEND
+            )
+            return self._add_ml_urgency(prediction, user_message)
             
+        except ExecutorSaturatedError:
+            raise
         except Exception as e:
             logger.error("ML prediction error", error=str(e))
             return None
+    
+    def _predict_with_ml_batch(self,
+                               user_messages: List[str],
+                               symptoms_list: List[List[Dict[str, Any]]]) -> List[Optional[Dict[str, Any]]]:
+        """ML predictions for several messages with one batched model call (None where it fails)"""
+        try:
+            inputs = [self._ml_input(symptoms) for symptoms in symptoms_list]
+            predictions = self._shap_explainer.explain_batch(
+                [symptom_names for symptom_names, _ in inputs],
+                [patient_age for _, patient_age in inputs],
+                backend=settings.CHAT_EXPLANATION_BACKEND
+            )
+            return [
+                self._add_ml_urgency(prediction, user_message)
+                for prediction, user_message in zip(predictions, user_messages)
+            ]
+            
+        except Exception as e:
+            logger.error("ML batch prediction error", error=str(e), batch_size=len(user_messages))
+            return [None] * len(user_messages)
+    
+    def _ml_input(self, symptoms: List[Dict[str, Any]]) -> tuple:
+        """Canonical symptom names and patient age for the ML model"""
+        # The explainer builds features straight from the names (no comma-separated text)
+        symptom_names = tuple(s.get('symptom', '') for s in symptoms)
+        
+        # Get patient age from context if available (default 35)
+        patient_age = 35
+        if symptoms and isinstance(symptoms[0], dict):
+            patient_age = symptoms[0].get('patient_age', 35)
+        
+        return symptom_names, patient_age
+    
+    def _has_urgency_keywords(self, user_message: str) -> bool:
+        """Whether the message mentions a sign that makes an ML prediction urgent"""
+        detected_text = user_message.lower()
+        return any(kw in detected_text for kw in self.URGENCY_KEYWORDS)
+    
+    def _add_ml_urgency(self, prediction: Dict[str, Any], user_message: str) -> Dict[str, Any]:
+        """Enhance an ML prediction with urgency level"""
+        if self._has_urgency_keywords(user_message):
+            prediction['urgency_level'] = 'high'
+        elif prediction.get('confidence', 0) > 0.8:
+            prediction['urgency_level'] = 'medium'
+        else:
+            prediction['urgency_level'] = 'low'
+        
+        return prediction
+
+
+# Process-wide shared service instance.
+# Construction loads the ML models and parses the disease database, so it is
+# built once at startup and reused by every request. The instance is read-only
+# after construction, which makes it safe to share between concurrent requests.
+_chatbot_service: Optional[EnhancedChatbotService] = None
+_chatbot_service_lock = threading.Lock()
+
+
+def init_chatbot_service() -> EnhancedChatbotService:
+    """Build the shared chatbot service if it does not exist yet"""
+    global _chatbot_service
+
+    with _chatbot_service_lock:
+        if _chatbot_service is None:
+            _chatbot_service = EnhancedChatbotService()
+            logger.info("chatbot_service_initialized", use_ml=_chatbot_service._use_ml)
+        return _chatbot_service
+
+
+def get_chatbot_service() -> EnhancedChatbotService:
+    """Get the shared chatbot service instance (FastAPI dependency)"""
+    service = _chatbot_service
+    if service is None:
+        service = init_chatbot_service()
+    return service
+
+
+def reload_chatbot_service() -> EnhancedChatbotService:
+    """
+    Rebuild the shared chatbot service and swap it in
+
+    The new instance is fully built before the swap, so requests never see a
+    half-loaded service; in-flight requests finish on the instance they hold.
+    """
+    global _chatbot_service
+
+    new_service = EnhancedChatbotService()
+    with _chatbot_service_lock:
+        _chatbot_service = new_service
+
+    # Process workers hold a copy of the old service
+    restart_process_executors()
+
+    logger.info("chatbot_service_reloaded", use_ml=new_service._use_ml)
+    return new_service
+
 
+def _call_shared_service(method_name: str, args: tuple) -> Any:
+    """Process-pool entry point: call a method of the worker's shared service"""
+    return getattr(get_chatbot_service(), method_name)(*args)
@@ -0,0 +1,95 @@
+"""
+Deferred ML explanations
+
+SHAP is most of the cost of an ML prediction, and most callers only need the
+label. /v1/ml-analyze answers without SHAP unless the explanation is asked for
+inline, and returns an explanation ID instead; the client fetches
+/v1/ml-explanation/{explanation_id} only when it shows the explanation. The
+store keeps the inputs of each prediction (and the explanation once computed)
+in an in-process LRU with TTL, backed by Redis (core/cache.py) when enabled.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, Optional
+
+import structlog
+
+from core.cache import TieredCache
+from core.config import settings
+
+logger = structlog.get_logger()
+
+
+class ExplanationStore:
+    """Inputs and computed explanations of recent predictions, by explanation ID"""
+
+    KEY_PREFIX = 'ml_explanation:'
+
+    def __init__(self,
+                 max_entries: int = settings.EXPLANATION_STORE_SIZE,
+                 ttl: int = settings.EXPLANATION_TTL,
+                 use_redis: bool = settings.EXPLANATION_STORE_REDIS):
+        """
+        Args:
+            max_entries: Entries kept in memory before the least recent is evicted
+            ttl: Seconds an explanation ID can be fetched
+            use_redis: Also read/write entries through core.cache
+        """
+        self._cache = TieredCache(self.KEY_PREFIX, max_entries, ttl, use_redis=use_redis)
+
+    @staticmethod
+    def make_id(model_version: str, symptoms: str, patient_age: int) -> str:
+        """Explanation ID of a prediction (identical requests share it)"""
+        digest = hashlib.sha1(f"{model_version}\x00{symptoms}\x00{patient_age}".encode('utf-8'))
+        return digest.hexdigest()[:24]
+
+    async def register(self, model_path: str, model_version: str, symptoms: str, patient_age: int) -> str:
+        """Remember a prediction so its explanation can be fetched later; returns its ID"""
+        explanation_id = self.make_id(model_version, symptoms, patient_age)
+        if await self._cache.get(explanation_id) is None:
+            await self._cache.set(explanation_id, {
+                'model_path': model_path,
+                'model_version': model_version,
+                'symptoms': symptoms,
+                'patient_age': patient_age,
+                'top_k': None,
+                'explanation': None,
+            })
+        return explanation_id
+
+    async def get(self, explanation_id: str) -> Optional[Dict[str, Any]]:
+        """Entry of an explanation ID, None if unknown or expired"""
+        entry = await self._cache.get(explanation_id)
+        return entry if isinstance(entry, dict) else None
+
+    async def save_explanation(self, explanation_id: str, entry: Dict[str, Any],
+                               top_k: int, explanation: Dict[str, Any]):
+        """Keep a computed explanation with its entry"""
+        await self._cache.set(explanation_id, {**entry, 'top_k': top_k, 'explanation': explanation})
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit/miss counters"""
+        return self._cache.stats()
+
+
+# Process-wide store shared by the ML routes
+_explanation_store: Optional[ExplanationStore] = None
+_explanation_store_lock = threading.Lock()
+
+
+def get_explanation_store() -> ExplanationStore:
+    """Get the shared explanation store (FastAPI dependency)"""
+    global _explanation_store
+
+    store = _explanation_store
+    if store is None:
+        with _explanation_store_lock:
+            if _explanation_store is None:
+                _explanation_store = ExplanationStore()
+                logger.info("explanation_store_initialized",
+                           max_entries=settings.EXPLANATION_STORE_SIZE,
+                           ttl=settings.EXPLANATION_TTL,
+                           redis=settings.EXPLANATION_STORE_REDIS)
+            store = _explanation_store
+    return store
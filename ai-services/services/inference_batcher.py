@@ -0,0 +1,343 @@
+"""
+Micro-batching of ML predictions
+
+Every /v1/ml-analyze and chat request used to make its own one-row
+predict_proba (and shap_values) call, and most of the cost of such a call is
+fixed per call: building the feature matrix, XGBoost's DMatrix set-up, the
+SHAP tree walk set-up. The batcher collects the requests that arrive within
+ML_BATCH_WINDOW_MS of each other (or until ML_BATCH_MAX_SIZE are waiting),
+runs them as one predict_batch / explain_batch on the 'ml' stage executor and
+resolves each caller's future. Requests are only batched with others for the
+same model and the same kind of call (prediction only, or explanation with
+the same top_k and backend). Batch sizes and queue latencies (submit to batch start) are
+kept as histograms.
+
+With a PredictionCache, a batch first builds its feature matrix and looks
+each row up by feature vector and model version; only the rows not cached
+(each distinct one once) go to the model.
+"""
+
+import asyncio
+import bisect
+import copy
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import structlog
+
+from core.config import settings
+from core.executors import get_executor
+from services.model_registry import LoadedModel, get_model_registry
+from services.prediction_cache import PredictionCache, get_prediction_cache
+
+logger = structlog.get_logger()
+
+# Histogram bucket upper bounds (one more bucket above the last)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+QUEUE_LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+
+
+class Histogram:
+    """Observation counts per bucket, with count, mean and max"""
+
+    def __init__(self, bounds: Sequence[float]):
+        """
+        Args:
+            bounds: Increasing bucket upper bounds (inclusive)
+        """
+        self.bounds = tuple(bounds)
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counts keyed by bucket ('<=2', ..., '>256'), with count, mean and max"""
+        with self._lock:
+            counts = list(self._counts)
+            count, total, maximum = self.count, self.total, self.max
+        labels = [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            'buckets': dict(zip(labels, counts)),
+            'count': count,
+            'mean': total / count if count else 0.0,
+            'max': maximum,
+        }
+
+
+def _run_batch(model_path: str,
+               model_kind: str,
+               symptoms_list: List[str],
+               patient_ages: List[int],
+               explain: bool,
+               top_k: Optional[int],
+               backend: Optional[str]) -> Tuple[float, List[Dict[str, Any]]]:
+    """Executor entry point: one batched call on the worker's model; returns (start time, predictions)"""
+    # Wall clock: compared with submit times taken in the event loop's process
+    started_at = time.time()
+    loaded = get_model_registry().get(model_path, model_kind)
+    if loaded is None:
+        raise RuntimeError(f"Model {model_path} could not be loaded")
+    if explain:
+        return started_at, loaded.explainer.explain_batch(symptoms_list, patient_ages, top_k=top_k, backend=backend)
+    return started_at, loaded.explainer.predict_batch(symptoms_list, patient_ages)
+
+
+def _build_batch_features(model_path: str,
+                          model_kind: str,
+                          symptoms_list: List[str],
+                          patient_ages: List[int]) -> Tuple[float, str, Any, List[str]]:
+    """Executor entry point: feature matrix of a batch; returns (start time, model version, matrix, row digests)"""
+    started_at = time.time()
+    loaded = get_model_registry().get(model_path, model_kind)
+    if loaded is None or not loaded.explainer.model:
+        raise RuntimeError(f"Model {model_path} could not be loaded")
+    X = loaded.explainer.build_features(symptoms_list, patient_ages)
+    return started_at, loaded.version, X, loaded.explainer.feature_digests(X)
+
+
+def _run_features(model_path: str,
+                  model_kind: str,
+                  model_version: str,
+                  X: Any,
+                  symptoms_list: List[str],
+                  patient_ages: List[int],
+                  explain: bool,
+                  top_k: Optional[int],
+                  backend: Optional[str]) -> Tuple[str, List[Dict[str, Any]]]:
+    """Executor entry point: one batched call on a feature matrix; returns (model version, predictions)"""
+    loaded = get_model_registry().get(model_path, model_kind)
+    if loaded is None:
+        raise RuntimeError(f"Model {model_path} could not be loaded")
+    if loaded.version != model_version:
+        # Swapped since the features were built: they may not fit the new model
+        X = loaded.explainer.build_features(symptoms_list, patient_ages)
+    if explain:
+        return loaded.version, loaded.explainer.explain_features(X, top_k=top_k, backend=backend)
+    return loaded.version, loaded.explainer.predict_features(X)
+
+
+class InferenceBatcher:
+    """Groups concurrent ML predictions into batched model calls"""
+
+    def __init__(self,
+                 window_ms: float = settings.ML_BATCH_WINDOW_MS,
+                 max_batch_size: int = settings.ML_BATCH_MAX_SIZE,
+                 stage: str = 'ml',
+                 cache: Optional[PredictionCache] = None):
+        """
+        Args:
+            window_ms: How long the first request of a batch waits for others
+            max_batch_size: Requests that flush a batch at once (1 disables batching)
+            stage: Executor stage the batched calls run on
+            cache: Results cache by feature vector (None: every request calls the model)
+        """
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.stage = stage
+        self.cache = cache
+
+        # Event-loop state: only touched from the loop that submits
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[tuple, List[tuple]] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._failed_batches = 0
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self._queue_latency = Histogram(QUEUE_LATENCY_BUCKETS_MS)
+
+    async def predict(self,
+                      loaded: LoadedModel,
+                      symptoms: Union[str, Sequence[str]],
+                      patient_age: int = 35,
+                      explain: bool = False,
+                      top_k: int = 10,
+                      backend: str = 'shap') -> Dict[str, Any]:
+        """
+        Prediction of one case, made in a batch with concurrent requests
+
+        Args:
+            loaded: Registry model to predict with
+            symptoms: Comma-separated symptoms or canonical symptom names
+            patient_age: Patient age
+            explain: Include the SHAP explanation (explain_prediction output)
+            top_k: Factors per explanation
+            backend: How the explanation is computed (SHAPDiseaseExplainer.EXPLANATION_BACKENDS)
+
+        Returns:
+            The dict predict (or explain_prediction with explain) returns
+
+        Raises:
+            ExecutorSaturatedError: the ML executor rejected the batch
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Timers and futures belong to one loop (tests run one per test)
+            self._loop = loop
+            self._pending = {}
+            self._timers = {}
+
+        key = (loaded.path, loaded.kind, explain, top_k if explain else None, backend if explain else None)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((symptoms, patient_age, future, time.time()))
+        with self._lock:
+            self._requests += 1
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key: tuple):
+        """Start the batched call of everything pending under key"""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if not batch:
+            return
+        task = self._loop.create_task(self._run(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: tuple, batch: List[tuple]):
+        model_path, model_kind, explain, top_k, backend = key
+        self._batch_sizes.observe(len(batch))
+        try:
+            if self.cache is None:
+                started_at, predictions = await get_executor(self.stage).run(
+                    _run_batch,
+                    model_path,
+                    model_kind,
+                    [symptoms for symptoms, _, _, _ in batch],
+                    [patient_age for _, patient_age, _, _ in batch],
+                    explain,
+                    top_k,
+                    backend
+                )
+                for entry, prediction in zip(batch, predictions):
+                    self._resolve(entry, started_at, prediction)
+            else:
+                await self._run_cached(key, batch)
+        except Exception as e:
+            with self._lock:
+                self._failed_batches += 1
+            logger.warning("ml_batch_failed", error=str(e), batch_size=len(batch))
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batches += 1
+
+    def _resolve(self, entry: tuple, started_at: float, prediction: Dict[str, Any]):
+        _, _, future, submitted_at = entry
+        self._queue_latency.observe(max(0.0, started_at - submitted_at) * 1000)
+        # A caller that gave up (cancelled) leaves a done future
+        if not future.done():
+            future.set_result(prediction)
+
+    async def _run_cached(self, key: tuple, batch: List[tuple]):
+        """Resolve cached rows as soon as they are found, then compute each distinct missing row once"""
+        model_path, model_kind, explain, top_k, backend = key
+        symptoms_list = [symptoms for symptoms, _, _, _ in batch]
+        patient_ages = [patient_age for _, patient_age, _, _ in batch]
+        executor = get_executor(self.stage)
+        started_at, version, X, digests = await executor.run(
+            _build_batch_features, model_path, model_kind, symptoms_list, patient_ages
+        )
+
+        # Rows of each distinct feature vector
+        rows_by_key: Dict[str, List[int]] = {}
+        for row, digest in enumerate(digests):
+            rows_by_key.setdefault(self.cache.make_key(version, digest, explain, top_k, backend), []).append(row)
+        cached = await asyncio.gather(*[self.cache.get(cache_key) for cache_key in rows_by_key])
+
+        missing = []
+        for cache_key, result in zip(rows_by_key, cached):
+            if result is None:
+                missing.append(cache_key)
+            else:
+                self._resolve_rows(batch, rows_by_key[cache_key], started_at, result)
+        if not missing:
+            return
+
+        rows = [rows_by_key[cache_key][0] for cache_key in missing]
+        result_version, computed = await executor.run(
+            _run_features,
+            model_path,
+            model_kind,
+            version,
+            X if len(rows) == len(digests) else X[rows],
+            [symptoms_list[row] for row in rows],
+            [patient_ages[row] for row in rows],
+            explain,
+            top_k,
+            backend
+        )
+        # Cached before callers get (and may modify) the results
+        if result_version == version:
+            await asyncio.gather(*[
+                self.cache.set(cache_key, result)
+                for cache_key, result in zip(missing, computed) if 'error' not in result
+            ])
+        for cache_key, result in zip(missing, computed):
+            self._resolve_rows(batch, rows_by_key[cache_key], started_at, result)
+
+    def _resolve_rows(self, batch: List[tuple], rows: List[int], started_at: float, result: Dict[str, Any]):
+        """Resolve rows sharing a feature vector, each with its own copy of result"""
+        self._resolve(batch[rows[0]], started_at, result)
+        for row in rows[1:]:
+            self._resolve(batch[row], started_at, copy.deepcopy(result))
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuration, counters and batch-size / queue-latency (ms) histograms"""
+        with self._lock:
+            stats = {
+                'window_ms': self.window * 1000,
+                'max_batch_size': self.max_batch_size,
+                'requests': self._requests,
+                'batches': self._batches,
+                'failed_batches': self._failed_batches,
+            }
+        stats['pending'] = sum(len(batch) for batch in list(self._pending.values()))
+        stats['batch_size'] = self._batch_sizes.snapshot()
+        stats['queue_latency_ms'] = self._queue_latency.snapshot()
+        return stats
+
+
+# Process-wide batcher shared by the ML routes and the chatbot service
+_inference_batcher: Optional[InferenceBatcher] = None
+_inference_batcher_lock = threading.Lock()
+
+
+def get_inference_batcher() -> InferenceBatcher:
+    """Get the shared inference batcher (FastAPI dependency)"""
+    global _inference_batcher
+
+    batcher = _inference_batcher
+    if batcher is None:
+        with _inference_batcher_lock:
+            if _inference_batcher is None:
+                _inference_batcher = InferenceBatcher(cache=get_prediction_cache())
+                logger.info("inference_batcher_initialized",
+                           window_ms=settings.ML_BATCH_WINDOW_MS,
+                           max_batch_size=settings.ML_BATCH_MAX_SIZE)
+            batcher = _inference_batcher
+    return batcher
@@ -0,0 +1,264 @@
+"""
+Process-wide registry of loaded ML explainers
+
+Loading a model artifact (joblib.load + building the shap.TreeExplainer) costs
+far more than a prediction, so each artifact is loaded once per process and
+shared by the ML routes and the chatbot service. The registry remembers the
+file version (mtime + size) it loaded and checks it at most every
+MODEL_RELOAD_CHECK_INTERVAL seconds; a changed file is loaded in a background
+thread and swapped in once ready. Requests never wait for a reload, and those
+already holding the previous model finish with it.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+# (kind, path) candidates in order of preference: XGBoost first (better performance),
+# memory-mapped artifacts (model_artifacts.py) before joblib ones
+DEFAULT_MODELS = (
+    ('xgboost', 'models/xgboost_model.mmap'),
+    ('xgboost', 'ai-services/models/xgboost_model.mmap'),
+    ('xgboost', 'models/xgboost_model.pkl'),
+    ('xgboost', 'ai-services/models/xgboost_model.pkl'),
+    ('random_forest', 'models/base_random_forest.pkl'),
+    ('random_forest', 'ai-services/models/base_random_forest.pkl'),
+)
+
+
+def _load_shap_explainer(path: str) -> Any:
+    from shap_explainer import SHAPDiseaseExplainer
+    return SHAPDiseaseExplainer(path)
+
+
+def _file_version(path: str) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _file_digest(path: str) -> str:
+    """Short content hash, the model version shown in metrics and cache keys"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class LoadedModel:
+    """One loaded version of a model artifact"""
+
+    def __init__(self, kind: str, path: str, explainer: Any,
+                 file_version: Tuple[int, int], version: str, load_seconds: float):
+        self.kind = kind
+        self.path = path
+        self.explainer = explainer
+        self.file_version = file_version
+        self.version = version
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'path': self.path,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'load_seconds': round(self.load_seconds, 3),
+        }
+
+
+class ModelRegistry:
+    """Loads each model artifact once and hot-swaps it when the file changes"""
+
+    def __init__(self,
+                 loader: Callable[[str], Any] = _load_shap_explainer,
+                 check_interval: float = settings.MODEL_RELOAD_CHECK_INTERVAL,
+                 background_reload: bool = True):
+        """
+        Args:
+            loader: Builds the explainer of an artifact path
+            check_interval: Seconds between file checks of a loaded model (0 checks on every get)
+            background_reload: Load changed files in a background thread (False: in the calling thread)
+        """
+        self._loader = loader
+        self.check_interval = check_interval
+        self.background_reload = background_reload
+
+        self._lock = threading.Lock()
+        self._models: Dict[str, LoadedModel] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._failed: Dict[str, Tuple[Optional[Tuple[int, int]], str]] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._loads = 0
+        self._reloads = 0
+        self._load_failures = 0
+        self._swap_listeners = []
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def add_swap_listener(self, listener: Callable[[LoadedModel, LoadedModel], None]):
+        """Call listener(previous, current) whenever a new version of a loaded model is swapped in"""
+        with self._lock:
+            self._swap_listeners.append(listener)
+
+    def get(self, path: str, kind: str = '') -> Optional[LoadedModel]:
+        """
+        Current model of an artifact, loading it on first use
+
+        Returns None if the file does not exist or fails to load (a broken
+        file is not retried until it changes).
+        """
+        key = os.path.abspath(path)
+        loaded = self._models.get(key)
+        if loaded is None:
+            with self._load_lock(key):
+                loaded = self._models.get(key)
+                if loaded is None:
+                    loaded = self._load(key, kind)
+            return loaded
+
+        self._check_for_update(key, loaded)
+        # Always the current model: a reload only replaces it once fully built
+        return self._models.get(key, loaded)
+
+    def get_first(self, candidates: Sequence[Tuple[str, str]] = DEFAULT_MODELS) -> Optional[LoadedModel]:
+        """First (kind, path) candidate that exists and loads"""
+        for kind, path in candidates:
+            if os.path.abspath(path) in self._models or os.path.exists(path):
+                loaded = self.get(path, kind)
+                if loaded is not None:
+                    return loaded
+        return None
+
+    def _check_for_update(self, key: str, loaded: LoadedModel):
+        """Start a reload if the file changed since it was loaded"""
+        now = time.monotonic()
+        if now - self._checked_at.get(key, 0.0) < self.check_interval:
+            return
+        self._checked_at[key] = now
+
+        file_version = _file_version(key)
+        # A removed file keeps serving the model already loaded
+        if file_version is None or file_version == loaded.file_version:
+            return
+        failed = self._failed.get(key)
+        if failed is not None and failed[0] == file_version:
+            return
+
+        load_lock = self._load_lock(key)
+        if not load_lock.acquire(blocking=False):
+            return  # Already reloading
+
+        if self.background_reload:
+            threading.Thread(
+                target=self._reload, args=(key, loaded.kind, load_lock),
+                name='model-reload', daemon=True
+            ).start()
+        else:
+            self._reload(key, loaded.kind, load_lock)
+
+    def _reload(self, key: str, kind: str, load_lock: threading.Lock):
+        try:
+            if self._load(key, kind) is not None:
+                with self._lock:
+                    self._reloads += 1
+        finally:
+            load_lock.release()
+
+    def _load(self, key: str, kind: str) -> Optional[LoadedModel]:
+        """Load an artifact and swap it in; None if missing or broken"""
+        file_version = _file_version(key)
+        if file_version is None:
+            return None
+        failed = self._failed.get(key)
+        if failed is not None and failed[0] == file_version:
+            return None
+
+        start = time.perf_counter()
+        try:
+            version = _file_digest(key)
+            explainer = self._loader(key)
+        except Exception as e:
+            with self._lock:
+                self._failed[key] = (file_version, str(e))
+                self._load_failures += 1
+            logger.warning("model_load_failed", path=key, error=str(e))
+            return None
+
+        loaded = LoadedModel(kind, key, explainer, file_version, version, time.perf_counter() - start)
+        with self._lock:
+            previous = self._models.get(key)
+            self._models[key] = loaded
+            self._checked_at[key] = time.monotonic()
+            self._failed.pop(key, None)
+            self._loads += 1
+
+        logger.info("model_loaded",
+                   kind=kind,
+                   path=key,
+                   version=version,
+                   previous_version=previous.version if previous else None,
+                   load_seconds=round(loaded.load_seconds, 3))
+        if previous is not None and previous.version != version:
+            for listener in list(self._swap_listeners):
+                try:
+                    listener(previous, loaded)
+                except Exception as e:
+                    logger.warning("model_swap_listener_failed", path=key, error=str(e))
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """Loaded models, failed artifacts and load counters"""
+        with self._lock:
+            return {
+                'models': [loaded.info() for loaded in self._models.values()],
+                'failed': [{'path': key, 'error': error} for key, (_, error) in self._failed.items()],
+                'loads': self._loads,
+                'reloads': self._reloads,
+                'load_failures': self._load_failures,
+            }
+
+    def clear(self):
+        """Forget every loaded model (the next get loads from disk)"""
+        with self._lock:
+            self._models.clear()
+            self._checked_at.clear()
+            self._failed.clear()
+
+
+# Process-wide registry shared by the ML routes and the chatbot service
+_model_registry: Optional[ModelRegistry] = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """Get the shared model registry"""
+    global _model_registry
+
+    registry = _model_registry
+    if registry is None:
+        with _model_registry_lock:
+            if _model_registry is None:
+                _model_registry = ModelRegistry()
+            registry = _model_registry
+    return registry
+
+
+def get_default_model() -> Optional[LoadedModel]:
+    """XGBoost model if available, otherwise Random Forest; None if neither loads"""
+    return get_model_registry().get_first(DEFAULT_MODELS)
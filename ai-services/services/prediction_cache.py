@@ -0,0 +1,111 @@
+"""
+Memoization of ML predictions and SHAP explanations by feature vector
+
+Many different messages reduce to the same symptom set, and so to the same
+model input: the chat analysis cache (services/analysis_cache.py) keys on the
+message text and misses them, although the SHAP call they make is by far the
+most expensive step of a request. This cache keys each result on the model
+version and a hash of the row's feature vector
+(SHAPDiseaseExplainer.feature_digests). Results live in an in-process LRU
+and, when enabled, in Redis (core/cache.py) shared by every worker.
+
+The model version is part of every key, so a new model never reads results
+of the previous one; when the model registry swaps a version in, the entries
+of the version it replaced are dropped from memory (Redis ones expire).
+"""
+
+import copy
+import threading
+from typing import Any, Dict, Optional
+
+import structlog
+
+from core.cache import TieredCache
+from core.config import settings
+from services.model_registry import LoadedModel, get_model_registry
+
+logger = structlog.get_logger()
+
+
+class PredictionCache:
+    """Two-tier cache of prediction / explanation results (LRU + optional Redis) with hit/miss counters"""
+
+    KEY_PREFIX = 'ml_prediction:'
+
+    def __init__(self,
+                 max_entries: int = settings.PREDICTION_CACHE_SIZE,
+                 ttl: int = settings.PREDICTION_CACHE_TTL,
+                 use_redis: bool = settings.PREDICTION_CACHE_REDIS):
+        """
+        Args:
+            max_entries: Results kept in memory before the least recent is evicted
+            ttl: Seconds a result is reused
+            use_redis: Also read/write results through core.cache
+        """
+        self._cache = TieredCache(self.KEY_PREFIX, max_entries, ttl, use_redis=use_redis)
+        self._lock = threading.Lock()
+        self._invalidations = 0
+
+    @staticmethod
+    def make_key(model_version: str,
+                 feature_digest: str,
+                 explain: bool,
+                 top_k: Optional[int],
+                 backend: Optional[str] = 'shap') -> str:
+        """Key of one row's result: model version first, so a version's entries share a prefix"""
+        kind = f"{backend}{top_k}" if explain else 'predict'
+        return f"{model_version}:{kind}:{feature_digest}"
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result (a private copy), None on a miss"""
+        result = await self._cache.get(key)
+        return copy.deepcopy(result) if isinstance(result, dict) else None
+
+    async def set(self, key: str, result: Dict[str, Any]):
+        """Cache a result (callers keep their own copy)"""
+        await self._cache.set(key, copy.deepcopy(result))
+
+    def invalidate_version(self, model_version: str):
+        """Drop the in-memory results of a model version"""
+        self._cache.clear_local(f"{model_version}:")
+        with self._lock:
+            self._invalidations += 1
+
+    def on_model_swap(self, previous: LoadedModel, current: LoadedModel):
+        """Model registry swap listener"""
+        self.invalidate_version(previous.version)
+        logger.info("prediction_cache_invalidated",
+                   path=current.path,
+                   previous_version=previous.version,
+                   version=current.version)
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count, hit/miss counters and version invalidations"""
+        stats = self._cache.stats()
+        with self._lock:
+            stats['invalidations'] = self._invalidations
+        return stats
+
+
+# Process-wide cache shared by the inference batcher
+_prediction_cache: Optional[PredictionCache] = None
+_prediction_cache_lock = threading.Lock()
+
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Get the shared prediction cache, None when PREDICTION_CACHE_SIZE is 0"""
+    global _prediction_cache
+
+    if settings.PREDICTION_CACHE_SIZE <= 0:
+        return None
+    cache = _prediction_cache
+    if cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache()
+                get_model_registry().add_swap_listener(_prediction_cache.on_model_swap)
+                logger.info("prediction_cache_initialized",
+                           max_entries=settings.PREDICTION_CACHE_SIZE,
+                           redis=settings.PREDICTION_CACHE_REDIS)
+            cache = _prediction_cache
+    return cache
@@ -0,0 +1,112 @@
+"""
+Per-session chat analysis state
+
+Keeps what a session has already extracted (symptoms, tokens, last
+classification) so a new turn only processes its own message. States live in
+an in-process LRU with TTL; when enabled, Redis (core/cache.py) backs them so
+other workers can pick a session up.
+
+A turn reads, updates and saves its session's state; lock(session_id) runs
+the turns of one session one at a time, so concurrent turns (a client retry,
+two tabs) do not drop each other's symptoms. The lock is per worker: with
+Redis, turns of one session sent to two workers at once are not serialized.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import structlog
+
+from core.cache import TieredCache
+from core.config import settings
+
+logger = structlog.get_logger()
+
+
+class SessionStore:
+    """In-process LRU + TTL store of session states, with an optional Redis tier"""
+
+    KEY_PREFIX = 'chat_session:'
+
+    def __init__(self,
+                 max_sessions: int = settings.SESSION_CACHE_SIZE,
+                 ttl: int = settings.SESSION_TTL,
+                 use_redis: bool = settings.SESSION_STORE_REDIS):
+        """
+        Args:
+            max_sessions: Sessions kept in memory before the least recent is evicted
+            ttl: Seconds a session lives without activity
+            use_redis: Also read/write states through core.cache
+        """
+        self._cache = TieredCache(self.KEY_PREFIX, max_sessions, ttl, use_redis=use_redis)
+        # session_id -> (lock, turns holding or waiting for it); dropped when unused
+        self._locks: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    @property
+    def max_sessions(self) -> int:
+        return self._cache.max_entries
+
+    @property
+    def ttl(self) -> int:
+        return self._cache.ttl
+
+    @property
+    def use_redis(self) -> bool:
+        return self._cache.use_redis
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """State of a session, None if unknown or expired"""
+        state = await self._cache.get(session_id)
+        return state if isinstance(state, dict) else None
+
+    async def save(self, session_id: str, state: Dict[str, Any]):
+        """Store the state of a session (refreshes its TTL)"""
+        await self._cache.set(session_id, state)
+
+    async def delete(self, session_id: str):
+        """Forget a session"""
+        await self._cache.delete(session_id)
+
+    @asynccontextmanager
+    async def lock(self, session_id: str) -> AsyncIterator[None]:
+        """Hold the session for one get -> process -> save turn (event-loop only)"""
+        lock, users = self._locks.get(session_id, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[session_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[session_id]
+            if users == 1:
+                del self._locks[session_id]
+            else:
+                self._locks[session_id] = (lock, users - 1)
+
+
+# Process-wide store shared by the chat routes
+_session_store: Optional[SessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """Get the shared session store (FastAPI dependency)"""
+    global _session_store
+
+    store = _session_store
+    if store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = SessionStore()
+                logger.info("session_store_initialized",
+                           max_sessions=_session_store.max_sessions,
+                           ttl=_session_store.ttl,
+                           redis=_session_store.use_redis)
+            store = _session_store
+    return store
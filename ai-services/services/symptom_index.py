@@ -0,0 +1,122 @@
+"""
+Inverted symptom index over the disease database
+
+Answers "which diseases list a symptom that contains this phrase, or is
+contained in it" without scanning every symptom key. Disease sets are
+returned as bitsets (bit i set = disease id i).
+"""
+
+from typing import Dict, List, Optional
+
+from services.symptom_matcher import MultiPatternMatcher
+
+
+def bitset_members(bits: int) -> List[int]:
+    """Set bit positions of a bitset, ascending"""
+    members = []
+    while bits:
+        lowest = bits & -bits
+        members.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return members
+
+
+class SymptomIndex:
+    """
+    N-gram index over the symptom keys of build_disease_database output
+
+    Keys containing the query come from intersecting the posting bitsets of
+    the query's n-grams (then a substring check on the few candidates); keys
+    contained in the query come from one Aho-Corasick scan of the query.
+    """
+
+    NGRAM_SIZE = 3
+
+    def __init__(self, symptom_to_diseases: Dict[str, List[int]]):
+        """
+        Build the index
+
+        Args:
+            symptom_to_diseases: Symptom -> disease ids, as in build_disease_database
+        """
+        # Keys compare lowercased; keys that collide after lowercasing are merged
+        merged: Dict[str, int] = {}
+        for symptom, disease_ids in symptom_to_diseases.items():
+            key = symptom.lower()
+            bits = merged.get(key, 0)
+            for disease_id in disease_ids:
+                bits |= 1 << disease_id
+            merged[key] = bits
+
+        self._keys = list(merged)
+        self._positions = {key: position for position, key in enumerate(self._keys)}
+        self._key_diseases = list(merged.values())
+        self._all_keys = (1 << len(self._keys)) - 1
+
+        self.all_diseases = 0
+        for bits in self._key_diseases:
+            self.all_diseases |= bits
+
+        # n-gram -> bitset of key positions, for every n up to NGRAM_SIZE so
+        # short queries are answered straight from their posting
+        self._ngrams: Dict[str, int] = {}
+        for position, key in enumerate(self._keys):
+            key_bit = 1 << position
+            for size in range(1, self.NGRAM_SIZE + 1):
+                for start in range(len(key) - size + 1):
+                    gram = key[start:start + size]
+                    self._ngrams[gram] = self._ngrams.get(gram, 0) | key_bit
+
+        self._key_matcher = MultiPatternMatcher(
+            (key, 'symptom_key', position) for position, key in enumerate(self._keys)
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _keys_containing(self, text: str) -> int:
+        """Bitset of key positions whose key contains text"""
+        if not text:
+            return self._all_keys
+        if len(text) <= self.NGRAM_SIZE:
+            return self._ngrams.get(text, 0)
+
+        size = self.NGRAM_SIZE
+        candidates = self._all_keys
+        for start in range(len(text) - size + 1):
+            candidates &= self._ngrams.get(text[start:start + size], 0)
+            if not candidates:
+                return 0
+
+        # Shared n-grams do not guarantee a substring; confirm the survivors
+        keys = self._keys
+        for position in bitset_members(candidates):
+            if text not in keys[position]:
+                candidates ^= 1 << position
+        return candidates
+
+    def key_position(self, symptom: str) -> Optional[int]:
+        """Column of a symptom key (compared lowercased), None if unknown"""
+        return self._positions.get(symptom.lower())
+
+    def match_keys(self, symptom: str) -> int:
+        """Bitset of key positions whose key contains symptom or is contained in it"""
+        text = symptom.lower()
+        keys = self._keys_containing(text)
+        for match in self._key_matcher.scan(text):
+            keys |= 1 << match.value
+        return keys
+
+    def lookup(self, symptom: str) -> int:
+        """
+        Diseases with a symptom key that contains symptom or is contained in it
+
+        Returns:
+            Bitset of disease ids (0 when nothing matches)
+        """
+        key_diseases = self._key_diseases
+
+        diseases = 0
+        for position in bitset_members(self.match_keys(symptom)):
+            diseases |= key_diseases[position]
+        return diseases
@@ -0,0 +1,164 @@
+"""
+Multi-pattern matcher (Aho-Corasick) for chat message scanning
+
+Finds every occurrence of every pattern in one pass over the text, so the cost
+grows with message length instead of with the size of the lexicon.
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+
+
+class PatternMatch(NamedTuple):
+    """One pattern occurrence in the scanned text"""
+    start: int
+    end: int
+    pattern: str
+    pattern_class: str
+    value: Any
+
+
+def is_word_char(char: str) -> bool:
+    """Same notion of word character as the regex \\w class"""
+    return char.isalnum() or char == '_'
+
+
+class MultiPatternMatcher:
+    """
+    Aho-Corasick automaton over (pattern, class, value) entries
+
+    The same pattern string may be registered under several classes
+    (e.g. 'tos' as a symptom word and as a disease term); each registration
+    produces its own PatternMatch. Matching is case-sensitive: callers pass
+    already-lowercased text.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str, Any]]):
+        """
+        Build the automaton
+
+        Args:
+            entries: (pattern, pattern_class, value) triples
+        """
+        self._payloads: List[List[Tuple[str, str, Any]]] = []
+        pattern_ids: Dict[str, int] = {}
+
+        goto: List[Dict[str, int]] = [{}]
+        terminal: List[List[int]] = [[]]
+
+        for pattern, pattern_class, value in entries:
+            if not pattern:
+                continue
+
+            if pattern not in pattern_ids:
+                pattern_ids[pattern] = len(self._payloads)
+                self._payloads.append([])
+
+                node = 0
+                for char in pattern:
+                    next_node = goto[node].get(char)
+                    if next_node is None:
+                        next_node = len(goto)
+                        goto[node][char] = next_node
+                        goto.append({})
+                        terminal.append([])
+                    node = next_node
+                terminal[node].append(pattern_ids[pattern])
+
+            self._payloads[pattern_ids[pattern]].append((pattern, pattern_class, value))
+
+        self._build_automaton(goto, terminal)
+        self.pattern_count = len(self._payloads)
+
+    def _build_automaton(self, goto: List[Dict[str, int]], terminal: List[List[int]]):
+        """Compute failure links and flatten them into a dense transition table"""
+        fail = [0] * len(goto)
+        outputs: List[Tuple[int, ...]] = [tuple()] * len(goto)
+        outputs[0] = tuple(terminal[0])
+
+        # Breadth-first so every node's failure target is finished before it
+        order = []
+        queue = deque()
+        for child in goto[0].values():
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            order.append(node)
+            outputs[node] = tuple(terminal[node]) + outputs[fail[node]]
+            for char, child in goto[node].items():
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                queue.append(child)
+
+        # Dense table: each node inherits its failure target's transitions, so a
+        # scan is one dict lookup per character. Characters outside the pattern
+        # alphabet fall back to the root.
+        delta: List[Dict[str, int]] = [goto[0]] * len(goto)
+        for node in order:
+            transitions = dict(delta[fail[node]])
+            transitions.update(goto[node])
+            delta[node] = transitions
+
+        # Per node, every (length, pattern, class, value) it reports
+        self._delta = delta
+        self._outputs = [
+            tuple(
+                (len(pattern), pattern, pattern_class, value)
+                for pattern_id in node_outputs
+                for pattern, pattern_class, value in self._payloads[pattern_id]
+            )
+            for node_outputs in outputs
+        ]
+
+    def scan(self, text: str) -> List[PatternMatch]:
+        """
+        Find all (possibly overlapping) pattern occurrences in text
+
+        Returns:
+            Matches ordered by end position, then longest pattern first
+        """
+        delta = self._delta
+        outputs = self._outputs
+        hits = []
+
+        node = 0
+        for end, char in enumerate(text, 1):
+            node = delta[node].get(char, 0)
+            if outputs[node]:
+                hits.append((end, node))
+
+        return [
+            PatternMatch(end - length, end, pattern, pattern_class, value)
+            for end, node in hits
+            for length, pattern, pattern_class, value in outputs[node]
+        ]
+
+
+class MessageMatches:
+    """Scan result grouped by pattern class"""
+
+    def __init__(self, text: str, matches: List[PatternMatch]):
+        self.text = text
+        self.matches = matches
+        self._by_class: Dict[str, List[PatternMatch]] = {}
+        for match in matches:
+            self._by_class.setdefault(match.pattern_class, []).append(match)
+
+    def of_class(self, pattern_class: str) -> List[PatternMatch]:
+        """Matches of one class, in scan order"""
+        return self._by_class.get(pattern_class, [])
+
+    def has(self, pattern_class: str) -> bool:
+        """Whether any pattern of the class occurs"""
+        return pattern_class in self._by_class
+
+    def words_of_class(self, pattern_class: str) -> List[PatternMatch]:
+        """Matches of one class that are whole words (bounded by non-word characters)"""
+        text = self.text
+        return [
+            match for match in self.of_class(pattern_class)
+            if (match.start == 0 or not is_word_char(text[match.start - 1]))
+            and (match.end == len(text) or not is_word_char(text[match.end]))
+        ]
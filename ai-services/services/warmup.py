@@ -0,0 +1,170 @@
+"""
+Startup warm-up of the analysis pipeline
+
+The first requests after a start pay for everything that is built lazily:
+the model registry loading the artifact, the chatbot service parsing the
+disease database and building its index, executor threads (or processes)
+starting, the first XGBoost / SHAP calls and the per-class boosters of the
+native explanation backend. Warm-up runs a representative set of synthetic
+symptom messages through every stage once, before the service reports ready
+on /api/v1/health, and logs how long each stage took.
+
+A failing stage is logged and recorded but does not block readiness: the
+service still answers (pattern matching without a model, for instance).
+"""
+
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import structlog
+
+from core.config import settings
+
+logger = structlog.get_logger()
+
+# Synthetic messages covering the main presentations (no patient data)
+WARMUP_MESSAGES = (
+    "Tengo fiebre alta, tos con flema y dolor en el pecho",
+    "Desde ayer tengo tos seca, fiebre y perdí el olfato",
+    "Me falta el aire y tengo sibilancias por las noches",
+    "Estornudos, congestión nasal y dolor de garganta",
+    "Dolor de cabeza, dolores musculares y fatiga extrema",
+    "Tos crónica con mucosidad y opresión en el pecho",
+    "Tengo escalofríos, sudoración y dificultad para respirar",
+    "Dolor de garganta con fiebre y ganglios inflamados",
+)
+
+
+class Warmup:
+    """Runs the warm-up stages once and keeps their timings for the health check"""
+
+    def __init__(self, messages: Sequence[str] = WARMUP_MESSAGES):
+        self.messages = list(messages)
+        self.ready = False
+        self._started_at: Optional[str] = None
+        self._seconds: Optional[float] = None
+        self._stages: Dict[str, float] = {}
+        self._failed: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        """Run the warm-up in the background of the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def run(self) -> Dict[str, Any]:
+        """Run every stage in order, then mark the service ready"""
+        self._started_at = datetime.now().isoformat()
+        start = time.perf_counter()
+
+        loaded = await self._stage('models', self._load_model)
+        service = await self._stage('disease_index', self._load_service)
+
+        if service is not None:
+            tokens = await self._stage('tokenize', self._gather, [
+                service._run_stage('classification', 'tokenize_spanish_text', message)
+                for message in self.messages
+            ])
+            if tokens is not None:
+                symptoms = await self._stage('extract', self._gather, [
+                    service._run_stage('classification', 'extract_symptom_keywords', message, message_tokens)
+                    for message, message_tokens in zip(self.messages, tokens)
+                ])
+                if symptoms is not None:
+                    await self._stage('classify', self._gather, [
+                        service._run_stage('classification', 'classify_disease', message, message_symptoms, message_tokens)
+                        for message, message_symptoms, message_tokens in zip(self.messages, symptoms, tokens)
+                    ])
+                    inputs = [service._ml_input(message_symptoms) for message_symptoms in symptoms if message_symptoms]
+                    if loaded is not None and inputs:
+                        await self._warm_model(loaded, inputs)
+
+        self._seconds = time.perf_counter() - start
+        self.ready = True
+        logger.info("warmup_completed",
+                   seconds=round(self._seconds, 3),
+                   stages=self._stages,
+                   failed=list(self._failed))
+        return self.status()
+
+    async def _warm_model(self, loaded, inputs: List[tuple]):
+        """Predictions, then explanations with every configured backend, through the shared batcher"""
+        from services.inference_batcher import get_inference_batcher
+
+        batcher = get_inference_batcher()
+        await self._stage('predict', self._gather, [
+            batcher.predict(loaded, symptom_names, patient_age=patient_age)
+            for symptom_names, patient_age in inputs
+        ])
+
+        backends = dict.fromkeys((settings.CHAT_EXPLANATION_BACKEND, settings.ML_ANALYZE_EXPLANATION_BACKEND, 'shap'))
+        for backend in backends:
+            await self._stage(f'explain_{backend}', self._gather, [
+                batcher.predict(loaded, symptom_names, patient_age=patient_age, explain=True, backend=backend)
+                for symptom_names, patient_age in inputs
+            ])
+
+    async def _stage(self, name: str, func, *args) -> Any:
+        """Run and time one stage; None if it fails"""
+        start = time.perf_counter()
+        try:
+            result = await func(*args)
+        except Exception as e:
+            self._failed[name] = str(e)
+            logger.warning("warmup_stage_failed", stage=name, error=str(e))
+            return None
+        seconds = time.perf_counter() - start
+        self._stages[name] = round(seconds, 4)
+        logger.info("warmup_stage_completed", stage=name, seconds=round(seconds, 4))
+        return result
+
+    @staticmethod
+    async def _gather(calls: list) -> list:
+        """Concurrent calls, so every executor worker gets one"""
+        return await asyncio.gather(*calls)
+
+    @staticmethod
+    async def _load_model():
+        """Registry model shared by the ML routes and the chatbot service"""
+        from services.model_registry import get_default_model
+
+        return await asyncio.to_thread(get_default_model)
+
+    @staticmethod
+    async def _load_service():
+        """Shared chatbot service: disease database, symptom index and scoring matrices"""
+        from services.enhanced_chatbot_service import init_chatbot_service
+
+        return await asyncio.to_thread(init_chatbot_service)
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness, per-stage seconds and failed stages"""
+        return {
+            'ready': self.ready,
+            'started_at': self._started_at,
+            'seconds': round(self._seconds, 3) if self._seconds is not None else None,
+            'stages': dict(self._stages),
+            'failed': dict(self._failed),
+        }
+
+
+# Process-wide warm-up reported by the health check
+_warmup: Optional[Warmup] = None
+_warmup_lock = threading.Lock()
+
+
+def get_warmup() -> Warmup:
+    """Get the process warm-up"""
+    global _warmup
+
+    warmup = _warmup
+    if warmup is None:
+        with _warmup_lock:
+            if _warmup is None:
+                _warmup = Warmup()
+            warmup = _warmup
+    return warmup
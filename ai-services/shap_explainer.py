@@ -5,16 +5,30 @@ Provides explainability for ML predictions using SHAP values.
 Shows which symptoms contribute most to disease diagnosis.
 """
 
+import hashlib
 import numpy as np
 import shap
 import joblib
-from typing import Dict, List, Any
+import xgboost as xgb
+from scipy import sparse
+from typing import Dict, List, Any, Sequence, Union
 import json
 
+# A case: comma-separated symptoms, or a sequence of canonical symptom names
+Symptoms = Union[str, Sequence[str]]
+
 
 class SHAPDiseaseExplainer:
     """SHAP-based explainer for disease classification"""
     
+    # Rows per shap_values call in explain_batch
+    SHAP_CHUNK_SIZE = 256
+    
+    # How explanation contributions are computed (see _contribution_rows):
+    # 'shap' shap.TreeExplainer, 'native' XGBoost's own TreeSHAP on the
+    # predicted class only (same values), 'approximate' Saabas path attributions
+    EXPLANATION_BACKENDS = ('shap', 'native', 'approximate')
+    
     def __init__(self, model_path: str = None):
         """
         Initialize SHAP explainer
@@ -27,135 +41,448 @@ class SHAPDiseaseExplainer:
         self.vectorizer = None
         self.feature_engineer = None
         self.explainer = None
+        self.sparse_features = False
+        self.feature_names = None
+        self._class_boosters = None
+        self._symptom_map = None
         
         if model_path:
             self.load_model(model_path)
     
     def load_model(self, model_path: str):
-        """Load trained model"""
+        """Load trained model (joblib artifact or memory-mapped artifact, see model_artifacts.py)"""
         print(f"Loading model from {model_path}...")
+        self._class_boosters = None
+        self._symptom_map = None
+        
+        from model_artifacts import is_mmap_artifact, load_explainer_state, read_mmap_artifact
+        if is_mmap_artifact(model_path):
+            load_explainer_state(self, read_mmap_artifact(model_path))
+            print("Model loaded successfully (memory-mapped)")
+            return
         
         data = joblib.load(model_path)
         self.model = data['model']
         self.label_encoder = data['label_encoder']
         self.vectorizer = data['vectorizer']
+        # Models trained on CSR input read absent entries as missing values, not zeros
+        self.sparse_features = data.get('sparse_features', False)
         
-        try:
-            self.feature_engineer = data.get('feature_engineer')
-        except:
-            # Fallback for models without feature engineer
+        # Models saved by train_xgboost_model.py do not pickle the feature
+        # engineer; rebuild it when the model expects the engineered columns
+        self.feature_engineer = data.get('feature_engineer')
+        if self.feature_engineer is None and self._expects_engineered_features():
             from train_xgboost_model import AdvancedFeatureEngineering
             self.feature_engineer = AdvancedFeatureEngineering()
         
+        self.feature_names = np.asarray(
+            list(self.vectorizer.get_feature_names_out()) +
+            (self.feature_engineer.get_feature_names() if self.feature_engineer is not None else []),
+            dtype=str
+        )
+        
         # Create SHAP explainer
         self.explainer = shap.TreeExplainer(self.model)
         
         print("Model loaded successfully")
     
-    def explain_prediction(self, 
-                          symptoms: str, 
-                          patient_age: int = 35,
-                          top_k: int = 10) -> Dict[str, Any]:
+    def _expects_engineered_features(self) -> bool:
+        """Whether the model was trained on more columns than the vectorizer produces"""
+        n_features = getattr(self.model, 'n_features_in_', None)
+        return n_features is not None and n_features > len(self.vectorizer.vocabulary_)
+    
+    def build_features(self, symptoms_list: List[Symptoms], patient_ages: List[int]):
         """
-        Explain model prediction for given symptoms
+        Feature matrix (vectorizer counts + engineered features), one row per case
+        
+        CSR for models trained on sparse input, dense for the others: XGBoost
+        treats entries absent from a sparse matrix as missing, so a model
+        trained on dense zeros must keep getting dense zeros.
+        
+        A case is either comma-separated symptoms or a sequence of canonical
+        symptom names. When every case is a sequence of names, the rows are
+        assembled from the model's SymptomFeatureMap instead of vectorizing
+        and splitting the joined text (same matrix).
+        """
+        if symptoms_list and not any(isinstance(symptoms, str) for symptoms in symptoms_list):
+            symptom_map = self.symptom_feature_map()
+            if symptom_map.supported:
+                return symptom_map.transform(symptoms_list, patient_ages)
+        symptoms_list = [symptoms if isinstance(symptoms, str) else ', '.join(symptoms) for symptoms in symptoms_list]
+        
+        X_symptom = self.vectorizer.transform(symptoms_list)
+        if self.feature_engineer is None:
+            # Basic format (Random Forest)
+            return X_symptom.tocsr() if self.sparse_features else X_symptom.toarray()
+        
+        if len(symptoms_list) > 1 and hasattr(self.feature_engineer, 'create_features_batch'):
+            X_engineered = self.feature_engineer.create_features_batch(symptoms_list, patient_ages)
+        else:
+            X_engineered = np.array([
+                self.feature_engineer.create_features(symptoms, age)
+                for symptoms, age in zip(symptoms_list, patient_ages)
+            ])
+        if self.sparse_features:
+            return self._append_dense_columns(X_symptom.tocsr(), X_engineered)
+        return np.hstack([X_symptom.toarray(), X_engineered])
+    
+    def symptom_feature_map(self):
+        """SymptomFeatureMap of the loaded model, built on first use"""
+        symptom_map = self._symptom_map
+        if symptom_map is None:
+            from symptom_features import SymptomFeatureMap
+            symptom_map = SymptomFeatureMap(self.vectorizer, self.feature_engineer, self.sparse_features)
+            self._symptom_map = symptom_map
+        return symptom_map
+    
+    @staticmethod
+    def _append_dense_columns(X: sparse.csr_matrix, dense: np.ndarray) -> sparse.csr_matrix:
+        """
+        Same matrix as sparse.hstack([X, csr_matrix(dense)], format='csr')
+        
+        Builds data/indices/indptr directly; sparse.hstack costs ~0.3 ms even
+        for the single row of a request.
+        """
+        n_rows = dense.shape[0]
+        rows, cols = np.nonzero(dense)
+        dense_counts = np.bincount(rows, minlength=n_rows)
+        sparse_counts = np.diff(X.indptr)
+        
+        indptr = np.zeros(n_rows + 1, dtype=X.indptr.dtype)
+        np.cumsum(sparse_counts + dense_counts, out=indptr[1:])
+        data = np.empty(indptr[-1], dtype=np.result_type(X.dtype, dense.dtype))
+        indices = np.empty(indptr[-1], dtype=X.indices.dtype)
+        
+        # Each row keeps its sparse entries first, then its non-zero dense columns
+        sparse_pos = np.arange(X.nnz) + np.repeat(indptr[:-1] - X.indptr[:-1], sparse_counts)
+        data[sparse_pos] = X.data
+        indices[sparse_pos] = X.indices
+        rank_in_row = np.arange(len(rows)) - np.repeat(np.cumsum(dense_counts) - dense_counts, dense_counts)
+        dense_pos = np.repeat(indptr[:-1] + sparse_counts, dense_counts) + rank_in_row
+        data[dense_pos] = dense[rows, cols]
+        indices[dense_pos] = cols + X.shape[1]
+        
+        return sparse.csr_matrix((data, indices, indptr), shape=(n_rows, X.shape[1] + dense.shape[1]))
+    
+    @staticmethod
+    def feature_digests(X) -> List[str]:
+        """
+        Stable hash of each row of a feature matrix (prediction cache keys)
+        
+        Hashes the non-zero columns and their values, so the same case gets
+        the same digest from a CSR or a dense matrix and in every process.
+        """
+        X = sparse.csr_matrix(X)
+        if not X.has_sorted_indices:
+            X = X.sorted_indices()
+        digests = []
+        for row in range(X.shape[0]):
+            start, end = X.indptr[row], X.indptr[row + 1]
+            values = X.data[start:end]
+            keep = values != 0
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(np.int64(X.shape[1]).tobytes())
+            digest.update(X.indices[start:end][keep].astype(np.int64).tobytes())
+            digest.update(values[keep].astype(np.float64).tobytes())
+            digests.append(digest.hexdigest())
+        return digests
+    
+    @staticmethod
+    def _predicted_class_shap_values(shap_values, prediction_indices: np.ndarray) -> np.ndarray:
+        """(n_samples, n_features) SHAP values of each row's predicted class, whatever layout shap returned"""
+        rows = np.arange(len(prediction_indices))
+        if isinstance(shap_values, list):
+            # Multi-class (shap < 0.45): one (n_samples, n_features) array per class
+            return np.asarray(shap_values)[prediction_indices, rows]
+        if len(shap_values.shape) > 2:
+            # Multi-class as (n_samples, n_features, n_classes)
+            return shap_values[rows, :, prediction_indices]
+        return shap_values
+    
+    def _contribution_rows(self, X, prediction_indices: np.ndarray, backend: str = 'shap') -> np.ndarray:
+        """(n_samples, n_features) contributions to each row's predicted class, computed by backend"""
+        if backend not in self.EXPLANATION_BACKENDS:
+            raise ValueError(f"Unknown explanation backend '{backend}', expected one of {self.EXPLANATION_BACKENDS}")
+        if backend != 'shap' and isinstance(self.model, xgb.XGBClassifier):
+            return self._booster_contributions(X, prediction_indices, approximate=backend == 'approximate')
+        # Other models: shap's own TreeSHAP (approximate: its Saabas attributions)
+        shap_values = self.explainer.shap_values(X, approximate=backend == 'approximate')
+        return self._predicted_class_shap_values(shap_values, prediction_indices)
+    
+    def _booster_contributions(self, X, prediction_indices: np.ndarray, approximate: bool) -> np.ndarray:
+        """
+        Predicted-class contributions from XGBoost's pred_contribs
+        
+        shap.TreeExplainer reads the same values from pred_contribs on the
+        whole booster, which computes them for every class. Rows are grouped
+        by predicted class and sent to a booster holding only that class's
+        trees: 1/n_classes of the work, the same values.
+        """
+        boosters = self._get_class_boosters()
+        if len(boosters) == 1:
+            # Binary model: one set of trees, explained like shap does (positive class)
+            return boosters[0].predict(xgb.DMatrix(X), pred_contribs=True, approx_contribs=approximate)[:, :-1]
+        
+        rows = np.empty(X.shape, dtype=np.float32)
+        for class_index in np.unique(prediction_indices):
+            selected = np.flatnonzero(prediction_indices == class_index)
+            contributions = boosters[class_index].predict(
+                xgb.DMatrix(X[selected]), pred_contribs=True, approx_contribs=approximate
+            )
+            # Last column is the bias term
+            rows[selected] = contributions[:, :-1]
+        return rows
+    
+    def _get_class_boosters(self) -> List[xgb.Booster]:
+        """One booster per class of the XGBoost model, built on first use"""
+        boosters = self._class_boosters
+        if boosters is None:
+            boosters = self._class_boosters = self._split_booster(self.model.get_booster())
+        return boosters
+    
+    @staticmethod
+    def _split_booster(booster: xgb.Booster) -> List[xgb.Booster]:
+        """
+        Boosters holding the trees of one class each (the booster itself if binary)
+        
+        Each keeps the base score and becomes a single-output regression
+        model, so its margin and contributions are that class's.
+        """
+        model = json.loads(booster.save_raw('json'))
+        learner = model['learner']
+        n_classes = int(learner['learner_model_param']['num_class'])
+        if n_classes <= 1:
+            return [booster]
+        
+        trees = learner['gradient_booster']['model']['trees']
+        tree_info = learner['gradient_booster']['model']['tree_info']
+        boosters = []
+        for class_index in range(n_classes):
+            class_trees = [dict(tree, id=i) for i, tree in enumerate(
+                tree for tree, tree_class in zip(trees, tree_info) if tree_class == class_index
+            )]
+            class_model = {
+                **model,
+                'learner': {
+                    **learner,
+                    'learner_model_param': {**learner['learner_model_param'], 'num_class': '0'},
+                    'objective': {'name': 'reg:squarederror', 'reg_loss_param': {'scale_pos_weight': '1'}},
+                    'gradient_booster': {
+                        'name': 'gbtree',
+                        'model': {
+                            'gbtree_model_param': {'num_parallel_tree': '1', 'num_trees': str(len(class_trees))},
+                            'iteration_indptr': list(range(len(class_trees) + 1)),
+                            'tree_info': [0] * len(class_trees),
+                            'trees': class_trees,
+                        },
+                    },
+                },
+            }
+            boosters.append(xgb.Booster(model_file=bytearray(json.dumps(class_model).encode('utf-8'))))
+        return boosters
+    
+    @staticmethod
+    def _top_features(shap_rows: np.ndarray, top_k: int, positive: bool) -> np.ndarray:
+        """
+        Feature indexes of the top_k strongest positive (or negative) SHAP values of every row
+        
+        Strongest first, ties by feature index. Rows may hold fewer than top_k
+        values of that sign; callers drop the rest.
+        """
+        n_rows, n_features = shap_rows.shape
+        k = min(top_k, n_features)
+        signed = -shap_rows if positive else shap_rows
+        if k < n_features:
+            # k-th strongest value of each row; among values tied with it keep the lowest indexes
+            kth = np.take_along_axis(signed, np.argpartition(signed, k - 1, axis=1)[:, k - 1:k], axis=1)
+            stronger = signed < kth
+            tied = signed == kth
+            tie_rank = np.cumsum(tied, axis=1)
+            selected = stronger | (tied & (tie_rank <= k - stronger.sum(axis=1, keepdims=True)))
+            candidates = np.nonzero(selected)[1].reshape(n_rows, k)
+        else:
+            candidates = np.broadcast_to(np.arange(n_features), (n_rows, n_features))
+        order = np.lexsort((candidates, np.take_along_axis(signed, candidates, axis=1)), axis=1)
+        return np.take_along_axis(candidates, order, axis=1)
+    
+    def _build_predictions(self, prediction_proba: np.ndarray) -> List[Dict[str, Any]]:
+        """Predicted disease, confidence and top 3 for every row of class probabilities"""
+        classes = self.label_encoder.classes_
+        prediction_indices = np.argmax(prediction_proba, axis=1)
+        top_indices = np.argsort(prediction_proba, axis=1)[:, -3:][:, ::-1]
+        top_confidences = np.take_along_axis(prediction_proba, top_indices, axis=1)
+        
+        diseases = classes[prediction_indices]
+        confidences = prediction_proba[np.arange(len(prediction_proba)), prediction_indices].tolist()
+        top_diseases = classes[top_indices]
+        
+        return [
+            {
+                'disease': diseases[row],
+                'confidence': confidences[row],
+                'top_3_predictions': [
+                    {'disease': disease, 'confidence': confidence}
+                    for disease, confidence in zip(top_diseases[row], top_confidences[row].tolist())
+                ]
+            }
+            for row in range(len(prediction_proba))
+        ]
+    
+    def _build_prediction(self, prediction_proba: np.ndarray) -> Dict[str, Any]:
+        """Predicted disease, confidence and top 3 from one row of class probabilities"""
+        return self._build_predictions(prediction_proba[np.newaxis, :])[0]
+    
+    def _build_explanations(self,
+                            prediction_proba: np.ndarray,
+                            shap_rows: np.ndarray,
+                            top_k: int,
+                            backend: str = 'shap') -> List[Dict[str, Any]]:
+        """Explanation dicts from class probabilities and predicted-class SHAP rows"""
+        predictions = self._build_predictions(prediction_proba)
+        if top_k > 0:
+            positive_indices = self._top_features(shap_rows, top_k, positive=True)
+            negative_indices = self._top_features(shap_rows, top_k, positive=False)
+        
+        explanations = []
+        for row, prediction in enumerate(predictions):
+            shap_row = shap_rows[row]
+            positive = []
+            negative = []
+            if top_k > 0:
+                positive = self._contributions(shap_row, positive_indices[row], positive=True)
+                negative = self._contributions(shap_row, negative_indices[row], positive=False)
+            
+            explanations.append({
+                **prediction,
+                'explanation': {
+                    'positive_factors': positive,
+                    'negative_factors': negative,
+                    'decision_factors': positive[:5],  # Top 5 factors that led to this diagnosis
+                    'explainability_score': 1.0,  # Full explainability with SHAP
+                    'backend': backend
+                },
+                'shap_values': shap_row.tolist()
+            })
+        return explanations
+    
+    @staticmethod
+    def _contributions(shap_row: np.ndarray, feature_indices: np.ndarray, positive: bool) -> List[Dict[str, Any]]:
+        """Contribution dicts of the given features, keeping only values of the requested sign"""
+        contributions = []
+        for index, value in zip(feature_indices.tolist(), shap_row[feature_indices].tolist()):
+            if (value > 0) if positive else (value < 0):
+                contributions.append({
+                    'feature_index': index,
+                    'shap_value': value,
+                    'feature_importance': abs(value)
+                })
+        return contributions
+    
+    def predict(self, symptoms: Symptoms, patient_age: int = 35) -> Dict[str, Any]:
+        """
+        Predict without SHAP values
         
         Args:
-            symptoms: Comma-separated symptoms
+            symptoms: Comma-separated symptoms or canonical symptom names
             patient_age: Patient age
-            top_k: Number of top features to show
         
         Returns:
-            Dict with prediction, confidence, and explanation
+            Dict with prediction, confidence and top 3 predictions
         """
         if not self.model:
             return {'error': 'Model not loaded'}
         
-        # Create feature vector
-        try:
-            # Try XGBoost format (advanced features)
-            X_symptom = self.vectorizer.transform([symptoms]).toarray()
-            X_engineered = self.feature_engineer.create_features(symptoms, patient_age).reshape(1, -1)
-            X_combined = np.hstack([X_symptom, X_engineered])
-        except:
-            # Fallback to basic format (Random Forest)
-            X_combined = self.vectorizer.transform([symptoms]).toarray()
-        
-        # Predict
-        prediction_idx = self.model.predict(X_combined)[0]
-        prediction_proba = self.model.predict_proba(X_combined)[0]
-        
-        disease = self.label_encoder.inverse_transform([prediction_idx])[0]
-        confidence = prediction_proba[prediction_idx]
+        X_combined = self.build_features([symptoms], [patient_age])
+        return self._build_prediction(self.model.predict_proba(X_combined)[0])
+    
+    def predict_batch(self,
+                      symptoms_list: List[Symptoms],
+                      patient_ages: List[int] = None) -> List[Dict[str, Any]]:
+        """
+        Predict multiple cases without SHAP values, with one predict_proba call
         
-        # Get SHAP values
-        shap_values = self.explainer.shap_values(X_combined)
+        Args:
+            symptoms_list: Symptoms of each case (strings or canonical names)
+            patient_ages: List of patient ages (optional)
         
-        # Handle multi-dimensional SHAP values (binary vs multi-class)
-        if len(shap_values.shape) > 2:
-            # Multi-class: get values for predicted class
-            shap_values_for_prediction = shap_values[prediction_idx, 0]
-        else:
-            shap_values_for_prediction = shap_values[0]
+        Returns:
+            List of predictions as returned by predict
+        """
+        if not self.model:
+            return [{'error': 'Model not loaded'} for _ in symptoms_list]
+        if not symptoms_list:
+            return []
         
-        # Get feature contributions
-        contributions = []
-        for i, value in enumerate(shap_values_for_prediction):
-            contributions.append({
-                'feature_index': i,
-                'shap_value': float(value),
-                'feature_importance': abs(float(value))
-            })
+        if patient_ages is None:
+            patient_ages = [35] * len(symptoms_list)
         
-        # Sort by importance
-        contributions.sort(key=lambda x: x['feature_importance'], reverse=True)
+        return self.predict_features(self.build_features(symptoms_list, patient_ages))
+    
+    def predict_features(self, X_combined) -> List[Dict[str, Any]]:
+        """predict_batch on a feature matrix from build_features"""
+        return self._build_predictions(self.model.predict_proba(X_combined))
+    
+    def explain_prediction(self, 
+                          symptoms: Symptoms, 
+                          patient_age: int = 35,
+                          top_k: int = 10,
+                          backend: str = 'shap') -> Dict[str, Any]:
+        """
+        Explain model prediction for given symptoms
         
-        # Get top K positive and negative
-        positive = [c for c in contributions if c['shap_value'] > 0][:top_k]
-        negative = [c for c in contributions if c['shap_value'] < 0][:top_k]
+        Args:
+            symptoms: Comma-separated symptoms or canonical symptom names
+            patient_age: Patient age
+            top_k: Number of top features to show
+            backend: One of EXPLANATION_BACKENDS
         
-        # Get top 3 predictions
-        top_indices = np.argsort(prediction_proba)[-3:][::-1]
-        top_predictions = [
-            {
-                'disease': self.label_encoder.inverse_transform([idx])[0],
-                'confidence': float(prediction_proba[idx])
-            }
-            for idx in top_indices
-        ]
+        Returns:
+            Dict with prediction, confidence, and explanation
+        """
+        if not self.model:
+            return {'error': 'Model not loaded'}
         
-        return {
-            'disease': disease,
-            'confidence': float(confidence),
-            'top_3_predictions': top_predictions,
-            'explanation': {
-                'positive_factors': positive,
-                'negative_factors': negative,
-                'decision_factors': positive[:5],  # Top 5 factors that led to this diagnosis
-                'explainability_score': 1.0  # Full explainability with SHAP
-            },
-            'shap_values': shap_values_for_prediction.tolist()
-        }
+        return self.explain_batch([symptoms], [patient_age], top_k=top_k, backend=backend)[0]
     
     def explain_batch(self, 
-                     symptoms_list: List[str],
-                     patient_ages: List[int] = None) -> List[Dict[str, Any]]:
+                     symptoms_list: List[Symptoms],
+                     patient_ages: List[int] = None,
+                     top_k: int = 10,
+                     backend: str = 'shap') -> List[Dict[str, Any]]:
         """
         Explain predictions for multiple cases
         
         Args:
-            symptoms_list: List of symptom strings
+            symptoms_list: Symptoms of each case (strings or canonical names)
             patient_ages: List of patient ages (optional)
+            top_k: Number of top features to show per case
+            backend: One of EXPLANATION_BACKENDS
         
         Returns:
             List of explanations
         """
+        if not self.model:
+            return [{'error': 'Model not loaded'} for _ in symptoms_list]
+        if not symptoms_list:
+            return []
+        
         if patient_ages is None:
             patient_ages = [35] * len(symptoms_list)
         
+        return self.explain_features(self.build_features(symptoms_list, patient_ages), top_k=top_k, backend=backend)
+    
+    def explain_features(self, X_combined, top_k: int = 10, backend: str = 'shap') -> List[Dict[str, Any]]:
+        """explain_batch on a feature matrix from build_features"""
+        # One predict_proba for the whole batch
+        prediction_proba = self.model.predict_proba(X_combined)
+        prediction_indices = np.argmax(prediction_proba, axis=1)
+        
+        # SHAP returns every class; chunks bound that (n_rows, n_features, n_classes) array
         explanations = []
-        for symptoms, age in zip(symptoms_list, patient_ages):
-            explanation = self.explain_prediction(symptoms, age)
-            explanations.append(explanation)
+        for start in range(0, X_combined.shape[0], self.SHAP_CHUNK_SIZE):
+            end = start + self.SHAP_CHUNK_SIZE
+            shap_rows = self._contribution_rows(X_combined[start:end], prediction_indices[start:end], backend)
+            explanations.extend(self._build_explanations(prediction_proba[start:end], shap_rows, top_k, backend))
         
         return explanations
     
@@ -186,6 +513,7 @@ class SHAPDiseaseExplainer:
         for idx in top_indices:
             summary['most_important_features'].append({
                 'index': int(idx),
+                'feature': str(self.feature_names[idx]) if idx < len(self.feature_names) else None,
                 'importance': float(feature_importances[idx])
             })
         
@@ -207,12 +535,9 @@ class SHAPDiseaseExplainer:
             return
         
         # Create feature vector
-        try:
-            X_symptom = self.vectorizer.transform([symptoms]).toarray()
-            X_engineered = self.feature_engineer.create_features(symptoms, patient_age).reshape(1, -1)
-            X_combined = np.hstack([X_symptom, X_engineered])
-        except:
-            X_combined = self.vectorizer.transform([symptoms]).toarray()
+        X_combined = self.build_features([symptoms], [patient_age])
+        if sparse.issparse(X_combined):
+            X_combined = X_combined.toarray()
         
         # Get SHAP values
         shap_values = self.explainer.shap_values(X_combined)
@@ -0,0 +1,266 @@
+"""
+Canonical Symptom Features
+
+The chat service extracts canonical symptom names ('fiebre alta', 'dolor de
+garganta', ...) and used to join them into the comma-separated text the model
+was trained on, which build_features then tokenized again
+(CountVectorizer.transform) and split again (AdvancedFeatureEngineering).
+The names come from a small fixed set, so SymptomFeatureMap computes once per
+model and name:
+- the vectorizer columns of its unigrams and inner bigrams
+- its first and last token, for the bigram across two adjacent symptoms
+- its keyword-group hits and word count, for the engineered features
+
+and assembles each case's rows from those parts. A flag keyword with a space
+can also span two adjacent symptoms; that check is memoized per pair.
+SHAPDiseaseExplainer keeps one map per loaded model, so a model swapped in by
+the registry starts with its own.
+
+The rows are identical to those of the text path. Vectorizers whose text
+handling the map does not reproduce (character analyzers, custom tokenizers,
+n-grams longer than 2, TF-IDF weighting) make it unsupported, and callers keep
+the text path.
+"""
+
+from itertools import accumulate
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+# Bound on memoized names and pairs, should callers pass free text instead of canonical names
+MAX_ENTRIES = 4096
+
+_DEFAULT_TOKEN_PATTERN = CountVectorizer().token_pattern
+
+
+class _Symptom:
+    """Precomputed parts of one symptom (one comma-separated item of the text)"""
+
+    __slots__ = ('columns', 'first', 'last', 'text', 'hits', 'words')
+
+    def __init__(self, columns: List[int], first: Optional[str], last: Optional[str],
+                 text: str, hits: Optional[List[int]], words: int):
+        self.columns = columns
+        self.first = first
+        self.last = last
+        self.text = text
+        self.hits = hits
+        self.words = words
+
+
+class SymptomFeatureMap:
+    """Canonical symptom names -> vectorizer counts and engineered features of a model"""
+
+    # Up to this many rows, CSR rows are merged in Python (NumPy call overhead dominates)
+    SMALL_BATCH = 16
+
+    def __init__(self, vectorizer: Any, feature_engineer: Any = None, sparse_features: bool = False):
+        self.vectorizer = vectorizer
+        self.feature_engineer = feature_engineer
+        self.sparse_features = sparse_features
+        self.supported = self._supports(vectorizer, feature_engineer)
+        self._symptoms: Dict[str, List[_Symptom]] = {}
+        self._spanning: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        if not self.supported:
+            return
+
+        self._vocabulary = vectorizer.vocabulary_
+        self._n_columns = len(self._vocabulary)
+        self._preprocess = vectorizer.build_preprocessor()
+        self._tokenize = vectorizer.build_tokenizer()
+        self._stop_words = vectorizer.get_stop_words()
+        min_n, max_n = vectorizer.ngram_range
+        self._unigrams = min_n <= 1
+        self._bigrams = max_n >= 2
+        self._n_counts = len(getattr(feature_engineer, 'SYMPTOM_COUNT_KEYWORDS', ()))
+        self._spanning_matchers = [
+            (group, matcher) for group, matcher in enumerate(getattr(feature_engineer, 'SPANNING_MATCHERS', ()))
+            if matcher is not None
+        ]
+
+    @staticmethod
+    def _supports(vectorizer: Any, feature_engineer: Any) -> bool:
+        """Whether the map reproduces the text path of this vectorizer and feature engineer"""
+        if type(vectorizer) is not CountVectorizer or not hasattr(vectorizer, 'vocabulary_'):
+            return False
+        if (vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None
+                or vectorizer.preprocessor is not None or vectorizer.token_pattern != _DEFAULT_TOKEN_PATTERN
+                or vectorizer.ngram_range[1] > 2):
+            return False
+        if feature_engineer is None:
+            return True
+        if not all(hasattr(feature_engineer, name) for name in ('symptom_hits', 'assemble_features', 'SPANNING_MATCHERS')):
+            return False
+        # Joined symptoms are separated by one space: a keyword can span two of them only at a single space
+        return all(kw.count(' ') <= 1 and kw.split() == kw.split(' ')
+                   for keywords in feature_engineer.TEXT_FLAG_KEYWORDS for kw in keywords)
+
+    def precompute(self, names: Sequence[str]):
+        """Compute the parts of these names ahead of the first request"""
+        if self.supported:
+            for name in names:
+                self._parts(name)
+
+    def _parts(self, name: str) -> List[_Symptom]:
+        """Symptoms of one name (more than one if it contains commas, as the text path splits it)"""
+        parts = self._symptoms.get(name)
+        if parts is None:
+            parts = [self._symptom(item) for item in name.split(',')]
+            if len(self._symptoms) < MAX_ENTRIES:
+                self._symptoms[name] = parts
+        return parts
+
+    def _symptom(self, item: str) -> _Symptom:
+        tokens = self._tokenize(self._preprocess(item))
+        if self._stop_words is not None:
+            tokens = [token for token in tokens if token not in self._stop_words]
+        ngrams = list(tokens) if self._unigrams else []
+        if self._bigrams:
+            ngrams.extend(f'{a} {b}' for a, b in zip(tokens, tokens[1:]))
+        columns = [self._vocabulary[ngram] for ngram in ngrams if ngram in self._vocabulary]
+
+        text = item.lower().strip()
+        hits = None
+        if self.feature_engineer is not None:
+            hits = [int(hit) for hit in self.feature_engineer.symptom_hits(text)]
+        return _Symptom(columns, tokens[0] if tokens else None, tokens[-1] if tokens else None,
+                        text, hits, len(text.split()))
+
+    def _spanning_groups(self, previous: str, current: str) -> Tuple[int, ...]:
+        """Flag groups with a keyword spanning two adjacent symptoms"""
+        key = (previous, current)
+        groups = self._spanning.get(key)
+        if groups is None:
+            joined = f'{previous} {current}'
+            groups = tuple(group for group, matcher in self._spanning_matchers if matcher.search(joined) is not None)
+            if len(self._spanning) < MAX_ENTRIES:
+                self._spanning[key] = groups
+        return groups
+
+    def transform(self, cases: Sequence[Sequence[str]], patient_ages: Sequence[int]):
+        """
+        Model input of cases given as symptom names
+
+        Args:
+            cases: Canonical symptom names of each case
+            patient_ages: Patient age of each case
+
+        Returns:
+            The matrix SHAPDiseaseExplainer.build_features returns for the
+            ', '.join(names) of each case: CSR with sparse_features, else dense
+        """
+        n_cases = len(cases)
+        # Vectorizer counts in CSR layout (sorted columns per row)
+        indices: List[int] = []
+        data: List[int] = []
+        indptr = [0]
+        # Distinct symptoms of the batch, the batch index of each case's symptoms, and spanning flags
+        distinct: Dict[_Symptom, int] = {}
+        symptom_ids: List[int] = []
+        num_symptoms: List[int] = []
+        spanning: List[Tuple[int, int]] = []
+
+        for case, names in enumerate(cases):
+            # ', '.join([]) is '', a single empty symptom
+            parts = [part for name in (names or ('',)) for part in self._parts(name)]
+            counts: Dict[int, int] = {}
+            last_token = None
+            previous = None
+            for part in parts:
+                for column in part.columns:
+                    counts[column] = counts.get(column, 0) + 1
+                if part.first is not None:
+                    # Bigram across the comma, from the last symptom that had tokens
+                    if self._bigrams and last_token is not None:
+                        column = self._vocabulary.get(f'{last_token} {part.first}')
+                        if column is not None:
+                            counts[column] = counts.get(column, 0) + 1
+                    last_token = part.last
+                if previous is not None and self._spanning_matchers:
+                    spanning.extend((case, group) for group in self._spanning_groups(previous.text, part.text))
+                previous = part
+                symptom_ids.append(distinct.setdefault(part, len(distinct)))
+            num_symptoms.append(len(parts))
+            for column in sorted(counts):
+                indices.append(column)
+                data.append(counts[column])
+            indptr.append(len(indices))
+
+        if self.vectorizer.binary:
+            data = [1] * len(data)
+        engineered = None
+        if self.feature_engineer is not None:
+            engineered = self._engineered(list(distinct), symptom_ids, num_symptoms, spanning, patient_ages)
+
+        if not self.sparse_features:
+            return self._dense(indices, data, indptr, engineered)
+        if engineered is not None and n_cases <= self.SMALL_BATCH:
+            return self._csr_rows(indices, data, indptr, engineered)
+        X_symptom = sparse.csr_matrix(
+            (np.array(data, dtype=self.vectorizer.dtype), np.array(indices, dtype=np.int32),
+             np.array(indptr, dtype=np.int32)),
+            shape=(n_cases, self._n_columns)
+        )
+        if engineered is None:
+            return X_symptom
+        from shap_explainer import SHAPDiseaseExplainer
+        return SHAPDiseaseExplainer._append_dense_columns(X_symptom, engineered)
+
+    def _engineered(self,
+                    distinct: List[_Symptom],
+                    symptom_ids: List[int],
+                    num_symptoms: List[int],
+                    spanning: List[Tuple[int, int]],
+                    patient_ages: Sequence[int]) -> np.ndarray:
+        """Engineered features: the sums of create_features_batch, over the precomputed parts"""
+        table = np.array([symptom.hits + [symptom.words] for symptom in distinct], dtype=np.intp)
+        case_starts = list(accumulate(num_symptoms[:-1], initial=0))
+        sums = np.add.reduceat(table[symptom_ids], case_starts, axis=0)
+        case_hits = sums[:, :-1]
+        flags = case_hits[:, self._n_counts:] > 0
+        if spanning:
+            rows, groups = zip(*spanning)
+            flags[list(rows), list(groups)] = True
+        return self.feature_engineer.assemble_features(np.array(num_symptoms), case_hits, flags, sums[:, -1],
+                                                       patient_ages)
+
+    def _dense(self, indices: List[int], data: List[int], indptr: List[int],
+               engineered: Optional[np.ndarray]) -> np.ndarray:
+        """Counts, then the engineered columns (X_symptom.toarray() and np.hstack of the text path)"""
+        n_cases = len(indptr) - 1
+        if engineered is None:
+            X = np.zeros((n_cases, self._n_columns), dtype=self.vectorizer.dtype)
+        else:
+            X = np.zeros((n_cases, self._n_columns + engineered.shape[1]),
+                         dtype=np.result_type(self.vectorizer.dtype, engineered.dtype))
+            X[:, self._n_columns:] = engineered
+        rows = np.repeat(np.arange(n_cases), np.diff(indptr))
+        X[rows, indices] = data
+        return X
+
+    def _csr_rows(self, indices: List[int], data: List[int], indptr: List[int],
+                  engineered: np.ndarray) -> sparse.csr_matrix:
+        """
+        Counts, then the non-zero engineered columns of each row, row by row
+
+        Same matrix as SHAPDiseaseExplainer._append_dense_columns, without
+        its fixed cost of NumPy calls for a few rows.
+        """
+        combined_indices: List[int] = []
+        combined_data: List[float] = []
+        combined_indptr = [0]
+        for row, values in enumerate(engineered.tolist()):
+            combined_indices.extend(indices[indptr[row]:indptr[row + 1]])
+            combined_data.extend(data[indptr[row]:indptr[row + 1]])
+            for column, value in enumerate(values, self._n_columns):
+                if value != 0:
+                    combined_indices.append(column)
+                    combined_data.append(value)
+            combined_indptr.append(len(combined_indices))
+        return sparse.csr_matrix(
+            (np.array(combined_data, dtype=np.result_type(self.vectorizer.dtype, engineered.dtype)),
+             np.array(combined_indices, dtype=np.int32), np.array(combined_indptr, dtype=np.int32)),
+            shape=(len(engineered), self._n_columns + engineered.shape[1])
+        )
@@ -0,0 +1,188 @@
+"""
+Unit tests for the stage executors
+"""
+
+import asyncio
+import operator
+import threading
+import time
+
+import pytest
+
+from core.executors import ExecutorSaturatedError, StageExecutor
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class TestStageExecutor:
+    """Test running work off the event loop with bounded queues"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('kind', ['inline', 'thread', 'process'])
+    async def test_runs_function(self, kind):
+        """Test that every kind returns the function's result"""
+        executor = StageExecutor('test', kind=kind, max_workers=1)
+        try:
+            assert await executor.run(operator.add, 2, 3) == 5
+            assert executor.stats()['completed'] == 1
+        finally:
+            executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_errors_are_raised_and_counted(self):
+        """Test that a failing task raises its own error"""
+        executor = StageExecutor('test', kind='thread', max_workers=1)
+
+        with pytest.raises(ValueError, match='boom'):
+            await executor.run(fail, 'boom')
+
+        stats = executor.stats()
+        assert stats['failed'] == 1
+        assert stats['completed'] == 0
+        executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_rejects_beyond_max_queue(self):
+        """Test bounded queue depth"""
+        executor = StageExecutor('test', kind='thread', max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(release.wait)
+        assert executor.stats()['queue_depth'] == 1
+
+        release.set()
+        await asyncio.gather(running, queued)
+        stats = executor.stats()
+        assert stats['rejected'] == 1
+        assert stats['completed'] == 2
+        assert stats['in_flight'] == 0
+        executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_running_task_keeps_its_slot(self):
+        """Test that a started task still counts after its caller is cancelled"""
+        executor = StageExecutor('test', kind='thread', max_workers=1, max_queue=0)
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait()
+
+        caller = asyncio.ensure_future(executor.run(blocking))
+        try:
+            await asyncio.to_thread(started.wait)
+            caller.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+
+            # The task still occupies the only worker
+            assert executor.stats()['in_flight'] == 1
+            with pytest.raises(ExecutorSaturatedError):
+                await asyncio.wait_for(executor.run(operator.add, 1, 2), timeout=1)
+        finally:
+            release.set()
+
+        # The slot is released when the task ends on the pool
+        for _ in range(100):
+            if executor.stats()['in_flight'] == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await executor.run(operator.add, 1, 2) == 3
+        executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_queued_task_frees_its_slot(self):
+        """Test that a task cancelled before it starts leaves the queue"""
+        executor = StageExecutor('test', kind='thread', max_workers=1, max_queue=1)
+        release = threading.Event()
+
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0)
+
+        assert executor.stats()['queue_depth'] == 0
+        release.set()
+        await running
+        assert executor.stats()['in_flight'] == 0
+        executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_submit_races_shutdown(self, monkeypatch):
+        """Test that a task whose pool is shut down before it is submitted runs on the next pool"""
+        executor = StageExecutor('test', kind='thread', max_workers=1)
+        get_pool = executor._get_pool
+        retired = []
+
+        def get_pool_then_shutdown():
+            pool = get_pool()
+            if not retired:
+                retired.append(pool)
+                executor.shutdown()
+            return pool
+
+        monkeypatch.setattr(executor, '_get_pool', get_pool_then_shutdown)
+        try:
+            assert await executor.run(operator.add, 1, 2) == 3
+            assert executor._pool is not retired[0]
+            stats = executor.stats()
+            assert stats['in_flight'] == 0
+            assert stats['completed'] == 1
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_submit_to_shut_down_pool_frees_its_slot(self):
+        """Test that a submit error from the current pool is raised without leaking a slot"""
+        executor = StageExecutor('test', kind='thread', max_workers=1)
+        executor._get_pool().shutdown()
+
+        with pytest.raises(RuntimeError):
+            await executor.run(operator.add, 1, 2)
+        assert executor.stats()['in_flight'] == 0
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_is_measured(self):
+        """Test that a task waiting for a busy worker reports its wait"""
+        executor = StageExecutor('test', kind='thread', max_workers=1)
+
+        await asyncio.gather(executor.run(time.sleep, 0.05), executor.run(time.sleep, 0))
+
+        waits = executor.stats()['queue_wait_ms']
+        assert waits['count'] == 2
+        assert waits['max'] >= 40
+        executor.shutdown(wait=True)
+
+    @pytest.mark.asyncio
+    async def test_event_loop_keeps_running(self):
+        """Test that a slow task does not block other coroutines"""
+        executor = StageExecutor('test', kind='thread', max_workers=1)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.ensure_future(ticker())
+        await executor.run(time.sleep, 0.1)
+        task.cancel()
+
+        assert ticks >= 5
+        executor.shutdown(wait=True)
+
+    def test_unknown_kind(self):
+        """Test configuration errors"""
+        with pytest.raises(ValueError):
+            StageExecutor('test', kind='gpu')
@@ -0,0 +1,3 @@
+"""
+Tests for disease data parsing and knowledge base snapshots
+"""
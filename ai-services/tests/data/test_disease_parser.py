@@ -0,0 +1,148 @@
+"""
+Unit tests for the disease parser and its compiled snapshot
+"""
+
+import os
+import pickle
+
+import pytest
+
+import data.disease_parser as disease_parser
+from data.disease_parser import (
+    SNAPSHOT_FORMAT_VERSION,
+    build_disease_database,
+    compile_disease_snapshot,
+    default_snapshot_path,
+    load_disease_database,
+    parse_diseases_markdown
+)
+
+DISEASES_MARKDOWN = """# Lista de enfermedades respiratorias
+
+## INFECCIONES AGUDAS
+
+1. **Resfriado común**: Congestión nasal, estornudos, dolor de garganta leve, fiebre leve
+2. **Neumonía grave**: Fiebre alta, dificultad respiratoria marcada, taquipnea, cianosis
+
+## ENFERMEDADES CRÓNICAS
+
+3. **Asma bronquial**: Sibilancias recurrentes, dificultad respiratoria episódica, tos nocturna
+"""
+
+
+@pytest.fixture
+def disease_file(tmp_path):
+    """Disease markdown in a temporary directory"""
+    path = tmp_path / 'lista_enfermedades_respiratorias.md'
+    path.write_text(DISEASES_MARKDOWN, encoding='utf-8')
+    return str(path)
+
+
+@pytest.fixture
+def parse_counter(monkeypatch):
+    """Count how many times the markdown gets parsed"""
+    calls = {'count': 0}
+    original = disease_parser.parse_diseases_text
+
+    def counting_parse(content):
+        calls['count'] += 1
+        return original(content)
+
+    monkeypatch.setattr(disease_parser, 'parse_diseases_text', counting_parse)
+    return calls
+
+
+class TestDiseaseParser:
+    """Test markdown parsing"""
+
+    def test_parse_diseases(self, disease_file):
+        """Test that entries, sections and urgency are parsed"""
+        diseases = parse_diseases_markdown(disease_file)
+
+        assert [d['id'] for d in diseases] == [1, 2, 3]
+        assert diseases[0]['categoria'] == 'INFECCIONES AGUDAS'
+        assert diseases[2]['categoria'] == 'ENFERMEDADES CRÓNICAS'
+        assert diseases[1]['urgencia'] == 'alta'
+        assert 'estornudos' in diseases[0]['sintomas']
+
+    def test_build_database_mappings(self, disease_file):
+        """Test symptom, urgency and category mappings"""
+        database = build_disease_database(parse_diseases_markdown(disease_file))
+
+        assert database['symptom_to_diseases']['estornudos'] == [1]
+        assert database['category_mapping']['INFECCIONES AGUDAS'] == [1, 2]
+
+
+class TestDiseaseSnapshot:
+    """Test the compiled knowledge base snapshot"""
+
+    def test_compile_writes_snapshot(self, disease_file):
+        """Test that compiling writes a versioned snapshot next to the source"""
+        database = compile_disease_snapshot(disease_file)
+        snapshot_path = default_snapshot_path(disease_file)
+
+        assert os.path.exists(snapshot_path)
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+        assert snapshot['format_version'] == SNAPSHOT_FORMAT_VERSION
+        assert snapshot['database'] == database
+
+    def test_load_matches_parsed_database(self, disease_file):
+        """Test that the snapshot round-trips the parsed database"""
+        expected = build_disease_database(parse_diseases_markdown(disease_file))
+
+        assert load_disease_database(disease_file) == expected
+        assert load_disease_database(disease_file) == expected
+
+    def test_fresh_snapshot_skips_parsing(self, disease_file, parse_counter):
+        """Test that an up-to-date snapshot is loaded without parsing"""
+        compile_disease_snapshot(disease_file)
+        parse_counter['count'] = 0
+
+        load_disease_database(disease_file)
+
+        assert parse_counter['count'] == 0
+
+    def test_touched_source_keeps_snapshot(self, disease_file, parse_counter):
+        """Test that a new mtime with identical content does not reparse"""
+        compile_disease_snapshot(disease_file)
+        parse_counter['count'] = 0
+        stat = os.stat(disease_file)
+        os.utime(disease_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        load_disease_database(disease_file)
+
+        assert parse_counter['count'] == 0
+
+    def test_changed_source_rebuilds_snapshot(self, disease_file):
+        """Test that editing the markdown invalidates the snapshot"""
+        compile_disease_snapshot(disease_file)
+        with open(disease_file, 'a', encoding='utf-8') as f:
+            f.write("4. **Tos ferina**: Tos paroxística violenta, apnea en lactantes\n")
+
+        database = load_disease_database(disease_file)
+
+        assert [d['id'] for d in database['diseases']] == [1, 2, 3, 4]
+
+    def test_other_format_version_rebuilds(self, disease_file, parse_counter):
+        """Test that snapshots from another format version are ignored"""
+        snapshot_path = default_snapshot_path(disease_file)
+        with open(snapshot_path, 'wb') as f:
+            pickle.dump({'format_version': -1, 'database': {}}, f)
+
+        database = load_disease_database(disease_file)
+
+        assert parse_counter['count'] == 1
+        assert len(database['diseases']) == 3
+
+    def test_failed_snapshot_write_leaves_no_temp_file(self, disease_file, monkeypatch):
+        """Test that a failing write falls back to parsing and removes its temporary file"""
+        def full_disk(src, dst):
+            raise OSError(28, 'No space left on device')
+
+        monkeypatch.setattr(disease_parser.os, 'replace', full_disk)
+
+        database = load_disease_database(disease_file)
+
+        assert len(database['diseases']) == 3
+        assert os.listdir(os.path.dirname(disease_file)) == [os.path.basename(disease_file)]
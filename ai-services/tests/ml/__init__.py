@@ -0,0 +1,3 @@
+"""
+Tests for the ML model code (explainers, feature engineering)
+"""
@@ -0,0 +1,62 @@
+"""
+Unit tests for the batch engineered features of the XGBoost training scripts
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+import train_xgboost_simple
+from generate_dataset import generate_case, parse_disease_list
+from train_xgboost_model import AdvancedFeatureEngineering
+
+EDGE_CASES = [
+    ('', 35),
+    (',', 0),
+    ('Fiebre ALTA, Tos seca', 101),
+    ('  dificultad ,  respiratoria  ', 7),  # keyword spanning two symptoms
+    ('muy, alta', 60),
+    ('dolor torácico, opresión, ardor de pecho, molestia', 45),
+    ('tos,tos,,tos', 12),
+    ('síntomas crónicos desde hace semanas, inicio súbito', 88),
+    ('Tos ferina\tpersistente,\nfatiga', 3),
+]
+
+
+@pytest.fixture(scope='module')
+def cases():
+    random.seed(1234)
+    generated = [generate_case(disease) for disease in parse_disease_list() for _ in range(20)]
+    return [(case['symptoms'], case['patient_age']) for case in generated] + EDGE_CASES
+
+
+class TestCreateFeaturesBatch:
+    """Test that the batch features equal the per-case features exactly"""
+
+    def test_advanced_feature_engineering(self, cases):
+        """Test AdvancedFeatureEngineering.create_features_batch"""
+        texts, ages = zip(*cases)
+        expected = np.array([AdvancedFeatureEngineering.create_features(text, age) for text, age in cases])
+
+        batch = AdvancedFeatureEngineering.create_features_batch(texts, ages)
+
+        assert batch.shape == (len(cases), len(AdvancedFeatureEngineering.get_feature_names()))
+        assert batch.dtype == expected.dtype
+        np.testing.assert_array_equal(batch, expected)
+
+    def test_simple_training_script(self, cases):
+        """Test create_advanced_features_batch of train_xgboost_simple.py"""
+        texts, ages = zip(*cases)
+        expected = np.array([
+            train_xgboost_simple.create_advanced_features(text, age) for text, age in cases
+        ])
+
+        batch = train_xgboost_simple.create_advanced_features_batch(texts, ages)
+
+        np.testing.assert_array_equal(batch, expected)
+
+    def test_empty_batch(self):
+        """Test that no cases give an empty 15-column matrix"""
+        assert AdvancedFeatureEngineering.create_features_batch([], []).shape == (0, 15)
+        assert train_xgboost_simple.create_advanced_features_batch([], []).shape == (0, 15)
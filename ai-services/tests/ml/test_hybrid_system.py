@@ -0,0 +1,68 @@
+"""
+Unit tests for the soft-voting ensemble of HybridRuleMLSystem
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from ml_models import HybridRuleMLSystem
+
+
+class FixedModel:
+    """Model returning fixed class probabilities, recording the thread it ran on"""
+
+    def __init__(self, classes, probabilities):
+        self.classes = np.array(classes)
+        self.probabilities = np.array(probabilities)
+        self.is_trained = True
+        self.threads = []
+
+    def class_probabilities(self, symptoms, all_symptoms=None):
+        self.threads.append(threading.current_thread().name)
+        return self.classes, self.probabilities
+
+
+@pytest.fixture
+def system():
+    system = HybridRuleMLSystem()
+    system.random_forest = FixedModel(['asma', 'gripe'], [0.6, 0.4])
+    system.xgboost = FixedModel(['asma', 'gripe', 'neumonia'], [0.1, 0.3, 0.6])
+    system.neural_net = FixedModel(['gripe', 'neumonia'], [0.2, 0.8])
+    system.is_trained = True
+    return system
+
+
+class TestSoftVoting:
+    """Test probability averaging over a shared class index"""
+
+    def test_averages_aligned_probabilities(self, system):
+        """Test that classes a model does not know count as probability 0"""
+        result = system._ensemble_predict(['tos'], [])
+
+        # asma (0.6 + 0.1 + 0) / 3, gripe (0.4 + 0.3 + 0.2) / 3, neumonia (0 + 0.6 + 0.8) / 3
+        assert result['disease'] == 'neumonia'
+        assert result['confidence'] == pytest.approx(1.4 / 3)
+        assert [p['disease'] for p in result['top_3_predictions']] == ['neumonia', 'gripe', 'asma']
+        assert result['model_predictions']['rf'] == {'disease': 'asma', 'confidence': 0.6}
+        assert result['models_agreed'] == 2
+
+    def test_weights(self, system):
+        system.ensemble_weights = {'rf': 4.0, 'xgb': 1.0, 'nn': 1.0}
+
+        result = system._ensemble_predict(['tos'], [])
+
+        assert result['disease'] == 'asma'
+        assert result['confidence'] == pytest.approx((4 * 0.6 + 0.1) / 6)
+
+    def test_models_run_on_thread_pool(self, system):
+        """Test that untrained models are skipped and the others run off the calling thread"""
+        system.neural_net.is_trained = False
+
+        result = system._ensemble_predict(['tos'], [])
+
+        assert set(result['model_predictions']) == {'rf', 'xgb'}
+        assert system.neural_net.threads == []
+        for model in (system.random_forest, system.xgboost):
+            assert model.threads[0].startswith('hybrid-ensemble')
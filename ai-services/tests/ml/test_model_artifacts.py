@@ -0,0 +1,123 @@
+"""
+Unit tests for the memory-mapped model artifact format
+"""
+
+import contextlib
+import io
+import mmap
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from benchmarks.common import generate_cases, train_xgboost_artifact
+from model_artifacts import (
+    ALIGNMENT, MAGIC, export_mmap_artifact, is_mmap_artifact, read_mmap_artifact, write_mmap_artifact
+)
+from shap_explainer import SHAPDiseaseExplainer
+
+
+@pytest.fixture(scope='module')
+def explainers(tmp_path_factory):
+    """The same small model loaded from its joblib and its mmap artifact"""
+    directory = tmp_path_factory.mktemp('models')
+    with contextlib.redirect_stdout(io.StringIO()):
+        pkl_path = train_xgboost_artifact(str(directory / 'xgboost_model.pkl'), cases_per_disease=10, n_estimators=5)
+        mmap_path = export_mmap_artifact(pkl_path)
+        return SHAPDiseaseExplainer(pkl_path), SHAPDiseaseExplainer(mmap_path)
+
+
+class TestMmapFile:
+    """Test the file layout"""
+
+    def test_arrays_round_trip_as_read_only_views(self, tmp_path):
+        """Test that arrays come back equal, aligned and backed by the mapping"""
+        path = str(tmp_path / 'state.mmap')
+        state = {
+            'values': np.arange(1000, dtype=np.float64).reshape(10, 100),
+            'labels': np.array(['asma', 'covid-19', 'neumonia']),
+            'odd': np.arange(7, dtype=np.int8),
+            'name': 'xgboost',
+        }
+
+        write_mmap_artifact(state, path)
+        loaded = read_mmap_artifact(path)
+
+        assert is_mmap_artifact(path)
+        assert loaded['name'] == 'xgboost'
+        for key in ('values', 'labels', 'odd'):
+            np.testing.assert_array_equal(loaded[key], state[key])
+            assert loaded[key].dtype == state[key].dtype
+            assert not loaded[key].flags.writeable
+            assert loaded[key].ctypes.data % ALIGNMENT == 0
+
+    def test_rewrite_replaces_file(self, tmp_path):
+        """Test that writing over an artifact leaves only the new file"""
+        path = str(tmp_path / 'state.mmap')
+        write_mmap_artifact({'version': 1}, path)
+        write_mmap_artifact({'version': 2}, path)
+
+        assert read_mmap_artifact(path) == {'version': 2}
+        assert os.listdir(tmp_path) == ['state.mmap']
+
+    def test_other_files_are_not_artifacts(self, tmp_path):
+        path = tmp_path / 'model.pkl'
+        path.write_bytes(b'not an artifact')
+
+        assert not is_mmap_artifact(str(path))
+        assert not is_mmap_artifact(str(tmp_path / 'missing.mmap'))
+        with pytest.raises(ValueError):
+            read_mmap_artifact(str(path))
+
+    def test_unreadable_files_are_unmapped(self, tmp_path, monkeypatch):
+        """Test that the mapping is closed when the magic or the header is wrong"""
+        mappings = []
+        original = mmap.mmap
+
+        def recording_mmap(*args, **kwargs):
+            mappings.append(original(*args, **kwargs))
+            return mappings[-1]
+
+        monkeypatch.setattr(mmap, 'mmap', recording_mmap)
+        other = tmp_path / 'model.pkl'
+        other.write_bytes(b'not an artifact')
+        corrupt = tmp_path / 'model.mmap'
+        write_mmap_artifact({'weights': np.arange(10.0)}, str(corrupt))
+        raw = bytearray(corrupt.read_bytes())
+        # Counts, then the (offset, length) entry of the single buffer, then the header
+        header_start = len(MAGIC) + 16 + 16
+        raw[header_start:header_start + 8] = b'\xff' * 8
+        corrupt.write_bytes(bytes(raw))
+
+        with pytest.raises(ValueError):
+            read_mmap_artifact(str(other))
+        with pytest.raises(pickle.UnpicklingError):
+            read_mmap_artifact(str(corrupt))
+
+        assert len(mappings) == 2 and all(mapping.closed for mapping in mappings)
+
+
+class TestMmapExplainer:
+    """Test that an explainer loaded from the mmap artifact matches the joblib one"""
+
+    def test_same_predictions_and_explanations(self, explainers):
+        joblib_explainer, mmap_explainer = explainers
+        cases = generate_cases(cases_per_disease=2, seed=11)
+        texts = [case['symptoms'] for case in cases]
+        ages = [int(case['patient_age']) for case in cases]
+
+        assert mmap_explainer.predict_batch(texts, ages) == joblib_explainer.predict_batch(texts, ages)
+        assert mmap_explainer.explain_batch(texts, ages) == joblib_explainer.explain_batch(texts, ages)
+
+    def test_tables_are_mapped(self, explainers):
+        """Test the vocabulary, class labels, feature names and tree arrays"""
+        joblib_explainer, mmap_explainer = explainers
+
+        assert mmap_explainer.vectorizer.vocabulary_ == joblib_explainer.vectorizer.vocabulary_
+        np.testing.assert_array_equal(mmap_explainer.label_encoder.classes_, joblib_explainer.label_encoder.classes_)
+        np.testing.assert_array_equal(mmap_explainer.feature_names, joblib_explainer.feature_names)
+        np.testing.assert_array_equal(mmap_explainer.explainer.model.values, joblib_explainer.explainer.model.values)
+        assert not mmap_explainer.label_encoder.classes_.flags.writeable
+        assert not mmap_explainer.explainer.model.values.flags.writeable
+        assert mmap_explainer.sparse_features == joblib_explainer.sparse_features
@@ -0,0 +1,99 @@
+"""
+Unit tests for the shared-trunk multi-task network
+"""
+
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.common import generate_cases
+from ml_models import SharedTrunkMultiTaskNetwork
+
+
+def cases_frame(cases_per_disease, seed):
+    cases = generate_cases(cases_per_disease=cases_per_disease, seed=seed)
+    return pd.DataFrame({
+        'disease': [case['disease'] for case in cases],
+        'symptoms': [[symptom.strip() for symptom in case['symptoms'].split(',')] for case in cases],
+        'urgency': [case['urgency'] for case in cases],
+        'severity': [case['severity'] for case in cases],
+        'category': [case['category'] for case in cases],
+    })
+
+
+@pytest.fixture(scope='module')
+def trained():
+    """Small network trained on synthetic cases, with its training frame"""
+    df = cases_frame(cases_per_disease=8, seed=3)
+    network = SharedTrunkMultiTaskNetwork(hidden_layer_sizes=(32, 16), batch_size=32, max_iter=100)
+    with contextlib.redirect_stdout(io.StringIO()):
+        network.train(network.prepare_multi_task_data(df))
+    return network, df
+
+
+class TestSharedTrunkMultiTaskNetwork:
+    """Test training, the one-pass prediction and persistence"""
+
+    def test_one_set_of_weights_for_every_task(self, trained):
+        """Test that the tasks share the trunk and split one output layer"""
+        network, df = trained
+
+        assert network.models == {}
+        assert [W.shape[1] for W, _ in network.layers[:-1]] == [32, 16]
+        assert network.layers[-1][0].shape[1] == sum(
+            df[task].nunique() for task in ('disease', 'urgency', 'severity', 'category')
+        )
+
+    def test_predict_all_tasks_format(self, trained):
+        """Test the prediction dict of MultiTaskNeuralNetwork and labels seen in training"""
+        network, df = trained
+
+        prediction = network.predict_all_tasks(df['symptoms'].iloc[0])
+
+        assert set(prediction) == {'disease', 'urgency', 'severity', 'category'}
+        assert prediction['disease']['name'] in set(df['disease'])
+        assert 0 < prediction['disease']['confidence'] <= 1
+        for task in ('urgency', 'severity', 'category'):
+            assert prediction[task] in set(df[task])
+
+    def test_learns_training_cases(self, trained):
+        """Test that most training cases get their disease back"""
+        network, df = trained
+
+        predicted = [network.predict_all_tasks(symptoms)['disease']['name'] for symptoms in df['symptoms']]
+
+        assert np.mean(np.array(predicted) == df['disease'].to_numpy()) > 0.8
+
+    def test_class_probabilities_match_prediction(self, trained):
+        """Test that the disease probabilities sum to one and agree with predict_all_tasks"""
+        network, df = trained
+        symptoms = df['symptoms'].iloc[5]
+
+        classes, probabilities = network.class_probabilities(symptoms)
+        prediction = network.predict_all_tasks(symptoms)['disease']
+
+        assert len(classes) == len(probabilities)
+        assert probabilities.sum() == pytest.approx(1.0)
+        assert classes[int(np.argmax(probabilities))] == prediction['name']
+        assert probabilities.max() == pytest.approx(prediction['confidence'])
+
+    def test_save_and_load_round_trip(self, trained, tmp_path):
+        """Test that a loaded network predicts like the saved one"""
+        network, df = trained
+        path = tmp_path / 'shared_trunk.pkl'
+
+        loaded = SharedTrunkMultiTaskNetwork()
+        with contextlib.redirect_stdout(io.StringIO()):
+            network.save_model(str(path))
+            loaded.load_model(str(path))
+
+        for symptoms in df['symptoms'].iloc[:10]:
+            assert loaded.predict_all_tasks(symptoms) == network.predict_all_tasks(symptoms)
+
+    def test_untrained_raises(self):
+        """Test that predicting before training is refused"""
+        with pytest.raises(ValueError):
+            SharedTrunkMultiTaskNetwork().predict_all_tasks(['fiebre'])
@@ -0,0 +1,118 @@
+"""
+Unit tests for the Random Forest disease classifier's features and batch prediction
+"""
+
+import contextlib
+import io
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.common import generate_cases
+from ml_models import RandomForestDiseaseClassifier
+
+
+def cases_frame(cases_per_disease, seed):
+    cases = generate_cases(cases_per_disease=cases_per_disease, seed=seed)
+    return pd.DataFrame({
+        'disease': [case['disease'] for case in cases],
+        'symptoms': [[symptom.strip() for symptom in case['symptoms'].split(',')] for case in cases],
+    })
+
+
+@pytest.fixture(scope='module')
+def trained():
+    """Small classifier trained on synthetic cases, with its training frame"""
+    df = cases_frame(cases_per_disease=8, seed=3)
+    classifier = RandomForestDiseaseClassifier(n_estimators=20, max_depth=8)
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y = classifier.prepare_features(df)
+        classifier.train(X, y)
+    return classifier, df
+
+
+class TestFeatures:
+    """Test the symptom -> column index"""
+
+    def test_matrix_matches_dense_encoding(self):
+        """Test the sparse matrix against a cell-by-cell encoding over sorted symptoms"""
+        df = pd.DataFrame({
+            'disease': ['asma', 'gripe', 'asma'],
+            'symptoms': [['Tos', 'sibilancias'], 'fiebre,tos', ['sibilancias']],
+        })
+        classifier = RandomForestDiseaseClassifier()
+
+        X, y = classifier.prepare_features(df)
+
+        assert classifier.feature_names == ['fiebre', 'sibilancias', 'tos']
+        assert classifier.symptom_index == {'fiebre': 0, 'sibilancias': 1, 'tos': 2}
+        np.testing.assert_array_equal(X.toarray(), [[0, 1, 1], [1, 0, 1], [0, 1, 0]])
+        np.testing.assert_array_equal(y, [0, 1, 0])
+
+    def test_unknown_symptoms_are_ignored(self, trained):
+        classifier, _ = trained
+        known = classifier.feature_names[0]
+
+        X = classifier._features([[known.upper(), 'sintoma inventado']])
+
+        assert X.shape == (1, len(classifier.feature_names))
+        assert X.indices.tolist() == [0]
+
+
+class TestPredict:
+    """Test single and batch predictions"""
+
+    def test_batch_matches_single_predictions(self, trained):
+        classifier, _ = trained
+        holdout = cases_frame(cases_per_disease=1, seed=9)['symptoms'].tolist()
+
+        batch = classifier.predict_batch(holdout)
+
+        assert batch == [classifier.predict(symptoms) for symptoms in holdout]
+
+    def test_label_is_the_model_prediction(self, trained):
+        """Test that the disease read from predict_proba is what model.predict returns"""
+        classifier, df = trained
+        symptoms_list = [symptoms for symptoms in df['symptoms'].tolist()[:60]
+                         if not classifier._check_emergency_rules(symptoms)['is_emergency']]
+
+        X = classifier._features(symptoms_list)
+        expected = classifier.label_encoder.inverse_transform(classifier.model.predict(X.toarray()))
+
+        assert [result['disease'] for result in classifier.predict_batch(symptoms_list)] == list(expected)
+
+    def test_emergency_cases_skip_the_model(self, trained):
+        classifier, df = trained
+        symptoms = df['symptoms'].iloc[0]
+
+        results = classifier.predict_batch([['cianosis'], symptoms])
+
+        assert results[0]['is_emergency'] and results[0]['urgency_level'] == 'critical'
+        assert results[1] == classifier.predict(symptoms)
+
+    def test_index_is_saved_with_model(self, trained, tmp_path):
+        classifier, df = trained
+        path = str(tmp_path / 'rf.pkl')
+        with contextlib.redirect_stdout(io.StringIO()):
+            classifier.save_model(path)
+            loaded = RandomForestDiseaseClassifier()
+            loaded.load_model(path)
+
+        assert loaded.symptom_index == classifier.symptom_index
+        assert loaded.predict(df['symptoms'].iloc[0]) == classifier.predict(df['symptoms'].iloc[0])
+
+    def test_model_saved_without_index_uses_all_symptoms(self, trained, tmp_path):
+        """Test files written before the index was persisted"""
+        classifier, df = trained
+        path = str(tmp_path / 'rf.pkl')
+        joblib.dump({'model': classifier.model, 'label_encoder': classifier.label_encoder}, path)
+        legacy = RandomForestDiseaseClassifier()
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy.load_model(path)
+        symptoms = df['symptoms'].iloc[0]
+
+        assert legacy.predict(symptoms, classifier.feature_names) == classifier.predict(symptoms)
+        with pytest.raises(ValueError):
+            legacy.predict(symptoms)
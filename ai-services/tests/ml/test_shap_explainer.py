@@ -0,0 +1,206 @@
+"""
+Unit tests for the SHAP explainer's feature matrix and batch post-processing
+"""
+
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+import shap
+import xgboost as xgb
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.preprocessing import LabelEncoder
+
+from benchmarks.common import generate_cases, train_xgboost_artifact
+from generate_dataset import generate_case, parse_disease_list
+from shap_explainer import SHAPDiseaseExplainer
+from train_xgboost_model import AdvancedFeatureEngineering
+
+
+def reference_factors(shap_row, top_k):
+    """Top factors as the per-row implementation computed them (stable sort on |value|)"""
+    contributions = sorted(
+        ({'feature_index': i, 'shap_value': float(v), 'feature_importance': abs(float(v))}
+         for i, v in enumerate(shap_row)),
+        key=lambda c: c['feature_importance'], reverse=True
+    )
+    positive = [c for c in contributions if c['shap_value'] > 0][:top_k]
+    negative = [c for c in contributions if c['shap_value'] < 0][:top_k]
+    return positive, negative
+
+
+@pytest.fixture
+def explainer():
+    explainer = SHAPDiseaseExplainer()
+    explainer.label_encoder = LabelEncoder().fit(['asma', 'bronquitis', 'covid-19', 'gripe', 'neumonia'])
+    return explainer
+
+
+@pytest.fixture
+def batch():
+    rng = np.random.default_rng(0)
+    proba = rng.dirichlet(np.ones(5), size=40).astype(np.float32)
+    # Rounded so rows hold ties and zeros
+    shap_rows = np.round(rng.normal(size=(40, 60)), 1)
+    return proba, shap_rows
+
+
+class TestExplanationPostProcessing:
+    """Test that the vectorized top-k matches the per-row sort"""
+
+    @pytest.mark.parametrize('top_k', [0, 1, 5, 60, 100])
+    def test_factors_match_per_row_sort(self, explainer, batch, top_k):
+        """Test positive/negative factors, ties included"""
+        proba, shap_rows = batch
+
+        explanations = explainer._build_explanations(proba, shap_rows, top_k)
+
+        for explanation, shap_row in zip(explanations, shap_rows):
+            positive, negative = reference_factors(shap_row, top_k)
+            assert explanation['explanation']['positive_factors'] == positive
+            assert explanation['explanation']['negative_factors'] == negative
+            assert explanation['explanation']['decision_factors'] == positive[:5]
+            assert explanation['shap_values'] == shap_row.tolist()
+
+    def test_predictions_decode_labels(self, explainer, batch):
+        """Test predicted disease and top 3 against inverse_transform"""
+        proba, shap_rows = batch
+
+        explanations = explainer._build_explanations(proba, shap_rows, 3)
+
+        for explanation, row in zip(explanations, proba):
+            top_indices = np.argsort(row)[-3:][::-1]
+            assert explanation['disease'] == explainer.label_encoder.inverse_transform([np.argmax(row)])[0]
+            assert explanation['confidence'] == float(row.max())
+            assert explanation['top_3_predictions'] == [
+                {'disease': explainer.label_encoder.inverse_transform([idx])[0], 'confidence': float(row[idx])}
+                for idx in top_indices
+            ]
+
+    def test_predicted_class_shap_values_layouts(self):
+        """Test picking each row's class from list and 3D SHAP layouts"""
+        rng = np.random.default_rng(1)
+        per_class = rng.normal(size=(4, 6, 3))  # (classes, rows, features)
+        predicted = np.array([0, 3, 1, 1, 2, 0])
+        expected = np.stack([per_class[c, r] for r, c in enumerate(predicted)])
+
+        as_list = SHAPDiseaseExplainer._predicted_class_shap_values(list(per_class), predicted)
+        as_3d = SHAPDiseaseExplainer._predicted_class_shap_values(per_class.transpose(1, 2, 0), predicted)
+
+        np.testing.assert_array_equal(as_list, expected)
+        np.testing.assert_array_equal(as_3d, expected)
+
+
+class TestSparseFeatures:
+    """Test the CSR feature matrix of models trained on sparse input"""
+
+    def test_append_dense_columns_matches_hstack(self):
+        """Test the hand-built CSR against sparse.hstack, empty rows included"""
+        rng = np.random.default_rng(2)
+        X = sparse.random(30, 50, density=0.05, format='lil', random_state=3)
+        X[5] = 0  # Row with no sparse entries
+        X = X.tocsr()
+        dense = np.round(rng.normal(size=(30, 4)))  # Rounded so rows hold zeros
+        dense[7] = 0
+
+        built = SHAPDiseaseExplainer._append_dense_columns(X, dense)
+        expected = sparse.hstack([X, sparse.csr_matrix(dense)], format='csr')
+
+        assert built.shape == expected.shape
+        np.testing.assert_array_equal(built.indptr, expected.indptr)
+        np.testing.assert_array_equal(built.indices, expected.indices)
+        np.testing.assert_array_equal(built.data, expected.data)
+
+    def test_sparse_and_dense_features_hold_the_same_values(self):
+        """Test that the sparse_features flag only changes the matrix format"""
+        random.seed(5)
+        cases = [generate_case(disease) for disease in parse_disease_list() for _ in range(5)]
+        texts = [case['symptoms'] for case in cases]
+        ages = [case['patient_age'] for case in cases]
+        explainer = SHAPDiseaseExplainer()
+        explainer.vectorizer = CountVectorizer(max_features=500, ngram_range=(1, 2)).fit(texts)
+        explainer.feature_engineer = AdvancedFeatureEngineering()
+
+        dense = explainer.build_features(texts, ages)
+        explainer.sparse_features = True
+        csr = explainer.build_features(texts, ages)
+        single = explainer.build_features(texts[:1], ages[:1])
+
+        assert isinstance(dense, np.ndarray)
+        assert sparse.isspmatrix_csr(csr)
+        np.testing.assert_array_equal(csr.toarray(), dense)
+        np.testing.assert_array_equal(single.toarray(), dense[:1])
+
+    def test_feature_digests_ignore_matrix_format(self):
+        """Test that equal rows get equal digests, from CSR or dense rows alike"""
+        dense = np.array([[0, 2, 0, 1.5], [0, 2, 0, 1.5], [0, 0, 0, 0], [1, 2, 0, 1.5]])
+
+        digests = SHAPDiseaseExplainer.feature_digests(dense)
+
+        assert SHAPDiseaseExplainer.feature_digests(sparse.csr_matrix(dense)) == digests
+        assert digests[0] == digests[1]
+        assert len(set(digests[1:])) == 3
+        # Same values over more columns is another vector
+        assert SHAPDiseaseExplainer.feature_digests(np.hstack([dense, np.zeros((4, 1))])) != digests
+
+
+@pytest.fixture(scope='module')
+def trained_explainer(tmp_path_factory):
+    """Explainer of a small trained XGBoost model, with a batch of its inputs"""
+    directory = tmp_path_factory.mktemp('models')
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = train_xgboost_artifact(str(directory / 'xgboost_model.pkl'), cases_per_disease=10, n_estimators=5)
+        explainer = SHAPDiseaseExplainer(path)
+    cases = generate_cases(cases_per_disease=2, seed=11)
+    return explainer, [case['symptoms'] for case in cases], [int(case['patient_age']) for case in cases]
+
+
+class TestExplanationBackends:
+    """Test the native and approximate backends against shap and XGBoost"""
+
+    def test_native_matches_shap(self, trained_explainer):
+        """Test that per-class pred_contribs give shap's explanations exactly"""
+        explainer, texts, ages = trained_explainer
+
+        full = explainer.explain_batch(texts, ages, backend='shap')
+        native = explainer.explain_batch(texts, ages, backend='native')
+
+        for shap_result, native_result in zip(full, native):
+            assert native_result['shap_values'] == shap_result['shap_values']
+            assert native_result['explanation']['positive_factors'] == shap_result['explanation']['positive_factors']
+            assert native_result['explanation']['backend'] == 'native'
+
+    def test_approximate_matches_xgboost_approx_contribs(self, trained_explainer):
+        """Test that approximate gives XGBoost's Saabas attributions of the predicted class"""
+        explainer, texts, ages = trained_explainer
+        X = explainer.build_features(texts, ages)
+        predicted = np.argmax(explainer.model.predict_proba(X), axis=1)
+
+        rows = explainer._contribution_rows(X, predicted, 'approximate')
+        expected = explainer.model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True, approx_contribs=True)
+
+        np.testing.assert_array_equal(rows, expected[np.arange(len(predicted)), predicted, :-1])
+
+    def test_binary_model_explains_positive_class(self):
+        """Test that a binary model's contributions are shap's (positive class) for every row"""
+        rng = np.random.default_rng(3)
+        X = rng.integers(0, 3, size=(60, 8)).astype(np.float64)
+        y = (X[:, 0] + X[:, 3] > 2).astype(int)
+        explainer = SHAPDiseaseExplainer()
+        explainer.model = xgb.XGBClassifier(n_estimators=5, max_depth=3, n_jobs=1).fit(X, y)
+        explainer.explainer = shap.TreeExplainer(explainer.model)
+        predicted = explainer.model.predict(X)
+
+        np.testing.assert_array_equal(
+            explainer._contribution_rows(X, predicted, 'native'),
+            explainer._contribution_rows(X, predicted, 'shap')
+        )
+
+    def test_unknown_backend(self, trained_explainer):
+        explainer, texts, ages = trained_explainer
+
+        with pytest.raises(ValueError):
+            explainer.explain_batch(texts[:1], ages[:1], backend='lime')
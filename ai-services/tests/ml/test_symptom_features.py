@@ -0,0 +1,129 @@
+"""
+Unit tests for the canonical symptom -> feature path (symptom_features.py)
+"""
+
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+from benchmarks.common import generate_cases, train_xgboost_artifact
+from services.enhanced_chatbot_service import EnhancedChatbotService
+from shap_explainer import SHAPDiseaseExplainer
+from symptom_features import SymptomFeatureMap
+from train_xgboost_model import AdvancedFeatureEngineering
+
+# Chatbot names, dataset symptoms (in the vocabulary, with bigrams) and edge cases:
+# a keyword spanning two symptoms, a name with a comma, names without tokens
+NAMES = sorted(
+    set(EnhancedChatbotService.canonical_symptom_names())
+    | {symptom.strip() for case in generate_cases(cases_per_disease=2, seed=3) for symptom in case['symptoms'].split(',')}
+) + ['dificultad', 'respiratoria', 'muy', 'alta', 'tos, fiebre', '', 'a', ' Fiebre  Alta ']
+
+
+def random_cases(n_cases, seed):
+    rng = random.Random(seed)
+    cases = [tuple(rng.choice(NAMES) for _ in range(rng.randint(0, 6))) for _ in range(n_cases)]
+    return cases, [rng.randint(1, 90) for _ in cases]
+
+
+def assert_same_matrix(direct, text):
+    if sparse.issparse(text):
+        assert sparse.isspmatrix_csr(direct)
+        assert direct.shape == text.shape and direct.dtype == text.dtype
+        assert np.array_equal(direct.indptr, text.indptr)
+        assert np.array_equal(direct.indices, text.indices)
+        assert np.array_equal(direct.data, text.data)
+    else:
+        assert isinstance(direct, np.ndarray) and direct.dtype == text.dtype
+        assert np.array_equal(direct, text)
+
+
+@pytest.fixture(scope='module', params=[True, False], ids=['sparse', 'dense'])
+def trained_explainer(request, tmp_path_factory):
+    """Explainer of a small trained XGBoost model (CSR and dense input)"""
+    directory = tmp_path_factory.mktemp('models')
+    with contextlib.redirect_stdout(io.StringIO()):
+        path = train_xgboost_artifact(str(directory / 'xgboost_model.pkl'), cases_per_disease=10, n_estimators=5,
+                                      sparse_features=request.param)
+        return SHAPDiseaseExplainer(path)
+
+
+class TestExplainerParity:
+    """Test that canonical names give the features and predictions of the joined text"""
+
+    def test_batch_matches_text(self, trained_explainer):
+        """Test a batch with duplicates, empty cases and spanning keywords"""
+        cases, ages = random_cases(300, seed=0)
+        cases += [('dificultad', 'respiratoria'), ('fiebre', 'muy', 'alta'), ()]
+        ages += [30, 40, 50]
+        texts = [', '.join(names) for names in cases]
+
+        assert trained_explainer.symptom_feature_map().supported
+        assert_same_matrix(trained_explainer.build_features(cases, ages), trained_explainer.build_features(texts, ages))
+        assert trained_explainer.predict_batch(cases, ages) == trained_explainer.predict_batch(texts, ages)
+
+    def test_single_case_matches_text(self, trained_explainer):
+        """Test the one-row path (create_features for the text)"""
+        for names, age in zip(*random_cases(40, seed=1)):
+            text = ', '.join(names)
+            assert_same_matrix(trained_explainer.build_features([names], [age]),
+                               trained_explainer.build_features([text], [age]))
+        names = ('tos seca', 'fiebre alta', 'dolor de garganta')
+        assert trained_explainer.predict(names, 20) == trained_explainer.predict(', '.join(names), 20)
+        assert (trained_explainer.explain_prediction(names, 20, backend='native')
+                == trained_explainer.explain_prediction(', '.join(names), 20, backend='native'))
+
+    def test_mixed_batch_uses_text(self, trained_explainer):
+        """Test that a batch with strings and names joins the names"""
+        cases, ages = random_cases(10, seed=2)
+        mixed = [names if row % 2 else ', '.join(names) for row, names in enumerate(cases)]
+        assert_same_matrix(trained_explainer.build_features(mixed, ages),
+                           trained_explainer.build_features([', '.join(names) for names in cases], ages))
+
+    def test_spanning_keyword_flag(self, trained_explainer):
+        """Test that a keyword across two symptoms sets its flag, as in the joined text"""
+        X = trained_explainer.build_features([('dificultad', 'respiratoria'), ('dificultad',)], [35, 35])
+        has_emergency = (len(trained_explainer.vectorizer.vocabulary_)
+                         + AdvancedFeatureEngineering.get_feature_names().index('has_emergency'))
+        assert X[0, has_emergency] == 1
+        assert X[1, has_emergency] == 0
+
+
+class TestVectorizerOptions:
+    """Test the counts against CountVectorizer.transform for other vectorizer settings"""
+
+    @pytest.mark.parametrize('options', [
+        {'ngram_range': (1, 1)},
+        {'ngram_range': (2, 2)},
+        {'ngram_range': (1, 2), 'stop_words': ['de', 'con', 'en']},
+        {'ngram_range': (1, 2), 'binary': True, 'dtype': np.float32},
+    ])
+    def test_counts_match_transform(self, options):
+        cases, ages = random_cases(200, seed=4)
+        texts = [', '.join(names) for names in cases]
+        vectorizer = CountVectorizer(**options).fit(texts)
+        X_text = vectorizer.transform(texts)
+
+        assert_same_matrix(SymptomFeatureMap(vectorizer, sparse_features=True).transform(cases, ages), X_text)
+        assert_same_matrix(SymptomFeatureMap(vectorizer).transform(cases, ages), X_text.toarray())
+
+    @pytest.mark.parametrize('vectorizer', [
+        CountVectorizer(analyzer='char_wb', ngram_range=(2, 3)),
+        CountVectorizer(ngram_range=(1, 3)),
+        CountVectorizer(tokenizer=str.split, token_pattern=None),
+        TfidfVectorizer(),
+    ])
+    def test_unsupported_vectorizers_keep_text_path(self, vectorizer):
+        """Test that the explainer falls back to the text for vectorizers the map does not reproduce"""
+        cases, ages = random_cases(20, seed=5)
+        texts = [', '.join(names) for names in cases]
+        explainer = SHAPDiseaseExplainer()
+        explainer.vectorizer = vectorizer.fit(texts)
+
+        assert not explainer.symptom_feature_map().supported
+        assert_same_matrix(explainer.build_features(cases, ages), explainer.build_features(texts, ages))
@@ -0,0 +1,128 @@
+"""
+Unit tests for the array-backed tree ensemble exporter and evaluator
+"""
+
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from ml_models.tree_inference import ArrayTreeEnsemble, export_tree_ensemble
+
+
+@pytest.fixture(scope='module')
+def data():
+    """Sparse binary features (mostly absent) and a 5-class target"""
+    rng = np.random.RandomState(0)
+    X = (rng.rand(600, 40) < 0.15).astype(np.float64)
+    y = (X[:, :8] @ np.arange(8)).astype(int) % 5
+    return X, y
+
+
+@pytest.fixture(scope='module')
+def xgboost_model(data):
+    X, y = data
+    model = xgb.XGBClassifier(n_estimators=30, max_depth=4, subsample=0.8, colsample_bytree=0.8,
+                              random_state=0, n_jobs=1, objective='multi:softprob')
+    return model.fit(sparse.csr_matrix(X), y)
+
+
+@pytest.fixture(scope='module')
+def random_forest(data):
+    X, y = data
+    # One job: scikit-learn sums the trees in order, as the evaluator does
+    return RandomForestClassifier(n_estimators=40, random_state=0, n_jobs=1).fit(sparse.csr_matrix(X), y)
+
+
+class TestXGBoost:
+    """Test the export of an XGBClassifier"""
+
+    def test_sparse_input_bit_identical(self, xgboost_model, data):
+        """Test that absent CSR entries take the default branches like XGBoost"""
+        X_sparse = sparse.csr_matrix(data[0])
+
+        expected = xgboost_model.predict_proba(X_sparse)
+        actual = export_tree_ensemble(xgboost_model).predict_proba(X_sparse)
+
+        assert actual.dtype == expected.dtype
+        assert np.array_equal(actual, expected)
+
+    def test_dense_input_with_missing_values_bit_identical(self, xgboost_model, data):
+        """Test present zeros, NaN and continuous values on a dense matrix"""
+        X = data[0] + np.random.RandomState(1).rand(*data[0].shape)
+        X[::3, ::4] = np.nan
+
+        expected = xgboost_model.predict_proba(X)
+        actual = export_tree_ensemble(xgboost_model).predict_proba(X)
+
+        assert np.array_equal(actual, expected)
+
+    def test_single_row(self, xgboost_model, data):
+        """Test a 1-D row against the library's one-row call"""
+        ensemble = export_tree_ensemble(xgboost_model)
+
+        assert np.array_equal(ensemble.predict_proba(data[0][7]), xgboost_model.predict_proba(data[0][7:8]))
+        assert ensemble.predict(data[0][:20]).tolist() == xgboost_model.predict(data[0][:20]).tolist()
+
+
+class TestRandomForest:
+    """Test the export of a RandomForestClassifier"""
+
+    @pytest.mark.parametrize('rows', [1, ArrayTreeEnsemble.SMALL_BATCH + 1, 600])
+    def test_bit_identical(self, random_forest, data, rows):
+        """Test small (one cumsum) and large (per-tree sum) batches"""
+        X_sparse = sparse.csr_matrix(data[0][:rows])
+
+        assert np.array_equal(
+            export_tree_ensemble(random_forest).predict_proba(X_sparse),
+            random_forest.predict_proba(X_sparse)
+        )
+
+    def test_apply_matches_leaves(self, random_forest, data):
+        """Test that every tree reaches the leaf scikit-learn reaches"""
+        ensemble = export_tree_ensemble(random_forest)
+        leaves = ensemble.apply(data[0][:50])
+
+        for index, estimator in enumerate(random_forest.estimators_):
+            assert np.array_equal(ensemble.value[leaves[:, index]], estimator.predict_proba(data[0][:50]))
+
+
+class TestArrayTreeEnsemble:
+    """Test persistence, validation and the import footprint"""
+
+    def test_save_and_load_round_trip(self, xgboost_model, data, tmp_path):
+        """Test that the .npz file predicts like the exported ensemble"""
+        ensemble = export_tree_ensemble(xgboost_model)
+        path = tmp_path / 'model.npz'
+        ensemble.save(str(path))
+
+        loaded = ArrayTreeEnsemble.load(str(path))
+
+        assert loaded.kind == ensemble.kind
+        assert np.array_equal(loaded.predict_proba(data[0]), ensemble.predict_proba(data[0]))
+
+    def test_wrong_feature_count_raises(self, random_forest):
+        """Test that inputs of another width are refused"""
+        with pytest.raises(ValueError):
+            export_tree_ensemble(random_forest).predict_proba(np.zeros((2, 39)))
+
+    def test_unsupported_model_raises(self, data):
+        """Test that only tree ensembles are exported"""
+        with pytest.raises(ValueError):
+            export_tree_ensemble(LogisticRegression().fit(*data))
+
+    def test_import_loads_numpy_only(self):
+        """Test that the evaluator imports neither xgboost nor scikit-learn"""
+        script = (
+            "import sys, ml_models.tree_inference; "
+            "print(sorted(name for name in ('xgboost', 'sklearn', 'pandas', 'scipy') if name in sys.modules))"
+        )
+
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+
+        assert output.strip() == '[]'
@@ -0,0 +1,85 @@
+"""
+Unit tests for the chat analysis result cache
+"""
+
+import pytest
+
+import core.cache as cache_module
+from services.analysis_cache import AnalysisCache, fold_accents, normalize_message
+
+
+class TestNormalization:
+    """Test the normalized message form used in cache keys"""
+
+    def test_fold_accents_keeps_enie(self):
+        """Test that accents and diaeresis go but ñ stays"""
+        assert fold_accents('Síntomas de pingüino, año, ÑANDÚ') == 'Sintomas de pinguino, año, ÑANDU'
+
+    def test_normalize_message(self):
+        """Test lowercasing, folding, whitespace and stop words"""
+        stop_words = {'que', 'el', 'de'}
+
+        assert normalize_message('  ¿Qué es   el ASMA? ', stop_words) == '¿que es asma?'
+        assert normalize_message('Dolor DE garganta', stop_words) == normalize_message('dolor  garganta', stop_words)
+
+
+class TestAnalysisCache:
+    """Test both tiers and the counters"""
+
+    @pytest.mark.asyncio
+    async def test_hit_returns_private_copy(self):
+        """Test that callers cannot modify the cached result"""
+        cache = AnalysisCache(max_entries=10, ttl=60, use_redis=False)
+        result = {'success': True, 'analysis': {'detected_symptoms': ['tos']}}
+
+        await cache.set('k', result)
+        result['analysis']['detected_symptoms'].append('fiebre')
+        first = await cache.get('k')
+        first['analysis']['detected_symptoms'].append('fiebre')
+
+        assert (await cache.get('k'))['analysis']['detected_symptoms'] == ['tos']
+
+    @pytest.mark.asyncio
+    async def test_counters(self):
+        """Test hit/miss counting"""
+        cache = AnalysisCache(max_entries=10, ttl=60, use_redis=False)
+
+        await cache.get('k')
+        await cache.set('k', {'success': True})
+        await cache.get('k')
+        await cache.get('k')
+
+        stats = cache.stats()
+        assert (stats['local_hits'], stats['redis_hits'], stats['misses']) == (2, 0, 1)
+        assert stats['hit_rate'] == pytest.approx(2 / 3)
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_shared(self, monkeypatch):
+        """Test that a result cached by one worker is a Redis hit for another"""
+        data = {}
+
+        async def get_cache(key):
+            return data.get(key)
+
+        async def set_cache(key, value, ttl=None):
+            data[key] = value
+            return True
+
+        monkeypatch.setattr(cache_module, 'get_cache', get_cache)
+        monkeypatch.setattr(cache_module, 'set_cache', set_cache)
+        first = AnalysisCache(max_entries=10, ttl=60, use_redis=True)
+        second = AnalysisCache(max_entries=10, ttl=60, use_redis=True)
+
+        await first.set('k', {'success': True})
+
+        assert 'chat_analysis:k' in data
+        assert await second.get('k') == {'success': True}
+        assert second.stats()['redis_hits'] == 1
+
+    def test_key_depends_on_namespace_and_signature(self):
+        """Test fixed-length keys per data version"""
+        key = AnalysisCache.make_key('v1', 'tos seca', 'symptom_phrase:tos seca')
+
+        assert key.startswith('v1:')
+        assert key != AnalysisCache.make_key('v2', 'tos seca', 'symptom_phrase:tos seca')
+        assert key != AnalysisCache.make_key('v1', 'tos seca', '')
@@ -0,0 +1,86 @@
+"""
+Unit tests for the sparse disease scorer
+"""
+
+import numpy as np
+import pytest
+
+from data.disease_parser import build_disease_database, parse_diseases_text
+from services.disease_scoring import DiseaseScorer
+from services.symptom_index import SymptomIndex
+
+
+DISEASES_MARKDOWN = """## INFECCIONES AGUDAS
+
+1. **Resfriado común**: congestion nasal, estornudos, fiebre leve, dolor de garganta
+2. **Influenza**: fiebre alta, tos seca, dolores musculares, fatiga
+3. **Neumonía**: fiebre alta, tos con flema, dificultad respiratoria, dolor torácico
+4. **Bronquitis aguda**: tos con flema, fiebre leve, sibilancias
+5. **Faringitis**: dolor de garganta, fiebre leve
+"""
+
+
+def loop_scores(diseases, detected_symptoms, tokens):
+    """The per-disease loops the scorer replaces"""
+    scores = []
+    for disease in diseases:
+        symptom_matches = 0
+        for detected_symptom in detected_symptoms:
+            for disease_symptom in disease['sintomas']:
+                if detected_symptom.lower() in disease_symptom.lower() or disease_symptom.lower() in detected_symptom.lower():
+                    symptom_matches += 1
+                    break
+        keyword_matches = sum(
+            1 for keyword in disease['keywords']
+            if any(keyword.lower() in token for token in tokens)
+        )
+        scores.append(symptom_matches * 3 + keyword_matches * 1.5)
+    return scores
+
+
+@pytest.fixture
+def database():
+    return build_disease_database(parse_diseases_text(DISEASES_MARKDOWN))
+
+
+@pytest.fixture
+def scorer(database):
+    return DiseaseScorer(database['diseases'], SymptomIndex(database['symptom_to_diseases']))
+
+
+class TestDiseaseScorer:
+    """Test the vectorized scoring formula"""
+
+    @pytest.mark.parametrize('detected_symptoms,tokens', [
+        (['fiebre alta', 'tos'], ['fiebre', 'alta', 'tos']),
+        (['dolor de garganta', 'fiebre'], ['dolor', 'garganta', 'fiebre']),
+        (['sibilancias'], ['sibilancias', 'toser']),
+        (['congestion nasal', 'estornudos', 'fiebre leve'], ['congestion', 'nasal', 'estornudos']),
+        ([], ['tos']),
+        (['mareo'], [])
+    ])
+    def test_matches_loop_scores(self, database, scorer, detected_symptoms, tokens):
+        """Test that the sparse product reproduces symptom_matches * 3 + keyword_matches * 1.5"""
+        scores, _, _ = scorer.score(detected_symptoms, tokens)
+
+        assert scores.tolist() == loop_scores(database['diseases'], detected_symptoms, tokens)
+
+    def test_match_counts(self, scorer):
+        """Test the separate symptom and keyword counts"""
+        _, symptom_matches, keyword_matches = scorer.score(['fiebre alta', 'tos seca'], ['fiebre', 'tos'])
+
+        assert symptom_matches.tolist() == [0, 2, 1, 0, 0]
+        assert keyword_matches.tolist() == [1, 2, 2, 2, 1]
+
+    def test_top_rows_stable_on_ties(self):
+        """Test that ties keep database order, like a stable sort"""
+        scores = np.array([3.0, 6.0, 3.0, 6.0, 3.0, 1.0])
+        rows = np.arange(6)
+
+        assert DiseaseScorer.top_rows(scores, rows, 3).tolist() == [1, 3, 0]
+        assert DiseaseScorer.top_rows(scores, np.array([0, 2, 4, 5]), 3).tolist() == [0, 2, 4]
+        assert DiseaseScorer.top_rows(scores, np.array([5]), 3).tolist() == [5]
+
+    def test_candidate_rows_skip_unknown_ids(self, scorer):
+        """Test mapping disease ids to matrix rows"""
+        assert scorer.candidate_rows({5, 1, 99}).tolist() == [0, 4]
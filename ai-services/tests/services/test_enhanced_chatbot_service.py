@@ -0,0 +1,470 @@
+"""
+Unit tests for Enhanced Chatbot Service
+"""
+
+import os
+
+import pytest
+
+import services.enhanced_chatbot_service as chatbot_module
+import services.inference_batcher as inference_batcher_module
+import services.model_registry as model_registry_module
+from core.executors import ExecutorSaturatedError, StageExecutor
+from services.enhanced_chatbot_service import (
+    EnhancedChatbotService,
+    init_chatbot_service,
+    get_chatbot_service,
+    reload_chatbot_service
+)
+from services.inference_batcher import InferenceBatcher
+from services.model_registry import ModelRegistry
+
+
+@pytest.fixture(autouse=True)
+def isolated_workspace(tmp_path, monkeypatch):
+    """Run every test from an empty directory with no shared service"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(chatbot_module, '_chatbot_service', None)
+    yield tmp_path
+
+
+class FixedExplainer:
+    """Explainer predicting one disease with low confidence, whatever the symptoms"""
+
+    def predict_batch(self, symptoms_list, patient_ages):
+        return [{'disease': 'Neumonía', 'confidence': 0.5} for _ in symptoms_list]
+
+    def explain_batch(self, symptoms_list, patient_ages, top_k=10, backend='shap'):
+        return self.predict_batch(symptoms_list, patient_ages)
+
+
+@pytest.fixture
+def ml_service(isolated_workspace, monkeypatch):
+    """Service whose ML model is FixedExplainer"""
+    (isolated_workspace / 'models').mkdir()
+    (isolated_workspace / 'models' / 'xgboost_model.pkl').write_bytes(b'v1')
+    registry = ModelRegistry(loader=lambda _: FixedExplainer(), check_interval=60)
+    monkeypatch.setattr(model_registry_module, '_model_registry', registry)
+    # No prediction cache: it keys rows by the model's feature vectors
+    monkeypatch.setattr(inference_batcher_module, '_inference_batcher', InferenceBatcher())
+    service = EnhancedChatbotService()
+    assert service._use_ml
+    return service
+
+
+class TestSharedChatbotService:
+    """Test the process-wide chatbot service instance"""
+
+    def test_get_returns_same_instance(self):
+        """Test that every request gets the same service"""
+        first = get_chatbot_service()
+        second = get_chatbot_service()
+
+        assert isinstance(first, EnhancedChatbotService)
+        assert first is second
+
+    def test_init_is_idempotent(self):
+        """Test that init does not rebuild an existing service"""
+        service = init_chatbot_service()
+
+        assert init_chatbot_service() is service
+        assert get_chatbot_service() is service
+
+    def test_reload_swaps_instance(self):
+        """Test that reload builds a new service and swaps it in"""
+        old_service = get_chatbot_service()
+
+        new_service = reload_chatbot_service()
+
+        assert new_service is not old_service
+        assert get_chatbot_service() is new_service
+
+    @pytest.mark.asyncio
+    async def test_shared_instance_processes_messages(self):
+        """Test that the shared service handles consecutive messages"""
+        service = get_chatbot_service()
+
+        first = await service.process_user_message("Tengo fiebre alta y tos seca")
+        second = await service.process_user_message("Estornudos y congestion nasal")
+
+        assert first['success'] is True
+        assert second['success'] is True
+        assert 'fiebre alta' in first['analysis']['detected_symptoms']
+        assert 'estornudos' in second['analysis']['detected_symptoms']
+
+
+class TestDiseaseDatabaseLoading:
+    """Test loading the disease database through the compiled snapshot"""
+
+    def test_service_loads_and_snapshots_database(self, isolated_workspace):
+        """Test that the service compiles the snapshot on first load"""
+        (isolated_workspace / 'lista_enfermedades_respiratorias.md').write_text(
+            "## INFECCIONES AGUDAS\n\n"
+            "1. **Resfriado común**: congestion nasal, estornudos, fiebre leve\n",
+            encoding='utf-8'
+        )
+
+        service = EnhancedChatbotService()
+
+        assert service._disease_db['diseases'][0]['nombre'] == 'Resfriado común'
+        assert os.path.exists(isolated_workspace / 'lista_enfermedades_respiratorias.snapshot.pkl')
+
+
+class TestMessageScanning:
+    """Test that symptom extraction and detection work from a single message scan"""
+
+    def test_phrases_before_words_without_duplicates(self):
+        """Test phrase priority order, then whole-token words in message order"""
+        service = EnhancedChatbotService()
+        message = "Tengo tos seca, fiebre alta y estornudos; tosiendo y con fiebre"
+
+        symptoms = service.extract_symptom_keywords(message, service.tokenize_spanish_text(message))
+
+        assert [s['symptom'] for s in symptoms] == ['fiebre alta', 'tos seca', 'tos', 'fiebre', 'estornudos']
+        assert [s['confidence'] for s in symptoms] == [0.9, 0.9, 0.8, 0.8, 0.8]
+        assert symptoms[0]['matched_token'] == 'fiebre'
+
+    def test_classify_by_patterns_counts_repeated_terms(self):
+        """Test that duplicated disease terms score once per listing"""
+        service = EnhancedChatbotService()
+        message = "estornudos, congestion nasal y picazon en los ojos"
+        tokens = service.tokenize_spanish_text(message)
+        symptoms = service.extract_symptom_keywords(message, tokens)
+
+        result = service._classify_by_patterns(message, symptoms, tokens)
+
+        assert result['disease_name'] == 'Rinitis alérgica'
+        assert result['matched_symptoms'] == [
+            'estornudos', 'picazon', 'nasal', 'congestion', 'nasal', 'picazon', 'ojos'
+        ]
+
+    def test_greeting_and_question_detection(self):
+        """Test greeting and question flags from the shared scan"""
+        service = EnhancedChatbotService()
+
+        assert service._is_greeting("Buenas tardes doctor, tengo una consulta larga")
+        assert service._is_greeting("hey")
+        assert not service._is_greeting("Tengo fiebre alta desde ayer")
+        assert service._is_question("¿Cuál es el tratamiento del asma")
+        assert service._is_question("asma?")
+        assert not service._is_question("Tengo fiebre alta desde ayer")
+
+    def test_scan_is_reused_for_same_message(self):
+        """Test that one message is scanned once across pipeline steps"""
+        service = EnhancedChatbotService()
+
+        service._is_greeting("tos seca y fiebre alta")
+        service._is_question("tos seca y fiebre alta")
+        service.extract_symptom_keywords("tos seca y fiebre alta", [])
+
+        assert service._scan_message.cache_info().misses == 1
+
+    def test_disease_ids_from_symptom_index(self, isolated_workspace):
+        """Test symptom lookups against the loaded database"""
+        (isolated_workspace / 'lista_enfermedades_respiratorias.md').write_text(
+            "## INFECCIONES AGUDAS\n\n"
+            "1. **Resfriado común**: congestion nasal, estornudos, fiebre leve\n"
+            "2. **Influenza**: fiebre alta, tos seca, dolores musculares\n",
+            encoding='utf-8'
+        )
+
+        service = EnhancedChatbotService()
+
+        assert service._get_disease_ids_for_symptom('fiebre') == [1, 2]
+        assert service._get_disease_ids_for_symptom('Tos seca') == [2]
+        # Unknown symptoms fall back to every disease in the database
+        assert service._get_disease_ids_for_symptom('sibilancias') == [1, 2]
+
+    def test_classify_disease_with_database(self, isolated_workspace):
+        """Test top-3 classification from the scoring matrix"""
+        (isolated_workspace / 'lista_enfermedades_respiratorias.md').write_text(
+            "## INFECCIONES AGUDAS\n\n"
+            "1. **Resfriado común**: congestion nasal, estornudos, fiebre leve\n"
+            "2. **Influenza**: fiebre alta, tos seca, dolores musculares\n"
+            "3. **Neumonía**: fiebre alta, tos con flema, dificultad respiratoria\n",
+            encoding='utf-8'
+        )
+        service = EnhancedChatbotService()
+        message = "Tengo fiebre alta, tos seca y dolores musculares"
+        tokens = service.tokenize_spanish_text(message)
+        symptoms = service.extract_symptom_keywords(message, tokens)
+
+        result = service.classify_disease(message, symptoms, tokens)
+
+        assert result['disease_name'] == 'Influenza'
+        assert result['matched_symptoms'] == ['dolores musculares', 'fiebre alta', 'tos seca']
+        assert [d['id'] for d in result['top_3_diseases']] == [2, 3, 1]
+        assert result['top_3_diseases'][0]['matches'] == 5
+
+
+class TestBatchProcessing:
+    """Test processing several messages in one call"""
+
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_messages(self):
+        """Test that each batch result equals the single-message result"""
+        service = EnhancedChatbotService()
+        messages = [
+            "Tengo fiebre alta, tos seca y dolores musculares",
+            "¿Qué es el asma?",
+            "Estornudos, congestion nasal y lagrimeo",
+            "nada relevante por aqui"
+        ]
+
+        batch = await service.process_user_messages(messages)
+        single = [await service.process_user_message(message) for message in messages]
+
+        assert batch == single
+
+    @pytest.mark.asyncio
+    async def test_failing_message_does_not_fail_batch(self, monkeypatch):
+        """Test per-item errors"""
+        service = EnhancedChatbotService()
+        original = service.extract_symptom_keywords
+
+        def flaky_extract(user_message, tokens):
+            if 'explota' in user_message:
+                raise ValueError('boom')
+            return original(user_message, tokens)
+
+        monkeypatch.setattr(service, 'extract_symptom_keywords', flaky_extract)
+
+        results = await service.process_user_messages([
+            "Tengo fiebre alta y tos seca", "esto explota con fiebre", "Hola"
+        ])
+
+        assert [r['success'] for r in results] == [True, False, True]
+        assert results[1]['error'] == 'boom'
+        assert results[2]['analysis']['message_type'] == 'greeting'
+
+
+class TestSessionProcessing:
+    """Test incremental processing of chat session turns"""
+
+    @pytest.mark.asyncio
+    async def test_first_turn_matches_single_message(self):
+        """Test that a new session analyzes like process_user_message"""
+        service = EnhancedChatbotService()
+        message = "Tengo fiebre alta, tos seca y dolores musculares"
+
+        result, state = await service.process_session_message(message)
+
+        assert result == await service.process_user_message(message)
+        assert state['turns'] == 1
+        assert [s['symptom'] for s in state['symptoms']] == result['analysis']['detected_symptoms']
+
+    @pytest.mark.asyncio
+    async def test_turns_merge_symptoms(self):
+        """Test that later turns add only their new symptoms"""
+        service = EnhancedChatbotService()
+
+        _, state = await service.process_session_message("Tengo fiebre alta")
+        result, state = await service.process_session_message("y también tos seca y fiebre alta", state)
+
+        assert result['analysis']['detected_symptoms'] == ['fiebre alta', 'fiebre', 'tos seca', 'tos']
+        assert state['tokens'].count('fiebre') == 1
+        assert state['turns'] == 2
+
+    @pytest.mark.asyncio
+    async def test_turn_without_new_symptoms_reuses_classification(self, monkeypatch):
+        """Test that classification is skipped when the symptom set does not change"""
+        service = EnhancedChatbotService()
+        _, state = await service.process_session_message("Tengo fiebre alta y tos seca")
+
+        def fail_classify(*args):
+            raise AssertionError('classified again')
+
+        monkeypatch.setattr(service, 'classify_disease', fail_classify)
+        result, new_state = await service.process_session_message("sigo igual desde ayer", state)
+
+        assert result['disease_classification'] == state['classification']
+        assert new_state['symptoms'] == state['symptoms']
+
+    @pytest.mark.asyncio
+    async def test_greeting_keeps_state(self):
+        """Test that greetings and errors leave the session unchanged"""
+        service = EnhancedChatbotService()
+        _, state = await service.process_session_message("Tengo fiebre alta")
+
+        result, same_state = await service.process_session_message("Hola", state)
+
+        assert result['analysis']['message_type'] == 'greeting'
+        assert same_state is state
+
+
+class TestSessionUrgency:
+    """Test that a session turn is never less urgent than its message on its own"""
+
+    URGENCY_RANK = {'baja': 0, 'media': 1, 'alta': 2, 'critica': 3}
+
+    @pytest.fixture
+    def service(self, ml_service):
+        return ml_service
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('turns', [
+        # The keyword phrase reuses a word of an earlier turn
+        ["tengo dificultad para dormir y tos", "ahora tengo dificultad respiratoria y fiebre"],
+        # No new symptom: the classification is reused
+        ["tengo tos y fiebre", "la tos ahora es grave y la fiebre severa"],
+    ])
+    async def test_session_urgency_not_below_latest_turn(self, service, turns):
+        state = None
+        for message in turns:
+            result, state = await service.process_session_message(message, state)
+        alone = await service.process_user_message(turns[-1])
+
+        assert alone['analysis']['urgency_level'] == 'alta'
+        assert (self.URGENCY_RANK[result['analysis']['urgency_level']]
+                >= self.URGENCY_RANK[alone['analysis']['urgency_level']])
+        assert state['urgent']
+
+    @pytest.mark.asyncio
+    async def test_urgency_is_kept_by_later_turns(self, service):
+        """Test that an urgency keyword keeps applying after its turn"""
+        _, state = await service.process_session_message("tengo tos grave")
+        result, state = await service.process_session_message("y también fiebre", state)
+
+        assert result['disease_classification']['urgency_level'] == 'high'
+        assert result['analysis']['urgency_level'] == 'alta'
+
+
+class TestStreamingProcessing:
+    """Test the staged workflow used by the streaming route"""
+
+    @staticmethod
+    async def collect(service, message):
+        return [event async for event in service.stream_user_message(message)]
+
+    @pytest.mark.asyncio
+    async def test_stage_order_and_final_result(self):
+        """Test that stages arrive in order and the result equals process_user_message"""
+        service = EnhancedChatbotService()
+        message = "Tengo fiebre alta, tos seca y dolores musculares"
+
+        events = await self.collect(service, message)
+
+        assert [name for name, _ in events] == ['symptoms', 'classification', 'narrative', 'result']
+        assert events[0][1]['count'] == len(events[-1][1]['symptom_extraction']['symptoms'])
+        assert events[1][1] == events[-1][1]['disease_classification']
+        assert events[-1][1] == await service.process_user_message(message)
+
+    @pytest.mark.asyncio
+    async def test_special_cases_only_send_result(self):
+        """Test greetings and general questions"""
+        service = EnhancedChatbotService()
+
+        greeting = await self.collect(service, "Hola")
+        question = await self.collect(service, "¿Qué es el asma?")
+
+        assert [name for name, _ in greeting] == ['result']
+        assert greeting[0][1]['analysis']['message_type'] == 'greeting'
+        assert question[0][1]['analysis']['message_type'] == 'general_question'
+
+
+class TestStageExecutors:
+    """Test that the workflow runs its CPU-bound steps on the stage executors"""
+
+    @pytest.mark.asyncio
+    async def test_results_do_not_depend_on_executor(self, monkeypatch):
+        """Test inline and thread executors give the same analysis"""
+        service = EnhancedChatbotService()
+        message = "Tengo fiebre alta, tos seca y dolores musculares"
+
+        threaded = await service.process_user_message(message)
+        monkeypatch.setattr(chatbot_module, 'get_executor', lambda stage: StageExecutor(stage, kind='inline'))
+        inline = await service.process_user_message(message)
+
+        assert inline['disease_classification'] == threaded['disease_classification']
+        assert inline['symptom_extraction'] == threaded['symptom_extraction']
+
+    @pytest.mark.asyncio
+    async def test_saturation_is_raised(self, monkeypatch):
+        """Test that a full executor rejects the request instead of returning an error result"""
+        service = EnhancedChatbotService()
+        full = StageExecutor('classification', kind='thread', max_workers=0, max_queue=0)
+        monkeypatch.setattr(chatbot_module, 'get_executor', lambda stage: full)
+
+        with pytest.raises(ExecutorSaturatedError):
+            await service.process_user_message("Tengo fiebre alta")
+        assert full.stats()['rejected'] == 1
+
+
+class TestAnalysisCaching:
+    """Test memoization of process_user_message"""
+
+    @pytest.mark.asyncio
+    async def test_near_duplicates_share_result(self):
+        """Test that case, accents, spacing and stop words do not change the key"""
+        service = EnhancedChatbotService()
+
+        first = await service.process_user_message("Tengo fiebre alta y tos seca")
+        second = await service.process_user_message("  tengo FIEBRE alta   tos seca")
+
+        assert second == first
+        assert service.analysis_cache_stats()['local_hits'] == 1
+
+    @pytest.mark.asyncio
+    async def test_lexicon_differences_do_not_share_result(self):
+        """Test that messages analyzed differently keep their own entries"""
+        service = EnhancedChatbotService()
+
+        # 'que' is a stop word but also a question word
+        question = await service.process_user_message("que es el asma")
+        statement = await service.process_user_message("es el asma")
+        # Same normalized form, but short messages count as greetings
+        greeting = await service.process_user_message("es asma")
+
+        assert question['analysis']['message_type'] == 'general_question'
+        assert statement['analysis']['message_type'] == 'no_symptoms'
+        assert greeting['analysis']['message_type'] == 'greeting'
+        assert service.analysis_cache_stats()['local_hits'] == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('messages', [
+        ("tengo tos grave", "tengo tos gráve"),
+        ("tengo tos y shock", "tengo tos y shóck"),
+        ("¿podés ayudarme?", "¿podes ayudarme?"),
+    ])
+    @pytest.mark.parametrize('reverse', [False, True], ids=['plain_first', 'accented_first'])
+    async def test_accent_variants_match_uncached(self, ml_service, messages, reverse):
+        """Test that accent variants analyzed differently never get each other's cached result"""
+        if reverse:
+            messages = messages[::-1]
+        uncached = [
+            await ml_service._analyze_user_message(message, greeting_seed=ml_service._analysis_cache_key(message))
+            for message in messages
+        ]
+        assert uncached[0] != uncached[1]
+
+        assert [await ml_service.process_user_message(message) for message in messages] == uncached
+        assert ml_service.analysis_cache_stats()['local_hits'] == 0
+
+    @pytest.mark.asyncio
+    async def test_greeting_variant_is_fixed_per_entry(self):
+        """Test that greetings are deterministic per cache key, even in a new service"""
+        first = await EnhancedChatbotService().process_user_message("Hola")
+        second = await EnhancedChatbotService().process_user_message("hola")
+
+        assert first['message'] == second['message']
+
+    @pytest.mark.asyncio
+    async def test_errors_are_not_cached(self, monkeypatch):
+        """Test that a failed analysis is retried on the next call"""
+        service = EnhancedChatbotService()
+        original = service.extract_symptom_keywords
+        calls = []
+
+        def flaky_extract(user_message, tokens):
+            calls.append(user_message)
+            if len(calls) == 1:
+                raise ValueError('boom')
+            return original(user_message, tokens)
+
+        monkeypatch.setattr(service, 'extract_symptom_keywords', flaky_extract)
+
+        failed = await service.process_user_message("Tengo fiebre alta")
+        retried = await service.process_user_message("Tengo fiebre alta")
+
+        assert failed['success'] is False
+        assert retried['success'] is True
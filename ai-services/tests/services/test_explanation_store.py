@@ -0,0 +1,49 @@
+"""
+Unit tests for the deferred explanation store
+"""
+
+import pytest
+
+from services.explanation_store import ExplanationStore
+
+
+class TestExplanationStore:
+    """Test explanation IDs and stored explanations"""
+
+    def test_id_depends_on_model_version_and_inputs(self):
+        """Test that IDs are stable per (model version, symptoms, age)"""
+        make_id = ExplanationStore.make_id
+
+        assert make_id('v1', 'fiebre, tos', 35) == make_id('v1', 'fiebre, tos', 35)
+        assert make_id('v1', 'fiebre, tos', 35) != make_id('v2', 'fiebre, tos', 35)
+        assert make_id('v1', 'fiebre, tos', 35) != make_id('v1', 'fiebre, tos', 60)
+        assert make_id('v1', 'fiebre, tos', 35) != make_id('v1', 'fiebre', 35)
+
+    @pytest.mark.asyncio
+    async def test_register_and_get(self):
+        """Test that a registered prediction keeps its inputs"""
+        store = ExplanationStore(max_entries=10, ttl=60, use_redis=False)
+
+        explanation_id = await store.register('/models/xgb.pkl', 'v1', 'fiebre, tos', 35)
+        entry = await store.get(explanation_id)
+
+        assert entry['model_path'] == '/models/xgb.pkl'
+        assert entry['model_version'] == 'v1'
+        assert entry['symptoms'] == 'fiebre, tos'
+        assert entry['patient_age'] == 35
+        assert entry['explanation'] is None
+        assert await store.get('unknown') is None
+
+    @pytest.mark.asyncio
+    async def test_registering_again_keeps_computed_explanation(self):
+        """Test that a repeated prediction does not drop an explanation already computed"""
+        store = ExplanationStore(max_entries=10, ttl=60, use_redis=False)
+
+        explanation_id = await store.register('/models/xgb.pkl', 'v1', 'fiebre, tos', 35)
+        entry = await store.get(explanation_id)
+        await store.save_explanation(explanation_id, entry, 10, {'disease': 'Gripe'})
+
+        assert await store.register('/models/xgb.pkl', 'v1', 'fiebre, tos', 35) == explanation_id
+        entry = await store.get(explanation_id)
+        assert entry['top_k'] == 10
+        assert entry['explanation'] == {'disease': 'Gripe'}
@@ -0,0 +1,151 @@
+"""
+Unit tests for the ML inference micro-batcher
+"""
+
+import asyncio
+
+import pytest
+
+import services.model_registry as model_registry_module
+from services.inference_batcher import Histogram, InferenceBatcher
+from services.model_registry import ModelRegistry
+
+
+class RecordingExplainer:
+    """Explainer echoing its inputs, recording each batched call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_batch(self, symptoms_list, patient_ages):
+        self.calls.append(('predict', list(symptoms_list), None))
+        if 'broken' in symptoms_list:
+            raise ValueError('bad input')
+        return [{'disease': symptoms, 'age': age} for symptoms, age in zip(symptoms_list, patient_ages)]
+
+    def explain_batch(self, symptoms_list, patient_ages, top_k=10, backend='shap'):
+        self.calls.append(('explain', list(symptoms_list), top_k if backend == 'shap' else (top_k, backend)))
+        return [{'disease': symptoms, 'age': age, 'explanation': top_k, 'backend': backend}
+                for symptoms, age in zip(symptoms_list, patient_ages)]
+
+
+@pytest.fixture
+def explainer():
+    return RecordingExplainer()
+
+
+@pytest.fixture
+def loaded(tmp_path, explainer, monkeypatch):
+    """Model of a registry swapped in for the process-wide one"""
+    path = tmp_path / 'xgboost_model.pkl'
+    path.write_bytes(b'v1')
+    registry = ModelRegistry(loader=lambda _: explainer, check_interval=60)
+    monkeypatch.setattr(model_registry_module, '_model_registry', registry)
+    return registry.get(str(path), 'xgboost')
+
+
+class TestInferenceBatcher:
+    """Test batching of concurrent predictions"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_call(self, loaded, explainer):
+        """Test that requests within the window are predicted together, each getting its own result"""
+        batcher = InferenceBatcher(window_ms=50, max_batch_size=32)
+
+        results = await asyncio.gather(*[
+            batcher.predict(loaded, f"sintoma {i}", patient_age=i) for i in range(5)
+        ])
+
+        assert explainer.calls == [('predict', [f"sintoma {i}" for i in range(5)], None)]
+        assert results == [{'disease': f"sintoma {i}", 'age': i} for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_does_not_wait_for_window(self, loaded, explainer):
+        """Test that max_batch_size requests start a batch at once"""
+        batcher = InferenceBatcher(window_ms=10_000, max_batch_size=3)
+
+        results = await asyncio.wait_for(asyncio.gather(*[
+            batcher.predict(loaded, f"sintoma {i}") for i in range(3)
+        ]), timeout=5)
+
+        assert len(explainer.calls) == 1
+        assert [result['disease'] for result in results] == ['sintoma 0', 'sintoma 1', 'sintoma 2']
+
+    @pytest.mark.asyncio
+    async def test_explanations_are_batched_apart(self, loaded, explainer):
+        """Test that predictions and explanations (per top_k) go to separate calls"""
+        batcher = InferenceBatcher(window_ms=20, max_batch_size=32)
+
+        results = await asyncio.gather(
+            batcher.predict(loaded, 'a'),
+            batcher.predict(loaded, 'b', explain=True, top_k=5),
+            batcher.predict(loaded, 'c', explain=True, top_k=5),
+            batcher.predict(loaded, 'd', explain=True, top_k=20),
+        )
+
+        assert sorted(explainer.calls) == [
+            ('explain', ['b', 'c'], 5),
+            ('explain', ['d'], 20),
+            ('predict', ['a'], None),
+        ]
+        assert [result.get('explanation') for result in results] == [None, 5, 5, 20]
+
+    @pytest.mark.asyncio
+    async def test_explanation_backends_are_batched_apart(self, loaded, explainer):
+        """Test that each explanation backend gets its own call"""
+        batcher = InferenceBatcher(window_ms=20, max_batch_size=32)
+
+        results = await asyncio.gather(
+            batcher.predict(loaded, 'a', explain=True),
+            batcher.predict(loaded, 'b', explain=True, backend='native'),
+            batcher.predict(loaded, 'c', explain=True, backend='native'),
+        )
+
+        assert sorted(explainer.calls, key=str) == [
+            ('explain', ['a'], 10),
+            ('explain', ['b', 'c'], (10, 'native')),
+        ]
+        assert [result['backend'] for result in results] == ['shap', 'native', 'native']
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_fails_every_caller(self, loaded):
+        """Test that an error in the batched call reaches each request of the batch"""
+        batcher = InferenceBatcher(window_ms=20, max_batch_size=32)
+
+        results = await asyncio.gather(
+            batcher.predict(loaded, 'tos'),
+            batcher.predict(loaded, 'broken'),
+            return_exceptions=True
+        )
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert batcher.stats()['failed_batches'] == 1
+
+    @pytest.mark.asyncio
+    async def test_stats_histograms(self, loaded):
+        """Test request/batch counters and the batch-size histogram"""
+        batcher = InferenceBatcher(window_ms=20, max_batch_size=4)
+
+        await asyncio.gather(*[batcher.predict(loaded, f"sintoma {i}") for i in range(6)])
+        stats = batcher.stats()
+
+        assert stats['requests'] == 6
+        assert stats['batches'] == 2
+        assert stats['pending'] == 0
+        assert stats['batch_size']['buckets']['<=2'] == 1
+        assert stats['batch_size']['buckets']['<=4'] == 1
+        assert stats['batch_size']['mean'] == 3
+        assert stats['queue_latency_ms']['count'] == 6
+
+
+class TestHistogram:
+    """Test bucket boundaries"""
+
+    def test_bounds_are_inclusive(self):
+        histogram = Histogram((1, 2, 4))
+
+        for value in (0.5, 1, 2, 3, 4, 5):
+            histogram.observe(value)
+
+        assert histogram.snapshot()['buckets'] == {'<=1': 2, '<=2': 1, '<=4': 2, '>4': 1}
+        assert histogram.snapshot()['max'] == 5
@@ -0,0 +1,177 @@
+"""
+Unit tests for the model registry
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from services.model_registry import ModelRegistry
+
+
+class CountingLoader:
+    """Loader returning the artifact content, counting calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, path):
+        self.calls.append(path)
+        with open(path, 'rb') as f:
+            content = f.read()
+        if content == b'broken':
+            raise ValueError('unreadable artifact')
+        return content
+
+
+def write_artifact(path, content, mtime_offset=0):
+    """Write an artifact, moving its mtime so a rewrite within the same tick is seen as a change"""
+    path.write_bytes(content)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + mtime_offset * 1_000_000_000))
+
+
+@pytest.fixture
+def loader():
+    return CountingLoader()
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / 'xgboost_model.pkl'
+    write_artifact(path, b'v1')
+    return path
+
+
+class TestModelRegistry:
+    """Test loading once, versioning and fallbacks"""
+
+    def test_artifact_is_loaded_once(self, loader, artifact):
+        """Test that repeated gets share one loaded explainer"""
+        registry = ModelRegistry(loader=loader, check_interval=0)
+
+        first = registry.get(str(artifact), 'xgboost')
+        second = registry.get(str(artifact), 'xgboost')
+
+        assert first is second
+        assert first.explainer == b'v1'
+        assert first.kind == 'xgboost'
+        assert len(loader.calls) == 1
+
+    def test_missing_file(self, loader, tmp_path):
+        """Test that a missing artifact returns None without calling the loader"""
+        registry = ModelRegistry(loader=loader)
+
+        assert registry.get(str(tmp_path / 'missing.pkl')) is None
+        assert loader.calls == []
+
+    def test_broken_file_is_not_retried_until_it_changes(self, loader, tmp_path):
+        """Test that a failed load is remembered for that file version"""
+        path = tmp_path / 'xgboost_model.pkl'
+        write_artifact(path, b'broken')
+        registry = ModelRegistry(loader=loader)
+
+        assert registry.get(str(path)) is None
+        assert registry.get(str(path)) is None
+        assert len(loader.calls) == 1
+        assert registry.stats()['load_failures'] == 1
+
+        write_artifact(path, b'v2', mtime_offset=1)
+        assert registry.get(str(path)).explainer == b'v2'
+        assert registry.stats()['failed'] == []
+
+    def test_get_first_falls_back_in_order(self, loader, tmp_path):
+        """Test the XGBoost -> Random Forest fallback"""
+        xgboost_path = tmp_path / 'xgboost_model.pkl'
+        forest_path = tmp_path / 'base_random_forest.pkl'
+        write_artifact(forest_path, b'forest')
+        candidates = [('xgboost', str(xgboost_path)), ('random_forest', str(forest_path))]
+        registry = ModelRegistry(loader=loader)
+
+        assert registry.get_first(candidates).kind == 'random_forest'
+
+        write_artifact(xgboost_path, b'broken')
+        assert registry.get_first(candidates).kind == 'random_forest'
+
+        write_artifact(xgboost_path, b'xgb', mtime_offset=1)
+        assert registry.get_first(candidates).kind == 'xgboost'
+
+
+class TestModelHotSwap:
+    """Test swapping in a changed artifact"""
+
+    def test_changed_file_is_swapped_in(self, loader, artifact):
+        """Test that a rewritten artifact replaces the loaded one with a new version"""
+        registry = ModelRegistry(loader=loader, check_interval=0, background_reload=False)
+        old = registry.get(str(artifact))
+
+        write_artifact(artifact, b'v2-longer', mtime_offset=1)
+        new = registry.get(str(artifact))
+
+        assert new.explainer == b'v2-longer'
+        assert new.version != old.version
+        # Holders of the old model keep a working object
+        assert old.explainer == b'v1'
+        assert registry.stats()['reloads'] == 1
+
+    def test_swap_listeners_get_both_versions(self, loader, artifact):
+        """Test that listeners hear of a swapped-in version, not of the first load"""
+        registry = ModelRegistry(loader=loader, check_interval=0, background_reload=False)
+        swaps = []
+        registry.add_swap_listener(lambda previous, current: swaps.append((previous.version, current.version)))
+        old = registry.get(str(artifact))
+
+        write_artifact(artifact, b'v2-longer', mtime_offset=1)
+        new = registry.get(str(artifact))
+
+        assert swaps == [(old.version, new.version)]
+
+    def test_file_is_checked_once_per_interval(self, loader, artifact):
+        """Test that changes are only looked for after check_interval"""
+        registry = ModelRegistry(loader=loader, check_interval=3600, background_reload=False)
+        registry.get(str(artifact))
+
+        write_artifact(artifact, b'v2', mtime_offset=1)
+
+        assert registry.get(str(artifact)).explainer == b'v1'
+        assert len(loader.calls) == 1
+
+    def test_removed_file_keeps_serving(self, loader, artifact):
+        """Test that deleting the artifact does not unload the model"""
+        registry = ModelRegistry(loader=loader, check_interval=0, background_reload=False)
+        registry.get(str(artifact))
+
+        os.remove(artifact)
+
+        assert registry.get(str(artifact)).explainer == b'v1'
+
+    def test_background_reload_does_not_block_gets(self, artifact):
+        """Test that gets return the old model while the new one loads"""
+        release = threading.Event()
+        loaded_v2 = threading.Event()
+
+        def slow_loader(path):
+            with open(path, 'rb') as f:
+                content = f.read()
+            if content == b'v2':
+                release.wait(5)
+                loaded_v2.set()
+            return content
+
+        registry = ModelRegistry(loader=slow_loader, check_interval=0)
+        registry.get(str(artifact))
+        write_artifact(artifact, b'v2', mtime_offset=1)
+
+        # Starts the reload and returns at once, as do the gets during it
+        assert registry.get(str(artifact)).explainer == b'v1'
+        assert registry.get(str(artifact)).explainer == b'v1'
+
+        release.set()
+        assert loaded_v2.wait(5)
+        for _ in range(100):
+            if registry.get(str(artifact)).explainer == b'v2':
+                break
+            time.sleep(0.01)
+        assert registry.get(str(artifact)).explainer == b'v2'
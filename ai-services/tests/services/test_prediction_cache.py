@@ -0,0 +1,137 @@
+"""
+Unit tests for the prediction cache and its use by the inference batcher
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+import services.model_registry as model_registry_module
+from services.inference_batcher import InferenceBatcher
+from services.model_registry import ModelRegistry
+from services.prediction_cache import PredictionCache
+from shap_explainer import SHAPDiseaseExplainer
+
+VOCABULARY = ('fiebre', 'tos', 'flema')
+
+
+class VocabularyExplainer:
+    """Explainer whose features are vocabulary word counts, recording model calls"""
+
+    feature_digests = staticmethod(SHAPDiseaseExplainer.feature_digests)
+
+    def __init__(self, label):
+        self.label = label
+        self.model = object()
+        self.calls = []
+
+    def build_features(self, symptoms_list, patient_ages):
+        return np.array([[symptoms.split().count(word) for word in VOCABULARY] for symptoms in symptoms_list])
+
+    def predict_features(self, X):
+        self.calls.append(('predict', X.shape[0]))
+        return [{'disease': self.label, 'features': row.tolist()} for row in X]
+
+    def explain_features(self, X, top_k=10, backend='shap'):
+        self.calls.append(('explain', X.shape[0]))
+        return [{'disease': self.label, 'features': row.tolist(), 'top_k': top_k} for row in X]
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / 'xgboost_model.pkl'
+    path.write_bytes(b'v1')
+    return path
+
+
+@pytest.fixture
+def registry(artifact, monkeypatch):
+    """Registry loading a VocabularyExplainer labelled with the artifact content, swapped in for the process-wide one"""
+    registry = ModelRegistry(loader=lambda path: VocabularyExplainer(open(path).read()),
+                             check_interval=0, background_reload=False)
+    monkeypatch.setattr(model_registry_module, '_model_registry', registry)
+    return registry
+
+
+@pytest.fixture
+def cache(registry):
+    cache = PredictionCache(max_entries=100, ttl=60, use_redis=False)
+    registry.add_swap_listener(cache.on_model_swap)
+    return cache
+
+
+class TestPredictionCache:
+    """Test keys, copies and version invalidation"""
+
+    def test_key_holds_version_and_call_kind(self):
+        assert PredictionCache.make_key('abc', 'f00', explain=False, top_k=None) == 'abc:predict:f00'
+        assert PredictionCache.make_key('abc', 'f00', explain=True, top_k=20) == 'abc:shap20:f00'
+        assert PredictionCache.make_key('abc', 'f00', explain=True, top_k=20, backend='native') == 'abc:native20:f00'
+
+    @pytest.mark.asyncio
+    async def test_invalidate_version_keeps_other_versions(self):
+        cache = PredictionCache(max_entries=10, ttl=60, use_redis=False)
+        await cache.set(PredictionCache.make_key('v1', 'a', False, None), {'disease': 'asma'})
+        await cache.set(PredictionCache.make_key('v2', 'a', False, None), {'disease': 'covid-19'})
+
+        cache.invalidate_version('v1')
+
+        assert await cache.get('v1:predict:a') is None
+        assert await cache.get('v2:predict:a') == {'disease': 'covid-19'}
+        assert cache.stats()['invalidations'] == 1
+
+
+class TestCachedBatching:
+    """Test the batcher serving rows from the cache"""
+
+    @pytest.mark.asyncio
+    async def test_same_features_call_the_model_once(self, registry, artifact, cache):
+        """Test that messages reducing to the same features share one computed result"""
+        loaded = registry.get(str(artifact), 'xgboost')
+        batcher = InferenceBatcher(window_ms=20, max_batch_size=32, cache=cache)
+
+        first = await asyncio.gather(
+            batcher.predict(loaded, 'tengo fiebre y tos', explain=True),
+            batcher.predict(loaded, 'fiebre alta y tos', explain=True),
+            batcher.predict(loaded, 'tos con flema', explain=True),
+        )
+        second = await batcher.predict(loaded, 'mucha tos y fiebre', explain=True)
+
+        assert loaded.explainer.calls == [('explain', 2)]
+        assert first[0] == first[1] == second == {'disease': 'v1', 'features': [1, 1, 0], 'top_k': 10}
+        assert first[0] is not first[1]
+        assert first[2]['features'] == [0, 1, 1]
+        stats = cache.stats()
+        assert (stats['local_hits'], stats['misses']) == (1, 2)
+
+    @pytest.mark.asyncio
+    async def test_results_are_cached_per_call_kind(self, registry, artifact, cache):
+        """Test that a cached prediction does not answer an explanation request"""
+        loaded = registry.get(str(artifact), 'xgboost')
+        batcher = InferenceBatcher(window_ms=1, max_batch_size=32, cache=cache)
+
+        await batcher.predict(loaded, 'fiebre')
+        explained = await batcher.predict(loaded, 'fiebre', explain=True, top_k=5)
+
+        assert loaded.explainer.calls == [('predict', 1), ('explain', 1)]
+        assert explained['top_k'] == 5
+
+    @pytest.mark.asyncio
+    async def test_model_swap_invalidates(self, registry, artifact, cache):
+        """Test that a new model version recomputes and the old version's entries are dropped"""
+        batcher = InferenceBatcher(window_ms=1, max_batch_size=32, cache=cache)
+        old = registry.get(str(artifact), 'xgboost')
+        await batcher.predict(old, 'fiebre')
+
+        artifact.write_bytes(b'v2-longer')
+        stat = os.stat(artifact)
+        os.utime(artifact, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        new = registry.get(str(artifact), 'xgboost')
+        result = await batcher.predict(new, 'fiebre')
+
+        assert result['disease'] == 'v2-longer'
+        assert new.explainer.calls == [('predict', 1)]
+        assert cache.stats()['invalidations'] == 1
+        assert cache.stats()['entries'] == 1
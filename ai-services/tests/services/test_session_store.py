@@ -0,0 +1,160 @@
+"""
+Unit tests for the chat session store
+"""
+
+import asyncio
+
+import pytest
+
+import core.cache as cache_module
+from services.session_store import SessionStore
+
+
+class FakeClock:
+    """Controllable replacement for time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', fake.monotonic)
+    return fake
+
+
+class TestSessionStore:
+    """Test the in-process LRU + TTL tier"""
+
+    @pytest.mark.asyncio
+    async def test_save_and_get(self):
+        """Test that a saved state comes back"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=False)
+
+        await store.save('s1', {'turns': 1})
+
+        assert await store.get('s1') == {'turns': 1}
+        assert await store.get('unknown') is None
+
+    @pytest.mark.asyncio
+    async def test_least_recent_session_is_evicted(self):
+        """Test LRU eviction, where reads count as use"""
+        store = SessionStore(max_sessions=2, ttl=60, use_redis=False)
+
+        await store.save('s1', {'turns': 1})
+        await store.save('s2', {'turns': 1})
+        await store.get('s1')
+        await store.save('s3', {'turns': 1})
+
+        assert len(store) == 2
+        assert await store.get('s2') is None
+        assert await store.get('s1') is not None
+        assert await store.get('s3') is not None
+
+    @pytest.mark.asyncio
+    async def test_sessions_expire_after_ttl(self, clock):
+        """Test that inactive sessions expire and saving refreshes the TTL"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=False)
+
+        await store.save('s1', {'turns': 1})
+        await store.save('s2', {'turns': 1})
+        clock.now += 50
+        await store.save('s2', {'turns': 2})
+        clock.now += 20
+
+        assert await store.get('s1') is None
+        assert await store.get('s2') == {'turns': 2}
+
+    @pytest.mark.asyncio
+    async def test_delete(self):
+        """Test forgetting a session"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=False)
+
+        await store.save('s1', {'turns': 1})
+        await store.delete('s1')
+
+        assert await store.get('s1') is None
+
+
+class TestSessionLock:
+    """Test that turns of one session run one at a time"""
+
+    @staticmethod
+    async def turn(store, session_id, symptom):
+        """get -> process -> save, yielding to other turns while processing"""
+        async with store.lock(session_id):
+            state = await store.get(session_id) or {'symptoms': []}
+            await asyncio.sleep(0.01)
+            await store.save(session_id, {'symptoms': state['symptoms'] + [symptom]})
+
+    @pytest.mark.asyncio
+    async def test_concurrent_turns_keep_every_update(self):
+        """Test that no turn overwrites another's state"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=False)
+
+        await asyncio.gather(*[self.turn(store, 's1', f"sintoma {i}") for i in range(5)])
+
+        assert sorted((await store.get('s1'))['symptoms']) == [f"sintoma {i}" for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_sessions_do_not_wait_for_each_other(self):
+        """Test that the lock is per session and is dropped once unused"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=False)
+
+        async with store.lock('s1'):
+            await asyncio.wait_for(self.turn(store, 's2', 'tos'), timeout=1)
+
+        assert await store.get('s2') == {'symptoms': ['tos']}
+        assert store._locks == {}
+
+
+class TestSessionStoreRedisTier:
+    """Test the Redis tier through core.cache"""
+
+    @pytest.fixture
+    def redis_cache(self, monkeypatch):
+        """Replace core.cache calls with an in-memory dict"""
+        data = {}
+
+        async def get_cache(key):
+            return data.get(key)
+
+        async def set_cache(key, value, ttl=None):
+            data[key] = value
+            return True
+
+        async def delete_cache(key):
+            data.pop(key, None)
+            return True
+
+        monkeypatch.setattr(cache_module, 'get_cache', get_cache)
+        monkeypatch.setattr(cache_module, 'set_cache', set_cache)
+        monkeypatch.setattr(cache_module, 'delete_cache', delete_cache)
+        return data
+
+    @pytest.mark.asyncio
+    async def test_other_worker_reads_through_redis(self, redis_cache):
+        """Test that a session saved by one store is found by another"""
+        first = SessionStore(max_sessions=10, ttl=60, use_redis=True)
+        second = SessionStore(max_sessions=10, ttl=60, use_redis=True)
+
+        await first.save('s1', {'turns': 3})
+
+        assert redis_cache['chat_session:s1'] == {'turns': 3}
+        assert await second.get('s1') == {'turns': 3}
+        assert len(second) == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_removes_redis_entry(self, redis_cache):
+        """Test that deleting a session clears both tiers"""
+        store = SessionStore(max_sessions=10, ttl=60, use_redis=True)
+
+        await store.save('s1', {'turns': 1})
+        await store.delete('s1')
+
+        assert 'chat_session:s1' not in redis_cache
+        assert await store.get('s1') is None
@@ -0,0 +1,58 @@
+"""
+Unit tests for the inverted symptom index
+"""
+
+import pytest
+
+from services.symptom_index import SymptomIndex, bitset_members
+
+
+SYMPTOM_TO_DISEASES = {
+    'Fiebre alta': [1, 4],
+    'fiebre leve': [2],
+    'tos seca': [1],
+    'tos con flema': [3],
+    'dolor de garganta': [2, 3],
+    'Dificultad respiratoria': [4],
+    'dolor': [5]
+}
+
+
+def substring_scan(symptom):
+    """The scan the index replaces"""
+    disease_ids = set()
+    for symptom_key, ids in SYMPTOM_TO_DISEASES.items():
+        if symptom.lower() in symptom_key.lower() or symptom_key.lower() in symptom.lower():
+            disease_ids.update(ids)
+    return sorted(disease_ids)
+
+
+@pytest.fixture
+def index():
+    return SymptomIndex(SYMPTOM_TO_DISEASES)
+
+
+class TestSymptomIndex:
+    """Test lookups against the substring scan"""
+
+    @pytest.mark.parametrize('symptom', [
+        'fiebre', 'FIEBRE ALTA', 'tos', 'to', 't', '', 'dolor de garganta',
+        'dolor de cabeza', 'respiratoria', 'tos seca y fiebre leve', 'sibilancias', 'ebre al'
+    ])
+    def test_matches_substring_scan(self, index, symptom):
+        """Test contains and contained-in lookups in both directions"""
+        assert bitset_members(index.lookup(symptom)) == substring_scan(symptom)
+
+    def test_no_match_is_empty_bitset(self, index):
+        """Test that unknown symptoms return an empty set"""
+        assert index.lookup('sibilancias') == 0
+
+    def test_all_diseases(self, index):
+        """Test the union of every disease id"""
+        assert bitset_members(index.all_diseases) == [1, 2, 3, 4, 5]
+        assert len(index) == len(SYMPTOM_TO_DISEASES)
+
+    def test_bitset_members(self):
+        """Test bitset decoding"""
+        assert bitset_members(0) == []
+        assert bitset_members((1 << 124) | (1 << 3) | 1) == [0, 3, 124]
@@ -0,0 +1,90 @@
+"""
+Unit tests for the multi-pattern symptom matcher
+"""
+
+from services.symptom_matcher import MultiPatternMatcher, MessageMatches, PatternMatch
+
+
+def brute_force_scan(entries, text):
+    """Reference result: substring search for every entry"""
+    found = []
+    for pattern, pattern_class, value in entries:
+        start = text.find(pattern)
+        while start != -1:
+            found.append((start, start + len(pattern), pattern, pattern_class, value))
+            start = text.find(pattern, start + 1)
+    return sorted(found)
+
+
+class TestMultiPatternMatcher:
+    """Test the Aho-Corasick automaton"""
+
+    def test_finds_overlapping_patterns(self):
+        """Test that nested and overlapping patterns are all reported"""
+        entries = [
+            ('tos', 'word', 1),
+            ('tos seca', 'phrase', 2),
+            ('seca', 'word', 3),
+            ('os s', 'other', 4)
+        ]
+        matcher = MultiPatternMatcher(entries)
+
+        matches = matcher.scan('tengo tos seca')
+
+        assert sorted(tuple(m) for m in matches) == brute_force_scan(entries, 'tengo tos seca')
+
+    def test_same_pattern_in_several_classes(self):
+        """Test that each registration of a pattern produces its own match"""
+        matcher = MultiPatternMatcher([
+            ('tos', 'symptom_word', 'tos'),
+            ('tos', 'disease_term', (2, 3))
+        ])
+
+        matches = matcher.scan('tos')
+
+        assert matches == [
+            PatternMatch(0, 3, 'tos', 'symptom_word', 'tos'),
+            PatternMatch(0, 3, 'tos', 'disease_term', (2, 3))
+        ]
+
+    def test_matches_ordered_by_end(self):
+        """Test that matches come back in text order"""
+        matcher = MultiPatternMatcher([('fiebre', 'w', None), ('tos', 'w', None)])
+
+        matches = matcher.scan('tos y fiebre y tos')
+
+        assert [m.start for m in matches] == [0, 6, 15]
+        assert matcher.pattern_count == 2
+
+    def test_no_match_and_empty_text(self):
+        """Test texts without any pattern"""
+        matcher = MultiPatternMatcher([('fiebre', 'w', None)])
+
+        assert matcher.scan('') == []
+        assert matcher.scan('dolor de cabeza') == []
+
+
+class TestMessageMatches:
+    """Test grouping scan results by class"""
+
+    def test_words_of_class_requires_word_bounds(self):
+        """Test that substrings inside longer words are not whole-word hits"""
+        matcher = MultiPatternMatcher([('tos', 'symptom_word', 'tos')])
+        text = 'tosiendo, tos_ferina y tos.'
+
+        scan = MessageMatches(text, matcher.scan(text))
+
+        assert len(scan.of_class('symptom_word')) == 3
+        assert [m.start for m in scan.words_of_class('symptom_word')] == [23]
+
+    def test_has_class(self):
+        """Test class membership"""
+        matcher = MultiPatternMatcher([('hola', 'greeting', None), ('?', 'question', None)])
+        text = 'hola, ¿todo bien?'
+
+        scan = MessageMatches(text, matcher.scan(text))
+
+        assert scan.has('greeting')
+        assert scan.has('question')
+        assert not scan.has('symptom_phrase')
+        assert scan.of_class('symptom_phrase') == []
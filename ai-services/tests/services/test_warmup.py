@@ -0,0 +1,93 @@
+"""
+Unit tests for the startup warm-up
+"""
+
+import pytest
+
+import services.enhanced_chatbot_service as chatbot_module
+import services.inference_batcher as inference_batcher_module
+import services.model_registry as model_registry_module
+from core.config import settings
+from services.inference_batcher import InferenceBatcher
+from services.model_registry import ModelRegistry
+from services.warmup import WARMUP_MESSAGES, Warmup
+
+
+class RecordingExplainer:
+    """Explainer recording the batched calls it gets"""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_batch(self, symptoms_list, patient_ages):
+        self.calls.append(('predict', None))
+        return [{'disease': 'gripe'} for _ in symptoms_list]
+
+    def explain_batch(self, symptoms_list, patient_ages, top_k=10, backend='shap'):
+        self.calls.append(('explain', backend))
+        return [{'disease': 'gripe', 'backend': backend} for _ in symptoms_list]
+
+
+@pytest.fixture(autouse=True)
+def isolated_workspace(tmp_path, monkeypatch):
+    """Run every test from an empty directory with no shared service, registry or batcher"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(chatbot_module, '_chatbot_service', None)
+    monkeypatch.setattr(model_registry_module, '_model_registry', None)
+    monkeypatch.setattr(inference_batcher_module, '_inference_batcher', InferenceBatcher(window_ms=1))
+    yield tmp_path
+
+
+@pytest.fixture
+def explainer(tmp_path, monkeypatch):
+    """Default model of a registry swapped in for the process-wide one"""
+    explainer = RecordingExplainer()
+    (tmp_path / 'models').mkdir()
+    (tmp_path / 'models' / 'xgboost_model.pkl').write_bytes(b'v1')
+    registry = ModelRegistry(loader=lambda _: explainer, check_interval=60)
+    monkeypatch.setattr(model_registry_module, '_model_registry', registry)
+    return explainer
+
+
+class TestWarmup:
+    """Test the warm-up stages and readiness"""
+
+    @pytest.mark.asyncio
+    async def test_runs_every_stage_then_ready(self, explainer, monkeypatch):
+        """Test that the model is predicted with and explained with each configured backend"""
+        monkeypatch.setattr(settings, 'CHAT_EXPLANATION_BACKEND', 'native')
+        monkeypatch.setattr(settings, 'ML_ANALYZE_EXPLANATION_BACKEND', 'native')
+        warmup = Warmup()
+        assert not warmup.status()['ready']
+
+        status = await warmup.run()
+
+        assert status['ready'] and warmup.ready
+        assert list(status['stages']) == [
+            'models', 'disease_index', 'tokenize', 'extract', 'classify', 'predict', 'explain_native', 'explain_shap'
+        ]
+        assert status['failed'] == {}
+        assert [call for call in explainer.calls if call[0] == 'explain'] == [('explain', 'native'), ('explain', 'shap')]
+        assert chatbot_module._chatbot_service is not None
+
+    @pytest.mark.asyncio
+    async def test_without_model_skips_ml_stages(self):
+        """Test that pattern matching is still warmed when no model loads"""
+        status = await Warmup(WARMUP_MESSAGES[:2]).run()
+
+        assert status['ready']
+        assert list(status['stages']) == ['models', 'disease_index', 'tokenize', 'extract', 'classify']
+
+    @pytest.mark.asyncio
+    async def test_failing_stage_does_not_block_readiness(self, monkeypatch):
+        """Test that a failed stage is recorded and the later ones are skipped"""
+        def broken_service():
+            raise RuntimeError('database missing')
+
+        monkeypatch.setattr(chatbot_module, 'init_chatbot_service', broken_service)
+
+        status = await Warmup().run()
+
+        assert status['ready']
+        assert status['failed'] == {'disease_index': 'database missing'}
+        assert list(status['stages']) == ['models']
@@ -10,20 +10,51 @@ This script:
 """
 
 import csv
+import re
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Sequence, Tuple
 import xgboost as xgb
 from sklearn.model_selection import train_test_split, GridSearchCV
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.feature_extraction.text import CountVectorizer
+from scipy import sparse
 import joblib
 import shap
 
 
+def _keyword_matcher(keywords: List[str]) -> re.Pattern:
+    """Regex matching any of the keywords as a substring (same as any(kw in text))"""
+    return re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+
 class AdvancedFeatureEngineering:
     """Advanced feature engineering for ML models"""
     
+    # Keyword groups of create_features, in column order
+    SYMPTOM_COUNT_KEYWORDS = [  # Columns 2-4: symptoms containing a keyword
+        ['tos', 'congestion', 'secrecion', 'estornudos', 'sibilancias', 'difficultad'],
+        ['fiebre', 'fatiga', 'malestar', 'cansancio', 'debilidad'],
+        ['dolor', 'ardor', 'opresion', 'molestia'],
+    ]
+    TEXT_FLAG_KEYWORDS = [  # Columns 5-12: keyword anywhere in the joined symptoms
+        ['intenso', 'severa', 'extremo', 'grave', 'alto', 'muy alta'],
+        ['dificultad respiratoria', 'cianosis', 'confusion', 'shock', 'coma'],
+        ['fiebre'],
+        ['tos'],
+        ['dificultad', 'disnea', 'ahogo'],
+        ['fatiga', 'cansancio'],
+        ['aguda', 'sudbito', 'inicio'],
+        ['cronico', 'persistente', 'semanas', 'meses'],
+    ]
+    # One precompiled matcher per group, for create_features_batch
+    KEYWORD_MATCHERS = [_keyword_matcher(keywords) for keywords in SYMPTOM_COUNT_KEYWORDS + TEXT_FLAG_KEYWORDS]
+    # Keywords with a space can also span two symptoms once they are joined (None: no such keyword)
+    SPANNING_MATCHERS = [
+        _keyword_matcher([kw for kw in keywords if ' ' in kw]) if any(' ' in kw for kw in keywords) else None
+        for keywords in TEXT_FLAG_KEYWORDS
+    ]
+    
     @staticmethod
     def create_features(symptoms_text: str, patient_age: int = 35) -> np.ndarray:
         """
@@ -99,6 +130,88 @@ class AdvancedFeatureEngineering:
         
         return np.array(features)
     
+    @classmethod
+    def create_features_batch(cls, symptoms_texts: Sequence[str], patient_ages: Sequence[int]) -> np.ndarray:
+        """
+        create_features for many cases at once
+        
+        Each text is split once. Symptoms repeat across cases, so the keyword
+        matchers run once per distinct symptom; per-case counts and flags are
+        then NumPy sums over each case's symptoms.
+        
+        Args:
+            symptoms_texts: Comma-separated symptoms of each case
+            patient_ages: Patient age of each case
+        
+        Returns:
+            (n_cases, 15) matrix whose rows equal create_features(text, age)
+        """
+        n_cases = len(symptoms_texts)
+        if n_cases == 0:
+            return np.empty((0, len(cls.get_feature_names())))
+        
+        symptom_ids: Dict[str, int] = {}
+        case_symptom_ids = []
+        joined = []
+        num_symptoms = np.empty(n_cases, dtype=np.intp)
+        for case, text in enumerate(symptoms_texts):
+            symptoms = [s.strip() for s in text.lower().split(',')]
+            num_symptoms[case] = len(symptoms)
+            case_symptom_ids.extend(symptom_ids.setdefault(symptom, len(symptom_ids)) for symptom in symptoms)
+            joined.append(' '.join(symptoms))
+        
+        # Keyword hits and word count of each distinct symptom, summed over the symptoms of each case
+        distinct = list(symptom_ids)
+        hits = np.array([cls.symptom_hits(symptom) for symptom in distinct], dtype=np.intp)
+        words = np.array([len(symptom.split()) for symptom in distinct], dtype=np.intp)
+        case_starts = np.concatenate(([0], np.cumsum(num_symptoms)[:-1]))
+        case_symptom_ids = np.asarray(case_symptom_ids, dtype=np.intp)
+        case_hits = np.add.reduceat(hits[case_symptom_ids], case_starts, axis=0)
+        case_words = np.add.reduceat(words[case_symptom_ids], case_starts)
+        
+        flags = case_hits[:, len(cls.SYMPTOM_COUNT_KEYWORDS):] > 0
+        for group, matcher in enumerate(cls.SPANNING_MATCHERS):
+            if matcher is not None:
+                flags[:, group] |= np.fromiter((matcher.search(text) is not None for text in joined),
+                                               dtype=bool, count=n_cases)
+        
+        return cls.assemble_features(num_symptoms, case_hits, flags, case_words, patient_ages)
+    
+    @classmethod
+    def symptom_hits(cls, symptom: str) -> List[bool]:
+        """Whether a stripped, lowercased symptom contains a keyword of each group (KEYWORD_MATCHERS order)"""
+        return [matcher.search(symptom) is not None for matcher in cls.KEYWORD_MATCHERS]
+    
+    @classmethod
+    def assemble_features(cls,
+                          num_symptoms: np.ndarray,
+                          case_hits: np.ndarray,
+                          flags: np.ndarray,
+                          case_words: np.ndarray,
+                          patient_ages: Sequence[int]) -> np.ndarray:
+        """
+        Engineered feature rows from per-case sums
+        
+        Args:
+            num_symptoms: Symptoms of each case
+            case_hits: (n_cases, n_groups) symptoms of each case matching each keyword group
+            flags: (n_cases, len(TEXT_FLAG_KEYWORDS)) flag groups found in each joined case
+            case_words: Words of each case
+            patient_ages: Patient age of each case
+        
+        Returns:
+            (n_cases, 15) matrix laid out as create_features
+        """
+        n_counts = len(cls.SYMPTOM_COUNT_KEYWORDS)
+        features = np.empty((len(num_symptoms), len(cls.get_feature_names())))
+        features[:, 0] = num_symptoms
+        features[:, 1] = np.asarray(num_symptoms) / 10.0
+        features[:, 2:2 + n_counts] = case_hits[:, :n_counts]
+        features[:, 2 + n_counts:13] = flags
+        features[:, 13] = np.asarray(patient_ages, dtype=np.float64) / 100.0
+        features[:, 14] = np.asarray(case_words) / 20.0
+        return features
+    
     @staticmethod
     def get_feature_names() -> List[str]:
         """Get names of engineered features"""
@@ -145,6 +258,9 @@ class XGBoostDiseaseClassifier:
         self.feature_engineer = AdvancedFeatureEngineering()
         self.explainer = None
         self.is_trained = False
+        # Trained on CSR features: absent entries are missing values to XGBoost,
+        # so inference has to build the same sparse matrix
+        self.sparse_features = True
         
         self.feature_names = []
     
@@ -161,39 +277,31 @@ class XGBoostDiseaseClassifier:
         print(f"Loaded {len(cases)} cases")
         return cases
     
-    def create_advanced_features(self, cases: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    def create_advanced_features(self, cases: List[Dict[str, Any]]) -> Tuple[sparse.csr_matrix, np.ndarray]:
         """
         Create advanced feature matrix from cases
         
+        The vectorized symptoms stay in CSR form (a few non-zeros per row out
+        of 500 columns); the engineered columns are appended to it.
+        
         Returns:
             Tuple of (features, labels)
         """
         print("Creating advanced features...")
         
-        X_symptom_text = []
-        X_engineered = []
-        y = []
-        
-        for case in cases:
-            symptoms = case['symptoms']
-            disease = case['disease']
-            
-            X_symptom_text.append(symptoms)
-            
-            # Create engineered features
-            patient_age = int(case.get('patient_age', 35))
-            engineered_feat = self.feature_engineer.create_features(symptoms, patient_age)
-            X_engineered.append(engineered_feat)
-            
-            y.append(disease)
+        X_symptom_text = [case['symptoms'] for case in cases]
+        patient_ages = [int(case.get('patient_age', 35)) for case in cases]
+        y = [case['disease'] for case in cases]
+        
+        # Create engineered features (whole column at once)
+        X_engineered = self.feature_engineer.create_features_batch(X_symptom_text, patient_ages)
         
         # Vectorize symptoms
         print("Vectorizing symptoms...")
-        X_symptom_vectorized = self.vectorizer.fit_transform(X_symptom_text).toarray()
+        X_symptom_vectorized = self.vectorizer.fit_transform(X_symptom_text)
         
         # Combine features
-        X_engineered = np.array(X_engineered)
-        X_combined = np.hstack([X_symptom_vectorized, X_engineered])
+        X_combined = sparse.hstack([X_symptom_vectorized, sparse.csr_matrix(X_engineered)], format='csr')
         
         # Encode labels
         y_encoded = self.label_encoder.fit_transform(y)
@@ -208,7 +316,7 @@ class XGBoostDiseaseClassifier:
         
         return X_combined, y_encoded
     
-    def train(self, X: np.ndarray, y: np.ndarray, optimize: bool = True):
+    def train(self, X: sparse.csr_matrix, y: np.ndarray, optimize: bool = True):
         """
         Train XGBoost model with optional hyperparameter optimization
         
@@ -300,9 +408,12 @@ class XGBoostDiseaseClassifier:
             return {'error': 'Model not trained'}
         
         # Create feature vector
-        X_symptom = self.vectorizer.transform([symptoms]).toarray()
+        X_symptom = self.vectorizer.transform([symptoms])
         X_engineered = self.feature_engineer.create_features(symptoms, patient_age).reshape(1, -1)
-        X_combined = np.hstack([X_symptom, X_engineered])
+        if self.sparse_features:
+            X_combined = sparse.hstack([X_symptom, sparse.csr_matrix(X_engineered)], format='csr')
+        else:
+            X_combined = np.hstack([X_symptom.toarray(), X_engineered])
         
         # Predict
         prediction_idx = self.model.predict(X_combined)[0]
@@ -338,7 +449,8 @@ class XGBoostDiseaseClassifier:
             'model': self.model,
             'label_encoder': self.label_encoder,
             'vectorizer': self.vectorizer,
-            'feature_names': self.feature_names
+            'feature_names': self.feature_names,
+            'sparse_features': self.sparse_features
         }, filepath)
         print(f"Model saved to {filepath}")
     
@@ -349,6 +461,7 @@ class XGBoostDiseaseClassifier:
         self.label_encoder = data['label_encoder']
         self.vectorizer = data['vectorizer']
         self.feature_names = data['feature_names']
+        self.sparse_features = data.get('sparse_features', False)
         self.explainer = shap.TreeExplainer(self.model)
         self.is_trained = True
 
@@ -371,6 +484,8 @@ def main():
     
     # Save model
     model.save_model('models/xgboost_model.pkl')
+    from model_artifacts import export_mmap_artifact
+    print(f"Memory-mapped artifact saved to {export_mmap_artifact('models/xgboost_model.pkl')}")
     
     # Test prediction with SHAP
     print("\n=== Testing Model with SHAP ===")
@@ -5,12 +5,15 @@ Trains XGBoost model with advanced features for disease classification.
 """
 
 import csv
+import re
 import numpy as np
+from typing import Dict, List, Sequence
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics import classification_report, accuracy_score
+from scipy import sparse
 import joblib
 from datetime import datetime
 
@@ -63,6 +66,82 @@ def create_advanced_features(symptoms_text: str, patient_age: int = 35) -> np.nd
     return np.array(features)
 
 
+def _keyword_matcher(keywords: List[str]) -> re.Pattern:
+    """Regex matching any of the keywords as a substring (same as any(kw in text))"""
+    return re.compile('|'.join(re.escape(kw) for kw in keywords))
+
+
+# Keyword groups of create_advanced_features, in column order
+SYMPTOM_COUNT_KEYWORDS = [  # Columns 2-4: symptoms containing a keyword
+    ['tos', 'congestion', 'secrecion', 'estornudos', 'sibilancias', 'difficultad'],
+    ['fiebre', 'fatiga', 'malestar', 'cansancio', 'debilidad'],
+    ['dolor', 'ardor', 'opresion', 'molestia'],
+]
+TEXT_FLAG_KEYWORDS = [  # Columns 5-12: keyword anywhere in the joined symptoms
+    ['intenso', 'severa', 'extremo', 'grave', 'alto', 'muy alta'],
+    ['dificultad respiratoria', 'cianosis', 'confusion', 'shock', 'coma'],
+    ['fiebre'],
+    ['tos'],
+    ['dificultad', 'disnea', 'ahogo'],
+    ['fatiga', 'cansancio'],
+    ['aguda', 'sudbito', 'inicio'],
+    ['cronico', 'persistente', 'semanas', 'meses'],
+]
+# One precompiled matcher per group, for create_advanced_features_batch
+KEYWORD_MATCHERS = [_keyword_matcher(keywords) for keywords in SYMPTOM_COUNT_KEYWORDS + TEXT_FLAG_KEYWORDS]
+NUM_ENGINEERED_FEATURES = 15
+
+
+def create_advanced_features_batch(symptoms_texts: Sequence[str], patient_ages: Sequence[int]) -> np.ndarray:
+    """
+    (n_cases, 15) matrix whose rows equal create_advanced_features(text, age)
+    
+    Keywords are matched once per distinct symptom, then summed per case.
+    """
+    n_cases = len(symptoms_texts)
+    features = np.empty((n_cases, NUM_ENGINEERED_FEATURES))
+    if n_cases == 0:
+        return features
+    
+    symptom_ids: Dict[str, int] = {}
+    case_symptom_ids = []
+    joined = []
+    num_symptoms = np.empty(n_cases, dtype=np.intp)
+    for case, text in enumerate(symptoms_texts):
+        symptoms = [s.strip() for s in text.lower().split(',')]
+        num_symptoms[case] = len(symptoms)
+        case_symptom_ids.extend(symptom_ids.setdefault(symptom, len(symptom_ids)) for symptom in symptoms)
+        joined.append(' '.join(symptoms))
+    
+    # Keyword hits and word count of each distinct symptom, summed over the symptoms of each case
+    distinct = list(symptom_ids)
+    hits = np.array([[matcher.search(symptom) is not None for matcher in KEYWORD_MATCHERS]
+                     for symptom in distinct], dtype=np.intp)
+    words = np.array([len(symptom.split()) for symptom in distinct], dtype=np.intp)
+    case_starts = np.concatenate(([0], np.cumsum(num_symptoms)[:-1]))
+    case_symptom_ids = np.asarray(case_symptom_ids, dtype=np.intp)
+    case_hits = np.add.reduceat(hits[case_symptom_ids], case_starts, axis=0)
+    case_words = np.add.reduceat(words[case_symptom_ids], case_starts)
+    
+    n_counts = len(SYMPTOM_COUNT_KEYWORDS)
+    flags = case_hits[:, n_counts:] > 0
+    # Keywords with a space can also span two symptoms once they are joined
+    for group, keywords in enumerate(TEXT_FLAG_KEYWORDS):
+        spanning = [kw for kw in keywords if ' ' in kw]
+        if spanning:
+            flags[:, group] |= np.fromiter((any(kw in text for kw in spanning) for text in joined),
+                                           dtype=bool, count=n_cases)
+    
+    features[:, 0] = num_symptoms
+    features[:, 1] = num_symptoms / 10.0
+    features[:, 2:2 + n_counts] = case_hits[:, :n_counts]
+    features[:, 2 + n_counts:13] = flags
+    features[:, 13] = np.asarray(patient_ages, dtype=np.float64) / 100.0
+    features[:, 14] = case_words / 20.0
+    
+    return features
+
+
 def main():
     print("=== Training XGBoost Model ===")
     
@@ -78,28 +157,18 @@ def main():
     
     # Prepare data
     print("\nCreating advanced features...")
-    X_symptom_text = []
-    X_engineered = []
-    y = []
-    
-    for case in cases:
-        symptoms = case['symptoms']
-        disease = case['disease']
-        
-        X_symptom_text.append(symptoms)
-        patient_age = int(case.get('patient_age', 35))
-        engineered_feat = create_advanced_features(symptoms, patient_age)
-        X_engineered.append(engineered_feat)
-        y.append(disease)
+    X_symptom_text = [case['symptoms'] for case in cases]
+    patient_ages = [int(case.get('patient_age', 35)) for case in cases]
+    y = [case['disease'] for case in cases]
+    X_engineered = create_advanced_features_batch(X_symptom_text, patient_ages)
     
     # Vectorize symptoms
     print("Vectorizing symptoms...")
     vectorizer = CountVectorizer(max_features=500, ngram_range=(1, 2))
-    X_symptom_vectorized = vectorizer.fit_transform(X_symptom_text).toarray()
+    X_symptom_vectorized = vectorizer.fit_transform(X_symptom_text)
     
-    # Combine features
-    X_engineered = np.array(X_engineered)
-    X_combined = np.hstack([X_symptom_vectorized, X_engineered])
+    # Combine features (kept sparse: absent entries are missing values to XGBoost)
+    X_combined = sparse.hstack([X_symptom_vectorized, sparse.csr_matrix(X_engineered)], format='csr')
     
     # Encode labels
     label_encoder = LabelEncoder()
@@ -154,19 +223,24 @@ def main():
         'model': model,
         'label_encoder': label_encoder,
         'vectorizer': vectorizer,
+        'sparse_features': True,
         'created_at': datetime.now().isoformat()
     }
     joblib.dump(model_data, 'models/xgboost_model.pkl')
     print("Model saved to models/xgboost_model.pkl")
     
+    # Same model as a memory-mapped artifact, shared by the workers of a host
+    from model_artifacts import export_mmap_artifact
+    print(f"Memory-mapped artifact saved to {export_mmap_artifact('models/xgboost_model.pkl')}")
+    
     # Test prediction
     print("\n=== Testing Model ===")
     test_symptoms = "tos, sibilancias, dificultad respiratoria, opresion pecho"
     
     # Predict
-    X_symptom_test = vectorizer.transform([test_symptoms]).toarray()
+    X_symptom_test = vectorizer.transform([test_symptoms])
     X_engineered_test = create_advanced_features(test_symptoms).reshape(1, -1)
-    X_test_combined = np.hstack([X_symptom_test, X_engineered_test])
+    X_test_combined = sparse.hstack([X_symptom_test, sparse.csr_matrix(X_engineered_test)], format='csr')
     
     prediction_idx = model.predict(X_test_combined)[0]
     prediction_proba = model.predict_proba(X_test_combined)[0]